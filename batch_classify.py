@@ -0,0 +1,361 @@
+from typing import List, Dict, Any, Tuple, Iterable, Iterator, Optional, TextIO, Callable
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+logger = logging.getLogger(__file__)
+logger.setLevel(logging.INFO)
+
+"""大量のテキストをまとめてカテゴリ分類します。
+JSONLまたはTSVの入力をファイルか標準入力から逐次読み込み、複数のワーカープロセスでスコアリングします。
+各ワーカーはMecabWrapperと辞書を一度だけ読み込みます。同時に処理中のチャンク数を制限するため、入力の大きさによらずメモリ使用量は一定です。
+出力は入力と同じ順序で、1行に1レコードのJSONLとして書き出します。
+--dedupe-thresholdを指定すると、ほぼ同じテキストは代表の1件だけをスコアリングし、その結果を同じクラスタのレコードにも書き出します。
+
+python batch_classify.py --input texts.jsonl --output result.jsonl --workers 8 --top-k 5
+
+Python3.7以上で動作します。
+"""
+
+__author__ = "Kensuke Mitsuzawa"
+__author_email__ = "kensuke_mitsuzawa@fumankaitori.com"
+__license_name__ = "MIT"
+
+from category_scoring import POS_CONDITION, create_mecab_tokenizer, tokenize, get_text_score, \
+    load_word_score_dictionary, close_word_score_dictionary
+from dictionary_delta import DictionaryHandle
+from near_duplicate import NearDuplicateStage
+from metrics import METRICS
+from result_cache import get_manifest_dictionary_version
+
+# ワーカープロセスごとに一度だけ作成するトークナイザーと辞書
+_WORKER_STATE = {}  # type: Dict[str,Any]
+
+
+def iter_input_records(file_object,
+                       input_format='jsonl',
+                       id_key='id',
+                       text_key='text'):
+    # type: (TextIO, str, str, str)->Iterator[Tuple[Any, str]]
+    """* What you can do
+    - 入力ファイルから(レコードID, テキスト)を1件ずつ返します。
+    - jsonlでは1行1オブジェクト、tsvでは「ID<TAB>テキスト」の形式です。IDがなければ行番号をIDにします。
+    """
+    for line_number, line in enumerate(file_object, start=1):
+        line = line.rstrip('\n')
+        if not line.strip():
+            continue
+        if input_format == 'jsonl':
+            record = json.loads(line)
+            yield (record.get(id_key, line_number), record[text_key])
+        elif input_format == 'tsv':
+            fields = line.split('\t', 1)
+            if len(fields) == 1:
+                yield (line_number, fields[0])
+            else:
+                yield (fields[0], fields[1])
+        else:
+            raise ValueError('入力形式はjsonlかtsvを指定してください。format={}'.format(input_format))
+
+
+def iter_chunks(seq_records, chunk_size):
+    # type: (Iterable[Tuple[Any,str]], int)->Iterator[List[Tuple[Any,str]]]
+    chunk = []  # type: List[Tuple[Any,str]]
+    for record in seq_records:
+        chunk.append(record)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def initialize_worker(path_mecab_bin,
+                      path_dictionary_data,
+                      path_dictionary_index,
+                      pos_condition,
+                      is_enable_metrics=False,
+                      shared_dictionary_name=None,
+                      path_dictionary_manifest=None,
+                      function_tokenizer=None):
+    # type: (str, str, Optional[str], List[Tuple[str,...]], bool, Optional[str], Optional[str], Optional[Callable[[str],List[str]]])->None
+    """* What you can do
+    - ワーカープロセスの起動時に、トークナイザーと辞書を一度だけ読み込みます。
+    - is_enable_metrics=Trueの場合は、このプロセスで処理段階ごとの計測を有効にします。
+    - shared_dictionary_nameを指定すると、辞書を読み込まずに、親プロセスが作成した共有メモリの辞書に接続します。
+    - path_dictionary_manifestを指定すると、マニフェストの辞書を読み込みます。マニフェストが更新されると、チャンクの間で新しいバージョンに切り替えます。
+    - function_tokenizerを指定すると、MecabWrapperを作らずにそのトークナイザーを使います。ワーカープロセスに渡すため、pickleできる関数を指定します。
+    """
+    if is_enable_metrics:
+        METRICS.enable()
+    if function_tokenizer is None:
+        mecab_tokenizer = create_mecab_tokenizer(path_mecab_bin)
+        function_tokenizer = partial(tokenize, mecab_tokenizer=mecab_tokenizer, pos_condition=pos_condition)
+    _WORKER_STATE['function_tokenizer'] = function_tokenizer
+    if path_dictionary_manifest is not None:
+        _WORKER_STATE['dictionary_handle'] = DictionaryHandle(path_dictionary_manifest)
+    elif shared_dictionary_name is not None:
+        from shared_dictionary import attach_shared_dictionary
+        _WORKER_STATE['word_score_dictionary'] = attach_shared_dictionary(shared_dictionary_name)
+    else:
+        _WORKER_STATE['word_score_dictionary'] = load_word_score_dictionary(path_dictionary_data, path_dictionary_index)
+
+
+def create_worker_shared_dictionary(path_dictionary_data, path_dictionary_index=None):
+    # type: (str, Optional[str])->Any
+    """* What you can do
+    - 辞書を読み込み、ワーカープロセスが接続する共有メモリの辞書を作成します。
+    - 返した辞書をcloseすると共有メモリを削除します。
+    """
+    from shared_dictionary import create_shared_dictionary
+    word_score_dictionary = load_word_score_dictionary(path_dictionary_data, path_dictionary_index)
+    try:
+        return create_shared_dictionary(word_score_dictionary,
+                                        metadata={'source': os.path.abspath(path_dictionary_data)})
+    finally:
+        close_word_score_dictionary(word_score_dictionary)
+
+
+def classify_chunk(chunk, top_k):
+    # type: (List[Tuple[Any,str]], Optional[int])->List[Tuple[Any, List[Tuple[str,float]]]]
+    return classify_chunk_with_version(chunk, top_k)[0]
+
+
+def classify_chunk_with_version(chunk, top_k):
+    # type: (List[Tuple[Any,str]], Optional[int])->Tuple[List[Tuple[Any, List[Tuple[str,float]]]], Optional[str]]
+    """* What you can do
+    - classify_chunkの結果とともに、スコアリングに使った辞書のバージョン(result_cacheのバージョンと同じ形式)を返します。
+    - マニフェストの辞書でなければ、ワーカーは辞書を読み直さないため、バージョンはNoneです。
+    """
+    function_tokenizer = _WORKER_STATE['function_tokenizer']
+    dictionary_handle = _WORKER_STATE.get('dictionary_handle')
+    if dictionary_handle is None:
+        return __classify_records(chunk, _WORKER_STATE['word_score_dictionary'], function_tokenizer, top_k), None
+
+    ### チャンクの途中で辞書が変わらないよう、チャンクごとに辞書を取得します ###
+    dictionary_handle.refresh()
+    with dictionary_handle.acquire() as word_score_dictionary:
+        dictionary_version = get_manifest_dictionary_version(word_score_dictionary.path_base_index,
+                                                             word_score_dictionary.version)
+        return __classify_records(chunk, word_score_dictionary, function_tokenizer, top_k), dictionary_version
+
+
+def __classify_records(chunk, word_score_dictionary, function_tokenizer, top_k):
+    # type: (List[Tuple[Any,str]], Any, Any, Optional[int])->List[Tuple[Any, List[Tuple[str,float]]]]
+    return [(record_id, get_text_score(input_text=text,
+                                       word_score_dictionary=word_score_dictionary,
+                                       function_tokenizer=function_tokenizer,
+                                       top_k=top_k))
+            for record_id, text in chunk]
+
+
+def classify_chunk_with_metrics(chunk, top_k):
+    # type: (List[Tuple[Any,str]], Optional[int])->Tuple[List[Tuple[Any, List[Tuple[str,float]]]], Dict[str,Any]]
+    """* What you can do
+    - classify_chunkの結果とともに、このプロセスでの計測値を返します。返した計測値はプロセス内ではリセットします。
+    """
+    seq_result = classify_chunk(chunk, top_k)
+    return seq_result, METRICS.drain()
+
+
+def write_results(seq_result, output_file):
+    # type: (List[Tuple[Any, List[Tuple[str,float]]]], TextIO)->None
+    for record_id, seq_score_tuple in seq_result:
+        output_file.write(json.dumps({'id': record_id, 'categories': seq_score_tuple}, ensure_ascii=False))
+        output_file.write('\n')
+
+
+def main(input_file,
+         output_file,
+         path_mecab_bin,
+         path_dictionary_data,
+         path_dictionary_index=None,
+         pos_condition=POS_CONDITION,
+         input_format='jsonl',
+         n_workers=os.cpu_count(),
+         top_k=10,
+         chunk_size=100,
+         max_in_flight=None,
+         path_metrics_output=None,
+         is_use_shared_memory=False,
+         path_dictionary_manifest=None,
+         dedupe_threshold=None,
+         path_dedupe_report=None,
+         function_tokenizer=None):
+    # type: (TextIO, TextIO, str, str, Optional[str], List[Tuple[str,...]], str, int, Optional[int], int, Optional[int], Optional[str], bool, Optional[str], Optional[float], Optional[str], Optional[Callable[[str],List[str]]])->int
+    """* What you can do
+    - 入力を逐次読み込み、n_workers個のプロセスで分類し、入力と同じ順序で結果を書き出します。
+    - 処理中のチャンク数はmax_in_flight(デフォルトはワーカー数の2倍)までに制限します。
+    - n_workers=0の場合は、プロセスを起動せずに同じプロセス内で分類します。
+    - path_metrics_outputを指定すると、全ワーカーの処理段階ごとの計測値を集計して書き出します。
+      拡張子が.jsonならJSON、それ以外ならPrometheusのテキスト形式です。
+    - is_use_shared_memory=Trueの場合は、親プロセスで辞書を共有メモリに一度だけ展開し、全ワーカーがそれを参照します。
+      共有メモリは処理の終了時に削除します。
+    - path_dictionary_manifestを指定すると、マニフェスト(dictionary_delta.py)の辞書を使います。
+      処理中にデルタが公開されると、各ワーカーは次のチャンクから新しいバージョンの辞書を使います。
+    - dedupe_thresholdを指定すると、推定Jaccard係数がdedupe_threshold以上のテキストをまとめ(near_duplicate.py)、
+      代表だけをワーカーに渡します。path_dedupe_reportを指定すると、重複の割合とスループットをJSONで書き出します。
+    - function_tokenizerを指定すると、MeCabを使わずにそのトークナイザーでトークン化します(initialize_worker)。
+
+    * Output
+    - 処理したレコード数
+    """
+    if function_tokenizer is None and not os.path.exists(os.path.join(path_mecab_bin, 'mecab-config')):
+        raise FileExistsError('mecab-configファイルが見つかりません')
+    if is_use_shared_memory and path_dictionary_manifest is not None:
+        raise ValueError('共有メモリとマニフェストは同時に指定できません。')
+    if path_dictionary_index is not None and not os.path.exists(path_dictionary_index) \
+            and not is_use_shared_memory and path_dictionary_manifest is None:
+        ### ワーカーがmmapで同じページを共有できるよう、先にインデックスを作成します ###
+        word_score_dictionary = load_word_score_dictionary(path_dictionary_data, path_dictionary_index)
+        del word_score_dictionary
+
+    seq_chunks = iter_chunks(iter_input_records(input_file, input_format=input_format), chunk_size)
+    is_enable_metrics = path_metrics_output is not None
+    initargs = (path_mecab_bin, path_dictionary_data, path_dictionary_index, pos_condition, is_enable_metrics)
+    initializer = partial(initialize_worker,
+                          path_dictionary_manifest=path_dictionary_manifest,
+                          function_tokenizer=function_tokenizer)
+    function_classify = classify_chunk_with_metrics if is_enable_metrics else classify_chunk
+    near_duplicate_stage = None if dedupe_threshold is None else NearDuplicateStage(threshold=dedupe_threshold)
+    n_records = 0
+    start = time.time()
+    if n_workers == 0:
+        initializer(*initargs)
+        for chunk in seq_chunks:
+            plan, chunk = __split_chunk(chunk, near_duplicate_stage)
+            n_records += __write_chunk_result(classify_chunk(chunk, top_k), output_file, False,
+                                              near_duplicate_stage, plan)
+        if is_enable_metrics:
+            METRICS.write(path_metrics_output)
+        __write_dedupe_report(near_duplicate_stage, path_dedupe_report, time.time() - start)
+        return n_records
+
+    max_in_flight = max_in_flight or n_workers * 2
+    shared_dictionary = None
+    if is_use_shared_memory:
+        shared_dictionary = create_worker_shared_dictionary(path_dictionary_data, path_dictionary_index)
+        initializer = partial(initializer, shared_dictionary_name=shared_dictionary.name)
+    try:
+        with ProcessPoolExecutor(max_workers=n_workers, initializer=initializer, initargs=initargs) as executor:
+            in_flight = deque()
+            for chunk in seq_chunks:
+                plan, chunk = __split_chunk(chunk, near_duplicate_stage)
+                in_flight.append((executor.submit(function_classify, chunk, top_k), plan))
+                if len(in_flight) >= max_in_flight:
+                    future, plan = in_flight.popleft()
+                    n_records += __write_chunk_result(future.result(), output_file, is_enable_metrics,
+                                                      near_duplicate_stage, plan)
+            while in_flight:
+                future, plan = in_flight.popleft()
+                n_records += __write_chunk_result(future.result(), output_file, is_enable_metrics,
+                                                  near_duplicate_stage, plan)
+    finally:
+        ### ワーカーがすべて終了してから共有メモリを削除します ###
+        if shared_dictionary is not None:
+            shared_dictionary.close()
+    logger.info(msg='Classified {} records in {:.1f} sec.'.format(n_records, time.time() - start))
+    if is_enable_metrics:
+        METRICS.write(path_metrics_output)
+    __write_dedupe_report(near_duplicate_stage, path_dedupe_report, time.time() - start)
+
+    return n_records
+
+
+def __split_chunk(chunk, near_duplicate_stage):
+    # type: (List[Tuple[Any,str]], Optional[NearDuplicateStage])->Tuple[Optional[Dict[str,Any]], List[Tuple[Any,str]]]
+    """* What you can do
+    - 重複をまとめる場合は、(結果を戻すための情報, 代表だけのチャンク)を返します。まとめない場合はチャンクをそのまま返します。
+    """
+    if near_duplicate_stage is None:
+        return None, chunk
+    return near_duplicate_stage.split_chunk(chunk)
+
+
+def __write_chunk_result(chunk_result, output_file, is_enable_metrics, near_duplicate_stage=None, plan=None):
+    # type: (Any, TextIO, bool, Optional[NearDuplicateStage], Optional[Dict[str,Any]])->int
+    """* What you can do
+    - ワーカーの結果を書き出し、計測値があれば親プロセスの集計に加えます。書き出したレコード数を返します。
+    - 重複をまとめた場合は、代表の結果をクラスタのすべてのレコードに戻してから書き出します。
+    """
+    if is_enable_metrics:
+        seq_result, metrics_snapshot = chunk_result
+        METRICS.merge(metrics_snapshot)
+    else:
+        seq_result = chunk_result
+    if near_duplicate_stage is not None:
+        seq_result = near_duplicate_stage.fan_out(plan, seq_result)
+    write_results(seq_result, output_file)
+    return len(seq_result)
+
+
+def __write_dedupe_report(near_duplicate_stage, path_dedupe_report, elapsed):
+    # type: (Optional[NearDuplicateStage], Optional[str], float)->None
+    if near_duplicate_stage is None:
+        return
+    dedupe_report = near_duplicate_stage.get_report()
+    dedupe_report['elapsed_sec'] = elapsed
+    dedupe_report['records_per_sec'] = dedupe_report['n_records'] / elapsed if elapsed > 0 else 0.0
+    dedupe_report['scored_records_per_sec'] = dedupe_report['n_representatives'] / elapsed if elapsed > 0 else 0.0
+    logger.info(msg='Deduplicated {} of {} records (ratio={:.3f}); {:.1f} records/sec, signatures {:.1f} sec'.format(
+        dedupe_report['n_duplicates'], dedupe_report['n_records'], dedupe_report['dedupe_ratio'],
+        dedupe_report['records_per_sec'], dedupe_report['signature_sec']))
+    if path_dedupe_report is not None:
+        with open(path_dedupe_report, 'w') as f:
+            f.write(json.dumps(dedupe_report, ensure_ascii=False, indent=4))
+
+
+def parse_arguments(argv=None):
+    # type: (Optional[List[str]])->argparse.Namespace
+    parser = argparse.ArgumentParser(description='JSONL/TSVのテキストをまとめてカテゴリ分類します。')
+    parser.add_argument('--input', default='-', help='入力ファイル。-なら標準入力')
+    parser.add_argument('--output', default='-', help='出力ファイル。-なら標準出力')
+    parser.add_argument('--format', default='jsonl', choices=['jsonl', 'tsv'], help='入力形式')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='ワーカープロセス数')
+    parser.add_argument('--top-k', type=int, default=10, help='レコードごとに出力するカテゴリ数')
+    parser.add_argument('--chunk-size', type=int, default=100, help='1回にワーカーへ渡すレコード数')
+    parser.add_argument('--max-in-flight', type=int, default=None, help='同時に処理中のチャンク数の上限')
+    parser.add_argument('--metrics-output', default=None,
+                        help='処理段階ごとの計測値の出力先。.jsonならJSON、それ以外ならPrometheusのテキスト形式')
+    parser.add_argument('--shared-memory', action='store_true',
+                        help='辞書を共有メモリに一度だけ展開し、全ワーカーで共有します')
+    parser.add_argument('--path-dictionary-manifest', default=None,
+                        help='辞書のマニフェスト(dictionary_delta.py)。デルタが公開されると処理中に新しいバージョンへ切り替えます')
+    parser.add_argument('--dedupe-threshold', type=float, default=None,
+                        help='ほぼ同じテキストをまとめる推定Jaccard係数のしきい値(例: 0.9)。代表だけをスコアリングします')
+    parser.add_argument('--dedupe-report', default=None, help='重複の割合とスループットのJSONの出力先')
+    parser.add_argument('--path-mecab-bin', default='/usr/local/bin', help='mecab-configが存在しているディレクトリ')
+    parser.add_argument('--path-dictionary-data', default='./dictionary-data/word_soa.json')
+    parser.add_argument('--path-dictionary-index', default='./dictionary-data/word_soa.idx')
+    return parser.parse_args(argv)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    arguments = parse_arguments()
+    input_file = sys.stdin if arguments.input == '-' else open(arguments.input, 'r')
+    output_file = sys.stdout if arguments.output == '-' else open(arguments.output, 'w')
+    try:
+        main(input_file=input_file,
+             output_file=output_file,
+             path_mecab_bin=arguments.path_mecab_bin,
+             path_dictionary_data=arguments.path_dictionary_data,
+             path_dictionary_index=arguments.path_dictionary_index,
+             input_format=arguments.format,
+             n_workers=arguments.workers,
+             top_k=arguments.top_k,
+             chunk_size=arguments.chunk_size,
+             max_in_flight=arguments.max_in_flight,
+             path_metrics_output=arguments.metrics_output,
+             is_use_shared_memory=arguments.shared_memory,
+             path_dictionary_manifest=arguments.path_dictionary_manifest,
+             dedupe_threshold=arguments.dedupe_threshold,
+             path_dedupe_report=arguments.dedupe_report)
+    finally:
+        if input_file is not sys.stdin: input_file.close()
+        if output_file is not sys.stdout: output_file.close()
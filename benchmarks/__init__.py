@@ -0,0 +1,3 @@
+"""辞書ツールキットの性能を計測するためのベンチマークです。
+リポジトリのルートディレクトリから python -m benchmarks.<モジュール名> で実行します。
+"""
@@ -0,0 +1,92 @@
+from typing import List, Dict, Any, Callable
+import gc
+import logging
+import os
+import time
+import tracemalloc
+logger = logging.getLogger(__file__)
+logger.setLevel(logging.INFO)
+
+"""reformat_dictionaryの辞書(dict)とCompactDictionaryのメモリ使用量を、word_soa.jsonで比較します。
+辞書jsonファイルの読み込みから変形までを計測し、読み込んだレコードを解放した後に辞書が保持しているメモリを比較します。
+(dictはレコードのカテゴリ名の文字列とスコアのfloatをそのまま参照するため、これらも辞書のメモリに含まれます。)
+あわせて作成時間、全単語を1回ずつ引く時間、単精度にしたことによるスコアの最大誤差を出力します。
+
+python -m benchmarks.bench_dictionary_memory
+"""
+
+__author__ = "Kensuke Mitsuzawa"
+__author_email__ = "kensuke_mitsuzawa@fumankaitori.com"
+__license_name__ = "MIT"
+
+from get_category_score import load_dictionary_data, reformat_dictionary
+from compact_dictionary import CompactDictionary
+
+
+def measure_memory(function_build):
+    # type: (Callable[[], Any])->Dict[str,Any]
+    """* What you can do
+    - function_buildが作成したオブジェクトが保持しているメモリのバイト数と、作成にかかった秒数を返します。
+    """
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    word_score_dictionary = function_build()
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    current_bytes, peak_bytes = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {'dictionary': word_score_dictionary, 'bytes': current_bytes, 'peak_bytes': peak_bytes, 'build_sec': elapsed}
+
+
+def measure_lookup(word_score_dictionary, seq_word):
+    # type: (Any, List[str])->float
+    start = time.perf_counter()
+    for word in seq_word:
+        for label, score in word_score_dictionary.get(word):
+            pass
+    return time.perf_counter() - start
+
+
+def main(path_dictionary_data):
+    # type: (str)->Dict[str,Dict[str,float]]
+    seq_setting = [
+        ('dict', lambda: reformat_dictionary(load_dictionary_data(path_dictionary_data))),
+        ('compact(f)', lambda: CompactDictionary.from_records(load_dictionary_data(path_dictionary_data),
+                                                              score_typecode='f')),
+        ('compact(d)', lambda: CompactDictionary.from_records(load_dictionary_data(path_dictionary_data),
+                                                              score_typecode='d')),
+    ]
+    result = {}
+    seq_word = None
+    reference_dictionary = None
+    for name, function_build in seq_setting:
+        measured = measure_memory(function_build)
+        word_score_dictionary = measured.pop('dictionary')
+        if reference_dictionary is None:
+            reference_dictionary = word_score_dictionary
+            seq_word = list(reference_dictionary.keys())
+        measured['lookup_sec'] = measure_lookup(word_score_dictionary, seq_word)
+        ### 変形前の辞書とのスコアの誤差を確認します ###
+        measured['max_score_error'] = max(
+            abs(expected[1] - actual[1])
+            for word in seq_word
+            for expected, actual in zip(reference_dictionary[word], word_score_dictionary[word]))
+        result[name] = measured
+
+    for name, measured in result.items():
+        logger.info(msg='{:<12} {:>8.1f} MB (peak {:>8.1f} MB, x{:.2f} against dict), build {:.2f} sec, '
+                        'lookup {:.2f} sec, max score error {:.2e}'.format(
+            name, measured['bytes'] / 1024 ** 2, measured['peak_bytes'] / 1024 ** 2,
+            result['dict']['bytes'] / measured['bytes'], measured['build_sec'], measured['lookup_sec'],
+            measured['max_score_error']))
+    return result
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    PATH_DICTIONARY_DATA = './dictionary-data/word_soa.json'
+    if not os.path.exists(PATH_DICTIONARY_DATA): raise FileExistsError('辞書ファイルが発見できません。')
+
+    main(path_dictionary_data=PATH_DICTIONARY_DATA)
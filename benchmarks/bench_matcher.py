@@ -0,0 +1,133 @@
+from typing import List, Dict, Any, Callable, Optional
+from functools import partial
+import json
+import logging
+import os
+import time
+logger = logging.getLogger(__file__)
+logger.setLevel(logging.INFO)
+
+"""MeCabによるトークン化と、辞書の語彙のAho-Corasickオートマトン(dictionary_matcher.py)によるトークン化を、
+wikipedia_text.jsonlの評価データで比較します。
+トークナイザーごとに、トークン化とスコアリングを合わせた1文書あたりの処理時間と、top-k正解率、MRRを計測します。
+オートマトンは作成時間と、保存したファイルからの読み込み時間も計測します。
+
+python -m benchmarks.bench_matcher
+"""
+
+__author__ = "Kensuke Mitsuzawa"
+__author_email__ = "kensuke_mitsuzawa@fumankaitori.com"
+__license_name__ = "MIT"
+
+from category_scoring import POS_CONDITION, create_mecab_tokenizer, tokenize, get_text_score, load_word_score_dictionary
+from evaluate_dictionary import iter_evaluation_data, get_gold_rank, get_ranking_metrics, close_scoring_resources
+from dictionary_matcher import AhoCorasickMatcher
+
+SEQ_K = (1, 3, 5)
+
+
+def measure_tokenizer(function_tokenizer, seq_evaluation_obj, word_score_dictionary, seq_k=SEQ_K):
+    # type: (Callable[[str], List[str]], List[Dict[str,Any]], Any, List[int])->Dict[str,Any]
+    """* What you can do
+    - すべての文書をトークン化してスコアリングし、1文書あたりの秒数、トークン数、順位の評価を返します。
+    """
+    seq_gold_rank = []
+    n_tokens = 0
+    tokenize_seconds = 0.0
+    start = time.perf_counter()
+    for evaluation_obj in seq_evaluation_obj:
+        tokenize_start = time.perf_counter()
+        list_tokens = function_tokenizer(evaluation_obj['text'])
+        tokenize_seconds += time.perf_counter() - tokenize_start
+        n_tokens += len(list_tokens)
+        ### トークン化済みのリストを、そのまま返すトークナイザーでスコアリングします ###
+        seq_score_tuple = get_text_score(list_tokens, word_score_dictionary, lambda tokens: tokens)
+        seq_gold_rank.append(get_gold_rank(evaluation_obj['gold_label'], seq_score_tuple))
+    elapsed = time.perf_counter() - start
+    n_document = max(len(seq_evaluation_obj), 1)
+    metrics = get_ranking_metrics(seq_gold_rank, seq_k)
+
+    return {
+        'usec_per_document': elapsed / n_document * 1e6,
+        'tokenize_usec_per_document': tokenize_seconds / n_document * 1e6,
+        'tokens_per_document': n_tokens / n_document,
+        'top_k_accuracy': metrics['top_k_accuracy'],
+        'mrr': metrics['mrr'],
+    }
+
+
+def main(path_mecab_bin,
+         path_evaluation_data,
+         path_dictionary_data,
+         path_dictionary_index=None,
+         path_matcher=None,
+         min_word_length=1,
+         section_name='full',
+         path_output_json=None):
+    # type: (Optional[str], str, str, Optional[str], Optional[str], int, str, Optional[str])->Dict[str,Any]
+    """* What you can do
+    - path_mecab_binがNoneの場合は、MeCabを使わずにオートマトンだけを計測します。
+    """
+    word_score_dictionary = load_word_score_dictionary(path_dictionary_data, path_dictionary_index)
+    seq_evaluation_obj = list(iter_evaluation_data(path_evaluation_data, section_name))
+    logger.info(msg='N(document)={}, section={}'.format(len(seq_evaluation_obj), section_name))
+
+    result = {'n_document': len(seq_evaluation_obj), 'section': section_name, 'tokenizers': {}}  # type: Dict[str,Any]
+    start = time.perf_counter()
+    matcher = AhoCorasickMatcher.build(word_score_dictionary.keys(), min_word_length=min_word_length)
+    result['matcher_build_sec'] = time.perf_counter() - start
+    result['matcher_n_states'] = matcher.n_states
+    if path_matcher is not None:
+        matcher.save(path_matcher)
+        start = time.perf_counter()
+        matcher = AhoCorasickMatcher.load(path_matcher)
+        result['matcher_load_sec'] = time.perf_counter() - start
+        result['matcher_file_bytes'] = os.path.getsize(path_matcher)
+
+    if path_mecab_bin is not None:
+        mecab_tokenizer = create_mecab_tokenizer(path_mecab_bin)
+        function_mecab_tokenizer = partial(tokenize, mecab_tokenizer=mecab_tokenizer, pos_condition=POS_CONDITION)
+        result['tokenizers']['mecab'] = measure_tokenizer(function_mecab_tokenizer, seq_evaluation_obj, word_score_dictionary)
+    for match_policy in ('longest', 'all'):
+        matcher.match_policy = match_policy
+        result['tokenizers']['matcher_{}'.format(match_policy)] = measure_tokenizer(matcher.tokenize,
+                                                                                   seq_evaluation_obj,
+                                                                                   word_score_dictionary)
+    close_scoring_resources(word_score_dictionary)
+
+    logger.info(msg='Built automaton in {:.2f} sec; N(state)={}'.format(result['matcher_build_sec'],
+                                                                        result['matcher_n_states']))
+    for name, tokenizer_result in sorted(result['tokenizers'].items()):
+        logger.info(msg='{:<16} {:>10.1f} usec/document (tokenize {:>10.1f}), {:>7.1f} tokens/document, '
+                        'accuracy={}, MRR={:.4f}'.format(name,
+                                                         tokenizer_result['usec_per_document'],
+                                                         tokenizer_result['tokenize_usec_per_document'],
+                                                         tokenizer_result['tokens_per_document'],
+                                                         tokenizer_result['top_k_accuracy'],
+                                                         tokenizer_result['mrr']))
+    if path_output_json is not None:
+        with open(path_output_json, 'w') as f:
+            f.write(json.dumps(result, ensure_ascii=False, indent=4))
+
+    return result
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    ### mecab-configが存在しているディレクトリ。NoneならMeCabとの比較を行いません。
+    PATH_MECAB_BIN = '/usr/local/bin'
+    PATH_EVALUATION_DATA = './wikipedia-text/wikipedia_text.jsonl'
+    PATH_DICTIONARY_DATA = './dictionary-data/word_soa.json'
+    PATH_DICTIONARY_INDEX = './dictionary-data/word_soa.idx'
+    ### オートマトンの保存先
+    PATH_MATCHER = './dictionary-data/word_soa.acm'
+    ### この文字数未満の単語はオートマトンに登録しません
+    MIN_WORD_LENGTH = 2
+    if not os.path.exists(PATH_DICTIONARY_DATA): raise FileExistsError('辞書ファイルが発見できません。')
+
+    main(path_mecab_bin=PATH_MECAB_BIN,
+         path_evaluation_data=PATH_EVALUATION_DATA,
+         path_dictionary_data=PATH_DICTIONARY_DATA,
+         path_dictionary_index=PATH_DICTIONARY_INDEX,
+         path_matcher=PATH_MATCHER,
+         min_word_length=MIN_WORD_LENGTH)
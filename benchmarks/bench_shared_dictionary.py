@@ -0,0 +1,91 @@
+from typing import List, Dict, Any, Optional
+from concurrent.futures import ProcessPoolExecutor
+import logging
+import multiprocessing
+import os
+import time
+logger = logging.getLogger(__file__)
+logger.setLevel(logging.INFO)
+
+"""ワーカープロセスごとに辞書を読み込む場合と、共有メモリの辞書(shared_dictionary.py)に接続する場合とで、
+ワーカーの起動時間と、ワーカーごとのメモリ使用量を比較します。
+メモリは/proc/self/statusのRssAnon(プロセス固有のメモリ)とRssShmem(共有メモリ)で計測するため、Linuxでのみ動作します。
+
+python -m benchmarks.bench_shared_dictionary
+"""
+
+__author__ = "Kensuke Mitsuzawa"
+__author_email__ = "kensuke_mitsuzawa@fumankaitori.com"
+__license_name__ = "MIT"
+
+from get_category_score import load_word_score_dictionary, get_text_score
+from shared_dictionary import create_shared_dictionary, attach_shared_dictionary
+
+
+def get_process_memory_mb():
+    # type: ()->Dict[str,float]
+    memory = {}
+    with open('/proc/self/status', 'r') as f:
+        for line in f:
+            key, _, value = line.partition(':')
+            if key in ('RssAnon', 'RssShmem'):
+                memory[key] = int(value.split()[0]) / 1024
+    return memory
+
+
+def run_worker(path_dictionary_data, shared_dictionary_name, seq_word):
+    # type: (str, Optional[str], List[str])->Dict[str,Any]
+    """* What you can do
+    - 辞書を用意するまでの秒数と、すべての単語をスコアリングした後のメモリ使用量を返します。
+    """
+    rss_before = get_process_memory_mb()
+    start = time.perf_counter()
+    if shared_dictionary_name is None:
+        word_score_dictionary = load_word_score_dictionary(path_dictionary_data)
+    else:
+        word_score_dictionary = attach_shared_dictionary(shared_dictionary_name)
+    elapsed = time.perf_counter() - start
+    ### 共有メモリのページはアクセスした時点でRssShmemに計上されるため、全単語を引いてから計測します ###
+    get_text_score(seq_word, word_score_dictionary, lambda list_tokens: list_tokens, top_k=10)
+    rss_after = get_process_memory_mb()
+    if shared_dictionary_name is not None:
+        word_score_dictionary.close()
+
+    return {'startup_sec': elapsed,
+            'rss_anon_mb': rss_after['RssAnon'] - rss_before['RssAnon'],
+            'rss_shmem_mb': rss_after['RssShmem'] - rss_before['RssShmem']}
+
+
+def main(path_dictionary_data, n_workers=4):
+    # type: (str, int)->Dict[str,List[Dict[str,Any]]]
+    word_score_dictionary = load_word_score_dictionary(path_dictionary_data)
+    seq_word = list(word_score_dictionary.keys())
+    shared_dictionary = create_shared_dictionary(word_score_dictionary)
+    del word_score_dictionary
+
+    result = {}
+    try:
+        for name, shared_dictionary_name in (('load', None), ('shared_memory', shared_dictionary.name)):
+            with ProcessPoolExecutor(max_workers=n_workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+                seq_future = [executor.submit(run_worker, path_dictionary_data, shared_dictionary_name, seq_word)
+                              for _ in range(n_workers)]
+                result[name] = [future.result() for future in seq_future]
+    finally:
+        shared_dictionary.close()
+
+    for name, seq_worker_result in result.items():
+        logger.info(msg='{:<14} startup {:>7.3f} sec/worker, RssAnon {:>8.1f} MB/worker, RssShmem {:>8.1f} MB/worker'.format(
+            name,
+            sum(worker_result['startup_sec'] for worker_result in seq_worker_result) / n_workers,
+            sum(worker_result['rss_anon_mb'] for worker_result in seq_worker_result) / n_workers,
+            sum(worker_result['rss_shmem_mb'] for worker_result in seq_worker_result) / n_workers))
+    return result
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    PATH_DICTIONARY_DATA = './dictionary-data/word_soa.json'
+    N_WORKERS = 4
+    if not os.path.exists(PATH_DICTIONARY_DATA): raise FileExistsError('辞書ファイルが発見できません。')
+
+    main(PATH_DICTIONARY_DATA, n_workers=N_WORKERS)
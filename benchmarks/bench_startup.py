@@ -0,0 +1,213 @@
+from typing import List, Dict, Any, Optional
+import argparse
+import json
+import logging
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+logger = logging.getLogger(__file__)
+logger.setLevel(logging.INFO)
+
+"""短時間で終わるCLIの実行やワーカーの起動を想定し、新しいプロセスでのimportと最初の1件の分類にかかる時間を計測します。
+合成データの辞書インデックスと辞書マッチャーを事前に作成し、get_category_score.mainで1件を分類します。
+importの時間か、importと最初の分類を合わせた時間が予算を超えた場合、
+または重い依存(JapaneseTokenizer、sqlite3など)が読み込まれた場合に、終了コード1で終了します。
+
+python -m benchmarks.bench_startup
+python -m benchmarks.bench_startup --budget-import-ms 100 --budget-first-ms 300
+"""
+
+__author__ = "Kensuke Mitsuzawa"
+__author_email__ = "kensuke_mitsuzawa@fumankaitori.com"
+__license_name__ = "MIT"
+
+from benchmarks.synthetic_data import iter_synthetic_dictionary, iter_synthetic_documents
+
+PATH_PACKAGE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# 辞書インデックスと辞書マッチャーで分類する場合には、読み込まれないはずのモジュール
+HEAVY_MODULES = ('JapaneseTokenizer', 'sqlitedict', 'sqlite3', 'numpy', 'scipy')
+DEFAULT_BUDGET_IMPORT_MS = 150.0
+DEFAULT_BUDGET_FIRST_MS = 400.0
+
+# 新しいプロセスで実行するコードです。計測の前に余計なモジュールを読み込まないように、jsonとsysは計測の後にimportします。
+STARTUP_SCRIPT = '''
+import time
+start = time.perf_counter()
+from get_category_score import main
+import_sec = time.perf_counter() - start
+import sys
+input_text, path_dictionary_data, path_dictionary_index, path_matcher = sys.argv[1:5]
+seq_score_tuple = main(input_text=input_text,
+                       path_mecab_bin='',
+                       path_dictionary_data=path_dictionary_data,
+                       path_dictionary_index=path_dictionary_index,
+                       top_k=10,
+                       is_use_matcher=True,
+                       path_matcher=path_matcher)
+first_sec = time.perf_counter() - start
+import json
+print(json.dumps({'import_sec': import_sec,
+                  'first_classification_sec': first_sec,
+                  'n_modules': len(sys.modules),
+                  'loaded_modules': sorted(sys.modules),
+                  'top_label': seq_score_tuple[0][0] if seq_score_tuple else None}))
+'''
+
+
+def prepare_index(path_work_dir, n_words, n_categories, seed=0):
+    # type: (str, int, int, int)->Dict[str,str]
+    """* What you can do
+    - 合成した辞書から、辞書インデックスと辞書マッチャーを作成し、分類するテキストとパスを返します。
+    - 計測の対象外にするため、作成はこのプロセスで行います。
+    """
+    from category_scoring import load_word_score_dictionary, close_word_score_dictionary
+    from dictionary_matcher import load_dictionary_matcher
+    path_dictionary_data = os.path.join(path_work_dir, 'word_soa.json')
+    path_dictionary_index = os.path.join(path_work_dir, 'word_soa.idx')
+    path_matcher = os.path.join(path_work_dir, 'word_soa.matcher')
+    seq_score_object = list(iter_synthetic_dictionary(n_words=n_words, n_categories=n_categories, seed=seed))
+    with open(path_dictionary_data, 'w') as f:
+        f.write(json.dumps(seq_score_object, ensure_ascii=False))
+    word_score_dictionary = load_word_score_dictionary(path_dictionary_data, path_dictionary_index)
+    load_dictionary_matcher(word_score_dictionary, path_matcher=path_matcher, path_dictionary_data=path_dictionary_data)
+    close_word_score_dictionary(word_score_dictionary)
+    evaluation_obj = next(iter_synthetic_documents(seq_score_object, n_documents=1, seed=seed))
+    ### 辞書jsonファイルよりインデックスが新しくなるように、更新時刻を揃えます ###
+    os.utime(path_dictionary_data, (0, 0))
+
+    return {'input_text': ''.join(evaluation_obj['text'].split()),
+            'path_dictionary_data': path_dictionary_data,
+            'path_dictionary_index': path_dictionary_index,
+            'path_matcher': path_matcher}
+
+
+def run_startup(setting):
+    # type: (Dict[str,str])->Dict[str,Any]
+    """* What you can do
+    - 新しいプロセスでSTARTUP_SCRIPTを実行し、計測結果とプロセス全体の秒数を返します。
+    """
+    environment = dict(os.environ, PYTHONPATH=PATH_PACKAGE_ROOT)
+    start = time.perf_counter()
+    completed = subprocess.run([sys.executable, '-c', STARTUP_SCRIPT,
+                                setting['input_text'],
+                                setting['path_dictionary_data'],
+                                setting['path_dictionary_index'],
+                                setting['path_matcher']],
+                               stdout=subprocess.PIPE, env=environment, cwd=PATH_PACKAGE_ROOT, check=True)
+    process_sec = time.perf_counter() - start
+    result = json.loads(completed.stdout.decode('utf-8').strip().splitlines()[-1])
+    result['process_sec'] = process_sec
+
+    return result
+
+
+def get_interpreter_startup_sec():
+    # type: ()->float
+    """* What you can do
+    - 何もimportしないPythonプロセスの起動と終了にかかる秒数を返します。process_secとの比較に使います。
+    """
+    start = time.perf_counter()
+    subprocess.run([sys.executable, '-c', 'pass'], check=True)
+    return time.perf_counter() - start
+
+
+def get_median(seq_value):
+    # type: (List[float])->float
+    seq_sorted = sorted(seq_value)
+    middle = len(seq_sorted) // 2
+    if len(seq_sorted) % 2 == 1:
+        return seq_sorted[middle]
+    return (seq_sorted[middle - 1] + seq_sorted[middle]) / 2
+
+
+def main(n_repeat=5,
+         n_words=10000,
+         n_categories=100,
+         budget_import_ms=DEFAULT_BUDGET_IMPORT_MS,
+         budget_first_ms=DEFAULT_BUDGET_FIRST_MS,
+         seed=0):
+    # type: (int, int, int, float, float, int)->Dict[str,Any]
+    """* What you can do
+    - n_repeat回、新しいプロセスでimportと最初の分類を計測し、中央値と予算の超過を返します。
+    - 1回目はファイルがページキャッシュに載っていない場合があるため、計測に含めずに捨てます。
+
+    * Output
+    >>> {"import_ms": 35.2, "first_classification_ms": 60.1, "process_ms": 95.0, "interpreter_ms": 20.3,
+    ...  "heavy_modules": [], "violations": []}
+    """
+    path_work_dir = tempfile.mkdtemp(prefix='bench_startup_')
+    try:
+        setting = prepare_index(path_work_dir, n_words=n_words, n_categories=n_categories, seed=seed)
+        run_startup(setting)
+        seq_startup_result = [run_startup(setting) for _ in range(n_repeat)]
+        interpreter_sec = get_median([get_interpreter_startup_sec() for _ in range(n_repeat)])
+    finally:
+        shutil.rmtree(path_work_dir, ignore_errors=True)
+
+    heavy_modules = sorted({module_name for startup_result in seq_startup_result
+                            for module_name in startup_result['loaded_modules']
+                            if module_name.split('.')[0] in HEAVY_MODULES})
+    result = {
+        'setting': {'n_words': n_words, 'n_categories': n_categories, 'n_repeat': n_repeat},
+        'import_ms': get_median([startup_result['import_sec'] for startup_result in seq_startup_result]) * 1000,
+        'first_classification_ms': get_median([startup_result['first_classification_sec']
+                                               for startup_result in seq_startup_result]) * 1000,
+        'process_ms': get_median([startup_result['process_sec'] for startup_result in seq_startup_result]) * 1000,
+        'interpreter_ms': interpreter_sec * 1000,
+        'n_modules': seq_startup_result[-1]['n_modules'],
+        'top_label': seq_startup_result[-1]['top_label'],
+        'heavy_modules': heavy_modules,
+        'budget_import_ms': budget_import_ms,
+        'budget_first_ms': budget_first_ms,
+    }
+    violations = []  # type: List[str]
+    if result['import_ms'] > budget_import_ms:
+        violations.append('importに{:.1f}msかかり、予算の{:.1f}msを超えました。'.format(result['import_ms'], budget_import_ms))
+    if result['first_classification_ms'] > budget_first_ms:
+        violations.append('importと最初の分類に{:.1f}msかかり、予算の{:.1f}msを超えました。'.format(
+            result['first_classification_ms'], budget_first_ms))
+    if heavy_modules:
+        violations.append('重い依存が読み込まれました。{}'.format(', '.join(heavy_modules)))
+    result['violations'] = violations
+    logger.info(msg='Startup; import={import_ms:.1f}ms, first classification={first_classification_ms:.1f}ms, '
+                    'process={process_ms:.1f}ms (interpreter={interpreter_ms:.1f}ms), '
+                    'N(module)={n_modules}'.format(**result))
+
+    return result
+
+
+def parse_arguments(argv=None):
+    # type: (Optional[List[str]])->argparse.Namespace
+    parser = argparse.ArgumentParser(description='新しいプロセスでのimportと最初の分類の時間を計測し、予算と比較します。')
+    parser.add_argument('--repeat', type=int, default=5, help='計測するプロセスの数。中央値を採用します')
+    parser.add_argument('--n-words', type=int, default=10000, help='合成する辞書の単語数')
+    parser.add_argument('--n-categories', type=int, default=100, help='合成する辞書のカテゴリ数')
+    parser.add_argument('--budget-import-ms', type=float, default=DEFAULT_BUDGET_IMPORT_MS,
+                        help='importの予算(ミリ秒)')
+    parser.add_argument('--budget-first-ms', type=float, default=DEFAULT_BUDGET_FIRST_MS,
+                        help='importと最初の分類を合わせた予算(ミリ秒)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default=None, help='計測結果を書き出すJSONのパス')
+    return parser.parse_args(argv)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    arguments = parse_arguments()
+    startup_result = main(n_repeat=arguments.repeat,
+                          n_words=arguments.n_words,
+                          n_categories=arguments.n_categories,
+                          budget_import_ms=arguments.budget_import_ms,
+                          budget_first_ms=arguments.budget_first_ms,
+                          seed=arguments.seed)
+    if arguments.output is not None:
+        with open(arguments.output, 'w') as f:
+            f.write(json.dumps(startup_result, ensure_ascii=False, indent=4))
+    for violation in startup_result['violations']:
+        logger.warning(msg=violation)
+    if startup_result['violations']:
+        sys.exit(1)
+    logger.info(msg='Startup is within budget')
@@ -0,0 +1,233 @@
+from typing import List, Dict, Any, Optional
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+import argparse
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+logger = logging.getLogger(__file__)
+logger.setLevel(logging.INFO)
+
+"""合成データを使い、辞書の読み込みからスコアリング、評価までの処理時間とピークのメモリ使用量を複数の規模で計測します。
+規模ごとに新しいプロセスで計測するため、ピークRSSが前の規模の影響を受けません。
+計測結果は保存済みのベースラインと比較し、処理時間かメモリ使用量が許容幅を超えて悪化した場合、
+またはスコアリングの結果(ダイジェスト)が変わった場合に、終了コード1で終了します。
+
+python -m benchmarks.bench_suite --scales small medium
+python -m benchmarks.bench_suite --scales small medium --update-baseline
+python -m benchmarks.bench_suite --scales small medium --update-baseline --portable-baseline
+
+リポジトリのベースライン(benchmarks/bench_suite_baseline.json)には、マシンによらない項目(設定、ダイジェスト、正解率)だけを保存しています。
+処理時間とメモリ使用量も比較する場合は、手元のマシンで--update-baselineを実行してください。
+"""
+
+__author__ = "Kensuke Mitsuzawa"
+__author_email__ = "kensuke_mitsuzawa@fumankaitori.com"
+__license_name__ = "MIT"
+
+from benchmarks.synthetic_data import write_synthetic_dictionary, write_synthetic_documents
+from get_category_score import load_dictionary_data, reformat_dictionary, get_text_score
+from evaluate_dictionary import iter_evaluation_data, score_evaluation_texts, get_document_result, \
+    summarize_section, close_scoring_resources
+
+# 規模ごとの合成データの設定
+SCALES = {
+    'small': {'n_words': 10000, 'n_categories': 100, 'mean_postings': 10.0, 'n_documents': 200, 'mean_tokens': 300},
+    'medium': {'n_words': 100000, 'n_categories': 300, 'mean_postings': 10.0, 'n_documents': 500, 'mean_tokens': 500},
+    'large': {'n_words': 500000, 'n_categories': 500, 'mean_postings': 12.0, 'n_documents': 1000, 'mean_tokens': 800},
+}
+DEFAULT_TOLERANCE = 0.25
+SEQ_K = (1, 3, 5)
+# --portable-baselineでベースラインに残す、マシンによらない項目
+PORTABLE_BASELINE_KEYS = ('setting', 'digest', 'top_k_accuracy')
+
+
+def get_peak_rss_mb():
+    # type: ()->float
+    """* What you can do
+    - このプロセスのピークRSSをMBで返します。ru_maxrssの単位はLinuxではKB、macOSではbyteです。
+    """
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        return peak_rss / 1024 ** 2
+    return peak_rss / 1024
+
+
+def run_scale(scale_name, scale_setting, n_repeat=3, seed=0):
+    # type: (str, Dict[str,Any], int, int)->Dict[str,Any]
+    """* What you can do
+    - 1つの規模について合成データを作成し、各処理の秒数とピークRSSを計測します。
+    """
+    path_work_dir = tempfile.mkdtemp(prefix='bench_suite_')
+    path_dictionary_data = os.path.join(path_work_dir, 'word_soa.json')
+    path_evaluation_data = os.path.join(path_work_dir, 'wikipedia_text.jsonl')
+    result = {'setting': scale_setting}  # type: Dict[str,Any]
+    try:
+        write_synthetic_dictionary(path_dictionary_data,
+                                   n_words=scale_setting['n_words'],
+                                   n_categories=scale_setting['n_categories'],
+                                   mean_postings=scale_setting['mean_postings'],
+                                   seed=seed)
+        rss_before = get_peak_rss_mb()
+
+        start = time.perf_counter()
+        score_dictionary = load_dictionary_data(path_dictionary_data)
+        result['load_dictionary_data_sec'] = time.perf_counter() - start
+        write_synthetic_documents(path_evaluation_data, score_dictionary,
+                                  n_documents=scale_setting['n_documents'],
+                                  mean_tokens=scale_setting['mean_tokens'],
+                                  seed=seed)
+
+        start = time.perf_counter()
+        word_score_dictionary = reformat_dictionary(score_dictionary)
+        result['reformat_dictionary_sec'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        sqlite_dictionary = reformat_dictionary(score_dictionary,
+                                                is_use_sqlite=True,
+                                                path_sqlite=os.path.join(path_work_dir, 'word_soa.sqlite3'))
+        result['reformat_dictionary_sqlite_sec'] = time.perf_counter() - start
+        del score_dictionary
+
+        ### トークナイザーは空白区切りのstr.splitです ###
+        function_tokenizer = str.split
+        seq_text = [evaluation_obj['text'] for evaluation_obj in iter_evaluation_data(path_evaluation_data, 'full')]
+        for name, dictionary_object in (('get_text_score', word_score_dictionary),
+                                        ('get_text_score_sqlite', sqlite_dictionary)):
+            seq_elapsed = []
+            for _ in range(n_repeat):
+                start = time.perf_counter()
+                for input_text in seq_text:
+                    get_text_score(input_text, dictionary_object, function_tokenizer, top_k=10)
+                seq_elapsed.append(time.perf_counter() - start)
+            result['{}_usec_per_document'.format(name)] = min(seq_elapsed) / len(seq_text) * 1e6
+        close_scoring_resources(sqlite_dictionary)
+
+        ### evaluate_rankingと同じく、評価データを少しずつ読み込んでスコアリングし、集計します ###
+        start = time.perf_counter()
+        section2report = {}
+        digest = hashlib.sha1()
+        for section_name in ('summary', 'full'):
+            documents = []
+            seq_evaluation_obj = iter_evaluation_data(path_evaluation_data, section_name)
+            while True:
+                chunk = list(islice(seq_evaluation_obj, 256))
+                if not chunk:
+                    break
+                seq_section_score_tuple = score_evaluation_texts(chunk,
+                                                                 word_score_dictionary=word_score_dictionary,
+                                                                 function_tokenizer=function_tokenizer)
+                documents += [get_document_result(evaluation_obj, seq_score_tuple)
+                              for evaluation_obj, seq_score_tuple in zip(chunk, seq_section_score_tuple)]
+            section2report[section_name] = summarize_section(documents, SEQ_K)['overall']
+            for document in documents:
+                digest.update(json.dumps([document['page_title'], document['gold_rank'],
+                                          [label for label, _ in document['prediction'][:3]]],
+                                         ensure_ascii=False).encode('utf-8'))
+        result['evaluation_loop_sec'] = time.perf_counter() - start
+        result['top_k_accuracy'] = section2report['full']['top_k_accuracy']
+        result['digest'] = digest.hexdigest()
+        result['peak_rss_mb'] = get_peak_rss_mb()
+        result['peak_rss_increase_mb'] = result['peak_rss_mb'] - rss_before
+    finally:
+        shutil.rmtree(path_work_dir, ignore_errors=True)
+    logger.info(msg='Finished scale={}; {}'.format(scale_name, json.dumps(result, ensure_ascii=False)))
+
+    return result
+
+
+def run_suite(seq_scale_name, n_repeat=3, seed=0):
+    # type: (List[str], int, int)->Dict[str,Dict[str,Any]]
+    """* What you can do
+    - 規模ごとに新しいプロセスを起動してrun_scaleを実行します。
+    """
+    suite_result = {}
+    for scale_name in seq_scale_name:
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as executor:
+            suite_result[scale_name] = executor.submit(run_scale, scale_name, SCALES[scale_name], n_repeat, seed).result()
+    return suite_result
+
+
+def compare_with_baseline(suite_result, baseline, tolerance=DEFAULT_TOLERANCE):
+    # type: (Dict[str,Dict[str,Any]], Dict[str,Dict[str,Any]], float)->List[str]
+    """* What you can do
+    - 処理時間とピークRSSがベースラインの(1 + tolerance)倍を超えた項目と、ダイジェストが変わった規模を返します。
+    - ベースラインにない規模は比較しません。
+    """
+    seq_regression = []
+    for scale_name, scale_result in suite_result.items():
+        if scale_name not in baseline:
+            continue
+        scale_baseline = baseline[scale_name]
+        if scale_baseline.get('setting') != scale_result['setting']:
+            seq_regression.append('{}: 合成データの設定がベースラインと異なります。'.format(scale_name))
+            continue
+        if scale_baseline.get('digest') != scale_result['digest']:
+            seq_regression.append('{}: スコアリングの結果がベースラインと異なります。accuracy {} -> {}'.format(
+                scale_name, scale_baseline.get('top_k_accuracy'), scale_result['top_k_accuracy']))
+        for key, value in sorted(scale_result.items()):
+            if not (key.endswith('_sec') or key.endswith('_usec_per_document') or key == 'peak_rss_mb'):
+                continue
+            if key in scale_baseline and value > scale_baseline[key] * (1 + tolerance):
+                seq_regression.append('{}: {} {:.4g} -> {:.4g} (x{:.2f})'.format(
+                    scale_name, key, scale_baseline[key], value, value / scale_baseline[key]))
+    return seq_regression
+
+
+def get_portable_baseline(suite_result):
+    # type: (Dict[str,Dict[str,Any]])->Dict[str,Dict[str,Any]]
+    """* What you can do
+    - 計測結果から、処理時間とメモリ使用量を除いたマシンによらない項目だけを返します。
+    """
+    return {scale_name: {key: scale_result[key] for key in PORTABLE_BASELINE_KEYS}
+            for scale_name, scale_result in suite_result.items()}
+
+
+def parse_arguments(argv=None):
+    # type: (Optional[List[str]])->argparse.Namespace
+    parser = argparse.ArgumentParser(description='合成データで辞書ツールキットの性能を計測し、ベースラインと比較します。')
+    parser.add_argument('--scales', nargs='+', default=['small', 'medium'], choices=sorted(SCALES))
+    parser.add_argument('--repeat', type=int, default=3, help='スコアリングの計測を繰り返す回数。最短の時間を採用します')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='./benchmarks/bench_suite_result.json', help='計測結果の出力先')
+    parser.add_argument('--baseline', default='./benchmarks/bench_suite_baseline.json', help='ベースラインのJSON')
+    parser.add_argument('--update-baseline', action='store_true', help='計測結果でベースラインを上書きします')
+    parser.add_argument('--portable-baseline', action='store_true',
+                        help='--update-baselineで、マシンによらない項目(設定、ダイジェスト、正解率)だけを保存します')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE, help='悪化とみなす割合')
+    return parser.parse_args(argv)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    arguments = parse_arguments()
+    suite_result = run_suite(arguments.scales, n_repeat=arguments.repeat, seed=arguments.seed)
+    with open(arguments.output, 'w') as f:
+        f.write(json.dumps(suite_result, ensure_ascii=False, indent=4))
+
+    if arguments.update_baseline:
+        baseline = {}
+        if os.path.exists(arguments.baseline):
+            with open(arguments.baseline, 'r') as f:
+                baseline = json.loads(f.read())
+        baseline.update(get_portable_baseline(suite_result) if arguments.portable_baseline else suite_result)
+        with open(arguments.baseline, 'w') as f:
+            f.write(json.dumps(baseline, ensure_ascii=False, indent=4))
+        logger.info(msg='Updated baseline {}'.format(arguments.baseline))
+    elif os.path.exists(arguments.baseline):
+        with open(arguments.baseline, 'r') as f:
+            seq_regression = compare_with_baseline(suite_result, json.loads(f.read()), tolerance=arguments.tolerance)
+        for regression in seq_regression:
+            logger.warning(msg=regression)
+        if seq_regression:
+            sys.exit(1)
+        logger.info(msg='No regression against baseline {}'.format(arguments.baseline))
+    else:
+        logger.info(msg='Baseline {} is not found. Run with --update-baseline to create it.'.format(arguments.baseline))
@@ -0,0 +1,107 @@
+from typing import List, Dict, Tuple, Callable
+from itertools import chain, groupby
+from functools import partial
+import logging
+import os
+import time
+logger = logging.getLogger(__file__)
+logger.setLevel(logging.INFO)
+
+"""get_text_scoreのtop_k指定の効果を、wikipedia_text.jsonlのfullセクションで計測します。
+MeCabによるトークン化は計測前に一度だけ行い、スコアリングの時間だけを比較します。
+
+python -m benchmarks.bench_text_score
+"""
+
+__author__ = "Kensuke Mitsuzawa"
+__author_email__ = "kensuke_mitsuzawa@fumankaitori.com"
+__license_name__ = "MIT"
+
+from category_scoring import POS_CONDITION, create_mecab_tokenizer, tokenize, get_text_score, load_word_score_dictionary
+from evaluate_dictionary import iter_evaluation_data
+
+
+def get_text_score_sort_groupby(input_text,
+                                word_score_dictionary,
+                                function_tokenizer):
+    # type: (str, Dict[str, List[Tuple[str,float]]], Callable[[str], List[str]])->List[Tuple[str,float]]
+    """* What you can do
+    - 比較用に、ソートとgroupbyで集計する従来のスコアリング関数を残しています。
+    """
+    key_function = lambda tuple_obj: tuple_obj[0]
+    list_tokens = function_tokenizer(input_text)
+    seq_score_elements = [word_score_dictionary[token] for token in list_tokens if token in word_score_dictionary]
+
+    score_category = []
+    for key_name, grouped_obj in groupby(sorted(chain.from_iterable(seq_score_elements), key=key_function, reverse=True), key=key_function):
+        category_score = sum([score_tuple[1] for score_tuple in grouped_obj])
+        score_category.append((key_name, category_score))
+
+    return sorted(score_category, key=lambda tuple_obj: tuple_obj[1], reverse=True)
+
+
+def measure(function_score, seq_list_tokens, n_repeat):
+    # type: (Callable[[List[str]], List[Tuple[str,float]]], List[List[str]], int)->float
+    """* What you can do
+    - 全文書をn_repeat回スコアリングし、1文書あたりの平均秒数を返します。
+    """
+    start = time.perf_counter()
+    for _ in range(n_repeat):
+        for list_tokens in seq_list_tokens:
+            function_score(list_tokens)
+    return (time.perf_counter() - start) / (n_repeat * len(seq_list_tokens))
+
+
+def main(path_mecab_bin,
+         path_evaluation_data,
+         path_dictionary_data,
+         path_dictionary_index=None,
+         n_repeat=5,
+         seq_top_k=(1, 3, 5, 10)):
+    # type: (str, str, str, str, int, Tuple[int,...])->Dict[str,float]
+    mecab_tokenizer = create_mecab_tokenizer(path_mecab_bin)
+    function_mecab_tokenizer = partial(tokenize, mecab_tokenizer=mecab_tokenizer, pos_condition=POS_CONDITION)
+    word_score_dictionary = load_word_score_dictionary(path_dictionary_data, path_dictionary_index)
+
+    ### トークン化は一度だけ行います ###
+    seq_list_tokens = [function_mecab_tokenizer(evaluation_obj['text'])
+                       for evaluation_obj in iter_evaluation_data(path_evaluation_data, 'full')]
+    logger.info(msg='N(document)={}, N(token)={}'.format(len(seq_list_tokens), sum(map(len, seq_list_tokens))))
+    identity = lambda list_tokens: list_tokens
+
+    ### 両方の実装が同じ順位を返すことを確認します ###
+    for list_tokens in seq_list_tokens:
+        expected = get_text_score_sort_groupby(list_tokens, word_score_dictionary, identity)
+        actual = get_text_score(list_tokens, word_score_dictionary, identity, top_k=10)
+        assert [label for label, _ in expected[:10]] == [label for label, _ in actual]
+
+    result = {}
+    result['sort_groupby'] = measure(
+        lambda list_tokens: get_text_score_sort_groupby(list_tokens, word_score_dictionary, identity)[:10],
+        seq_list_tokens, n_repeat)
+    result['top_k=None'] = measure(
+        lambda list_tokens: get_text_score(list_tokens, word_score_dictionary, identity),
+        seq_list_tokens, n_repeat)
+    for top_k in seq_top_k:
+        result['top_k={}'.format(top_k)] = measure(
+            lambda list_tokens: get_text_score(list_tokens, word_score_dictionary, identity, top_k=top_k),
+            seq_list_tokens, n_repeat)
+
+    for name, seconds in result.items():
+        logger.info(msg='{:<14} {:>10.1f} usec/document, x{:.2f} against sort_groupby'.format(
+            name, seconds * 1e6, result['sort_groupby'] / seconds))
+    return result
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    PATH_MECAB_BIN = '/usr/local/bin'
+    PATH_EVALUATION_DATA = './wikipedia-text/wikipedia_text.jsonl'
+    PATH_DICTIONARY_DATA = './dictionary-data/word_soa.json'
+    PATH_DICTIONARY_INDEX = './dictionary-data/word_soa.idx'
+    if not os.path.exists(PATH_DICTIONARY_DATA): raise FileExistsError('辞書ファイルが発見できません。')
+
+    main(path_mecab_bin=PATH_MECAB_BIN,
+         path_evaluation_data=PATH_EVALUATION_DATA,
+         path_dictionary_data=PATH_DICTIONARY_DATA,
+         path_dictionary_index=PATH_DICTIONARY_INDEX)
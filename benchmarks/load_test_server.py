@@ -0,0 +1,117 @@
+from typing import List, Dict, Any, Optional
+from collections import Counter
+import argparse
+import asyncio
+import json
+import logging
+import time
+logger = logging.getLogger(__file__)
+logger.setLevel(logging.INFO)
+
+"""category_score_server.pyに負荷をかけ、スループットとレイテンシを計測します。
+並列数だけkeep-aliveの接続を張り、それぞれの接続から順にリクエストを送ります。
+
+python category_score_server.py --port 8080 &
+python -m benchmarks.load_test_server --port 8080 --concurrency 64 --n-requests 5000
+"""
+
+__author__ = "Kensuke Mitsuzawa"
+__author_email__ = "kensuke_mitsuzawa@fumankaitori.com"
+__license_name__ = "MIT"
+
+
+async def send_request(reader, writer, host, body):
+    # type: (asyncio.StreamReader, asyncio.StreamWriter, str, bytes)->int
+    writer.write('POST /score HTTP/1.1\r\nHost: {}\r\nContent-Type: application/json\r\nContent-Length: {}\r\n\r\n'.format(
+        host, len(body)).encode('latin-1') + body)
+    await writer.drain()
+    status = int((await reader.readline()).split(b' ')[1])
+    content_length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        if name.strip().lower() == 'content-length':
+            content_length = int(value.strip())
+    await reader.readexactly(content_length)
+    return status
+
+
+async def run_client(host, port, seq_body, latencies, status_counter):
+    # type: (str, int, List[bytes], List[float], Counter)->None
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for body in seq_body:
+            start = time.perf_counter()
+            status = await send_request(reader, writer, host, body)
+            latencies.append(time.perf_counter() - start)
+            status_counter[status] += 1
+    finally:
+        writer.close()
+
+
+def get_percentile(sorted_values, ratio):
+    # type: (List[float], float)->float
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * ratio))]
+
+
+async def run_load_test(host, port, seq_input_text, n_requests, concurrency, top_k=5):
+    # type: (str, int, List[str], int, int, int)->Dict[str,Any]
+    """* What you can do
+    - n_requests件のリクエストをconcurrency本の接続から送り、スループットとレイテンシの分布を返します。
+    """
+    seq_body = [json.dumps({'text': seq_input_text[i % len(seq_input_text)], 'top_k': top_k}, ensure_ascii=False).encode('utf-8')
+                for i in range(n_requests)]
+    latencies = []  # type: List[float]
+    status_counter = Counter()  # type: Counter
+    start = time.perf_counter()
+    await asyncio.gather(*[run_client(host, port, seq_body[i::concurrency], latencies, status_counter)
+                           for i in range(concurrency)])
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+
+    return {
+        'n_requests': n_requests,
+        'concurrency': concurrency,
+        'elapsed': elapsed,
+        'throughput': n_requests / elapsed,
+        'latency_p50': get_percentile(latencies, 0.50),
+        'latency_p95': get_percentile(latencies, 0.95),
+        'latency_p99': get_percentile(latencies, 0.99),
+        'latency_max': latencies[-1] if latencies else 0.0,
+        'status': dict(status_counter),
+    }
+
+
+def load_input_texts(path_evaluation_data):
+    # type: (Optional[str])->List[str]
+    if path_evaluation_data is None:
+        return ['鈴鹿サーキットは、三重県鈴鹿市にある国際レーシングコースを中心としたレジャー施設。']
+    with open(path_evaluation_data, 'r') as f:
+        if not path_evaluation_data.endswith('.jsonl'):
+            return [evaluation_obj['text'] for evaluation_obj in json.loads(f.read())['summary']]
+        return [evaluation_obj['text'] for evaluation_obj in map(json.loads, f) if evaluation_obj['kind'] == 'summary']
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description='category_score_server.pyの負荷試験を行います。')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--n-requests', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--top-k', type=int, default=5)
+    parser.add_argument('--path-evaluation-data', default=None,
+                        help='wikipedia_text.jsonlを指定すると、summaryセクションのテキストを送ります')
+    arguments = parser.parse_args()
+
+    result = asyncio.run(run_load_test(arguments.host,
+                                       arguments.port,
+                                       load_input_texts(arguments.path_evaluation_data),
+                                       n_requests=arguments.n_requests,
+                                       concurrency=arguments.concurrency,
+                                       top_k=arguments.top_k))
+    logger.info(msg=json.dumps(result, indent=4))
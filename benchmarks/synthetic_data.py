@@ -0,0 +1,190 @@
+from typing import List, Dict, Any, Tuple, Iterator
+from bisect import bisect
+from itertools import accumulate
+import json
+import logging
+import random
+logger = logging.getLogger(__file__)
+logger.setLevel(logging.INFO)
+
+"""ベンチマーク用に、word_soa.jsonと同じ形の辞書と、評価データと同じ形の文書を合成します。
+NIIの辞書データ、MeCab(neologd)、Wikipediaがなくても、同じ乱数のシードから毎回同じデータを作成できます。
+
+- 辞書: 語彙数、カテゴリ数、1単語あたりのカテゴリ数の分布を指定できます。スコアは裾の長い分布に従います。
+- 文書: 単語をZipf分布で選んだ、空白区切りのトークン列です。str.splitをトークナイザーとして使います。
+  各文書は正解カテゴリを持ち、トークンの一部はそのカテゴリのスコアが高い単語から選びます。
+"""
+
+__author__ = "Kensuke Mitsuzawa"
+__author_email__ = "kensuke_mitsuzawa@fumankaitori.com"
+__license_name__ = "MIT"
+
+# 日本語の単語らしく見えるように、カタカナと漢字を組み合わせて単語を作ります。
+KATAKANA = 'アイウエオカキクケコサシスセソタチツテトナニヌネノハヒフヘホマミムメモヤユヨラリルレロワン'
+KANJI = '日本語辞書分類電話住宅料理旅行自動車保険家具食品健康美容音楽映画教育金融通信衣服靴鞄時計'
+TOP_CATEGORIES = ['暮らし・住まい', 'ファッション', '食品・飲料', '家電・AV機器', '美容・健康', 'アウトドア・スポーツ',
+                  '趣味・ホビー', '旅行・レジャー', 'マネー・保険', '通信・インターネット']
+
+
+def make_word(random_object, word_id):
+    # type: (random.Random, int)->str
+    """* What you can do
+    - カタカナ語または漢字語を作ります。単語IDを末尾に付けるため、異なる単語IDから同じ単語はできません。
+    """
+    if random_object.random() < 0.5:
+        stem = ''.join(random_object.choice(KATAKANA) for _ in range(random_object.randint(2, 6)))
+    else:
+        stem = ''.join(random_object.choice(KANJI) for _ in range(random_object.randint(1, 4)))
+    return '{}{}'.format(stem, word_id)
+
+
+def make_labels(n_categories):
+    # type: (int)->List[str]
+    """* What you can do
+    - 「大カテゴリ-小カテゴリ」の形のカテゴリ名を作ります。
+    """
+    return ['{}-小カテゴリ{}'.format(TOP_CATEGORIES[i % len(TOP_CATEGORIES)], i) for i in range(n_categories)]
+
+
+def sample_n_postings(random_object, distribution, mean_postings, n_categories):
+    # type: (random.Random, str, float, int)->int
+    """* What you can do
+    - 1単語あたりのカテゴリ数を、distribution(fixed, uniform, geometric)に従って選びます。
+    """
+    if distribution == 'fixed':
+        n_postings = int(round(mean_postings))
+    elif distribution == 'uniform':
+        n_postings = random_object.randint(1, max(1, int(round(mean_postings * 2 - 1))))
+    elif distribution == 'geometric':
+        ### 少数のカテゴリしか持たない単語が多く、ごく一部の単語が多数のカテゴリを持ちます ###
+        n_postings = 1 + int(random_object.expovariate(1.0 / max(mean_postings - 1, 1e-9)))
+    else:
+        raise ValueError('distributionはfixed, uniform, geometricのいずれかを指定してください。distribution={}'.format(
+            distribution))
+    return max(1, min(n_postings, n_categories))
+
+
+def iter_synthetic_dictionary(n_words,
+                              n_categories,
+                              mean_postings=10.0,
+                              postings_distribution='geometric',
+                              seed=0):
+    # type: (int, int, float, str, int)->Iterator[Dict[str,Any]]
+    """* What you can do
+    - word_soa.jsonのレコードを1件ずつ返します。同じ単語のレコードは連続します。
+
+    * Output
+    >>> {"label": "暮らし・住まい-小カテゴリ0", "score": 0.0294, "word": "マジック12"}
+    """
+    random_object = random.Random(seed)
+    labels = make_labels(n_categories)
+    for word_id in range(n_words):
+        word = make_word(random_object, word_id)
+        n_postings = sample_n_postings(random_object, postings_distribution, mean_postings, n_categories)
+        ### スコアはパレート分布で、少数のカテゴリに大きなスコアが集中します ###
+        seq_weight = [random_object.paretovariate(1.5) for _ in range(n_postings)]
+        total_weight = sum(seq_weight)
+        for label, weight in zip(random_object.sample(labels, n_postings), seq_weight):
+            yield {'label': label, 'score': weight / total_weight, 'word': word}
+
+
+def write_synthetic_dictionary(path_dictionary_data, **kwargs):
+    # type: (str, Any)->int
+    """* What you can do
+    - 合成した辞書をword_soa.jsonと同じJSON配列の形式で書き出し、レコード数を返します。
+    """
+    n_records = 0
+    with open(path_dictionary_data, 'w') as f:
+        f.write('[')
+        for score_object in iter_synthetic_dictionary(**kwargs):
+            if n_records > 0:
+                f.write(',\n')
+            f.write(json.dumps(score_object, ensure_ascii=False))
+            n_records += 1
+        f.write(']')
+    logger.info(msg='Wrote synthetic dictionary {}; N(record)={}'.format(path_dictionary_data, n_records))
+
+    return n_records
+
+
+class ZipfSampler(object):
+    """* What you can do
+    - 0からn_items-1までの整数を、Zipf分布(順位のs乗に反比例)に従って選びます。
+    """
+    def __init__(self, n_items, exponent=1.1):
+        # type: (int, float)->None
+        self.cumulative_weights = list(accumulate(1.0 / (rank ** exponent) for rank in range(1, n_items + 1)))
+        self.total_weight = self.cumulative_weights[-1]
+
+    def sample(self, random_object):
+        # type: (random.Random)->int
+        return min(bisect(self.cumulative_weights, random_object.random() * self.total_weight),
+                   len(self.cumulative_weights) - 1)
+
+
+def iter_synthetic_documents(seq_score_object,
+                             n_documents,
+                             mean_tokens=300,
+                             topic_ratio=0.12,
+                             unknown_ratio=0.1,
+                             seed=0):
+    # type: (List[Dict[str,Any]], int, int, float, float, int)->Iterator[Dict[str,Any]]
+    """* What you can do
+    - 評価データ(get_wikipedia_text.pyの出力)と同じ形の文書を返します。textは空白区切りのトークン列です。
+    - トークンのうちtopic_ratioの割合は、正解カテゴリのスコアが最も高い単語から選びます。
+    - unknown_ratioの割合は、辞書にない単語にします。残りは語彙全体からZipf分布で選びます。
+
+    * Output
+    >>> {"kind": "full", "page_title": "synthetic-0", "text": "マジック12 日本3 ...", "gold_label": "暮らし・住まい-小カテゴリ0"}
+    """
+    random_object = random.Random(seed)
+    seq_word = []  # type: List[str]
+    label2words = {}  # type: Dict[str, List[str]]
+    best_posting = {}  # type: Dict[str, Tuple[str,float]]
+    for score_object in seq_score_object:
+        word = score_object['word']
+        if word not in best_posting:
+            seq_word.append(word)
+            best_posting[word] = (score_object['label'], score_object['score'])
+        elif score_object['score'] > best_posting[word][1]:
+            best_posting[word] = (score_object['label'], score_object['score'])
+    for word in seq_word:
+        label2words.setdefault(best_posting[word][0], []).append(word)
+    seq_label = sorted(label2words)
+    ### 語彙の並びをシャッフルし、頻出語がIDの若い単語に偏らないようにします ###
+    random_object.shuffle(seq_word)
+    zipf_sampler = ZipfSampler(len(seq_word))
+
+    for document_id in range(n_documents):
+        gold_label = random_object.choice(seq_label)
+        topic_words = label2words[gold_label]
+        n_tokens = max(1, int(random_object.gauss(mean_tokens, mean_tokens / 4)))
+        list_tokens = []  # type: List[str]
+        for _ in range(n_tokens):
+            value = random_object.random()
+            if value < topic_ratio:
+                list_tokens.append(random_object.choice(topic_words))
+            elif value < topic_ratio + unknown_ratio:
+                list_tokens.append('未知語{}'.format(random_object.randint(0, 10 * len(seq_word))))
+            else:
+                list_tokens.append(seq_word[zipf_sampler.sample(random_object)])
+        for kind, seq_token in (('summary', list_tokens[:max(1, n_tokens // 10)]), ('full', list_tokens)):
+            yield {'kind': kind,
+                   'page_title': 'synthetic-{}'.format(document_id),
+                   'text': ' '.join(seq_token),
+                   'gold_label': gold_label}
+
+
+def write_synthetic_documents(path_evaluation_data, seq_score_object, **kwargs):
+    # type: (str, List[Dict[str,Any]], Any)->int
+    """* What you can do
+    - 合成した文書を評価データと同じJSONL形式で書き出し、行数を返します。
+    """
+    n_lines = 0
+    with open(path_evaluation_data, 'w') as f:
+        for evaluation_obj in iter_synthetic_documents(seq_score_object, **kwargs):
+            f.write(json.dumps(evaluation_obj, ensure_ascii=False) + '\n')
+            n_lines += 1
+    logger.info(msg='Wrote synthetic documents {}; N(line)={}'.format(path_evaluation_data, n_lines))
+
+    return n_lines
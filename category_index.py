@@ -0,0 +1,75 @@
+from typing import List, Dict, Any, Tuple, Optional
+import json
+import logging
+import os
+logger = logging.getLogger(__file__)
+logger.setLevel(logging.INFO)
+
+"""カテゴリから単語を引く逆引きの辞書です。
+「あるカテゴリでスコアが高い単語」を調べるときに、辞書全体を走査せずに済みます。
+
+辞書インデックス(dictionary_index.py)はコンパイル時に逆引きのセクションを作成するため、そのまま引けます。
+dictやCompactDictionaryなど、逆引きを持たない辞書からはbuild_category_indexで一度だけ作成して使い回します。
+
+Python3.5以上で動作します。
+"""
+
+__author__ = "Kensuke Mitsuzawa"
+__author_email__ = "kensuke_mitsuzawa@fumankaitori.com"
+__license_name__ = "MIT"
+
+from dictionary_index import DictionaryIndex
+
+
+def build_category_index(word_score_dictionary):
+    # type: (Any)->Dict[str, List[Tuple[str,float]]]
+    """* What you can do
+    - 辞書(itemsを持つもの)を1回走査し、カテゴリごとの(単語, スコア)をスコアの降順に並べます。同点の場合は単語の昇順です。
+
+    * Output
+    >>> {"アウトドア・スポーツ-その他": [("お金", 0.02942301705479622), ...]}
+    """
+    category_index = {}  # type: Dict[str, List[Tuple[str,float]]]
+    for word, postings in word_score_dictionary.items():
+        for label, score in postings:
+            if label not in category_index:
+                category_index[label] = [(word, score)]
+            else:
+                category_index[label].append((word, score))
+    for seq_word_score in category_index.values():
+        seq_word_score.sort(key=lambda tuple_obj: (-tuple_obj[1], tuple_obj[0]))
+    logger.info(msg='Built category index; N(label)={}'.format(len(category_index)))
+
+    return category_index
+
+
+def get_category_top_words(word_score_dictionary, label, top_n=None, category_index=None):
+    # type: (Any, str, Optional[int], Optional[Dict[str, List[Tuple[str,float]]]])->List[Tuple[str,float]]
+    """* What you can do
+    - カテゴリの単語をスコアの降順に返します。top_nを指定すると上位top_n件だけを返します。
+    - 逆引きを持つ辞書インデックスはそれを使います。それ以外はcategory_index(build_category_indexの結果)を使い、
+      指定がなければその場で作成します。何度も引く場合は、category_indexを作成して渡してください。
+
+    * Example
+    >>> get_category_top_words(word_score_dictionary, '食品・飲料-インスタント食品', top_n=3)
+    [('カップ麺', 0.41), ('インスタントラーメン', 0.38), ('袋麺', 0.22)]
+    """
+    if isinstance(word_score_dictionary, DictionaryIndex) and word_score_dictionary.has_category_index:
+        return word_score_dictionary.get_category_postings(label, top_n)
+    if category_index is None:
+        category_index = build_category_index(word_score_dictionary)
+    seq_word_score = category_index.get(label, [])
+    return seq_word_score if top_n is None else seq_word_score[:top_n]
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    ### コンパイル済み辞書インデックスのパス
+    PATH_DICTIONARY_INDEX = './dictionary-data/word_soa.idx'
+    ### 調べたいカテゴリ
+    LABEL = '食品・飲料-インスタント食品'
+    TOP_N = 20
+    if not os.path.exists(PATH_DICTIONARY_INDEX): raise FileExistsError('辞書インデックスが発見できません。')
+
+    with DictionaryIndex.open(PATH_DICTIONARY_INDEX) as word_score_dictionary:
+        print(json.dumps(get_category_top_words(word_score_dictionary, LABEL, top_n=TOP_N), ensure_ascii=False, indent=4))
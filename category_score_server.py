@@ -0,0 +1,406 @@
+from typing import List, Dict, Any, Tuple, Optional
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+logger = logging.getLogger(__file__)
+logger.setLevel(logging.INFO)
+
+"""カテゴリ分類を常駐のHTTPサービスとして提供します。
+辞書とトークナイザーはワーカープロセスの起動時に一度だけ読み込みます。
+同時に届いたリクエストは、待ち時間の上限までまとめてから(マイクロバッチ)ワーカーに渡します。
+イベントループは形態素解析とスコアリングを行わないため、処理中も新しいリクエストを受け付けられます。
+
+- POST /score  {"text": "...", "top_k": 5} -> {"categories": [["カテゴリ名", スコア], ...]}
+- GET /health  -> {"status": "ok", ...}
+
+キューが満杯の場合は503を、スコアリングに失敗した場合は500を返します。バッチの1件が失敗しても、ほかのリクエストには結果を返します。
+top_kが1以上の整数でないリクエストや、Content-Lengthが不正なリクエストには400を返します。
+--result-cache-sizeを指定すると、同じテキストの結果をキャッシュ(result_cache.py)から返し、ワーカーに渡しません。
+
+python category_score_server.py --port 8080 --workers 4
+
+Python3.7以上で動作します。
+"""
+
+__author__ = "Kensuke Mitsuzawa"
+__author_email__ = "kensuke_mitsuzawa@fumankaitori.com"
+__license_name__ = "MIT"
+
+from batch_classify import initialize_worker, classify_chunk_with_version, create_worker_shared_dictionary
+from category_scoring import POS_CONDITION, load_word_score_dictionary
+from result_cache import ResultCache, get_dictionary_version
+
+HTTP_REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+                413: 'Payload Too Large', 500: 'Internal Server Error', 503: 'Service Unavailable'}
+MAX_BODY_BYTES = 10 * 1024 * 1024
+# 結果のキャッシュで、辞書のバージョン(ファイルの更新)を確認する間隔(秒)
+DICTIONARY_VERSION_CHECK_INTERVAL = 1.0
+
+
+class ScoringService(object):
+    """* What you can do
+    - リクエストをキューに溜め、max_batch_size件またはmax_batch_delay秒ごとにまとめてワーカーでスコアリングします。
+    - キューがmax_queue_size件で満杯のときは、submitがNoneを返します(バックプレッシャー)。
+    - is_use_shared_memory=Trueの場合は、辞書を共有メモリに一度だけ展開して全ワーカーで共有し、stopで削除します。
+    - path_dictionary_manifestを指定すると、デルタが公開されたときに、再起動せずに新しいバージョンの辞書へ切り替えます。
+    - result_cacheを指定すると、キャッシュに当たったリクエストはキューに入れずにすぐ返します。
+      マニフェストを指定した場合は、辞書のバージョンをDICTIONARY_VERSION_CHECK_INTERVAL秒ごとに確認し、変わっていればキャッシュを捨てます。
+      結果はワーカーが実際に使った辞書のバージョンでキャッシュし、それが現在のバージョンと異なれば捨てます。
+      マニフェストがなければワーカーは辞書を読み直さないため、辞書ファイルが更新されてもキャッシュのバージョンは変えません。
+    """
+    def __init__(self,
+                 path_mecab_bin,
+                 path_dictionary_data,
+                 path_dictionary_index=None,
+                 pos_condition=POS_CONDITION,
+                 n_workers=2,
+                 max_batch_size=32,
+                 max_batch_delay=0.01,
+                 max_queue_size=1024,
+                 default_top_k=10,
+                 is_use_shared_memory=False,
+                 path_dictionary_manifest=None,
+                 result_cache=None):
+        # type: (str, str, Optional[str], List[Tuple[str,...]], int, int, float, int, int, bool, Optional[str], Optional[ResultCache])->None
+        self.initargs = (path_mecab_bin, path_dictionary_data, path_dictionary_index, pos_condition)
+        if is_use_shared_memory and path_dictionary_manifest is not None:
+            raise ValueError('共有メモリとマニフェストは同時に指定できません。')
+        self.initializer = partial(initialize_worker, path_dictionary_manifest=path_dictionary_manifest)
+        self.path_dictionary_manifest = path_dictionary_manifest
+        self.n_workers = n_workers
+        self.max_batch_size = max_batch_size
+        self.max_batch_delay = max_batch_delay
+        self.max_queue_size = max_queue_size
+        self.default_top_k = default_top_k
+        self.is_use_shared_memory = is_use_shared_memory
+        self.result_cache = result_cache
+        self.dictionary_version_checked_at = 0.0
+        self.shared_dictionary = None
+        self.executor = None
+        self.queue = None  # type: Optional[asyncio.Queue]
+        self.batch_semaphore = None  # type: Optional[asyncio.Semaphore]
+        self.batcher_task = None
+        self.started_at = time.time()
+        self.n_processed = 0
+        self.n_rejected = 0
+        self.n_batches = 0
+
+    async def start(self):
+        # type: ()->None
+        path_dictionary_index = self.initargs[2]
+        if self.n_workers == 0:
+            ### ワーカープロセスを起動せず、同じプロセスのスレッドで処理します ###
+            self.initializer(*self.initargs)
+            self.executor = ThreadPoolExecutor(max_workers=1)
+        elif self.is_use_shared_memory:
+            self.shared_dictionary = create_worker_shared_dictionary(self.initargs[1], path_dictionary_index)
+            self.executor = ProcessPoolExecutor(max_workers=self.n_workers,
+                                                initializer=partial(self.initializer,
+                                                                    shared_dictionary_name=self.shared_dictionary.name),
+                                                initargs=self.initargs)
+        else:
+            if path_dictionary_index is not None and not os.path.exists(path_dictionary_index) \
+                    and self.path_dictionary_manifest is None:
+                ### ワーカーがmmapで同じページを共有できるよう、先にインデックスを作成します ###
+                load_word_score_dictionary(self.initargs[1], path_dictionary_index)
+            self.executor = ProcessPoolExecutor(max_workers=self.n_workers,
+                                                initializer=self.initializer,
+                                                initargs=self.initargs)
+        self.queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self.batch_semaphore = asyncio.Semaphore(max(self.n_workers, 1))
+        self.batcher_task = asyncio.ensure_future(self.run_batcher())
+
+    async def stop(self):
+        # type: ()->None
+        if self.batcher_task is not None:
+            self.batcher_task.cancel()
+            try:
+                await self.batcher_task
+            except asyncio.CancelledError:
+                pass
+        try:
+            if self.executor is not None:
+                self.executor.shutdown(wait=True)
+        finally:
+            ### 停止中に再度割り込まれても、共有メモリは削除します ###
+            if self.shared_dictionary is not None:
+                self.shared_dictionary.close()
+                self.shared_dictionary = None
+            if self.result_cache is not None:
+                self.result_cache.report()
+                self.result_cache.close()
+
+    def refresh_dictionary_version(self):
+        # type: ()->None
+        now = time.time()
+        if now - self.dictionary_version_checked_at < DICTIONARY_VERSION_CHECK_INTERVAL:
+            return
+        self.dictionary_version_checked_at = now
+        self.result_cache.set_dictionary_version(get_dictionary_version(path_dictionary_data=self.initargs[1],
+                                                                        path_dictionary_index=self.initargs[2],
+                                                                        path_dictionary_manifest=self.path_dictionary_manifest))
+
+    def submit(self, input_text, top_k):
+        # type: (str, int)->Optional[asyncio.Future]
+        future = asyncio.get_event_loop().create_future()
+        dictionary_version = None  # type: Optional[str]
+        if self.result_cache is not None:
+            if self.path_dictionary_manifest is not None:
+                self.refresh_dictionary_version()
+            dictionary_version = self.result_cache.dictionary_version
+            ### flush中はディスクを待たずに、キャッシュのミスとしてキューに入れます ###
+            seq_score_tuple = self.result_cache.get(input_text, self.initargs[3], top_k, is_wait_disk=False)
+            if seq_score_tuple is not None:
+                future.set_result(seq_score_tuple)
+                return future
+        try:
+            self.queue.put_nowait((input_text, top_k, future, dictionary_version))
+        except asyncio.QueueFull:
+            self.n_rejected += 1
+            return None
+        return future
+
+    async def run_batcher(self):
+        # type: ()->None
+        loop = asyncio.get_event_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.max_batch_delay
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            ### 処理中のバッチ数をワーカー数までに制限し、あふれたリクエストはキューで待たせます ###
+            await self.batch_semaphore.acquire()
+            asyncio.ensure_future(self.run_batch(batch))
+
+    async def run_batch(self, batch):
+        # type: (List[Tuple[str, int, asyncio.Future, Optional[str]]])->None
+        try:
+            try:
+                await self.__score_batch(batch)
+            except Exception:
+                if len(batch) == 1:
+                    raise
+                ### 1件の失敗でバッチ全体を失敗させないよう、1件ずつスコアリングし直し、失敗したリクエストだけに例外を返します ###
+                logger.exception(msg='Failed to score a batch of {} requests; retrying one by one.'.format(len(batch)))
+                for item in batch:
+                    try:
+                        await self.__score_batch([item])
+                    except Exception as exception:
+                        logger.exception(msg='Failed to score a request.')
+                        if not item[2].done():
+                            item[2].set_exception(exception)
+            self.n_processed += len(batch)
+            self.n_batches += 1
+            if self.result_cache is not None:
+                ### ディスクへの書き込みはバッチごとに1回のトランザクションにまとめ、イベントループの外で行います ###
+                await asyncio.get_event_loop().run_in_executor(None, self.result_cache.flush)
+        except Exception as exception:
+            logger.exception(msg='Failed to score a batch of {} requests.'.format(len(batch)))
+            for _, _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(exception)
+        finally:
+            self.batch_semaphore.release()
+
+    async def __score_batch(self, batch):
+        # type: (List[Tuple[str, int, asyncio.Future, Optional[str]]])->None
+        top_k = max(item[1] for item in batch)
+        chunk = [(index, item[0]) for index, item in enumerate(batch)]
+        seq_result, worker_dictionary_version = await asyncio.get_event_loop().run_in_executor(
+            self.executor, classify_chunk_with_version, chunk, top_k)
+        for (index, seq_score_tuple), (_, item_top_k, future, dictionary_version) in zip(seq_result, batch):
+            if not future.done():
+                future.set_result(seq_score_tuple[:item_top_k])
+            if self.result_cache is not None:
+                ### 受け付けたときか、ワーカーが使った辞書のバージョンで登録し、現在のバージョンと異なれば捨てます ###
+                self.result_cache.put(chunk[index][1], self.initargs[3], item_top_k, seq_score_tuple[:item_top_k],
+                                      is_auto_flush=False,
+                                      dictionary_version=worker_dictionary_version or dictionary_version)
+
+    def get_health(self):
+        # type: ()->Dict[str,Any]
+        return {
+            'status': 'ok',
+            'uptime': time.time() - self.started_at,
+            'queue_size': self.queue.qsize() if self.queue is not None else 0,
+            'max_queue_size': self.max_queue_size,
+            'n_processed': self.n_processed,
+            'n_rejected': self.n_rejected,
+            'n_batches': self.n_batches,
+            'result_cache': self.result_cache.stats() if self.result_cache is not None else None,
+        }
+
+
+async def write_response(writer, status, body, keep_alive):
+    # type: (asyncio.StreamWriter, int, Dict[str,Any], bool)->None
+    encoded_body = json.dumps(body, ensure_ascii=False).encode('utf-8')
+    header = 'HTTP/1.1 {} {}\r\nContent-Type: application/json; charset=utf-8\r\nContent-Length: {}\r\nConnection: {}\r\n\r\n'.format(
+        status, HTTP_REASONS.get(status, ''), len(encoded_body), 'keep-alive' if keep_alive else 'close')
+    writer.write(header.encode('latin-1') + encoded_body)
+    await writer.drain()
+
+
+async def handle_request(service, method, path, body):
+    # type: (ScoringService, str, str, bytes)->Tuple[int, Dict[str,Any]]
+    if path == '/health':
+        if method != 'GET':
+            return 405, {'error': 'method not allowed'}
+        return 200, service.get_health()
+    if path != '/score':
+        return 404, {'error': 'not found'}
+    if method != 'POST':
+        return 405, {'error': 'method not allowed'}
+
+    try:
+        request = json.loads(body.decode('utf-8'))
+        input_text = request['text']
+        top_k = request.get('top_k', service.default_top_k)
+        if not isinstance(input_text, str):
+            raise ValueError('text must be a string')
+        ### 1.5や"5"を黙って丸めたり変換したりしないよう、JSONの整数だけを受け付けます ###
+        if not isinstance(top_k, int) or isinstance(top_k, bool):
+            raise ValueError('top_k must be an integer')
+        if top_k < 1:
+            raise ValueError('top_k must be 1 or more')
+    except (ValueError, KeyError, TypeError, AttributeError) as exception:
+        return 400, {'error': 'invalid request: {}'.format(exception)}
+
+    future = service.submit(input_text, top_k)
+    if future is None:
+        return 503, {'error': 'queue is full'}
+    try:
+        seq_score_tuple = await future
+    except Exception as exception:
+        ### 再試行しても同じ結果になるため、503ではなく500を返します ###
+        return 500, {'error': 'scoring failed: {}'.format(exception)}
+
+    return 200, {'categories': seq_score_tuple}
+
+
+async def handle_connection(service, reader, writer):
+    # type: (ScoringService, asyncio.StreamReader, asyncio.StreamWriter)->None
+    try:
+        while True:
+            request_line = await reader.readline()
+            if not request_line:
+                break
+            try:
+                method, path, version = request_line.decode('latin-1').rstrip('\r\n').split(' ', 2)
+            except ValueError:
+                await write_response(writer, 400, {'error': 'bad request line'}, keep_alive=False)
+                break
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                name, _, value = line.decode('latin-1').partition(':')
+                headers[name.strip().lower()] = value.strip()
+            try:
+                content_length = int(headers.get('content-length', '0') or 0)
+            except ValueError:
+                content_length = -1
+            if content_length < 0:
+                await write_response(writer, 400, {'error': 'invalid content-length'}, keep_alive=False)
+                break
+            keep_alive = headers.get('connection', '').lower() != 'close' and version == 'HTTP/1.1'
+            if content_length > MAX_BODY_BYTES:
+                await write_response(writer, 413, {'error': 'payload too large'}, keep_alive=False)
+                break
+            body = await reader.readexactly(content_length) if content_length else b''
+
+            status, response_body = await handle_request(service, method, path.split('?', 1)[0], body)
+            await write_response(writer, status, response_body, keep_alive)
+            if not keep_alive:
+                break
+    except (asyncio.IncompleteReadError, ConnectionResetError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(service, host='127.0.0.1', port=8080, path_unix_socket=None):
+    # type: (ScoringService, str, int, Optional[str])->None
+    await service.start()
+    client_connected_cb = lambda reader, writer: handle_connection(service, reader, writer)
+    if path_unix_socket is not None:
+        server = await asyncio.start_unix_server(client_connected_cb, path=path_unix_socket)
+        logger.info(msg='Serving on unix socket {}'.format(path_unix_socket))
+    else:
+        server = await asyncio.start_server(client_connected_cb, host=host, port=port)
+        logger.info(msg='Serving on http://{}:{}'.format(host, port))
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await service.stop()
+
+
+def parse_arguments(argv=None):
+    # type: (Optional[List[str]])->argparse.Namespace
+    parser = argparse.ArgumentParser(description='カテゴリ分類のHTTPサービスを起動します。')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--unix-socket', default=None, help='指定するとUnixドメインソケットで待ち受けます')
+    parser.add_argument('--workers', type=int, default=2, help='ワーカープロセス数。0なら同じプロセスで処理します')
+    parser.add_argument('--max-batch-size', type=int, default=32)
+    parser.add_argument('--max-batch-delay', type=float, default=0.01, help='マイクロバッチを待つ最大秒数')
+    parser.add_argument('--max-queue-size', type=int, default=1024)
+    parser.add_argument('--top-k', type=int, default=10, help='top_kの指定がないリクエストに返すカテゴリ数')
+    parser.add_argument('--shared-memory', action='store_true',
+                        help='辞書を共有メモリに一度だけ展開し、全ワーカーで共有します')
+    parser.add_argument('--path-dictionary-manifest', default=None,
+                        help='辞書のマニフェスト(dictionary_delta.py)。デルタが公開されると再起動せずに新しいバージョンへ切り替えます')
+    parser.add_argument('--result-cache-size', type=int, default=0,
+                        help='プロセス内にキャッシュする結果の件数。0ならキャッシュしません')
+    parser.add_argument('--result-cache-ttl', type=float, default=3600.0, help='キャッシュした結果の有効期限(秒)')
+    parser.add_argument('--path-result-cache', default=None,
+                        help='同じホストのプロセスで共有する、結果のキャッシュのSQLiteファイル')
+    parser.add_argument('--path-mecab-bin', default='/usr/local/bin', help='mecab-configが存在しているディレクトリ')
+    parser.add_argument('--path-dictionary-data', default='./dictionary-data/word_soa.json')
+    parser.add_argument('--path-dictionary-index', default='./dictionary-data/word_soa.idx')
+    return parser.parse_args(argv)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    arguments = parse_arguments()
+    if not os.path.exists(os.path.join(arguments.path_mecab_bin, 'mecab-config')):
+        raise FileExistsError('mecab-configファイルが見つかりません')
+    result_cache = None
+    if arguments.result_cache_size > 0:
+        result_cache = ResultCache(get_dictionary_version(path_dictionary_data=arguments.path_dictionary_data,
+                                                          path_dictionary_index=arguments.path_dictionary_index,
+                                                          path_dictionary_manifest=arguments.path_dictionary_manifest),
+                                   max_entries=arguments.result_cache_size,
+                                   ttl=arguments.result_cache_ttl,
+                                   path_disk_cache=arguments.path_result_cache)
+    scoring_service = ScoringService(path_mecab_bin=arguments.path_mecab_bin,
+                                     path_dictionary_data=arguments.path_dictionary_data,
+                                     path_dictionary_index=arguments.path_dictionary_index,
+                                     n_workers=arguments.workers,
+                                     max_batch_size=arguments.max_batch_size,
+                                     max_batch_delay=arguments.max_batch_delay,
+                                     max_queue_size=arguments.max_queue_size,
+                                     default_top_k=arguments.top_k,
+                                     is_use_shared_memory=arguments.shared_memory,
+                                     path_dictionary_manifest=arguments.path_dictionary_manifest,
+                                     result_cache=result_cache)
+    try:
+        asyncio.run(serve(scoring_service,
+                          host=arguments.host,
+                          port=arguments.port,
+                          path_unix_socket=arguments.unix_socket))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,224 @@
+from typing import List, Dict, Union, Any, Tuple, Callable, Optional, TYPE_CHECKING
+from collections import Counter
+from heapq import nlargest
+import json
+import logging
+import os
+import time
+logger = logging.getLogger(__file__)
+logger.setLevel(logging.INFO)
+
+"""カテゴリ判別のスコアリングの中核部分です。標準ライブラリだけでimportできます。
+get_category_score.pyとevaluate_dictionary.pyは、この関数を使っています。
+
+- JapaneseTokenizer(MeCab)はcreate_mecab_tokenizerを呼んだときに初めてimportします。
+- SQLiteの辞書ストア、CompactDictionary、辞書インデックスは、その辞書を読み込むときに初めてimportします。
+  作成済みの辞書インデックスと辞書マッチャーで分類する場合は、MeCabもSQLiteも読み込みません。
+
+Python3.5.2以上で動作します。
+"""
+
+__author__ = "Kensuke Mitsuzawa"
+__author_email__ = "kensuke_mitsuzawa@fumankaitori.com"
+__license_name__ = "MIT"
+
+from metrics import METRICS, record_document
+### 型コメントのためだけにimportします。実行時には読み込みません ###
+if TYPE_CHECKING:
+    from compact_dictionary import CompactDictionary
+    from dictionary_index import DictionaryIndex
+    from dictionary_store import SqliteDictionaryStore
+
+POS_CONDITION = [('名詞', '固有名詞'), ('名詞', '一般'), ('名詞', 'サ変接続'), ('動詞', '自立')]
+
+
+def create_mecab_tokenizer(path_mecab_bin, dict_type='neologd'):
+    # type: (str, str)->Any
+    """* What you can do
+    - JapaneseTokenizerのMecabWrapperを作成します。JapaneseTokenizerはここで初めてimportします。
+    """
+    try:
+        from JapaneseTokenizer import MecabWrapper
+    except ImportError:
+        raise ImportError('先にpip install JapaneseTokenizerを実行してください。')
+    return MecabWrapper(dictType=dict_type, path_mecab_config=path_mecab_bin)
+
+
+def tokenize(input_string: str, mecab_tokenizer, pos_condition)->List[str]:
+    tokenized_sentence_obj = mecab_tokenizer.tokenize(sentence=input_string, return_list=False)
+    filtered_obj = mecab_tokenizer.filter(parsed_sentence=tokenized_sentence_obj, pos_condition=pos_condition)
+    list_tokens = filtered_obj.convert_list_object()
+    if METRICS.enabled:
+        ### 品詞ごとのヒット数を集計するため、トークンの品詞(上位2階層)を記録します ###
+        METRICS.set_token_pos({token: '-'.join(token_obj.tuple_pos[:2])
+                               for token, token_obj in zip(list_tokens, filtered_obj.tokenized_objects)})
+    return list_tokens
+
+
+def load_dictionary_data(path_dictionary_data):
+    # type: (str)->List[Dict[str,Any]]
+    with open(path_dictionary_data, 'r') as f:
+        return json.loads(f.read())
+
+
+def reformat_dictionary(score_dictionary,
+                        batch_size=10000,
+                        is_use_sqlite=False,
+                        path_sqlite=None,
+                        is_use_compact=False):
+    # type: (List[Dict[str,Any]], int, bool, Optional[str], bool)->Union[SqliteDictionaryStore, CompactDictionary, Dict[str, List[Tuple[str,float]]]]
+    """* What you can do
+    - 辞書の形を変形します。
+    - is_use_sqlite=Trueの場合は、path_sqliteにSQLiteの辞書ストアを作成します。path_sqliteの指定がなければ一時ディレクトリに作成します。
+    - is_use_compact=Trueの場合は、カテゴリ名をIDに置き換えて配列に詰めたCompactDictionaryを返します。メモリ使用量が小さくなります。
+
+    * Input
+    >>> [{"label": "アウトドア・スポーツ-その他", "score": 0.02942301705479622, "word": "お金"}]
+
+    * Output
+    >>> {"お金": [("アウトドア・スポーツ-その他", 0.02942301705479622)]}
+    """
+    start = time.perf_counter()
+    try:
+        logger.info(msg="Loaded N(record)={}".format(len(score_dictionary)))
+
+        if is_use_sqlite:
+            from dictionary_store import SqliteDictionaryStore
+            if path_sqlite is None:
+                from tempfile import mkdtemp
+                path_sqlite = os.path.join(mkdtemp(), 'temporary_dict.sqlite3')
+            return SqliteDictionaryStore.build(path_sqlite, score_dictionary, batch_size=batch_size)
+        if is_use_compact:
+            from compact_dictionary import CompactDictionary
+            return CompactDictionary.from_records(score_dictionary)
+
+        word_score_dictionary = {}
+        for score_object in score_dictionary:
+            score_tuple = (score_object['label'], score_object['score'])
+            if not score_object['word'] in word_score_dictionary:
+                word_score_dictionary[score_object['word']] = [score_tuple]
+            else:
+                word_score_dictionary[score_object['word']].append(score_tuple)
+
+        return word_score_dictionary
+    finally:
+        if METRICS.enabled: METRICS.observe_stage('reformat', start)
+
+
+def load_word_score_dictionary(path_dictionary_data,
+                               path_dictionary_index=None,
+                               path_dictionary_sqlite=None,
+                               is_use_compact=False):
+    # type: (str, Optional[str], Optional[str], bool)->Union[DictionaryIndex, SqliteDictionaryStore, CompactDictionary, Dict[str, List[Tuple[str,float]]]]
+    """* What you can do
+    - path_dictionary_sqliteが指定されていれば、SQLiteの辞書ストアを利用します。作成済みなら読み込み専用で開きます。
+    - コンパイル済みの辞書インデックスがあれば、mmapで読み込みます。
+    - インデックスがなければ辞書jsonファイルを読み込み、path_dictionary_indexが指定されていればインデックスを作成します。
+    - is_use_compact=Trueの場合は、辞書jsonファイルから読み込んだ辞書をCompactDictionaryで保持します。
+    - 辞書jsonファイルがインデックスより新しい場合は、インデックスを作り直します。
+    """
+    start = time.perf_counter()
+    try:
+        if path_dictionary_index is not None and os.path.exists(path_dictionary_index):
+            if not os.path.exists(path_dictionary_data) or \
+                    os.path.getmtime(path_dictionary_index) >= os.path.getmtime(path_dictionary_data):
+                from dictionary_index import DictionaryIndex
+                return DictionaryIndex.open(path_dictionary_index)
+        if path_dictionary_sqlite is not None:
+            from dictionary_store import SqliteDictionaryStore
+            if SqliteDictionaryStore.is_built(path_dictionary_sqlite):
+                return SqliteDictionaryStore.open(path_dictionary_sqlite)
+            return reformat_dictionary(load_dictionary_data(path_dictionary_data),
+                                       is_use_sqlite=True,
+                                       path_sqlite=path_dictionary_sqlite)
+
+        word_score_dictionary = reformat_dictionary(load_dictionary_data(path_dictionary_data), is_use_compact=is_use_compact)
+        if path_dictionary_index is not None:
+            from dictionary_index import compile_dictionary_index
+            compile_dictionary_index(sorted(word_score_dictionary.items(), key=lambda tuple_obj: tuple_obj[0]),
+                                     path_dictionary_index,
+                                     metadata={'source': os.path.abspath(path_dictionary_data)})
+        return word_score_dictionary
+    finally:
+        if METRICS.enabled: METRICS.observe_stage('load', start)
+
+
+def close_word_score_dictionary(word_score_dictionary):
+    # type: (Any)->None
+    """* What you can do
+    - SQLiteの辞書ストアや辞書インデックスのように、closeを持つ辞書を閉じます。dictはそのままです。
+    """
+    if isinstance(word_score_dictionary, dict): return
+    function_close = getattr(word_score_dictionary, 'close', None)
+    if function_close is not None: function_close()
+
+
+def get_text_score(input_text,
+                   word_score_dictionary,
+                   function_tokenizer,
+                   top_k=None,
+                   n_contributing_tokens=None):
+    """* What you can do
+    - スコアリング関数
+    - カテゴリごとにスコアを算出することができます。
+    - top_kを指定すると、スコアが高い順にtop_k件のカテゴリだけを返します。
+    - n_contributing_tokensを指定すると、カテゴリごとにスコアへの寄与(スコア * 出現回数)が大きいトークンを
+      n_contributing_tokens件まで付けて、(カテゴリ名, スコア, [(トークン, 寄与)])で返します。集計と同じ走査で記録します。
+    """
+    # type: (str, Dict[str, List[Tuple[str,float]]], Callable[[str], List[str]], Optional[int], Optional[int])->List[Tuple[Any,...]]
+    ### METRICS.enabledの場合だけ、処理段階ごとの時間と辞書のヒット数を記録します ###
+    is_metrics_enabled = METRICS.enabled
+    if is_metrics_enabled: start = time.perf_counter()
+    ### 同じ単語は1回だけ辞書を引き、出現回数を掛けてカテゴリごとに加算します ###
+    token_frequency = Counter(function_tokenizer(input_text))
+    if is_metrics_enabled:
+        METRICS.observe_stage('tokenize', start)
+        start = time.perf_counter()
+
+    ### get_manyを持つ辞書(SQLiteの辞書ストア)は、文書中の異なり語のスコアを1回のクエリでまとめて引きます。
+    ### 辞書ストアのモジュールをimportしないように、型ではなくメソッドの有無で判定します ###
+    function_get_many = getattr(word_score_dictionary, 'get_many', None)
+    if function_get_many is not None:
+        word_score_dictionary = function_get_many(token_frequency)
+    seq_token_postings = []  # type: List[Tuple[str, List[Tuple[str,float]], int]]
+    for token, frequency in token_frequency.items():
+        postings = word_score_dictionary.get(token)
+        if postings is None: continue
+        seq_token_postings.append((token, postings, frequency))
+    if is_metrics_enabled:
+        METRICS.observe_stage('lookup', start)
+        record_document(token_frequency, {token for token, _, _ in seq_token_postings})
+        start = time.perf_counter()
+
+    score_category = {}  # type: Dict[str,float]
+    if n_contributing_tokens is None:
+        for _, postings, frequency in seq_token_postings:
+            for label, score in postings:
+                score_category[label] = score_category.get(label, 0.0) + score * frequency
+    else:
+        token_contributions = {}  # type: Dict[str, List[Tuple[float,str]]]
+        for token, postings, frequency in seq_token_postings:
+            for label, score in postings:
+                score_category[label] = score_category.get(label, 0.0) + score * frequency
+                if label not in token_contributions:
+                    token_contributions[label] = [(score * frequency, token)]
+                else:
+                    token_contributions[label].append((score * frequency, token))
+    if is_metrics_enabled:
+        METRICS.observe_stage('aggregate', start)
+        start = time.perf_counter()
+
+    ### 同点のカテゴリはカテゴリ名の降順に並べます ###
+    key_function = lambda tuple_obj: (tuple_obj[1], tuple_obj[0])
+    if top_k is None:
+        seq_score_tuple = sorted(score_category.items(), key=key_function, reverse=True)
+    else:
+        seq_score_tuple = nlargest(top_k, score_category.items(), key=key_function)
+    if n_contributing_tokens is not None:
+        ### 返すカテゴリについてだけ、寄与の大きいトークンを選びます ###
+        seq_score_tuple = [(label, score, [(token, contribution) for contribution, token
+                                           in nlargest(n_contributing_tokens, token_contributions[label])])
+                           for label, score in seq_score_tuple]
+    if is_metrics_enabled: METRICS.observe_stage('rank', start)
+
+    return seq_score_tuple
@@ -0,0 +1,147 @@
+from typing import List, Dict, Any, Tuple, Iterable, Iterator, Optional
+from array import array
+import logging
+logger = logging.getLogger(__file__)
+logger.setLevel(logging.INFO)
+
+"""辞書データをコンパクトな形でメモリに保持します。
+reformat_dictionaryの辞書(dict)は、ポスティングごとにカテゴリ名への参照とfloatオブジェクトを持つタプルを作るため、
+ポスティング1件あたり数十バイトを消費します。
+この実装では、カテゴリ名を1つのテーブルに集めて整数IDに置き換え、全単語のポスティングを
+カテゴリID配列(array('H'))とスコア配列(array('f'))に連続して格納します。
+
+Python3.5以上で動作します。
+"""
+
+__author__ = "Kensuke Mitsuzawa"
+__author_email__ = "kensuke_mitsuzawa@fumankaitori.com"
+__license_name__ = "MIT"
+
+# array('H')で表せるカテゴリ数の上限
+MAX_N_LABELS = 65536
+
+
+class CompactDictionary(object):
+    """* What you can do
+    - 辞書(dict)と同じ形でスコアを引くことができます。get_text_scoreにそのまま渡せます。
+    - score_typecode='d'を指定すると、スコアを倍精度で保持します。デフォルトの'f'は単精度です。
+
+    * Example
+    >>> word_score_dictionary = CompactDictionary.from_records(load_dictionary_data(path))
+    >>> word_score_dictionary.get('お金')
+    [('アウトドア・スポーツ-その他', 0.029423017054796219)]
+    """
+    __slots__ = ('labels', 'label2id', 'word2id', 'posting_offsets', 'posting_label_ids', 'posting_scores')
+
+    def __init__(self, score_typecode='f'):
+        # type: (str)->None
+        self.labels = []  # type: List[str]
+        self.label2id = {}  # type: Dict[str,int]
+        self.word2id = {}  # type: Dict[str,int]
+        self.posting_offsets = array('I', [0])
+        self.posting_label_ids = array('H')
+        self.posting_scores = array(score_typecode)
+
+    def get_label_id(self, label):
+        # type: (str)->int
+        label_id = self.label2id.get(label)
+        if label_id is None:
+            if len(self.labels) >= MAX_N_LABELS:
+                raise ValueError('カテゴリ数が上限({})を超えています。'.format(MAX_N_LABELS))
+            label_id = len(self.labels)
+            self.label2id[label] = label_id
+            self.labels.append(label)
+        return label_id
+
+    def add_postings(self, word, postings):
+        # type: (str, Iterable[Tuple[str,float]])->None
+        if word in self.word2id:
+            raise ValueError('単語が重複しています。word={}'.format(word))
+        for label, score in postings:
+            self.posting_label_ids.append(self.get_label_id(label))
+            self.posting_scores.append(score)
+        self.word2id[word] = len(self.posting_offsets) - 1
+        self.posting_offsets.append(len(self.posting_scores))
+
+    @classmethod
+    def from_records(cls, score_dictionary, score_typecode='f'):
+        # type: (Iterable[Dict[str,Any]], str)->CompactDictionary
+        """* What you can do
+        - 辞書jsonファイルのレコードから作成します。同じ単語のレコードが離れていても構いません。
+
+        * Input
+        >>> [{"label": "アウトドア・スポーツ-その他", "score": 0.02942301705479622, "word": "お金"}]
+        """
+        ### 単語ごとにカテゴリIDとスコアをまとめてから、連続した配列に詰め直します ###
+        compact_dictionary = cls(score_typecode)
+        word2postings = {}  # type: Dict[str, Tuple[array, array]]
+        for score_object in score_dictionary:
+            postings = word2postings.get(score_object['word'])
+            if postings is None:
+                postings = (array('H'), array(score_typecode))
+                word2postings[score_object['word']] = postings
+            postings[0].append(compact_dictionary.get_label_id(score_object['label']))
+            postings[1].append(score_object['score'])
+
+        for word, (label_ids, scores) in word2postings.items():
+            compact_dictionary.word2id[word] = len(compact_dictionary.posting_offsets) - 1
+            compact_dictionary.posting_label_ids.extend(label_ids)
+            compact_dictionary.posting_scores.extend(scores)
+            compact_dictionary.posting_offsets.append(len(compact_dictionary.posting_scores))
+
+        return compact_dictionary
+
+    @classmethod
+    def from_word_score_dictionary(cls, word_score_dictionary, score_typecode='f'):
+        # type: (Dict[str, List[Tuple[str,float]]], str)->CompactDictionary
+        compact_dictionary = cls(score_typecode)
+        for word, postings in word_score_dictionary.items():
+            compact_dictionary.add_postings(word, postings)
+        return compact_dictionary
+
+    def get_postings(self, word_id):
+        # type: (int)->List[Tuple[str,float]]
+        start, end = self.posting_offsets[word_id], self.posting_offsets[word_id + 1]
+        labels = self.labels
+        return [(labels[label_id], score)
+                for label_id, score in zip(self.posting_label_ids[start:end], self.posting_scores[start:end])]
+
+    def __contains__(self, word):
+        # type: (str)->bool
+        return word in self.word2id
+
+    def __getitem__(self, word):
+        # type: (str)->List[Tuple[str,float]]
+        return self.get_postings(self.word2id[word])
+
+    def get(self, word, default=None):
+        # type: (str, Any)->Any
+        word_id = self.word2id.get(word)
+        if word_id is None:
+            return default
+        return self.get_postings(word_id)
+
+    def __len__(self):
+        # type: ()->int
+        return len(self.word2id)
+
+    def __iter__(self):
+        # type: ()->Iterator[str]
+        return iter(self.word2id)
+
+    def keys(self):
+        # type: ()->Iterator[str]
+        return iter(self.word2id)
+
+    def items(self):
+        # type: ()->Iterator[Tuple[str, List[Tuple[str,float]]]]
+        for word, word_id in self.word2id.items():
+            yield word, self.get_postings(word_id)
+
+    def get_n_bytes(self):
+        # type: ()->Dict[str,int]
+        """* What you can do
+        - 配列ごとのバッファのバイト数を返します。語彙のdictとカテゴリ名の文字列は含みません。
+        """
+        return {name: len(getattr(self, name)) * getattr(self, name).itemsize
+                for name in ('posting_offsets', 'posting_label_ids', 'posting_scores')}
@@ -0,0 +1,445 @@
+from typing import List, Dict, Any, Tuple, Iterable, Iterator, Optional, Set
+from contextlib import contextmanager
+import json
+import logging
+import os
+import threading
+import time
+logger = logging.getLogger(__file__)
+logger.setLevel(logging.INFO)
+
+"""辞書インデックスを作り直さずに、差分(デルタ)だけを反映して辞書を更新します。
+デルタは1行に1レコードのJSONLです。
+
+- {"op": "add", "word": "お金", "label": "マネー・保険-その他", "score": 0.1}  単語にカテゴリのスコアを追加します。既にあれば置き換えます。
+- {"op": "replace", "word": "お金", "label": "マネー・保険-その他", "score": 0.1}  単語のスコアを、同じデルタ内のreplaceのレコードだけに置き換えます。
+- {"op": "remove", "word": "お金", "label": "マネー・保険-その他"}  単語からカテゴリを削除します。labelを省略すると単語を削除します。
+- {"op": "remove_label", "label": "マネー・保険-その他"}  カテゴリをすべての単語から削除します。
+
+デルタは元の辞書の上に重ねたOverlayDictionaryとして反映するため、反映にかかる時間はデルタの大きさに比例します。
+どのインデックスにどのデルタを反映したかは、バージョン番号とともにマニフェスト(JSON)に記録します。
+マニフェストは一時ファイルに書き出してから置き換えるため、読み込む側が書きかけのマニフェストを読むことはありません。
+稼働中のサービスやバッチのワーカーは、DictionaryHandleでマニフェストの更新を検知し、処理中のスコアリングを止めずに新しい辞書に切り替えます。
+
+Python3.5以上で動作します。
+"""
+
+__author__ = "Kensuke Mitsuzawa"
+__author_email__ = "kensuke_mitsuzawa@fumankaitori.com"
+__license_name__ = "MIT"
+
+from dictionary_index import DictionaryIndex, compile_dictionary_index
+
+DELTA_OPERATIONS = ('add', 'replace', 'remove', 'remove_label')
+
+
+def iter_delta_records(path_delta):
+    # type: (str)->Iterator[Dict[str,Any]]
+    """* What you can do
+    - デルタファイルのレコードを1件ずつ、検証してから返します。
+    """
+    with open(path_delta, 'r') as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            delta_record = json.loads(line)
+            operation = delta_record.get('op')
+            if operation not in DELTA_OPERATIONS:
+                raise ValueError('デルタの操作が不正です。{}行目, op={}'.format(line_number, operation))
+            if operation in ('add', 'replace') and not all(key in delta_record for key in ('word', 'label', 'score')):
+                raise ValueError('{}にはword, label, scoreが必要です。{}行目'.format(operation, line_number))
+            if operation == 'remove' and 'word' not in delta_record:
+                raise ValueError('removeにはwordが必要です。{}行目'.format(line_number))
+            if operation == 'remove_label' and 'label' not in delta_record:
+                raise ValueError('remove_labelにはlabelが必要です。{}行目'.format(line_number))
+            yield delta_record
+
+
+class OverlayDictionary(object):
+    """* What you can do
+    - 元の辞書(dict、DictionaryIndexなど)の上に、デルタで変更した単語だけを重ねて保持します。
+    - get_text_scoreのword_score_dictionaryとしてそのまま利用できます。
+    - apply_deltaは自身を変更せず、デルタを反映した新しいOverlayDictionaryを返します。
+      そのため、古い辞書でスコアリング中の処理に影響を与えずに切り替えられます。
+    - removeやremove_labelでカテゴリがすべてなくなった単語は、辞書にない単語として扱います。
+
+    * Example
+    >>> word_score_dictionary = OverlayDictionary(DictionaryIndex.open('./dictionary-data/word_soa.idx'), version=1)
+    >>> word_score_dictionary = word_score_dictionary.apply_delta(iter_delta_records('./delta.jsonl'), version=2)
+    """
+    def __init__(self, base_dictionary, version=0, overlay=None, removed_labels=None, n_words=None):
+        # type: (Any, int, Optional[Dict[str, Optional[List[Tuple[str,float]]]]], Optional[Set[str]], Optional[int])->None
+        self.base_dictionary = base_dictionary
+        self.version = version
+        # 単語ごとの変更後のスコア。Noneは削除した単語です。
+        self.overlay = overlay if overlay is not None else {}  # type: Dict[str, Optional[List[Tuple[str,float]]]]
+        # すべての単語から削除したカテゴリ。元の辞書のスコアにだけ適用します。
+        self.removed_labels = removed_labels if removed_labels is not None else set()  # type: Set[str]
+        if n_words is None and not self.overlay and not self.removed_labels:
+            n_words = len(base_dictionary)
+        # 単語数。Noneの場合は__len__で数え直します。
+        self.n_words = n_words  # type: Optional[int]
+        # マニフェストから読み込んだ場合の、元のインデックスのパス
+        self.path_base_index = None  # type: Optional[str]
+
+    def __get_base_postings(self, word):
+        # type: (str)->Optional[List[Tuple[str,float]]]
+        postings = self.base_dictionary.get(word)
+        if postings is None or not self.removed_labels:
+            return postings
+        return [(label, score) for label, score in postings if label not in self.removed_labels]
+
+    def get(self, word, default=None):
+        # type: (str, Any)->Any
+        if word in self.overlay:
+            postings = self.overlay[word]
+        else:
+            postings = self.__get_base_postings(word)
+        return postings if postings else default
+
+    def __contains__(self, word):
+        # type: (str)->bool
+        if word in self.overlay:
+            return bool(self.overlay[word])
+        if not self.removed_labels:
+            return word in self.base_dictionary
+        return bool(self.__get_base_postings(word))
+
+    def __getitem__(self, word):
+        # type: (str)->List[Tuple[str,float]]
+        postings = self.get(word)
+        if postings is None:
+            raise KeyError(word)
+        return postings
+
+    def __len__(self):
+        # type: ()->int
+        if self.n_words is None:
+            ### remove_labelでカテゴリがすべてなくなった単語を除くため、一度だけ数え直します ###
+            self.n_words = sum(1 for _ in self.keys())
+        return self.n_words
+
+    def __iter__(self):
+        # type: ()->Iterator[str]
+        return self.keys()
+
+    def keys(self):
+        # type: ()->Iterator[str]
+        if not self.removed_labels:
+            for word in self.base_dictionary.keys():
+                if word not in self.overlay:
+                    yield word
+        else:
+            removed_labels = self.removed_labels
+            for word, postings in self.base_dictionary.items():
+                if word not in self.overlay and any(label not in removed_labels for label, _ in postings):
+                    yield word
+        for word, postings in self.overlay.items():
+            if postings:
+                yield word
+
+    def items(self):
+        # type: ()->Iterator[Tuple[str, List[Tuple[str,float]]]]
+        for word in self.keys():
+            yield (word, self.get(word))
+
+    def apply_delta(self, seq_delta_record, version):
+        # type: (Iterable[Dict[str,Any]], int)->OverlayDictionary
+        """* What you can do
+        - デルタを反映した新しいOverlayDictionaryを返します。変更する単語のスコアだけを元の辞書から読み込みます。
+        """
+        overlay = dict(self.overlay)
+        removed_labels = set(self.removed_labels)
+        new_dictionary = OverlayDictionary(self.base_dictionary, version, overlay, removed_labels, self.n_words)
+        new_dictionary.path_base_index = self.path_base_index
+        replaced_words = set()  # type: Set[str]
+        n_records = 0
+        for delta_record in seq_delta_record:
+            n_records += 1
+            operation = delta_record['op']
+            if operation == 'remove_label':
+                label = delta_record['label']
+                removed_labels.add(label)
+                for word, postings in overlay.items():
+                    if postings is not None:
+                        overlay[word] = [posting for posting in postings if posting[0] != label]
+                ### 空になる単語を数えるには辞書全体を走査する必要があるため、__len__で数え直します ###
+                new_dictionary.n_words = None
+                continue
+
+            word = delta_record['word']
+            is_existing = word in new_dictionary
+            if operation == 'remove' and not is_existing:
+                continue
+            if operation == 'replace' and word not in replaced_words:
+                replaced_words.add(word)
+                postings = []  # type: Optional[List[Tuple[str,float]]]
+            else:
+                postings = list(new_dictionary.get(word, []))
+            if operation in ('add', 'replace'):
+                postings = [posting for posting in postings if posting[0] != delta_record['label']]
+                postings.append((delta_record['label'], float(delta_record['score'])))
+            elif 'label' in delta_record:
+                postings = [posting for posting in postings if posting[0] != delta_record['label']]
+            else:
+                postings = None
+            overlay[word] = postings
+            if new_dictionary.n_words is not None:
+                new_dictionary.n_words += bool(postings) - is_existing
+        logger.info(msg='Applied N(delta)={} as version {}; N(overlay)={}'.format(n_records, version, len(overlay)))
+
+        return new_dictionary
+
+    def close(self):
+        # type: ()->None
+        if isinstance(self.base_dictionary, DictionaryIndex): self.base_dictionary.close()
+
+
+def load_manifest(path_manifest):
+    # type: (str)->Dict[str,Any]
+    """* What you can do
+    - マニフェストを読み込みます。パスはマニフェストのディレクトリからの相対パスでも構いません。
+
+    * Output
+    >>> {"version": 3, "base_index": "word_soa.idx", "deltas": [{"version": 2, "path": "delta-2.jsonl"}, ...]}
+    """
+    with open(path_manifest, 'r') as f:
+        return json.loads(f.read())
+
+
+def resolve_manifest_path(path_manifest, path):
+    # type: (str, str)->str
+    """* What you can do
+    - マニフェストに記録したパスを、マニフェストのディレクトリを起点とした絶対パスにします。
+    """
+    return os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(path_manifest)), path))
+
+
+def write_manifest(path_manifest, manifest):
+    # type: (str, Dict[str,Any])->None
+    """* What you can do
+    - マニフェストを一時ファイルに書き出してから置き換えます。読み込む側は更新前か更新後のどちらかだけを読みます。
+    """
+    path_temporary = path_manifest + '.tmp'
+    with open(path_temporary, 'w') as f:
+        f.write(json.dumps(manifest, ensure_ascii=False, indent=4))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(path_temporary, path_manifest)
+
+
+def create_manifest(path_manifest, path_dictionary_index):
+    # type: (str, str)->Dict[str,Any]
+    """* What you can do
+    - コンパイル済みの辞書インデックスのマニフェストを作成します。バージョンはインデックスのメタデータから取り、なければ1です。
+    """
+    with DictionaryIndex.open(path_dictionary_index) as dictionary_index:
+        version = dictionary_index.metadata.get('version', 1)
+    manifest = {'version': version,
+                'base_index': os.path.relpath(os.path.abspath(path_dictionary_index),
+                                              os.path.dirname(os.path.abspath(path_manifest))),
+                'deltas': []}
+    write_manifest(path_manifest, manifest)
+    return manifest
+
+
+def publish_delta(path_manifest, path_delta):
+    # type: (str, str)->int
+    """* What you can do
+    - デルタファイルを検証し、バージョンを1つ上げてマニフェストに追加します。新しいバージョンを返します。
+    """
+    n_records = sum(1 for _ in iter_delta_records(path_delta))
+    manifest = load_manifest(path_manifest)
+    manifest['version'] += 1
+    manifest['deltas'].append({'version': manifest['version'],
+                               'path': os.path.relpath(os.path.abspath(path_delta),
+                                                       os.path.dirname(os.path.abspath(path_manifest))),
+                               'n_records': n_records})
+    write_manifest(path_manifest, manifest)
+    logger.info(msg='Published {} as version {}'.format(path_delta, manifest['version']))
+
+    return manifest['version']
+
+
+def load_manifest_dictionary(path_manifest, manifest=None, current_dictionary=None):
+    # type: (str, Optional[Dict[str,Any]], Optional[OverlayDictionary])->OverlayDictionary
+    """* What you can do
+    - マニフェストの辞書インデックスを開き、デルタを順に反映します。
+    - current_dictionaryが同じインデックスの古いバージョンであれば、インデックスを開き直さずに、新しいデルタだけを反映します。
+    """
+    if manifest is None:
+        manifest = load_manifest(path_manifest)
+    path_base_index = resolve_manifest_path(path_manifest, manifest['base_index'])
+    seq_delta = manifest['deltas']
+    if current_dictionary is not None \
+            and current_dictionary.path_base_index == path_base_index \
+            and current_dictionary.version <= manifest['version']:
+        word_score_dictionary = current_dictionary
+        seq_delta = [delta for delta in seq_delta if delta['version'] > current_dictionary.version]
+    else:
+        base_dictionary = DictionaryIndex.open(path_base_index)
+        word_score_dictionary = OverlayDictionary(base_dictionary,
+                                                  version=seq_delta[0]['version'] - 1 if seq_delta else manifest['version'])
+    for delta in seq_delta:
+        word_score_dictionary = word_score_dictionary.apply_delta(
+            iter_delta_records(resolve_manifest_path(path_manifest, delta['path'])), version=delta['version'])
+    word_score_dictionary.path_base_index = path_base_index
+
+    return word_score_dictionary
+
+
+def compact_manifest(path_manifest, path_new_index):
+    # type: (str, str)->Dict[str,Any]
+    """* What you can do
+    - デルタをすべて反映した辞書を新しいインデックスにコンパイルし、デルタのないマニフェストに置き換えます。
+    - 新しいインデックスのメタデータにバージョンを記録します。
+    - 稼働中のワーカーが古いインデックスをmmapで開いているため、path_new_indexには新しいファイル名を指定してください。
+    """
+    manifest = load_manifest(path_manifest)
+    if os.path.abspath(path_new_index) == resolve_manifest_path(path_manifest, manifest['base_index']):
+        raise ValueError('現在のインデックスと異なるパスを指定してください。path_new_index={}'.format(path_new_index))
+    word_score_dictionary = load_manifest_dictionary(path_manifest, manifest)
+    try:
+        compile_dictionary_index(sorted(word_score_dictionary.items(), key=lambda tuple_obj: tuple_obj[0]),
+                                 path_new_index,
+                                 metadata={'version': manifest['version'],
+                                           'source': resolve_manifest_path(path_manifest, manifest['base_index'])})
+    finally:
+        word_score_dictionary.close()
+    manifest = {'version': manifest['version'],
+                'base_index': os.path.relpath(os.path.abspath(path_new_index),
+                                              os.path.dirname(os.path.abspath(path_manifest))),
+                'deltas': []}
+    write_manifest(path_manifest, manifest)
+
+    return manifest
+
+
+class DictionaryHandle(object):
+    """* What you can do
+    - マニフェストの辞書を保持し、マニフェストが更新されたら新しいバージョンの辞書に切り替えます。
+    - スコアリングはacquireで取得した辞書で行います。切り替えは参照の置き換えだけなので、処理中のスコアリングは止まりません。
+    - インデックスが変わった場合、古いインデックスは使用中の処理がなくなってから閉じます。
+
+    * Example
+    >>> dictionary_handle = DictionaryHandle('./dictionary-data/manifest.json')
+    >>> dictionary_handle.refresh()
+    >>> with dictionary_handle.acquire() as word_score_dictionary:
+    ...     get_text_score(input_text, word_score_dictionary, function_tokenizer)
+    """
+    def __init__(self, path_manifest, refresh_interval=1.0):
+        # type: (str, float)->None
+        self.path_manifest = path_manifest
+        self.refresh_interval = refresh_interval
+        self.lock = threading.Lock()
+        # refreshを同時に呼ばれても、デルタを一度だけ読み込むためのロック。acquireを止めないようにlockとは分けます。
+        self.refresh_lock = threading.Lock()
+        self.manifest_stat = None  # type: Optional[Tuple[float,int]]
+        self.last_checked = 0.0
+        self.current = load_manifest_dictionary(path_manifest)
+        self.manifest_stat = self.__get_manifest_stat()
+        # 使用中の元の辞書(id)ごとの処理数と、切り替え後に閉じるのを待っている元の辞書
+        self.n_in_use = {}  # type: Dict[int,int]
+        self.retired = {}  # type: Dict[int,Any]
+
+    @property
+    def version(self):
+        # type: ()->int
+        return self.current.version
+
+    def __get_manifest_stat(self):
+        # type: ()->Tuple[float,int]
+        stat = os.stat(self.path_manifest)
+        return (stat.st_mtime, stat.st_ino)
+
+    @contextmanager
+    def acquire(self):
+        """* What you can do
+        - 現在のバージョンの辞書を返します。withを抜けるまで、その辞書の元のインデックスは閉じません。
+        """
+        with self.lock:
+            word_score_dictionary = self.current
+            key = id(word_score_dictionary.base_dictionary)
+            self.n_in_use[key] = self.n_in_use.get(key, 0) + 1
+        try:
+            yield word_score_dictionary
+        finally:
+            base_dictionary = None
+            with self.lock:
+                self.n_in_use[key] -= 1
+                if self.n_in_use[key] == 0:
+                    del self.n_in_use[key]
+                    base_dictionary = self.retired.pop(key, None)
+            if base_dictionary is not None: base_dictionary.close()
+
+    def refresh(self, is_force=False):
+        # type: (bool)->bool
+        """* What you can do
+        - マニフェストが更新されていれば新しいバージョンの辞書に切り替え、Trueを返します。
+        - マニフェストの確認は、is_force=Trueでなければrefresh_interval秒に1回だけ行います。
+        - 別のスレッドが確認中の場合は、is_force=Trueなら終わるのを待ち、そうでなければFalseを返します。
+        """
+        if not is_force and time.time() - self.last_checked < self.refresh_interval:
+            return False
+        if not self.refresh_lock.acquire(blocking=is_force):
+            return False
+        try:
+            return self.__refresh(is_force)
+        finally:
+            self.refresh_lock.release()
+
+    def __refresh(self, is_force):
+        # type: (bool)->bool
+        now = time.time()
+        if not is_force and now - self.last_checked < self.refresh_interval:
+            return False
+        self.last_checked = now
+        manifest_stat = self.__get_manifest_stat()
+        if manifest_stat == self.manifest_stat:
+            return False
+
+        manifest = load_manifest(self.path_manifest)
+        if manifest['version'] == self.current.version \
+                and resolve_manifest_path(self.path_manifest, manifest['base_index']) == self.current.path_base_index:
+            self.manifest_stat = manifest_stat
+            return False
+        new_dictionary = load_manifest_dictionary(self.path_manifest, manifest, current_dictionary=self.current)
+        self.swap(new_dictionary)
+        self.manifest_stat = manifest_stat
+        logger.info(msg='Switched dictionary to version {}'.format(new_dictionary.version))
+        return True
+
+    def swap(self, new_dictionary):
+        # type: (OverlayDictionary)->None
+        base_dictionary = None
+        with self.lock:
+            old_dictionary = self.current
+            self.current = new_dictionary
+            if old_dictionary.base_dictionary is not new_dictionary.base_dictionary:
+                key = id(old_dictionary.base_dictionary)
+                if self.n_in_use.get(key, 0) > 0:
+                    self.retired[key] = old_dictionary.base_dictionary
+                else:
+                    base_dictionary = old_dictionary.base_dictionary
+        if base_dictionary is not None: base_dictionary.close()
+
+    def close(self):
+        # type: ()->None
+        with self.lock:
+            self.current.close()
+            for base_dictionary in self.retired.values():
+                base_dictionary.close()
+            self.retired = {}
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    ### マニフェストのパス。存在しなければPATH_DICTIONARY_INDEXをバージョン1として作成します。
+    PATH_MANIFEST = './dictionary-data/manifest.json'
+    PATH_DICTIONARY_INDEX = './dictionary-data/word_soa.idx'
+    ### 反映するデルタファイル
+    PATH_DELTA = './dictionary-data/delta.jsonl'
+    if not os.path.exists(PATH_MANIFEST):
+        if not os.path.exists(PATH_DICTIONARY_INDEX): raise FileExistsError('辞書インデックスが発見できません。')
+        create_manifest(PATH_MANIFEST, PATH_DICTIONARY_INDEX)
+    publish_delta(PATH_MANIFEST, PATH_DELTA)
@@ -0,0 +1,553 @@
+from typing import List, Dict, Any, Tuple, Iterable, Iterator, Optional
+from array import array
+from bisect import bisect_right
+import json
+import logging
+import mmap
+import os
+import shutil
+import struct
+import sys
+import tempfile
+logger = logging.getLogger(__file__)
+logger.setLevel(logging.INFO)
+
+"""辞書データを一度だけバイナリ形式のインデックスにコンパイルし、mmapで読み込みます。
+word_soa.jsonを毎回json.loadsする代わりに、コンパイル済みのインデックスファイルを利用すると、
+起動がほぼ一瞬になり、複数プロセス間で同じページを共有できます。
+
+インデックスファイルの構成
+- マジックバイト(8byte) + ヘッダ長(uint32) + ヘッダ(JSON)
+- ソート済みの語彙(オフセット配列 + UTF-8のバイト列)
+- カテゴリ名のテーブル(オフセット配列 + UTF-8のバイト列)
+- 単語ごとのポスティングのオフセット配列、カテゴリID配列、スコア配列
+- (score_encoding=int8の場合のみ)カテゴリごとのスケール配列
+- (is_build_category_index=Trueの場合のみ)カテゴリごとのポスティングの逆引き。カテゴリごとにスコアの降順に並べたポスティングの位置の配列
+
+スコアは倍精度(float64)のほか、半精度(float16)や、カテゴリごとのスケールを掛けて戻す8bit整数(int8)で保持できます。
+
+Python3.5以上で動作します。スコアをfloat16で保持する場合はPython3.6以上が必要です。
+"""
+
+__author__ = "Kensuke Mitsuzawa"
+__author_email__ = "kensuke_mitsuzawa@fumankaitori.com"
+__license_name__ = "MIT"
+
+INDEX_MAGIC = b'FMCIDX01'
+INDEX_FORMAT_VERSION = 1
+SECTION_ALIGNMENT = 8
+
+# セクション名とarrayのtypecode
+SECTION_TYPECODES = (
+    ('word_offsets', 'I'),
+    ('word_blob', 'B'),
+    ('label_offsets', 'I'),
+    ('label_blob', 'B'),
+    ('posting_offsets', 'I'),
+    ('posting_label_ids', 'H'),
+    ('posting_scores', 'd'),
+)
+# スコアの保持形式とarrayのtypecode。float16はarrayが対応していないため、ビット列をuint16として保持します。
+SCORE_ENCODING_TYPECODES = {'float64': 'd', 'float16': 'H', 'int8': 'b'}
+INT8_MAX = 127
+# カテゴリの逆引きを作成するときの、ポスティング1件あたりのおおよそのメモリ(位置とスコアの配列、ソート中の添字とキーのオブジェクト)
+CATEGORY_SORT_BYTES_PER_POSTING = 100
+
+
+class _SectionWriter(object):
+    """* What you can do
+    - セクションごとのデータを一時ファイルに書き出します。メモリにすべてを保持しません。
+    """
+    def __init__(self, typecode, buffer_size=65536):
+        # type: (str, int)->None
+        self.typecode = typecode
+        self.file_object = tempfile.TemporaryFile()
+        self.buffer = array(typecode)
+        self.buffer_size = buffer_size
+        self.n_items = 0
+
+    def extend(self, values):
+        # type: (Iterable[Any])->None
+        before = len(self.buffer)
+        self.buffer.extend(values)
+        self.n_items += len(self.buffer) - before
+        if len(self.buffer) >= self.buffer_size:
+            self.flush()
+
+    def append(self, value):
+        # type: (Any)->None
+        self.buffer.append(value)
+        self.n_items += 1
+        if len(self.buffer) >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        # type: ()->None
+        if len(self.buffer):
+            self.buffer.tofile(self.file_object)
+            self.buffer = array(self.typecode)
+
+    def byte_size(self):
+        # type: ()->int
+        return self.n_items * array(self.typecode).itemsize
+
+
+def __align(position):
+    # type: (int)->int
+    return (position + SECTION_ALIGNMENT - 1) // SECTION_ALIGNMENT * SECTION_ALIGNMENT
+
+
+def __encode_scores(label_id_writer, score_writer, score_encoding, label_scales, chunk_size=65536):
+    # type: (_SectionWriter, _SectionWriter, str, List[float], int)->_SectionWriter
+    """* What you can do
+    - 倍精度で書き出したスコアを一時ファイルから少しずつ読み込み、score_encodingの形式に変換します。
+    """
+    encoded_writer = _SectionWriter(SCORE_ENCODING_TYPECODES[score_encoding])
+    label_id_writer.file_object.seek(0)
+    score_writer.file_object.seek(0)
+    n_remaining = score_writer.n_items
+    while n_remaining > 0:
+        n_items = min(n_remaining, chunk_size)
+        scores = array('d')
+        scores.fromfile(score_writer.file_object, n_items)
+        if score_encoding == 'float16':
+            encoded_writer.extend(struct.unpack('{}H'.format(n_items), struct.pack('{}e'.format(n_items), *scores)))
+        else:
+            label_ids = array('H')
+            label_ids.fromfile(label_id_writer.file_object, n_items)
+            encoded_writer.extend(max(-INT8_MAX, min(INT8_MAX, int(round(score / label_scales[label_id]))))
+                                  if label_scales[label_id] > 0.0 else 0
+                                  for label_id, score in zip(label_ids, scores))
+        n_remaining -= n_items
+    score_writer.file_object.close()
+    encoded_writer.flush()
+
+    return encoded_writer
+
+
+def __iter_label_score_chunks(label_id_writer, score_writer, chunk_size=65536):
+    # type: (_SectionWriter, _SectionWriter, int)->Iterator[Tuple[int, array, array]]
+    """* What you can do
+    - 一時ファイルからカテゴリID配列とスコア配列(倍精度)をchunk_size件ずつ読み込み、(先頭のポスティングの位置, カテゴリID, スコア)を返します。
+    """
+    label_id_writer.file_object.seek(0)
+    score_writer.file_object.seek(0)
+    position = 0
+    while position < label_id_writer.n_items:
+        n_items = min(label_id_writer.n_items - position, chunk_size)
+        label_ids = array('H')
+        label_ids.fromfile(label_id_writer.file_object, n_items)
+        scores = array('d')
+        scores.fromfile(score_writer.file_object, n_items)
+        yield position, label_ids, scores
+        position += n_items
+
+
+def __build_category_sections(label_id_writer, score_writer, n_labels, memory_budget_bytes=None):
+    # type: (_SectionWriter, _SectionWriter, int, Optional[int])->Tuple[_SectionWriter, _SectionWriter]
+    """* What you can do
+    - カテゴリごとに、ポスティングの位置をスコアの降順に並べたセクションを作成します。同点の場合は単語の昇順です。
+    - カテゴリのポスティングの位置とスコアを配列に集め、位置の配列の添字をスコアで安定ソートします。
+      ソート中はポスティング1件あたりCATEGORY_SORT_BYTES_PER_POSTING byte程度のメモリを使います。
+    - memory_budget_bytesを指定すると、その範囲に収まるようにカテゴリを分け、グループごとに一時ファイルを読み直します。
+      1つのカテゴリのポスティングだけで上限を超える場合は、そのカテゴリを単独で処理します。
+    """
+    label_counts = [0] * n_labels
+    for _, label_ids, _ in __iter_label_score_chunks(label_id_writer, score_writer):
+        for label_id in label_ids:
+            label_counts[label_id] += 1
+
+    ### 連続するカテゴリIDをメモリの上限に収まるグループにまとめます ###
+    seq_label_range = []  # type: List[Tuple[int,int]]
+    label_start = 0
+    group_bytes = 0
+    for label_id, label_count in enumerate(label_counts):
+        label_bytes = label_count * CATEGORY_SORT_BYTES_PER_POSTING
+        if memory_budget_bytes is not None and label_id > label_start and group_bytes + label_bytes > memory_budget_bytes:
+            seq_label_range.append((label_start, label_id))
+            label_start = label_id
+            group_bytes = 0
+        group_bytes += label_bytes
+    if label_start < n_labels:
+        seq_label_range.append((label_start, n_labels))
+
+    category_offset_writer = _SectionWriter('I')
+    category_posting_writer = _SectionWriter('I')
+    category_offset_writer.append(0)
+    for label_start, label_end in seq_label_range:
+        seq_posting_ids = [array('I') for _ in range(label_end - label_start)]
+        seq_scores = [array('d') for _ in range(label_end - label_start)]
+        for position, label_ids, scores in __iter_label_score_chunks(label_id_writer, score_writer):
+            for offset, label_id in enumerate(label_ids):
+                if label_start <= label_id < label_end:
+                    seq_posting_ids[label_id - label_start].append(position + offset)
+                    seq_scores[label_id - label_start].append(scores[offset])
+        for index in range(label_end - label_start):
+            posting_ids = seq_posting_ids[index]
+            ### 位置は昇順に集めてあるため、安定ソートで同点のポスティングは単語の昇順のまま残ります ###
+            seq_order = sorted(range(len(posting_ids)), key=seq_scores[index].__getitem__, reverse=True)
+            category_posting_writer.extend(posting_ids[order] for order in seq_order)
+            category_offset_writer.append(category_posting_writer.n_items)
+            seq_posting_ids[index] = seq_scores[index] = None
+    category_offset_writer.flush()
+    category_posting_writer.flush()
+
+    return category_offset_writer, category_posting_writer
+
+
+def compile_dictionary_index(seq_word_postings,
+                             path_dictionary_index,
+                             metadata=None,
+                             score_encoding='float64',
+                             is_build_category_index=True,
+                             memory_budget_bytes=None):
+    # type: (Iterable[Tuple[str, List[Tuple[str,float]]]], str, Optional[Dict[str,Any]], str, bool, Optional[int])->Dict[str,Any]
+    """* What you can do
+    - 単語ごとのスコアをバイナリのインデックスファイルに書き出します。
+    - score_encodingにはfloat64、float16、int8のいずれかを指定します。
+    - int8ではカテゴリごとにスコアの絶対値の最大値が127になるようなスケールを求め、スコアをスケールで割って丸めます。
+    - is_build_category_index=Trueの場合は、カテゴリから単語をスコアの降順に引くための逆引きのセクションも書き出します。
+      memory_budget_bytesを指定すると、逆引きの作成に使うメモリをその範囲に抑えます。
+
+    * Input
+    - seq_word_postings: 単語の昇順に並んだ(単語, [(カテゴリ名, スコア)])のイテレータ
+    >>> [("お金", [("アウトドア・スポーツ-その他", 0.02942301705479622)])]
+
+    * Output
+    - インデックスのヘッダ情報
+    """
+    if score_encoding not in SCORE_ENCODING_TYPECODES:
+        raise ValueError('score_encodingは{}のいずれかを指定してください。score_encoding={}'.format(
+            sorted(SCORE_ENCODING_TYPECODES), score_encoding))
+    writers = {name: _SectionWriter(typecode) for name, typecode in SECTION_TYPECODES}
+    label2id = {}  # type: Dict[str,int]
+    label_max_scores = []  # type: List[float]
+    word_blob_size = 0
+    n_postings = 0
+    previous_word = None  # type: Optional[str]
+
+    writers['word_offsets'].append(0)
+    writers['posting_offsets'].append(0)
+    for word, postings in seq_word_postings:
+        if previous_word is not None and not previous_word < word:
+            raise ValueError('単語が昇順に並んでいません。word={}'.format(word))
+        previous_word = word
+
+        encoded_word = word.encode('utf-8')
+        word_blob_size += len(encoded_word)
+        writers['word_blob'].extend(encoded_word)
+        writers['word_offsets'].append(word_blob_size)
+
+        for label, score in postings:
+            if label not in label2id:
+                label2id[label] = len(label2id)
+                label_max_scores.append(0.0)
+            label_max_scores[label2id[label]] = max(label_max_scores[label2id[label]], abs(score))
+            writers['posting_label_ids'].append(label2id[label])
+            writers['posting_scores'].append(score)
+        n_postings += len(postings)
+        writers['posting_offsets'].append(n_postings)
+    if len(label2id) > 0xFFFF:
+        raise ValueError('カテゴリ数が多すぎます。N(label)={}'.format(len(label2id)))
+
+    label_blob_size = 0
+    writers['label_offsets'].append(0)
+    for label in sorted(label2id, key=label2id.get):
+        encoded_label = label.encode('utf-8')
+        label_blob_size += len(encoded_label)
+        writers['label_blob'].extend(encoded_label)
+        writers['label_offsets'].append(label_blob_size)
+
+    for writer in writers.values():
+        writer.flush()
+
+    seq_section = list(SECTION_TYPECODES)
+    if is_build_category_index:
+        ### スコアを量子化する前の値で並べます ###
+        writers['category_offsets'], writers['category_posting_ids'] = __build_category_sections(
+            writers['posting_label_ids'], writers['posting_scores'], len(label2id), memory_budget_bytes)
+    if score_encoding != 'float64':
+        label_scales = [max_score / INT8_MAX for max_score in label_max_scores]
+        writers['posting_scores'] = __encode_scores(writers['posting_label_ids'], writers['posting_scores'],
+                                                    score_encoding, label_scales)
+        seq_section = [(name, writers[name].typecode) for name, _ in SECTION_TYPECODES]
+        if score_encoding == 'int8':
+            writers['label_scales'] = _SectionWriter('d')
+            writers['label_scales'].extend(label_scales)
+            writers['label_scales'].flush()
+            seq_section.append(('label_scales', 'd'))
+    if is_build_category_index:
+        seq_section.extend([('category_offsets', 'I'), ('category_posting_ids', 'I')])
+
+    header = {
+        'format_version': INDEX_FORMAT_VERSION,
+        'byteorder': sys.byteorder,
+        'n_words': writers['word_offsets'].n_items - 1,
+        'n_labels': len(label2id),
+        'n_postings': n_postings,
+        'score_encoding': score_encoding,
+        'metadata': metadata or {},
+        'sections': {},
+    }
+    # ヘッダの長さが決まらないとセクションの位置が決まらないため、位置が収束するまで計算します。
+    header_size = 0
+    while True:
+        position = __align(len(INDEX_MAGIC) + 4 + header_size)
+        for name, typecode in seq_section:
+            header['sections'][name] = [position, writers[name].n_items, typecode]
+            position = __align(position + writers[name].byte_size())
+        encoded_header = json.dumps(header, ensure_ascii=False).encode('utf-8')
+        if len(encoded_header) == header_size:
+            break
+        header_size = len(encoded_header)
+
+    path_temporary = path_dictionary_index + '.tmp'
+    with open(path_temporary, 'wb') as f:
+        f.write(INDEX_MAGIC)
+        f.write(struct.pack('<I', header_size))
+        f.write(encoded_header)
+        for name, typecode in seq_section:
+            f.write(b'\x00' * (header['sections'][name][0] - f.tell()))
+            writers[name].file_object.seek(0)
+            shutil.copyfileobj(writers[name].file_object, f)
+            writers[name].file_object.close()
+    os.replace(path_temporary, path_dictionary_index)
+    logger.info(msg='Compiled dictionary index into {}; N(word)={}, N(label)={}, N(posting)={}, score={}'.format(
+        path_dictionary_index, header['n_words'], header['n_labels'], header['n_postings'], score_encoding))
+
+    return header
+
+
+def group_score_records(score_dictionary):
+    # type: (Iterable[Dict[str,Any]])->Iterator[Tuple[str, List[Tuple[str,float]]]]
+    """* What you can do
+    - 辞書のレコードを単語ごとにまとめ、単語の昇順に返します。
+
+    * Input
+    >>> [{"label": "アウトドア・スポーツ-その他", "score": 0.02942301705479622, "word": "お金"}]
+
+    * Output
+    >>> [("お金", [("アウトドア・スポーツ-その他", 0.02942301705479622)])]
+    """
+    word_score_dictionary = {}  # type: Dict[str, List[Tuple[str,float]]]
+    for score_object in score_dictionary:
+        score_tuple = (score_object['label'], score_object['score'])
+        if not score_object['word'] in word_score_dictionary:
+            word_score_dictionary[score_object['word']] = [score_tuple]
+        else:
+            word_score_dictionary[score_object['word']].append(score_tuple)
+
+    return iter(sorted(word_score_dictionary.items(), key=lambda tuple_obj: tuple_obj[0]))
+
+
+class DictionaryIndex(object):
+    """* What you can do
+    - コンパイル済みのインデックスを読み込み、辞書(dict)と同じ形でスコアを引くことができます。
+    - get_text_scoreのword_score_dictionaryとしてそのまま利用できます。
+
+    * Example
+    >>> word_score_dictionary = DictionaryIndex.open('./dictionary-data/word_soa.idx')
+    >>> word_score_dictionary['お金']
+    [('アウトドア・スポーツ-その他', 0.02942301705479622)]
+    """
+    def __init__(self, buffer, mmap_object=None, file_object=None):
+        # type: (Any, Optional[mmap.mmap], Any)->None
+        self.mmap_object = mmap_object
+        self.file_object = file_object
+        self.buffer = memoryview(buffer)
+        if bytes(self.buffer[:len(INDEX_MAGIC)]) != INDEX_MAGIC:
+            raise ValueError('辞書インデックスのファイル形式が不正です。')
+        header_size = struct.unpack_from('<I', self.buffer, len(INDEX_MAGIC))[0]
+        header_start = len(INDEX_MAGIC) + 4
+        self.header = json.loads(bytes(self.buffer[header_start:header_start + header_size]).decode('utf-8'))
+        if self.header['format_version'] != INDEX_FORMAT_VERSION:
+            raise ValueError('辞書インデックスのバージョンが異なります。version={}'.format(self.header['format_version']))
+        if self.header['byteorder'] != sys.byteorder:
+            raise ValueError('辞書インデックスのバイトオーダーが異なります。再コンパイルしてください。')
+
+        self.sections = {}  # type: Dict[str, memoryview]
+        for name, (position, n_items, typecode) in self.header['sections'].items():
+            item_size = array(typecode).itemsize
+            section = self.buffer[position:position + n_items * item_size]
+            self.sections[name] = section if typecode == 'B' else section.cast(typecode)
+
+        self.n_words = self.header['n_words']
+        self.word_offsets = self.sections['word_offsets']
+        self.word_blob = self.sections['word_blob']
+        self.posting_offsets = self.sections['posting_offsets']
+        self.posting_label_ids = self.sections['posting_label_ids']
+        self.posting_scores = self.sections['posting_scores']
+        # 古いインデックスにはscore_encodingがないため、倍精度として扱います。
+        self.score_encoding = self.header.get('score_encoding', 'float64')
+        self.label_scales = self.sections.get('label_scales')
+        label_offsets = self.sections['label_offsets']
+        label_blob = self.sections['label_blob']
+        self.labels = [bytes(label_blob[label_offsets[i]:label_offsets[i + 1]]).decode('utf-8')
+                       for i in range(self.header['n_labels'])]  # type: List[str]
+        self.label2id = {label: label_id for label_id, label in enumerate(self.labels)}
+        # カテゴリの逆引き。is_build_category_index=Falseで作成したインデックスや、古いインデックスにはありません。
+        self.category_offsets = self.sections.get('category_offsets')
+        self.category_posting_ids = self.sections.get('category_posting_ids')
+
+    @classmethod
+    def open(cls, path_dictionary_index):
+        # type: (str)->DictionaryIndex
+        file_object = open(path_dictionary_index, 'rb')
+        mmap_object = mmap.mmap(file_object.fileno(), 0, access=mmap.ACCESS_READ)
+        logger.info(msg='Opened dictionary index {}'.format(path_dictionary_index))
+        return cls(mmap_object, mmap_object=mmap_object, file_object=file_object)
+
+    @property
+    def metadata(self):
+        # type: ()->Dict[str,Any]
+        return self.header['metadata']
+
+    def _get_word(self, word_id):
+        # type: (int)->bytes
+        return bytes(self.word_blob[self.word_offsets[word_id]:self.word_offsets[word_id + 1]])
+
+    def find(self, word):
+        # type: (str)->int
+        """* What you can do
+        - 二分探索で単語のIDを返します。存在しない場合は-1を返します。
+        """
+        encoded_word = word.encode('utf-8')
+        low, high = 0, self.n_words
+        while low < high:
+            middle = (low + high) // 2
+            if self._get_word(middle) < encoded_word:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self.n_words and self._get_word(low) == encoded_word:
+            return low
+        return -1
+
+    def get_postings(self, word_id):
+        # type: (int)->List[Tuple[str,float]]
+        start, end = self.posting_offsets[word_id], self.posting_offsets[word_id + 1]
+        labels = self.labels
+        label_ids = self.posting_label_ids[start:end]
+        if self.score_encoding == 'float64':
+            scores = self.posting_scores[start:end]
+        elif self.score_encoding == 'float16':
+            scores = struct.unpack('{}e'.format(end - start), self.posting_scores[start:end])
+        else:
+            label_scales = self.label_scales
+            scores = [quantized_score * label_scales[label_id]
+                      for label_id, quantized_score in zip(label_ids, self.posting_scores[start:end])]
+        return [(labels[label_id], score) for label_id, score in zip(label_ids, scores)]
+
+    @property
+    def has_category_index(self):
+        # type: ()->bool
+        return self.category_posting_ids is not None
+
+    def __get_score(self, posting_id):
+        # type: (int)->float
+        if self.score_encoding == 'float64':
+            return self.posting_scores[posting_id]
+        elif self.score_encoding == 'float16':
+            return struct.unpack('e', struct.pack('H', self.posting_scores[posting_id]))[0]
+        else:
+            return self.posting_scores[posting_id] * self.label_scales[self.posting_label_ids[posting_id]]
+
+    def get_category_postings(self, label, top_n=None):
+        # type: (str, Optional[int])->List[Tuple[str,float]]
+        """* What you can do
+        - カテゴリの単語を、スコアの降順に(単語, スコア)で返します。top_nを指定すると上位top_n件だけを返します。
+        - 辞書全体を走査せず、カテゴリの逆引きのセクションから必要な件数だけを読みます。
+
+        * Example
+        >>> word_score_dictionary.get_category_postings('食品・飲料-インスタント食品', top_n=3)
+        [('カップ麺', 0.41), ('インスタントラーメン', 0.38), ('袋麺', 0.22)]
+        """
+        if not self.has_category_index:
+            raise ValueError('カテゴリの逆引きがないインデックスです。is_build_category_index=Trueで作成し直してください。')
+        label_id = self.label2id.get(label)
+        if label_id is None:
+            return []
+        start, end = self.category_offsets[label_id], self.category_offsets[label_id + 1]
+        if top_n is not None:
+            end = min(end, start + top_n)
+        seq_word_score = []  # type: List[Tuple[str,float]]
+        for posting_id in self.category_posting_ids[start:end]:
+            ### ポスティングの位置から、それを含む単語のIDを二分探索で求めます ###
+            word_id = bisect_right(self.posting_offsets, posting_id) - 1
+            seq_word_score.append((self._get_word(word_id).decode('utf-8'), self.__get_score(posting_id)))
+        return seq_word_score
+
+    def __contains__(self, word):
+        # type: (str)->bool
+        return self.find(word) != -1
+
+    def __getitem__(self, word):
+        # type: (str)->List[Tuple[str,float]]
+        word_id = self.find(word)
+        if word_id == -1:
+            raise KeyError(word)
+        return self.get_postings(word_id)
+
+    def get(self, word, default=None):
+        # type: (str, Any)->Any
+        word_id = self.find(word)
+        if word_id == -1:
+            return default
+        return self.get_postings(word_id)
+
+    def __len__(self):
+        # type: ()->int
+        return self.n_words
+
+    def __iter__(self):
+        # type: ()->Iterator[str]
+        return self.keys()
+
+    def keys(self):
+        # type: ()->Iterator[str]
+        for word_id in range(self.n_words):
+            yield self._get_word(word_id).decode('utf-8')
+
+    def items(self):
+        # type: ()->Iterator[Tuple[str, List[Tuple[str,float]]]]
+        for word_id in range(self.n_words):
+            yield (self._get_word(word_id).decode('utf-8'), self.get_postings(word_id))
+
+    def close(self):
+        # type: ()->None
+        for section in self.sections.values():
+            section.release()
+        self.sections = {}
+        self.word_offsets = self.word_blob = None
+        self.posting_offsets = self.posting_label_ids = self.posting_scores = self.label_scales = None
+        self.category_offsets = self.category_posting_ids = None
+        self.buffer.release()
+        if self.mmap_object is not None:
+            self.mmap_object.close()
+        if self.file_object is not None:
+            self.file_object.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def open_dictionary_index(path_dictionary_index):
+    # type: (str)->DictionaryIndex
+    return DictionaryIndex.open(path_dictionary_index)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    ### 辞書jsonファイルが存在しているパス
+    PATH_DICTIONARY_DATA = './dictionary-data/word_soa.json'
+    ### コンパイル済みインデックスの出力先
+    PATH_DICTIONARY_INDEX = './dictionary-data/word_soa.idx'
+    if not os.path.exists(PATH_DICTIONARY_DATA): raise FileExistsError('辞書ファイルが発見できません。')
+
+    with open(PATH_DICTIONARY_DATA, 'r') as f:
+        compile_dictionary_index(group_score_records(json.loads(f.read())),
+                                 PATH_DICTIONARY_INDEX,
+                                 metadata={'source': os.path.abspath(PATH_DICTIONARY_DATA)})
@@ -0,0 +1,211 @@
+from typing import List, Dict, Any, Tuple, Iterable, Iterator, Optional
+from heapq import merge
+from itertools import groupby
+import json
+import logging
+import os
+import shutil
+import tempfile
+logger = logging.getLogger(__file__)
+logger.setLevel(logging.INFO)
+
+from dictionary_index import compile_dictionary_index
+from dictionary_pruning import iter_pruned_postings
+
+"""辞書jsonファイルを逐次的に読み込み、メモリ使用量を抑えながら辞書インデックスを作成します。
+メモリ上限を超えた分はソート済みのランとして一時ファイルに書き出し、最後に外部マージで単語ごとにまとめます。
+メモリに乗らない大きさの辞書からでもインデックスを作成できます。
+
+Python3.5以上で動作します。
+"""
+
+__author__ = "Kensuke Mitsuzawa"
+__author_email__ = "kensuke_mitsuzawa@fumankaitori.com"
+__license_name__ = "MIT"
+
+DEFAULT_MEMORY_BUDGET_BYTES = 256 * 1024 * 1024
+# 1ポスティングあたりのPythonオブジェクトのおおよそのサイズ(tuple, float, listの要素)
+POSTING_OVERHEAD_BYTES = 120
+# 1単語あたりのおおよそのサイズ(str, list, dictのエントリ)
+WORD_OVERHEAD_BYTES = 200
+
+
+def iter_score_records(path_dictionary_data, read_size=1024 * 1024):
+    # type: (str, int)->Iterator[Dict[str,Any]]
+    """* What you can do
+    - 辞書jsonファイルのレコードを1件ずつ返します。ファイル全体をメモリに読み込みません。
+
+    * Input
+    - [{"label": "アウトドア・スポーツ-その他", "score": 0.02942301705479622, "word": "お金"}, ...] 形式のファイル
+
+    * Output
+    >>> {"label": "アウトドア・スポーツ-その他", "score": 0.02942301705479622, "word": "お金"}
+    """
+    decoder = json.JSONDecoder()
+    with open(path_dictionary_data, 'r') as f:
+        buffer = ''
+        position = 0
+        is_started = False
+        is_eof = False
+        while True:
+            # 空白と区切り文字を読み飛ばします。
+            while position < len(buffer) and buffer[position] in ' \t\r\n,':
+                position += 1
+            if not is_started and position < len(buffer):
+                if buffer[position] != '[':
+                    raise ValueError('辞書ファイルがJSON配列ではありません。')
+                is_started = True
+                position += 1
+                continue
+            if is_started and position < len(buffer) and buffer[position] == ']':
+                return
+            if position < len(buffer):
+                try:
+                    record, end = decoder.raw_decode(buffer, position)
+                except ValueError:
+                    # レコードが読み込み単位の境界をまたいでいる場合は、続きを読み込みます。
+                    if is_eof:
+                        raise
+                    record, end = None, position
+                if record is not None:
+                    position = end
+                    yield record
+                    continue
+            if is_eof:
+                if is_started:
+                    raise ValueError('辞書ファイルのJSON配列が閉じていません。')
+                return
+            chunk = f.read(read_size)
+            if not chunk:
+                is_eof = True
+            buffer = buffer[position:] + chunk
+            position = 0
+
+
+def __spill_run(word_score_dictionary, path_temporary_dir, n_run):
+    # type: (Dict[str, List[Tuple[str,float]]], str, int)->str
+    path_run = os.path.join(path_temporary_dir, 'run_{:05d}.jsonl'.format(n_run))
+    with open(path_run, 'w') as f:
+        for word in sorted(word_score_dictionary):
+            f.write(json.dumps([word, word_score_dictionary[word]], ensure_ascii=False))
+            f.write('\n')
+    return path_run
+
+
+def __iter_run(path_run):
+    # type: (str)->Iterator[Tuple[str, List[Tuple[str,float]]]]
+    with open(path_run, 'r') as f:
+        for line in f:
+            word, postings = json.loads(line)
+            yield (word, [tuple(posting) for posting in postings])
+
+
+def iter_grouped_records(seq_score_records,
+                         memory_budget_bytes=DEFAULT_MEMORY_BUDGET_BYTES,
+                         path_temporary_dir=None):
+    # type: (Iterable[Dict[str,Any]], int, Optional[str])->Iterator[Tuple[str, List[Tuple[str,float]]]]
+    """* What you can do
+    - レコードを単語ごとにまとめ、単語の昇順に返します。
+    - 作業中のデータがmemory_budget_bytesを超えると、ソート済みのランとして一時ファイルに書き出し、最後に外部マージします。
+    - 単語ごとのポスティングは入力の順序を保ちます。
+
+    * Output
+    >>> [("お金", [("アウトドア・スポーツ-その他", 0.02942301705479622)])]
+    """
+    is_own_temporary_dir = path_temporary_dir is None
+    if is_own_temporary_dir:
+        path_temporary_dir = tempfile.mkdtemp()
+
+    label_table = {}  # type: Dict[str,str]
+    word_score_dictionary = {}  # type: Dict[str, List[Tuple[str,float]]]
+    estimated_bytes = 0
+    seq_path_runs = []  # type: List[str]
+    counter = 0
+    try:
+        for score_object in seq_score_records:
+            word = score_object['word']
+            # カテゴリ名は種類が少ないため、同じ文字列オブジェクトを共有します。
+            label = label_table.setdefault(score_object['label'], score_object['label'])
+            score_tuple = (label, score_object['score'])
+            if not word in word_score_dictionary:
+                word_score_dictionary[word] = [score_tuple]
+                estimated_bytes += WORD_OVERHEAD_BYTES + len(word) * 4
+            else:
+                word_score_dictionary[word].append(score_tuple)
+            estimated_bytes += POSTING_OVERHEAD_BYTES
+
+            counter += 1
+            if estimated_bytes >= memory_budget_bytes:
+                seq_path_runs.append(__spill_run(word_score_dictionary, path_temporary_dir, len(seq_path_runs)))
+                word_score_dictionary = {}
+                estimated_bytes = 0
+                logger.info(msg='Spilled run-{} after {} records.'.format(len(seq_path_runs), counter))
+
+        logger.info(msg="Loaded N(record)={}".format(counter))
+        if not seq_path_runs:
+            for word in sorted(word_score_dictionary):
+                yield (word, word_score_dictionary[word])
+            return
+
+        if word_score_dictionary:
+            seq_path_runs.append(__spill_run(word_score_dictionary, path_temporary_dir, len(seq_path_runs)))
+            word_score_dictionary = {}
+        # heapq.mergeは同じキーの要素を入力の順に返すので、ランの順序=レコードの出現順が保たれます。
+        merged_runs = merge(*[__iter_run(path_run) for path_run in seq_path_runs], key=lambda tuple_obj: tuple_obj[0])
+        for word, grouped_obj in groupby(merged_runs, key=lambda tuple_obj: tuple_obj[0]):
+            postings = []  # type: List[Tuple[str,float]]
+            for _, run_postings in grouped_obj:
+                postings += [(label_table.setdefault(label, label), score) for label, score in run_postings]
+            yield (word, postings)
+    finally:
+        if is_own_temporary_dir:
+            shutil.rmtree(path_temporary_dir, ignore_errors=True)
+
+
+def build_dictionary_index(path_dictionary_data,
+                           path_dictionary_index,
+                           memory_budget_bytes=DEFAULT_MEMORY_BUDGET_BYTES,
+                           path_temporary_dir=None,
+                           max_postings=None,
+                           min_score=None,
+                           cumulative_mass=None,
+                           score_encoding='float64',
+                           is_build_category_index=True):
+    # type: (str, str, int, Optional[str], Optional[int], Optional[float], Optional[float], str, bool)->Dict[str,Any]
+    """* What you can do
+    - 辞書jsonファイルから、メモリ使用量をmemory_budget_bytes程度に抑えて辞書インデックスを作成します。
+    - max_postings、min_score、cumulative_massを指定すると、単語ごとのポスティングを枝刈りします。(dictionary_pruning.pyを参照)
+    - score_encodingにfloat16かint8を指定すると、スコアを量子化して保持します。
+    - カテゴリの逆引きも、memory_budget_bytesに収まるようにカテゴリを分けて作成します。
+      1つのカテゴリのポスティングだけで上限を超える場合は上限を超えるため、その場合はis_build_category_index=Falseを指定してください。
+    """
+    pruning_setting = {'max_postings': max_postings, 'min_score': min_score, 'cumulative_mass': cumulative_mass}
+    return compile_dictionary_index(
+        iter_pruned_postings(iter_grouped_records(iter_score_records(path_dictionary_data),
+                                                  memory_budget_bytes=memory_budget_bytes,
+                                                  path_temporary_dir=path_temporary_dir),
+                             **pruning_setting),
+        path_dictionary_index,
+        metadata={'source': os.path.abspath(path_dictionary_data), 'pruning': pruning_setting},
+        score_encoding=score_encoding,
+        is_build_category_index=is_build_category_index,
+        memory_budget_bytes=memory_budget_bytes)
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    ### 辞書jsonファイルが存在しているパス
+    PATH_DICTIONARY_DATA = './dictionary-data/word_soa.json'
+    ### コンパイル済みインデックスの出力先
+    PATH_DICTIONARY_INDEX = './dictionary-data/word_soa.idx'
+    ### 作業用メモリの上限
+    MEMORY_BUDGET_BYTES = 512 * 1024 * 1024
+    ### 単語ごとに残すカテゴリ数の上限とスコアの保持形式。Noneとfloat64なら辞書jsonファイルのまま保持します。
+    MAX_POSTINGS = None
+    SCORE_ENCODING = 'float64'
+    if not os.path.exists(PATH_DICTIONARY_DATA): raise FileExistsError('辞書ファイルが発見できません。')
+
+    build_dictionary_index(PATH_DICTIONARY_DATA,
+                           PATH_DICTIONARY_INDEX,
+                           memory_budget_bytes=MEMORY_BUDGET_BYTES,
+                           max_postings=MAX_POSTINGS,
+                           score_encoding=SCORE_ENCODING)
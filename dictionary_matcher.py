@@ -0,0 +1,277 @@
+from typing import List, Dict, Any, Tuple, Iterable, Iterator, Optional
+from array import array
+from collections import deque
+import json
+import logging
+import os
+import struct
+import sys
+logger = logging.getLogger(__file__)
+logger.setLevel(logging.INFO)
+
+"""辞書の語彙からAho-Corasickのオートマトンを作成し、MeCabを使わずにテキスト中の辞書の単語を見つけます。
+テキストを1文字ずつ1回だけ走査するため、テキストの長さに比例した時間で、すべての出現位置を見つけられます。
+
+- match_policy='longest': 重ならないように、左から順に最も長い単語を選びます。
+- match_policy='all': 重なりも含めて、すべての出現を返します。
+
+tokenizeはget_text_scoreのfunction_tokenizerとしてそのまま使えます。
+作成したオートマトンはファイルに保存でき、次回以降は作成し直さずに読み込めます。
+
+Python3.5以上で動作します。
+"""
+
+__author__ = "Kensuke Mitsuzawa"
+__author_email__ = "kensuke_mitsuzawa@fumankaitori.com"
+__license_name__ = "MIT"
+
+MATCHER_MAGIC = b'FMCACM01'
+MATCHER_FORMAT_VERSION = 1
+SECTION_ALIGNMENT = 8
+# 遷移は「状態番号 * CODE_POINT_BASE + 文字コード」を整数のキーとする1つのdictで保持します。
+CODE_POINT_BASE = 0x110000
+MATCH_POLICIES = ('longest', 'all')
+
+
+class AhoCorasickMatcher(object):
+    """* What you can do
+    - 語彙のAho-Corasickオートマトンで、テキスト中の単語を見つけます。
+
+    * Example
+    >>> matcher = AhoCorasickMatcher.build(word_score_dictionary.keys(), min_word_length=2)
+    >>> matcher.tokenize('鈴鹿サーキットは三重県鈴鹿市にある')
+    ['鈴鹿サーキット', '三重県', '鈴鹿市']
+    >>> get_text_score(input_text, word_score_dictionary, matcher.tokenize)
+    """
+    def __init__(self, words, goto, fail, word_ids, dict_links, match_policy='longest', min_word_length=1):
+        # type: (List[str], Dict[int,int], array, array, array, str, int)->None
+        if match_policy not in MATCH_POLICIES:
+            raise ValueError('match_policyは{}のいずれかを指定してください。match_policy={}'.format(
+                MATCH_POLICIES, match_policy))
+        self.words = words
+        self.goto = goto
+        self.fail = fail
+        # 状態で終わる単語のID。単語が終わらない状態では-1です。
+        self.word_ids = word_ids
+        # 失敗遷移をたどって最初に見つかる、単語が終わる状態。なければ0(根)です。
+        self.dict_links = dict_links
+        self.match_policy = match_policy
+        self.min_word_length = min_word_length
+
+    @property
+    def n_states(self):
+        # type: ()->int
+        return len(self.fail)
+
+    @classmethod
+    def build(cls, seq_word, match_policy='longest', min_word_length=1):
+        # type: (Iterable[str], str, int)->AhoCorasickMatcher
+        """* What you can do
+        - 語彙からオートマトンを作成します。min_word_length文字未満の単語は登録しません。
+        """
+        words = []  # type: List[str]
+        goto = {}  # type: Dict[int,int]
+        word_ids = array('i', [-1])
+        ### 語彙のトライを作成します ###
+        for word in seq_word:
+            if len(word) < min_word_length:
+                continue
+            state = 0
+            for character in word:
+                key = state * CODE_POINT_BASE + ord(character)
+                next_state = goto.get(key)
+                if next_state is None:
+                    next_state = len(word_ids)
+                    goto[key] = next_state
+                    word_ids.append(-1)
+                state = next_state
+            if word_ids[state] == -1:
+                word_ids[state] = len(words)
+                words.append(word)
+
+        ### 幅優先で失敗遷移を計算します。子の一覧は遷移のキーをソートして作ります ###
+        n_states = len(word_ids)
+        sorted_keys = sorted(goto)
+        child_offsets = array('I', [0]) * (n_states + 1)
+        for key in sorted_keys:
+            child_offsets[key // CODE_POINT_BASE + 1] += 1
+        for state in range(n_states):
+            child_offsets[state + 1] += child_offsets[state]
+        fail = array('I', [0]) * n_states
+        dict_links = array('I', [0]) * n_states
+        queue = deque([0])
+        while queue:
+            state = queue.popleft()
+            for key in sorted_keys[child_offsets[state]:child_offsets[state + 1]]:
+                child = goto[key]
+                code_point = key - state * CODE_POINT_BASE
+                if state != 0:
+                    fail_state = fail[state]
+                    while True:
+                        next_state = goto.get(fail_state * CODE_POINT_BASE + code_point)
+                        if next_state is not None:
+                            fail[child] = next_state
+                            break
+                        if fail_state == 0:
+                            break
+                        fail_state = fail[fail_state]
+                fail_state = fail[child]
+                dict_links[child] = fail_state if word_ids[fail_state] != -1 else dict_links[fail_state]
+                queue.append(child)
+        logger.info(msg='Built Aho-Corasick automaton; N(word)={}, N(state)={}'.format(len(words), n_states))
+
+        return cls(words, goto, fail, word_ids, dict_links, match_policy=match_policy, min_word_length=min_word_length)
+
+    def iter_matches(self, input_text):
+        # type: (str)->Iterator[Tuple[int, int, str]]
+        """* What you can do
+        - テキスト中のすべての単語の出現を、(開始位置, 終了位置, 単語)として終了位置の順に返します。
+        """
+        goto = self.goto
+        fail = self.fail
+        word_ids = self.word_ids
+        dict_links = self.dict_links
+        words = self.words
+        state = 0
+        for position, character in enumerate(input_text, start=1):
+            code_point = ord(character)
+            while True:
+                next_state = goto.get(state * CODE_POINT_BASE + code_point)
+                if next_state is not None:
+                    state = next_state
+                    break
+                if state == 0:
+                    break
+                state = fail[state]
+            output_state = state if word_ids[state] != -1 else dict_links[state]
+            while output_state != 0:
+                word = words[word_ids[output_state]]
+                yield (position - len(word), position, word)
+                output_state = dict_links[output_state]
+
+    def tokenize(self, input_text):
+        # type: (str)->List[str]
+        """* What you can do
+        - テキスト中の単語をmatch_policyに従って選び、出現順に返します。
+        """
+        seq_match = list(self.iter_matches(input_text))
+        if self.match_policy == 'all':
+            return [word for _, _, word in sorted(seq_match)]
+
+        ### 開始位置が最も左で、その中で最も長い単語から順に、重ならないものを選びます ###
+        seq_match.sort(key=lambda match: (match[0], -match[1]))
+        list_tokens = []  # type: List[str]
+        last_end = 0
+        for start, end, word in seq_match:
+            if start >= last_end:
+                list_tokens.append(word)
+                last_end = end
+        return list_tokens
+
+    @staticmethod
+    def __align(position):
+        # type: (int)->int
+        return (position + SECTION_ALIGNMENT - 1) // SECTION_ALIGNMENT * SECTION_ALIGNMENT
+
+    def save(self, path_matcher, metadata=None):
+        # type: (str, Optional[Dict[str,Any]])->None
+        """* What you can do
+        - オートマトンをファイルに保存します。一時ファイルに書き出してから置き換えます。
+        """
+        encoded_words = [word.encode('utf-8') for word in self.words]
+        word_offsets = array('I', [0])
+        for encoded_word in encoded_words:
+            word_offsets.append(word_offsets[-1] + len(encoded_word))
+        sorted_keys = sorted(self.goto)
+        sections = [
+            ('word_offsets', word_offsets),
+            ('word_blob', array('B', b''.join(encoded_words))),
+            ('transition_keys', array('Q', sorted_keys)),
+            ('transition_values', array('I', [self.goto[key] for key in sorted_keys])),
+            ('fail', self.fail),
+            ('word_ids', self.word_ids),
+            ('dict_links', self.dict_links),
+        ]
+        header = {
+            'format_version': MATCHER_FORMAT_VERSION,
+            'byteorder': sys.byteorder,
+            'min_word_length': self.min_word_length,
+            'metadata': metadata or {},
+            'sections': {},
+        }
+        # ヘッダの長さが決まらないとセクションの位置が決まらないため、位置が収束するまで計算します。
+        header_size = 0
+        while True:
+            position = self.__align(len(MATCHER_MAGIC) + 4 + header_size)
+            for name, section in sections:
+                header['sections'][name] = [position, len(section), section.typecode]
+                position = self.__align(position + len(section) * section.itemsize)
+            encoded_header = json.dumps(header, ensure_ascii=False).encode('utf-8')
+            if len(encoded_header) == header_size:
+                break
+            header_size = len(encoded_header)
+
+        path_temporary = path_matcher + '.tmp'
+        with open(path_temporary, 'wb') as f:
+            f.write(MATCHER_MAGIC)
+            f.write(struct.pack('<I', header_size))
+            f.write(encoded_header)
+            for name, section in sections:
+                f.write(b'\x00' * (header['sections'][name][0] - f.tell()))
+                section.tofile(f)
+        os.replace(path_temporary, path_matcher)
+        logger.info(msg='Saved Aho-Corasick automaton into {}'.format(path_matcher))
+
+    @classmethod
+    def load(cls, path_matcher, match_policy='longest'):
+        # type: (str, str)->AhoCorasickMatcher
+        with open(path_matcher, 'rb') as f:
+            buffer = f.read()
+        if buffer[:len(MATCHER_MAGIC)] != MATCHER_MAGIC:
+            raise ValueError('オートマトンのファイル形式が不正です。')
+        header_size = struct.unpack_from('<I', buffer, len(MATCHER_MAGIC))[0]
+        header_start = len(MATCHER_MAGIC) + 4
+        header = json.loads(buffer[header_start:header_start + header_size].decode('utf-8'))
+        if header['format_version'] != MATCHER_FORMAT_VERSION:
+            raise ValueError('オートマトンのバージョンが異なります。version={}'.format(header['format_version']))
+        if header['byteorder'] != sys.byteorder:
+            raise ValueError('オートマトンのバイトオーダーが異なります。作成し直してください。')
+
+        sections = {}  # type: Dict[str, array]
+        for name, (position, n_items, typecode) in header['sections'].items():
+            section = array(typecode)
+            section.frombytes(buffer[position:position + n_items * section.itemsize])
+            sections[name] = section
+        word_offsets = sections['word_offsets']
+        word_blob = sections['word_blob'].tobytes()
+        words = [word_blob[word_offsets[i]:word_offsets[i + 1]].decode('utf-8') for i in range(len(word_offsets) - 1)]
+        goto = dict(zip(sections['transition_keys'], sections['transition_values']))
+
+        return cls(words, goto, sections['fail'], sections['word_ids'], sections['dict_links'],
+                   match_policy=match_policy, min_word_length=header['min_word_length'])
+
+
+def load_dictionary_matcher(word_score_dictionary,
+                            path_matcher=None,
+                            path_dictionary_data=None,
+                            match_policy='longest',
+                            min_word_length=1):
+    # type: (Any, Optional[str], Optional[str], str, int)->AhoCorasickMatcher
+    """* What you can do
+    - path_matcherに保存済みのオートマトンがあれば読み込みます。なければ辞書の語彙から作成し、path_matcherに保存します。
+    - 辞書jsonファイル(path_dictionary_data)が保存済みのオートマトンより新しい場合や、min_word_lengthが異なる場合は作り直します。
+    """
+    if path_matcher is not None and os.path.exists(path_matcher):
+        if path_dictionary_data is None or not os.path.exists(path_dictionary_data) or \
+                os.path.getmtime(path_matcher) >= os.path.getmtime(path_dictionary_data):
+            matcher = AhoCorasickMatcher.load(path_matcher, match_policy=match_policy)
+            if matcher.min_word_length == min_word_length:
+                return matcher
+
+    matcher = AhoCorasickMatcher.build(word_score_dictionary.keys(),
+                                       match_policy=match_policy,
+                                       min_word_length=min_word_length)
+    if path_matcher is not None:
+        matcher.save(path_matcher, metadata={'source': os.path.abspath(path_dictionary_data)
+                                             if path_dictionary_data is not None else None})
+    return matcher
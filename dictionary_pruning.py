@@ -0,0 +1,96 @@
+from typing import List, Dict, Any, Tuple, Iterable, Iterator, Optional
+import logging
+logger = logging.getLogger(__file__)
+logger.setLevel(logging.INFO)
+
+"""辞書インデックスの作成時に、単語ごとのポスティング(カテゴリとスコアの組)を枝刈りします。
+多くの単語は、数十のカテゴリにごく小さいスコアを持っています。これらはランキングにほとんど影響しない一方で、
+インデックスの大きさとスコアリングの計算量を増やします。
+
+枝刈りの条件は次の3つで、組み合わせて指定できます。
+- max_postings: スコアの高い順に上位N件のカテゴリだけを残します。
+- min_score: スコアがmin_score未満のカテゴリを削除します。
+- cumulative_mass: スコアの高い順に足していき、合計の割合がcumulative_massに達するまでのカテゴリを残します。
+  負のスコアで合計が小さくなり、正のスコアのカテゴリが削除されないように、割合はスコアの絶対値で計算します。
+
+Python3.5以上で動作します。
+"""
+
+__author__ = "Kensuke Mitsuzawa"
+__author_email__ = "kensuke_mitsuzawa@fumankaitori.com"
+__license_name__ = "MIT"
+
+
+def prune_postings(postings,
+                   max_postings=None,
+                   min_score=None,
+                   cumulative_mass=None):
+    # type: (List[Tuple[str,float]], Optional[int], Optional[float], Optional[float])->List[Tuple[str,float]]
+    """* What you can do
+    - 1単語のポスティングを枝刈りし、スコアの高い順に返します。
+
+    * Example
+    >>> prune_postings([("a", 0.5), ("b", 0.01), ("c", 0.3)], max_postings=2)
+    [("a", 0.5), ("c", 0.3)]
+    """
+    ### 同点のカテゴリはカテゴリ名の降順に並べます ###
+    pruned_postings = sorted(postings, key=lambda tuple_obj: (tuple_obj[1], tuple_obj[0]), reverse=True)
+    if min_score is not None:
+        pruned_postings = [score_tuple for score_tuple in pruned_postings if score_tuple[1] >= min_score]
+    if max_postings is not None:
+        pruned_postings = pruned_postings[:max_postings]
+    if cumulative_mass is not None:
+        total_score = sum(abs(score) for _, score in pruned_postings)
+        accumulated_score = 0.0
+        for n_keep, (_, score) in enumerate(pruned_postings, start=1):
+            accumulated_score += abs(score)
+            if accumulated_score >= total_score * cumulative_mass:
+                pruned_postings = pruned_postings[:n_keep]
+                break
+
+    return pruned_postings
+
+
+def iter_pruned_postings(seq_word_postings,
+                         max_postings=None,
+                         min_score=None,
+                         cumulative_mass=None):
+    # type: (Iterable[Tuple[str, List[Tuple[str,float]]]], Optional[int], Optional[float], Optional[float])->Iterator[Tuple[str, List[Tuple[str,float]]]]
+    """* What you can do
+    - (単語, ポスティング)のイテレータを枝刈りして返します。単語の順序は変えません。
+    - すべてのポスティングが削除された単語は返しません。
+    - 条件を1つも指定しない場合は、入力をそのまま返します。
+    """
+    is_pruning = not (max_postings is None and min_score is None and cumulative_mass is None)
+    n_postings_before = 0
+    n_postings_after = 0
+    n_removed_words = 0
+    for word, postings in seq_word_postings:
+        n_postings_before += len(postings)
+        if is_pruning:
+            postings = prune_postings(postings, max_postings, min_score, cumulative_mass)
+        n_postings_after += len(postings)
+        if not postings:
+            n_removed_words += 1
+            continue
+        yield word, postings
+
+    if is_pruning:
+        logger.info(msg='Pruned N(posting) {} -> {} ({:.1%}), removed N(word)={}; '
+                        'max_postings={}, min_score={}, cumulative_mass={}'.format(
+            n_postings_before, n_postings_after, n_postings_after / max(n_postings_before, 1), n_removed_words,
+            max_postings, min_score, cumulative_mass))
+
+
+def get_pruning_setting_name(pruning_setting):
+    # type: (Dict[str,Any])->str
+    """* What you can do
+    - 枝刈りと量子化の設定から、ファイル名にも使える短い名前を作ります。
+
+    * Example
+    >>> get_pruning_setting_name({"max_postings": 20, "score_encoding": "int8"})
+    'max_postings=20,score_encoding=int8'
+    """
+    seq_item = ['{}={}'.format(key, pruning_setting[key]) for key in sorted(pruning_setting)
+                if pruning_setting[key] is not None]
+    return ','.join(seq_item) or 'baseline'
@@ -0,0 +1,194 @@
+from typing import List, Dict, Any, Tuple, Iterable, Iterator, Optional
+import logging
+import os
+import sqlite3
+logger = logging.getLogger(__file__)
+logger.setLevel(logging.INFO)
+
+"""辞書データをSQLiteのファイルに永続化します。
+一度だけ大きなトランザクション単位で書き込み、以降の実行では読み込み専用で開きます。
+文書に含まれる単語のスコアを、1回のクエリでまとめて引くことができます。
+
+Python3.5以上で動作します。
+"""
+
+__author__ = "Kensuke Mitsuzawa"
+__author_email__ = "kensuke_mitsuzawa@fumankaitori.com"
+__license_name__ = "MIT"
+
+STORE_SCHEMA_VERSION = '1'
+# SQLiteのプレースホルダ数の上限(古いSQLiteでは999)を超えないように分割します。
+MAX_QUERY_PARAMETERS = 900
+
+
+class SqliteDictionaryStore(object):
+    """* What you can do
+    - SQLiteに保存した辞書データを、辞書(dict)と同じ形で引くことができます。
+    - get_manyで複数の単語のスコアを1回のクエリで取得できます。
+
+    * Example
+    >>> store = SqliteDictionaryStore.build('./dictionary-data/word_soa.sqlite3', load_dictionary_data(path))
+    >>> store = SqliteDictionaryStore.open('./dictionary-data/word_soa.sqlite3')
+    >>> store.get_many(['お金', '鈴鹿'])
+    {'お金': [('アウトドア・スポーツ-その他', 0.02942301705479622)]}
+    """
+    def __init__(self, connection, path_sqlite):
+        # type: (sqlite3.Connection, str)->None
+        self.connection = connection
+        self.path_sqlite = path_sqlite
+        self.labels = dict(connection.execute('SELECT label_id, label FROM labels'))  # type: Dict[int,str]
+
+    @staticmethod
+    def is_built(path_sqlite):
+        # type: (str)->bool
+        """* What you can do
+        - 最後まで書き込みが完了したストアが存在すればTrueを返します。
+        """
+        if not os.path.exists(path_sqlite):
+            return False
+        try:
+            connection = sqlite3.connect('file:{}?mode=ro'.format(path_sqlite), uri=True)
+            try:
+                row = connection.execute("SELECT value FROM meta WHERE key='schema_version'").fetchone()
+            finally:
+                connection.close()
+        except sqlite3.DatabaseError:
+            return False
+        return row is not None and row[0] == STORE_SCHEMA_VERSION
+
+    @classmethod
+    def build(cls, path_sqlite, score_dictionary, batch_size=100000):
+        # type: (str, Iterable[Dict[str,Any]], int)->SqliteDictionaryStore
+        """* What you can do
+        - 辞書のレコードからストアを作成し、読み込み専用で開き直して返します。
+        - batch_size件ごとに1回だけコミットします。書き込み途中のファイルは一時ファイル名で作成します。
+
+        * Input
+        >>> [{"label": "アウトドア・スポーツ-その他", "score": 0.02942301705479622, "word": "お金"}]
+        """
+        path_temporary = path_sqlite + '.tmp'
+        if os.path.exists(path_temporary):
+            os.remove(path_temporary)
+        connection = sqlite3.connect(path_temporary)
+        connection.execute('PRAGMA journal_mode=OFF')
+        connection.execute('PRAGMA synchronous=OFF')
+        connection.execute('CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)')
+        connection.execute('CREATE TABLE labels (label_id INTEGER PRIMARY KEY, label TEXT UNIQUE)')
+        # 単語ごとのポスティングは出現順(seq)に並べて返します。
+        connection.execute('CREATE TABLE postings (word TEXT, seq INTEGER, label_id INTEGER, score REAL)')
+
+        label2id = {}  # type: Dict[str,int]
+        batch = []  # type: List[Tuple[str,int,int,float]]
+        counter = 0
+        for score_object in score_dictionary:
+            label = score_object['label']
+            if label not in label2id:
+                label2id[label] = len(label2id)
+                connection.execute('INSERT INTO labels VALUES (?, ?)', (label2id[label], label))
+            batch.append((score_object['word'], counter, label2id[label], score_object['score']))
+            counter += 1
+            if len(batch) == batch_size:
+                connection.executemany('INSERT INTO postings VALUES (?, ?, ?, ?)', batch)
+                connection.commit()
+                batch = []
+                logger.info(msg='Processed {} records now.'.format(counter))
+        if batch:
+            connection.executemany('INSERT INTO postings VALUES (?, ?, ?, ?)', batch)
+        # 索引は全件の書き込みが終わってから一度に作成します。
+        connection.execute('CREATE INDEX postings_word ON postings (word, seq)')
+        connection.execute("INSERT INTO meta VALUES ('schema_version', ?)", (STORE_SCHEMA_VERSION,))
+        connection.execute("INSERT INTO meta VALUES ('n_records', ?)", (str(counter),))
+        connection.commit()
+        connection.close()
+        os.replace(path_temporary, path_sqlite)
+        logger.info(msg='Built sqlite dictionary store {}; N(record)={}'.format(path_sqlite, counter))
+
+        return cls.open(path_sqlite)
+
+    @classmethod
+    def open(cls, path_sqlite):
+        # type: (str)->SqliteDictionaryStore
+        if not cls.is_built(path_sqlite):
+            raise FileExistsError('辞書ストアが発見できないか、作成途中です。path={}'.format(path_sqlite))
+        connection = sqlite3.connect('file:{}?mode=ro'.format(path_sqlite), uri=True, check_same_thread=False)
+        return cls(connection, path_sqlite)
+
+    def get_many(self, words):
+        # type: (Iterable[str])->Dict[str, List[Tuple[str,float]]]
+        """* What you can do
+        - 複数の単語のスコアをまとめて取得します。辞書にない単語は結果に含まれません。
+        """
+        seq_words = list(set(words))
+        word_score_dictionary = {}  # type: Dict[str, List[Tuple[str,float]]]
+        labels = self.labels
+        for start in range(0, len(seq_words), MAX_QUERY_PARAMETERS):
+            chunk = seq_words[start:start + MAX_QUERY_PARAMETERS]
+            cursor = self.connection.execute(
+                'SELECT word, label_id, score FROM postings WHERE word IN ({}) ORDER BY word, seq'.format(
+                    ','.join('?' * len(chunk))),
+                chunk)
+            for word, label_id, score in cursor:
+                score_tuple = (labels[label_id], score)
+                if not word in word_score_dictionary:
+                    word_score_dictionary[word] = [score_tuple]
+                else:
+                    word_score_dictionary[word].append(score_tuple)
+
+        return word_score_dictionary
+
+    def __contains__(self, word):
+        # type: (str)->bool
+        return self.connection.execute('SELECT 1 FROM postings WHERE word = ? LIMIT 1', (word,)).fetchone() is not None
+
+    def __getitem__(self, word):
+        # type: (str)->List[Tuple[str,float]]
+        postings = self.get_many([word])
+        if word not in postings:
+            raise KeyError(word)
+        return postings[word]
+
+    def get(self, word, default=None):
+        # type: (str, Any)->Any
+        return self.get_many([word]).get(word, default)
+
+    def __len__(self):
+        # type: ()->int
+        return self.connection.execute('SELECT COUNT(DISTINCT word) FROM postings').fetchone()[0]
+
+    def keys(self):
+        # type: ()->Iterator[str]
+        for row in self.connection.execute('SELECT DISTINCT word FROM postings ORDER BY word'):
+            yield row[0]
+
+    def __iter__(self):
+        # type: ()->Iterator[str]
+        return self.keys()
+
+    def items(self):
+        # type: ()->Iterator[Tuple[str, List[Tuple[str,float]]]]
+        """* What you can do
+        - (単語, [(カテゴリ名, スコア)])を単語の順に返します。(word, seq)の索引の順に1回のクエリで読み、単語ごとにまとめます。
+        """
+        labels = self.labels
+        current_word = None  # type: Optional[str]
+        postings = []  # type: List[Tuple[str,float]]
+        for word, label_id, score in self.connection.execute(
+                'SELECT word, label_id, score FROM postings ORDER BY word, seq'):
+            if word != current_word:
+                if current_word is not None:
+                    yield current_word, postings
+                current_word = word
+                postings = []
+            postings.append((labels[label_id], score))
+        if current_word is not None:
+            yield current_word, postings
+
+    def close(self):
+        # type: ()->None
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
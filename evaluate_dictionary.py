@@ -1,10 +1,12 @@
-from typing import List, Dict, Union, Any, Tuple, Callable
+from typing import List, Dict, Any, Tuple, Callable, Optional, Iterable, Iterator, TYPE_CHECKING
 from tempfile import mkdtemp
-from itertools import chain, groupby
+from collections import Counter
+from itertools import groupby, islice
 from functools import partial
 import json
 import logging
 import os
+import time
 logger = logging.getLogger(__file__)
 logger.setLevel(logging.INFO)
 
@@ -12,120 +14,87 @@ logger.setLevel(logging.INFO)
 辞書のスコアにしたがって、テキストにスコア計算をし、ランキングが高い順にカテゴリ名を表示します。
 性能評価はデータにはWikipediaテキストを利用しています。
 
-Python3.5.1の環境下で動作を確認しています。
+Python3.5.2以上で動作します。
 """
 
 __author__ = "Kensuke Mitsuzawa"
 __author_email__ = "kensuke_mitsuzawa@fumankaitori.com"
 __license_name__ = "MIT"
 
-try:
-    from JapaneseTokenizer import MecabWrapper
+from dictionary_index import DictionaryIndex, compile_dictionary_index, group_score_records
+from dictionary_pruning import iter_pruned_postings, get_pruning_setting_name
+from metrics import METRICS
+from category_scoring import create_mecab_tokenizer, tokenize, load_dictionary_data, reformat_dictionary, \
+    load_word_score_dictionary, close_word_score_dictionary, get_text_score
+from near_duplicate import NearDuplicateStage
+if TYPE_CHECKING:
+    from tokenize_cache import TokenizeCache
 
-except ImportError:
-    raise ImportError('先にpip install JapaneseTokenizerを実行してください。')
 
-try:
-    from sqlitedict import SqliteDict
-except ImportError:
-    raise ImportError('先にpip install sqlitedictを実行してください')
-
-
-def load_evaluation_data(path_evaluation_data):
-    # type: (str)->Dict[str,Any]
-    with open(path_evaluation_data, 'r') as f:
-        return json.loads(f.read())
-
-
-def load_dictionary_data(path_dictionary_data):
-    # type: (str)->List[Dict[str,Any]]
-    with open(path_dictionary_data, 'r') as f:
-        return json.loads(f.read())
-
-
-def save_into_cached_dictionary(dict_object:Dict[str, List[List[str]]], cached_dict_object:SqliteDict):
-    for key, values in dict_object.items():
-        if not key in cached_dict_object:
-            cached_dict_object[key] = values
-        else:
-            cached_dict_object[key] += values
-
-    del dict_object
-    return cached_dict_object
-
-
-def reformat_dictionary(score_dictionary,
-                        batch_size=10000,
-                        is_use_sqlite=False):
-    # type: (List[Dict[str,Any]], int)->Union[SqliteDict, Dict[str, List[Tuple[str,float]]]]
+def iter_evaluation_data(path_evaluation_data, section_name=None):
+    # type: (str, Optional[str])->Iterator[Dict[str,Any]]
     """* What you can do
-    - 辞書の形を変形します。
-
-    * Input
-    >>> [{"label": "アウトドア・スポーツ-その他", "score": 0.02942301705479622, "word": "お金"}]
-
-    * Output
-    >>> {"お金": [("アウトドア・スポーツ-その他", 0.02942301705479622)]}
+    - 評価データを1件ずつ返します。section_nameを指定すると、そのセクション(summaryまたはfull)だけを返します。
+    - JSONL形式(get_wikipedia_text.pyの出力)はファイル全体を読み込まずに逐次読み込みます。作成途中のファイルでも評価できます。
+    - 従来のJSON形式にも対応しています。この場合は各レコードにkindを付けて返します。
     """
-    temporary_dir = mkdtemp()
-    if is_use_sqlite:
-        word_score_dictionary = SqliteDict(os.path.join(temporary_dir, 'temporary_dict.sqlite3'), autocommit=True)
-    else:
-        word_score_dictionary = {}
-
-    logger.info(msg="Loaded N(record)={}".format(len(score_dictionary)))
-
-    if is_use_sqlite:
-        counter = 0  # type: int
-        temporary_dict_obj = {}
-
-        for score_object in score_dictionary:
-            score_tuple = (score_object['label'], score_object['score'])
-            if not score_object['word'] in temporary_dict_obj:
-                temporary_dict_obj[score_object['word']] = [score_tuple]
-            else:
-                temporary_dict_obj[score_object['word']].append(score_tuple)
-
-            counter += 1
-            if counter % batch_size == 0:
-                word_score_dictionary = save_into_cached_dictionary(temporary_dict_obj, word_score_dictionary)
-                del temporary_dict_obj
-                temporary_dict_obj = {}
-                logger.info(msg='Processed {} records now.'.format(counter))
-    else:
-        for score_object in score_dictionary:
-            score_tuple = (score_object['label'], score_object['score'])
-            if not score_object['word'] in word_score_dictionary:
-                word_score_dictionary[score_object['word']] = [score_tuple]
-            else:
-                word_score_dictionary[score_object['word']].append(score_tuple)
-
-    return word_score_dictionary
-
-
-def __tokenize(input_string: str, mecab_tokenizer, pos_condition)->List[str]:
-    tokenized_sentence_obj = mecab_tokenizer.tokenize(sentence=input_string, return_list=False)
-    return mecab_tokenizer.filter(parsed_sentence=tokenized_sentence_obj, pos_condition=pos_condition).convert_list_object()
+    if not path_evaluation_data.endswith('.jsonl'):
+        with open(path_evaluation_data, 'r') as f:
+            evaluation_data = json.loads(f.read())
+        for kind in ('summary', 'full'):
+            if section_name is not None and kind != section_name:
+                continue
+            for evaluation_obj in evaluation_data[kind]:
+                yield dict(evaluation_obj, kind=kind)
+        return
+
+    seen = set()
+    with open(path_evaluation_data, 'r') as f:
+        for line in f:
+            try:
+                evaluation_obj = json.loads(line)
+            except ValueError:
+                ### 書き込み途中で中断された行は読み飛ばします ###
+                logger.warning(msg='Skip a broken line in {}'.format(path_evaluation_data))
+                continue
+            if section_name is not None and evaluation_obj['kind'] != section_name:
+                continue
+            ### 中断と再開で重複して書き出された記事は1件として扱います ###
+            key = (evaluation_obj['kind'], evaluation_obj['page_title'], evaluation_obj['gold_label'])
+            if key in seen:
+                continue
+            seen.add(key)
+            yield evaluation_obj
 
 
-def get_text_score(input_text,
-                   word_score_dictionary,
-                   function_tokenizer):
+def load_evaluation_data(path_evaluation_data):
+    # type: (str)->Dict[str,Any]
+    evaluation_data = {'summary': [], 'full': []}  # type: Dict[str, List[Dict[str,Any]]]
+    for evaluation_obj in iter_evaluation_data(path_evaluation_data):
+        evaluation_data[evaluation_obj['kind']].append(evaluation_obj)
+    return evaluation_data
+
+
+def score_evaluation_texts(seq_evaluation_obj,
+                           word_score_dictionary,
+                           function_tokenizer,
+                           sparse_scoring_engine=None,
+                           top_k=None):
+    # type: (List[Dict[str,Any]], Dict[str, List[Tuple[str,float]]], Callable[[str], List[str]], Any, Optional[int])->List[List[Tuple[str,float]]]
     """* What you can do
-    - スコアリング関数
-    - カテゴリごとにスコアを算出することができます。
+    - 評価データのテキストをスコアリングします。
+    - sparse_scoring_engineがあれば、すべてのテキストを疎行列の積でまとめてスコアリングします。
     """
-    # type: (str, Dict[str, List[Tuple[str,float]]], Callable[[str], List[str]])->List[Tuple[str,float]]
-    key_function = lambda tuple_obj: tuple_obj[0]
-    list_tokens = function_tokenizer(input_text)
-    seq_score_elements = [word_score_dictionary[token] for token in list_tokens if token in word_score_dictionary]
-
-    score_category = []
-    for key_name, grouped_obj in groupby(sorted(chain.from_iterable(seq_score_elements), key=key_function, reverse=True), key=key_function):
-        category_score = sum([score_tuple[1] for score_tuple in grouped_obj])
-        score_category.append((key_name, category_score))
+    if sparse_scoring_engine is None:
+        return [get_text_score(input_text=evaluation_obj['text'],
+                               word_score_dictionary=word_score_dictionary,
+                               function_tokenizer=function_tokenizer,
+                               top_k=top_k)
+                for evaluation_obj in seq_evaluation_obj]
 
-    return sorted(score_category, key=lambda tuple_obj: tuple_obj[1], reverse=True)
+    return sparse_scoring_engine.score_texts([evaluation_obj['text'] for evaluation_obj in seq_evaluation_obj],
+                                             function_tokenizer=function_tokenizer,
+                                             top_k=top_k)
 
 
 def evaluate_result(gold_label,
@@ -158,24 +127,353 @@ def  get_result_statistics(seq_result_tuple):
                                                                         len(seq_result_flags)))
 
 
+def prepare_scoring_resources(path_mecab_bin,
+                              path_dictionary_data,
+                              pos_condition,
+                              path_dictionary_index=None,
+                              path_dictionary_sqlite=None,
+                              is_use_sparse_engine=False,
+                              path_tokenize_cache=None):
+    # type: (str, str, List[Tuple[str,...]], Optional[str], Optional[str], bool, Optional[str])->Tuple[Any, Callable[[str], List[str]], Any, Optional[TokenizeCache]]
+    """* What you can do
+    - 評価に使う辞書、トークナイザー、疎行列エンジン、形態素解析キャッシュを用意します。
+    """
+    mecab_tokenizer = create_mecab_tokenizer(path_mecab_bin)
+    word_score_dictionary = load_word_score_dictionary(path_dictionary_data, path_dictionary_index, path_dictionary_sqlite)
+
+    if is_use_sparse_engine:
+        from sparse_scoring import SparseScoringEngine
+        sparse_scoring_engine = SparseScoringEngine.from_word_score_dictionary(word_score_dictionary)
+    else:
+        sparse_scoring_engine = None
+
+    function_mecab_tokenizer = partial(tokenize, mecab_tokenizer=mecab_tokenizer, pos_condition=pos_condition)
+    if path_tokenize_cache is not None:
+        ### 形態素解析の結果をディスクにキャッシュし、実行をまたいで再利用します ###
+        from tokenize_cache import TokenizeCache, get_mecab_dictionary_version
+        tokenize_cache = TokenizeCache(path_tokenize_cache,
+                                       dict_type='neologd',
+                                       pos_condition=pos_condition,
+                                       mecab_dictionary_version=get_mecab_dictionary_version(path_mecab_bin))
+        function_mecab_tokenizer = tokenize_cache.wrap(function_mecab_tokenizer)
+    else:
+        tokenize_cache = None
+
+    return word_score_dictionary, function_mecab_tokenizer, sparse_scoring_engine, tokenize_cache
+
+
+def close_scoring_resources(word_score_dictionary, tokenize_cache=None):
+    # type: (Any, Optional[TokenizeCache])->None
+    close_word_score_dictionary(word_score_dictionary)
+    if tokenize_cache is not None:
+        tokenize_cache.report()
+        tokenize_cache.close()
+
+
+def get_gold_rank(gold_label, seq_score_tuple):
+    # type: (str, List[Tuple[str,float]])->Optional[int]
+    """* What you can do
+    - 正解カテゴリの順位(1始まり)を返します。順位づけされていない場合はNoneを返します。
+    """
+    for rank, score_tuple in enumerate(seq_score_tuple, start=1):
+        if score_tuple[0] == gold_label:
+            return rank
+    return None
+
+
+def get_ranking_metrics(seq_gold_rank, seq_k):
+    # type: (List[Optional[int]], Iterable[int])->Dict[str,Any]
+    """* What you can do
+    - 正解カテゴリの順位のリストから、top-k正解率、MRR(平均逆順位)、順位の分布を計算します。
+
+    * Output
+    >>> {"n": 2, "top_k_accuracy": {"1": 0.5, "3": 1.0}, "mrr": 0.75, "rank_distribution": {"1": 1, "2": 1}}
+    """
+    n_document = len(seq_gold_rank)
+    rank_distribution = Counter('not_ranked' if gold_rank is None else str(gold_rank) for gold_rank in seq_gold_rank)
+    return {
+        'n': n_document,
+        'top_k_accuracy': {str(k): len([gold_rank for gold_rank in seq_gold_rank
+                                        if gold_rank is not None and gold_rank <= k]) / n_document if n_document else 0.0
+                           for k in seq_k},
+        'mrr': sum(1.0 / gold_rank for gold_rank in seq_gold_rank if gold_rank is not None) / n_document if n_document else 0.0,
+        'rank_distribution': dict(sorted(rank_distribution.items(),
+                                         key=lambda tuple_obj: (tuple_obj[0] == 'not_ranked', int(tuple_obj[0]) if tuple_obj[0].isdigit() else 0))),
+    }
+
+
+def evaluate_section(seq_evaluation_obj,
+                     seq_section_score_tuple,
+                     seq_k,
+                     n_keep_prediction=5):
+    # type: (List[Dict[str,Any]], List[List[Tuple[str,float]]], Iterable[int], int)->Dict[str,Any]
+    """* What you can do
+    - 1つのセクション(summaryまたはfull)の評価結果を、全体と大カテゴリごとに集計します。
+    - 記事ごとの正解カテゴリの順位と、上位n_keep_prediction件の予測も返します。
+    """
+    documents = [get_document_result(evaluation_obj, seq_score_tuple, n_keep_prediction)
+                 for evaluation_obj, seq_score_tuple in zip(seq_evaluation_obj, seq_section_score_tuple)]
+    return summarize_section(documents, seq_k)
+
+
+def get_document_result(evaluation_obj, seq_score_tuple, n_keep_prediction=5):
+    # type: (Dict[str,Any], List[Tuple[str,float]], int)->Dict[str,Any]
+    return {
+        'page_title': evaluation_obj['page_title'],
+        'gold_label': evaluation_obj['gold_label'],
+        'gold_rank': get_gold_rank(evaluation_obj['gold_label'], seq_score_tuple),
+        'prediction': seq_score_tuple[:n_keep_prediction],
+    }
+
+
+def summarize_section(documents, seq_k):
+    # type: (List[Dict[str,Any]], Iterable[int])->Dict[str,Any]
+    """* What you can do
+    - 記事ごとの評価結果を、全体と大カテゴリごとに集計します。
+    """
+    seq_k = list(seq_k)
+    key_function = lambda document: document['gold_label'].split('-')[0]
+    per_category = {}
+    for category_name, seq_document in groupby(sorted(documents, key=key_function, reverse=True), key=key_function):
+        per_category[category_name] = get_ranking_metrics([document['gold_rank'] for document in seq_document], seq_k)
+
+    return {
+        'overall': get_ranking_metrics([document['gold_rank'] for document in documents], seq_k),
+        'per_category': per_category,
+        'documents': documents,
+    }
+
+
+def log_section_report(section_name, section_report):
+    # type: (str, Dict[str,Any])->None
+    logger.info(msg='='*40)
+    overall = section_report['overall']
+    for k, accuracy in overall['top_k_accuracy'].items():
+        logger.info(msg='Accuracy of wikipedia {} text when rank={}; {}'.format(section_name, k, accuracy))
+    logger.info(msg='MRR of wikipedia {} text; {}'.format(section_name, overall['mrr']))
+    logger.info(msg='Rank distribution; {}'.format(overall['rank_distribution']))
+    for category_name, metrics in section_report['per_category'].items():
+        logger.info(msg='Category={}; N={}, accuracy={}, MRR={}'.format(category_name,
+                                                                         metrics['n'],
+                                                                         metrics['top_k_accuracy'],
+                                                                         metrics['mrr']))
+    logger.info('+'*40)
+
+
+def evaluate_ranking(path_mecab_bin,
+                     path_evaluation_data,
+                     path_dictionary_data,
+                     pos_condition,
+                     seq_k=(1, 3, 5),
+                     path_output_json=None,
+                     path_dictionary_index=None,
+                     path_dictionary_sqlite=None,
+                     is_use_sparse_engine=False,
+                     path_tokenize_cache=None,
+                     chunk_size=256,
+                     path_metrics_output=None,
+                     dedupe_threshold=None):
+    # type: (str, str, str, List[Tuple[str,...]], Iterable[int], Optional[str], Optional[str], Optional[str], bool, Optional[str], int, Optional[str], Optional[float])->Dict[str,Any]
+    """* What you can do
+    - 各記事を一度だけスコアリングし、任意のkのtop-k正解率、MRR、正解カテゴリの順位分布を計算します。
+    - summaryとfullの両方のセクションについて、大カテゴリごとの内訳も出します。
+    - path_output_jsonを指定すると、評価結果をJSONで書き出します。
+    - 評価データはchunk_size件ずつ読み込むため、評価データ全体をメモリに載せません。
+    - path_metrics_outputを指定すると、処理段階ごとの計測値を書き出します。拡張子が.jsonならJSON、それ以外ならPrometheusのテキスト形式です。
+    - dedupe_thresholdを指定すると、batch_classify.pyと同じく、ほぼ同じ記事は代表の1件だけをスコアリングしてその順位を使います。
+      しきい値ごとの正解率の変化を確認できます。重複の割合はセクションごとのdedupeに書き出します。
+    """
+    seq_k = sorted(seq_k)
+    if path_metrics_output is not None:
+        METRICS.enable()
+    word_score_dictionary, function_mecab_tokenizer, sparse_scoring_engine, tokenize_cache = prepare_scoring_resources(
+        path_mecab_bin=path_mecab_bin,
+        path_dictionary_data=path_dictionary_data,
+        pos_condition=pos_condition,
+        path_dictionary_index=path_dictionary_index,
+        path_dictionary_sqlite=path_dictionary_sqlite,
+        is_use_sparse_engine=is_use_sparse_engine,
+        path_tokenize_cache=path_tokenize_cache)
+
+    evaluation_report = {
+        'k': seq_k,
+        'pos_condition': [list(pos) for pos in pos_condition],
+        'sections': {},
+    }
+    for section_name in ('summary', 'full'):
+        documents = []
+        near_duplicate_stage = None if dedupe_threshold is None else NearDuplicateStage(threshold=dedupe_threshold)
+        seq_evaluation_obj = iter_evaluation_data(path_evaluation_data, section_name)
+        while True:
+            chunk = list(islice(seq_evaluation_obj, chunk_size))
+            if not chunk:
+                break
+            scored_chunk = chunk
+            if near_duplicate_stage is not None:
+                plan, representative_chunk = near_duplicate_stage.split_chunk(
+                    [(position, evaluation_obj['text']) for position, evaluation_obj in enumerate(chunk)])
+                scored_chunk = [{'text': text} for _, text in representative_chunk]
+            #### 順位をすべて保持するため、top_kを指定せずにスコアリングします ####
+            seq_section_score_tuple = score_evaluation_texts(scored_chunk,
+                                                             word_score_dictionary=word_score_dictionary,
+                                                             function_tokenizer=function_mecab_tokenizer,
+                                                             sparse_scoring_engine=sparse_scoring_engine)
+            if near_duplicate_stage is not None:
+                seq_representative_result = [(representative_key, seq_score_tuple) for (representative_key, _), seq_score_tuple
+                                             in zip(representative_chunk, seq_section_score_tuple)]
+                seq_section_score_tuple = [seq_score_tuple for _, seq_score_tuple
+                                           in near_duplicate_stage.fan_out(plan, seq_representative_result)]
+            documents += [get_document_result(evaluation_obj, seq_score_tuple)
+                          for evaluation_obj, seq_score_tuple in zip(chunk, seq_section_score_tuple)]
+        section_report = summarize_section(documents, seq_k)
+        if near_duplicate_stage is not None:
+            section_report['dedupe'] = near_duplicate_stage.get_report()
+        log_section_report(section_name, section_report)
+        evaluation_report['sections'][section_name] = section_report
+
+    close_scoring_resources(word_score_dictionary, tokenize_cache)
+    if path_output_json is not None:
+        with open(path_output_json, 'w') as f:
+            f.write(json.dumps(evaluation_report, ensure_ascii=False, indent=4))
+    if path_metrics_output is not None:
+        METRICS.write(path_metrics_output)
+
+    return evaluation_report
+
+
+# 比較する枝刈りと量子化の設定。キーはiter_pruned_postingsの引数とcompile_dictionary_indexのscore_encodingです。
+DEFAULT_PRUNING_SETTINGS = [
+    {},
+    {'score_encoding': 'float16'},
+    {'score_encoding': 'int8'},
+    {'max_postings': 50},
+    {'max_postings': 20},
+    {'max_postings': 10},
+    {'cumulative_mass': 0.95},
+    {'cumulative_mass': 0.8},
+    {'min_score': 0.001},
+    {'max_postings': 20, 'score_encoding': 'int8'},
+]
+
+
+def evaluate_pruning_settings(path_mecab_bin,
+                              path_evaluation_data,
+                              path_dictionary_data,
+                              pos_condition,
+                              seq_pruning_setting=DEFAULT_PRUNING_SETTINGS,
+                              seq_k=(1, 3, 5),
+                              path_index_directory=None,
+                              path_output_json=None,
+                              path_tokenize_cache=None):
+    # type: (str, str, str, List[Tuple[str,...]], List[Dict[str,Any]], Iterable[int], Optional[str], Optional[str], Optional[str])->List[Dict[str,Any]]
+    """* What you can do
+    - 枝刈りと量子化の設定ごとに辞書インデックスを作成し、インデックスの大きさ、スコアリングのスループット、top-k正解率とMRRを比較します。
+    - 評価データの形態素解析は一度だけ行い、スコアリングの時間だけを計測します。
+    - インデックスはpath_index_directory(指定がなければ一時ディレクトリ)に「設定名.idx」として残します。
+
+    * Output
+    >>> [{"name": "max_postings=20", "setting": {"max_postings": 20}, "index_bytes": 1234, "n_postings": 100,
+    ...   "sections": {"full": {"documents_per_second": 1000.0, "top_k_accuracy": {"1": 0.5}, "mrr": 0.6, ...}}}]
+    """
+    seq_k = sorted(seq_k)
+    path_index_directory = path_index_directory or mkdtemp()
+    seq_word_postings = list(group_score_records(load_dictionary_data(path_dictionary_data)))
+
+    mecab_tokenizer = create_mecab_tokenizer(path_mecab_bin)
+    function_mecab_tokenizer = partial(tokenize, mecab_tokenizer=mecab_tokenizer, pos_condition=pos_condition)
+    tokenize_cache = None
+    if path_tokenize_cache is not None:
+        from tokenize_cache import TokenizeCache, get_mecab_dictionary_version
+        tokenize_cache = TokenizeCache(path_tokenize_cache,
+                                       dict_type='neologd',
+                                       pos_condition=pos_condition,
+                                       mecab_dictionary_version=get_mecab_dictionary_version(path_mecab_bin))
+        function_mecab_tokenizer = tokenize_cache.wrap(function_mecab_tokenizer)
+    ### 形態素解析は一度だけ行います ###
+    section2documents = {}  # type: Dict[str, List[Tuple[str, List[str]]]]
+    for section_name in ('summary', 'full'):
+        section2documents[section_name] = [(evaluation_obj['gold_label'], function_mecab_tokenizer(evaluation_obj['text']))
+                                           for evaluation_obj in iter_evaluation_data(path_evaluation_data, section_name)]
+    if tokenize_cache is not None:
+        tokenize_cache.report()
+        tokenize_cache.close()
+
+    identity = lambda list_tokens: list_tokens
+    seq_pruning_result = []
+    for pruning_setting in seq_pruning_setting:
+        setting_name = get_pruning_setting_name(pruning_setting)
+        path_dictionary_index = os.path.join(path_index_directory, '{}.idx'.format(setting_name))
+        header = compile_dictionary_index(
+            iter_pruned_postings(seq_word_postings,
+                                 max_postings=pruning_setting.get('max_postings'),
+                                 min_score=pruning_setting.get('min_score'),
+                                 cumulative_mass=pruning_setting.get('cumulative_mass')),
+            path_dictionary_index,
+            metadata={'source': os.path.abspath(path_dictionary_data), 'pruning': pruning_setting},
+            score_encoding=pruning_setting.get('score_encoding', 'float64'))
+        pruning_result = {'name': setting_name,
+                          'setting': pruning_setting,
+                          'index_bytes': os.path.getsize(path_dictionary_index),
+                          'n_words': header['n_words'],
+                          'n_postings': header['n_postings'],
+                          'sections': {}}
+        with DictionaryIndex.open(path_dictionary_index) as word_score_dictionary:
+            for section_name, seq_document in section2documents.items():
+                start = time.perf_counter()
+                #### 順位をすべて保持するため、top_kを指定せずにスコアリングします ####
+                seq_section_score_tuple = [get_text_score(list_tokens, word_score_dictionary, identity)
+                                           for _, list_tokens in seq_document]
+                elapsed = time.perf_counter() - start
+                section_result = get_ranking_metrics(
+                    [get_gold_rank(gold_label, seq_score_tuple)
+                     for (gold_label, _), seq_score_tuple in zip(seq_document, seq_section_score_tuple)],
+                    seq_k)
+                section_result['documents_per_second'] = len(seq_document) / elapsed if elapsed > 0 else 0.0
+                pruning_result['sections'][section_name] = section_result
+        logger.info(msg='{:<40} size={:>8.1f} MB, N(posting)={:>9}, full: {:>8.1f} docs/sec, accuracy={}, mrr={:.3f}'.format(
+            setting_name,
+            pruning_result['index_bytes'] / 1024 ** 2,
+            pruning_result['n_postings'],
+            pruning_result['sections']['full']['documents_per_second'],
+            pruning_result['sections']['full']['top_k_accuracy'],
+            pruning_result['sections']['full']['mrr']))
+        seq_pruning_result.append(pruning_result)
+
+    if path_output_json is not None:
+        with open(path_output_json, 'w') as f:
+            f.write(json.dumps(seq_pruning_result, ensure_ascii=False, indent=4))
+
+    return seq_pruning_result
+
+
 def main(path_mecab_bin,
          path_evaluation_data,
          path_dictionary_data,
          pos_condition,
-         ranking_evaluation=3):
-    # type: (str, str, str, List[Any, int])->None
-    mecab_tokenizer = MecabWrapper(dictType='neologd', path_mecab_config=path_mecab_bin)
+         ranking_evaluation=3,
+         path_dictionary_index=None,
+         path_dictionary_sqlite=None,
+         is_use_sparse_engine=False,
+         path_tokenize_cache=None):
+    # type: (str, str, str, List[Any, int], Optional[str], Optional[str], bool, Optional[str])->None
     evaluation_data = load_evaluation_data(path_evaluation_data)
-    word_score_dictionary = reformat_dictionary(load_dictionary_data(path_dictionary_data))
-
-    function_mecab_tokenizer = partial(__tokenize, mecab_tokenizer=mecab_tokenizer, pos_condition=pos_condition)
+    word_score_dictionary, function_mecab_tokenizer, sparse_scoring_engine, tokenize_cache = prepare_scoring_resources(
+        path_mecab_bin=path_mecab_bin,
+        path_dictionary_data=path_dictionary_data,
+        pos_condition=pos_condition,
+        path_dictionary_index=path_dictionary_index,
+        path_dictionary_sqlite=path_dictionary_sqlite,
+        is_use_sparse_engine=is_use_sparse_engine,
+        path_tokenize_cache=path_tokenize_cache)
     flags = []
     ### wikipediaリードテキストに対する評価 ###
-    for evaluation_obj in evaluation_data['summary']:
-        #### スコアリングの実施 ####
-        seq_score_tuple = get_text_score(input_text=evaluation_obj['text'],
-                                         word_score_dictionary=word_score_dictionary,
-                                         function_tokenizer=function_mecab_tokenizer)
+    #### スコアリングの実施 ####
+    seq_section_score_tuple = score_evaluation_texts(evaluation_data['summary'],
+                                                     word_score_dictionary=word_score_dictionary,
+                                                     function_tokenizer=function_mecab_tokenizer,
+                                                     sparse_scoring_engine=sparse_scoring_engine,
+                                                     top_k=ranking_evaluation)
+    for evaluation_obj, seq_score_tuple in zip(evaluation_data['summary'], seq_section_score_tuple):
         #### 評価 ####
         tuple_boolean_flag = evaluate_result(gold_label=evaluation_obj['gold_label'],
                                        predicred_result=seq_score_tuple[:ranking_evaluation])
@@ -199,11 +497,13 @@ def main(path_mecab_bin,
 
     ### wikipedia全文に対する評価 ###
     flags = []
-    for evaluation_obj in evaluation_data['full']:
-        #### スコアリングの実施 ####
-        seq_score_tuple = get_text_score(input_text=evaluation_obj['text'],
-                                         word_score_dictionary=word_score_dictionary,
-                                         function_tokenizer=function_mecab_tokenizer)
+    #### スコアリングの実施 ####
+    seq_section_score_tuple = score_evaluation_texts(evaluation_data['full'],
+                                                     word_score_dictionary=word_score_dictionary,
+                                                     function_tokenizer=function_mecab_tokenizer,
+                                                     sparse_scoring_engine=sparse_scoring_engine,
+                                                     top_k=ranking_evaluation)
+    for evaluation_obj, seq_score_tuple in zip(evaluation_data['full'], seq_section_score_tuple):
         #### 評価 ####
         tuple_boolean_flag = evaluate_result(gold_label=evaluation_obj['gold_label'],
                                        predicred_result=seq_score_tuple[:ranking_evaluation])
@@ -222,39 +522,54 @@ def main(path_mecab_bin,
     get_result_statistics(flags)
     logger.info('+'*40)
 
-    if isinstance(word_score_dictionary, SqliteDict): word_score_dictionary.close()
+    close_scoring_resources(word_score_dictionary, tokenize_cache)
 
 
 if __name__ == '__main__':
     PATH_MECAB_BIN = '/usr/local/bin'
     #PATH_EVALUATION_DATA = './wikipedia-text/wikipedia_text.json'
-    PATH_EVALUATION_DATA = './wikipedia-text/wikipedia_text.json'
+    PATH_EVALUATION_DATA = './wikipedia-text/wikipedia_text.jsonl'
 
     #PATH_DICTIONARY_DATA = './wikipedia-text/word_soa.json'
     PATH_DICTIONARY_DATA = './dictionary-data/word_soa.json'
+    ### コンパイル済み辞書インデックス。初回のmain実行時に作成され、以降はmmapで読み込みます。
+    PATH_DICTIONARY_INDEX = './dictionary-data/word_soa.idx'
+    ### 形態素解析結果のキャッシュ。次回以降の評価で同じ解析結果を再利用します。
+    PATH_TOKENIZE_CACHE = './wikipedia-text/tokenize_cache.sqlite3'
+    ### 評価結果のJSONの出力先
+    PATH_EVALUATION_RESULT = './wikipedia-text/evaluation_result.json'
+    ### Trueなら、枝刈りと量子化の設定ごとにインデックスの大きさ、スループット、正解率を比較します
+    IS_EVALUATE_PRUNING = False
+    PATH_PRUNING_RESULT = './wikipedia-text/pruning_result.json'
+    ### 処理段階ごとの計測値の出力先。Noneなら計測しません。(例: './wikipedia-text/evaluation_metrics.prom')
+    PATH_METRICS_OUTPUT = None
+    ### ほぼ同じ記事をまとめる推定Jaccard係数のしきい値。Noneならまとめません。(例: 0.9)
+    DEDUPE_THRESHOLD = None
     pos_condition = [('名詞', '固有名詞'), ('名詞', '一般'), ('名詞', 'サ変接続'), ('動詞', '自立')]
     if not os.path.exists(PATH_DICTIONARY_DATA): raise FileExistsError('辞書ファイルが発見できません。')
 
-    main(
-        path_mecab_bin=PATH_MECAB_BIN,
-        path_evaluation_data=PATH_EVALUATION_DATA,
-        path_dictionary_data=PATH_DICTIONARY_DATA,
-        pos_condition=pos_condition,
-        ranking_evaluation=1
-    )
-
-    main(
-        path_mecab_bin=PATH_MECAB_BIN,
-        path_evaluation_data=PATH_EVALUATION_DATA,
-        path_dictionary_data=PATH_DICTIONARY_DATA,
-        pos_condition=pos_condition,
-        ranking_evaluation=3
-    )
-
-    main(
-        path_mecab_bin=PATH_MECAB_BIN,
-        path_evaluation_data=PATH_EVALUATION_DATA,
-        path_dictionary_data=PATH_DICTIONARY_DATA,
-        pos_condition=pos_condition,
-        ranking_evaluation=5
-    )
\ No newline at end of file
+    if IS_EVALUATE_PRUNING:
+        evaluate_pruning_settings(
+            path_mecab_bin=PATH_MECAB_BIN,
+            path_evaluation_data=PATH_EVALUATION_DATA,
+            path_dictionary_data=PATH_DICTIONARY_DATA,
+            pos_condition=pos_condition,
+            seq_k=(1, 3, 5),
+            path_index_directory='./dictionary-data',
+            path_output_json=PATH_PRUNING_RESULT,
+            path_tokenize_cache=PATH_TOKENIZE_CACHE
+        )
+    else:
+        ### 各記事を一度だけスコアリングし、rank=1,3,5の正解率とMRRをまとめて計算します ###
+        evaluate_ranking(
+            path_mecab_bin=PATH_MECAB_BIN,
+            path_evaluation_data=PATH_EVALUATION_DATA,
+            path_dictionary_data=PATH_DICTIONARY_DATA,
+            pos_condition=pos_condition,
+            seq_k=(1, 3, 5),
+            path_output_json=PATH_EVALUATION_RESULT,
+            path_dictionary_index=PATH_DICTIONARY_INDEX,
+            path_tokenize_cache=PATH_TOKENIZE_CACHE,
+            path_metrics_output=PATH_METRICS_OUTPUT,
+            dedupe_threshold=DEDUPE_THRESHOLD
+        )
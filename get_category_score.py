@@ -1,140 +1,73 @@
-from typing import List, Dict, Union, Any, Tuple, Callable
-from tempfile import mkdtemp
-from itertools import chain, groupby
+from typing import List, Tuple, Optional
 from functools import partial
-import json
-import logging
 import os
 
 """辞書の利用法の一例として、テキストのカテゴリ判別をします。
 辞書のスコアにしたがって、テキストにスコア計算をし、ランキングが高い順にカテゴリ名を表示します。
 
-Python3.5.1の環境下で動作を確認しています。
+Python3.5.2以上で動作します。
 """
 
 __author__ = "Kensuke Mitsuzawa"
 __author_email__ = "kensuke_mitsuzawa@fumankaitori.com"
 __license_name__ = "MIT"
 
-try:
-    from JapaneseTokenizer import MecabWrapper
-
-except ImportError:
-    raise ImportError('先にpip install JapaneseTokenizerを実行してください。')
-
-try:
-    from sqlitedict import SqliteDict
-except ImportError:
-    raise ImportError('先にpip install sqlitedictを実行してください')
-
-POS_CONDITION = [('名詞', '固有名詞'), ('名詞', '一般'), ('名詞', 'サ変接続'), ('動詞', '自立')]
-
-def load_dictionary_data(path_dictionary_data):
-    # type: (str)->List[Dict[str,Any]]
-    with open(path_dictionary_data, 'r') as f:
-        return json.loads(f.read())
-
-
-def save_into_cached_dictionary(dict_object:Dict[str, List[List[str]]], cached_dict_object:SqliteDict):
-    for key, values in dict_object.items():
-        if not key in cached_dict_object:
-            cached_dict_object[key] = values
-        else:
-            cached_dict_object[key] += values
-
-    del dict_object
-    return cached_dict_object
-
-
-def reformat_dictionary(score_dictionary,
-                        batch_size=10000,
-                        is_use_sqlite=False):
-    # type: (List[Dict[str,Any]], int)->Union[SqliteDict, Dict[str, List[Tuple[str,float]]]]
-    """* What you can do
-    - 辞書の形を変形します。
-
-    * Input
-    >>> [{"label": "アウトドア・スポーツ-その他", "score": 0.02942301705479622, "word": "お金"}]
-
-    * Output
-    >>> {"お金": [("アウトドア・スポーツ-その他", 0.02942301705479622)]}
-    """
-    temporary_dir = mkdtemp()
-    if is_use_sqlite:
-        word_score_dictionary = SqliteDict(os.path.join(temporary_dir, 'temporary_dict.sqlite3'), autocommit=True)
-    else:
-        word_score_dictionary = {}
-
-    logging.info(msg="Loaded N(record)={}".format(len(score_dictionary)))
-
-    if is_use_sqlite:
-        counter = 0  # type: int
-        temporary_dict_obj = {}
-
-        for score_object in score_dictionary:
-            score_tuple = (score_object['label'], score_object['score'])
-            if not score_object['word'] in temporary_dict_obj:
-                temporary_dict_obj[score_object['word']] = [score_tuple]
-            else:
-                temporary_dict_obj[score_object['word']].append(score_tuple)
-
-            counter += 1
-            if counter % batch_size == 0:
-                word_score_dictionary = save_into_cached_dictionary(temporary_dict_obj, word_score_dictionary)
-                del temporary_dict_obj
-                temporary_dict_obj = {}
-                logging.info(msg='Processed {} records now.'.format(counter))
-    else:
-        for score_object in score_dictionary:
-            score_tuple = (score_object['label'], score_object['score'])
-            if not score_object['word'] in word_score_dictionary:
-                word_score_dictionary[score_object['word']] = [score_tuple]
-            else:
-                word_score_dictionary[score_object['word']].append(score_tuple)
-
-    return word_score_dictionary
-
-
-def __tokenize(input_string: str, mecab_tokenizer, pos_condition)->List[str]:
-    tokenized_sentence_obj = mecab_tokenizer.tokenize(sentence=input_string, return_list=False)
-    return mecab_tokenizer.filter(parsed_sentence=tokenized_sentence_obj, pos_condition=pos_condition).convert_list_object()
-
-
-def get_text_score(input_text,
-                   word_score_dictionary,
-                   function_tokenizer):
-    """* What you can do
-    - スコアリング関数
-    - カテゴリごとにスコアを算出することができます。
-    """
-    # type: (str, Dict[str, List[Tuple[str,float]]], Callable[[str], List[str]])->List[Tuple[str,float]]
-    key_function = lambda tuple_obj: tuple_obj[0]
-    list_tokens = function_tokenizer(input_text)
-    seq_score_elements = [word_score_dictionary[token] for token in list_tokens if token in word_score_dictionary]
-
-    score_category = []
-    for key_name, grouped_obj in groupby(sorted(chain.from_iterable(seq_score_elements), key=key_function, reverse=True), key=key_function):
-        category_score = sum([score_tuple[1] for score_tuple in grouped_obj])
-        score_category.append((key_name, category_score))
-
-    return sorted(score_category, key=lambda tuple_obj: tuple_obj[1], reverse=True)
+from category_scoring import POS_CONDITION, create_mecab_tokenizer, tokenize, load_dictionary_data, \
+    reformat_dictionary, load_word_score_dictionary, close_word_score_dictionary, get_text_score
 
 
 def main(input_text:str,
          path_mecab_bin:str,
          path_dictionary_data:str,
-         pos_condition:List[Tuple[str,...]]=POS_CONDITION):
-    if not os.path.exists(os.path.join(path_mecab_bin, 'mecab-config')):
+         pos_condition:List[Tuple[str,...]]=POS_CONDITION,
+         path_dictionary_index:Optional[str]=None,
+         path_dictionary_sqlite:Optional[str]=None,
+         top_k:Optional[int]=None,
+         is_use_matcher:bool=False,
+         path_matcher:Optional[str]=None,
+         match_policy:str='longest',
+         n_contributing_tokens:Optional[int]=None,
+         result_cache=None):
+    """* What you can do
+    - is_use_matcher=Trueの場合、MeCabの代わりに辞書の語彙のAho-Corasickオートマトンでテキスト中の単語を見つけます。
+    - path_matcherを指定すると、作成したオートマトンを保存し、次回以降は読み込みます。
+    - n_contributing_tokensを指定すると、カテゴリごとにスコアへの寄与が大きいトークンも返します。
+    - result_cache(result_cache.ResultCache)を指定すると、同じテキストの結果をキャッシュから返します。
+      キャッシュに当たった場合は、辞書もトークナイザーも読み込みません。
+    """
+    if not is_use_matcher and not os.path.exists(os.path.join(path_mecab_bin, 'mecab-config')):
         raise FileExistsError('mecab-configファイルが見つかりません')
-
-    mecab_tokenizer = MecabWrapper(dictType='neologd', path_mecab_config=path_mecab_bin)
-    word_score_dictionary = reformat_dictionary(load_dictionary_data(path_dictionary_data))
-
-    function_mecab_tokenizer = partial(__tokenize, mecab_tokenizer=mecab_tokenizer, pos_condition=pos_condition)
+    tokenizer_name = 'matcher-{}'.format(match_policy) if is_use_matcher else 'mecab'
+    is_use_result_cache = result_cache is not None and n_contributing_tokens is None
+    if is_use_result_cache:
+        from result_cache import get_dictionary_version
+        dictionary_version = get_dictionary_version(path_dictionary_data, path_dictionary_index, path_dictionary_sqlite)
+        result_cache.set_dictionary_version(dictionary_version)
+        seq_score_tuple = result_cache.get(input_text, pos_condition, top_k, tokenizer_name)
+        if seq_score_tuple is not None:
+            return seq_score_tuple
+
+    word_score_dictionary = load_word_score_dictionary(path_dictionary_data, path_dictionary_index, path_dictionary_sqlite)
+    if is_use_matcher:
+        from dictionary_matcher import load_dictionary_matcher
+        function_tokenizer = load_dictionary_matcher(word_score_dictionary,
+                                                     path_matcher=path_matcher,
+                                                     path_dictionary_data=path_dictionary_data,
+                                                     match_policy=match_policy).tokenize
+    else:
+        mecab_tokenizer = create_mecab_tokenizer(path_mecab_bin)
+        function_tokenizer = partial(tokenize, mecab_tokenizer=mecab_tokenizer, pos_condition=pos_condition)
 
     seq_score_tuple = get_text_score(input_text=input_text,
                                      word_score_dictionary=word_score_dictionary,
-                                     function_tokenizer=function_mecab_tokenizer)
+                                     function_tokenizer=function_tokenizer,
+                                     top_k=top_k,
+                                     n_contributing_tokens=n_contributing_tokens)
+    close_word_score_dictionary(word_score_dictionary)
+    if is_use_result_cache:
+        result_cache.put(input_text, pos_condition, top_k, seq_score_tuple, tokenizer_name,
+                         dictionary_version=dictionary_version)
+        result_cache.flush()
 
     return seq_score_tuple
 
@@ -145,10 +78,14 @@ if __name__ == '__main__':
     path_mecab_bin = '/usr/local/bin'
     ### 辞書jsonファイルが存在しているパス
     path_dictionary_json = './dictionary-data/word_soa.json'
+    ### コンパイル済み辞書インデックスのパス。存在しなければ初回実行時に作成します。
+    path_dictionary_index = './dictionary-data/word_soa.idx'
 
     seq_evaluated_result = main(input_text=input_text,
                                 path_mecab_bin=path_mecab_bin,
-                                path_dictionary_data=path_dictionary_json)
+                                path_dictionary_data=path_dictionary_json,
+                                path_dictionary_index=path_dictionary_index,
+                                top_k=10)
     import pprint
     ### スコアが高い順に10カテゴリまでをチェックする
-    pprint.pprint(seq_evaluated_result[:10])
\ No newline at end of file
+    pprint.pprint(seq_evaluated_result)
\ No newline at end of file
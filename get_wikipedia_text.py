@@ -1,15 +1,31 @@
-from typing import List, Tuple, Dict, Union
-import wikipedia
+from typing import List, Tuple, Dict, Union, Iterator, Set
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.error import HTTPError, URLError
+from urllib.parse import urlencode
+from urllib.request import Request, urlopen
 import json
+import os
+import random
+import re
+import threading
 import time
 import logging
 logger = logging.getLogger(__file__)
 logger.setLevel(logging.INFO)
 
-SLEEP_TIME = 3
+# 全スレッド合計での1秒あたりのリクエスト数の上限
+REQUESTS_PER_SECOND = 1.0
+WIKIPEDIA_API_URL = 'https://ja.wikipedia.org/w/api.php'
+USER_AGENT = 'fuman-category-dictionary-tools/0.1 (kensuke_mitsuzawa@fumankaitori.com)'
+# 再試行するHTTPステータス
+RETRY_HTTP_STATUS = (429, 500, 502, 503, 504)
 
 """辞書の性能評価をするための、評価データを生成します。
 評価用のテキストのため、wikipediaから記事の取得を実行します。
+記事は複数のスレッドで並行して取得し、全スレッドで共有するトークンバケットでリクエストの頻度を制限します。
+1記事につき1回だけ全文を取得し、リード文(summary)は全文の冒頭から作ります。
+取得した記事はすぐにJSONLファイルに追記するため、途中で中断しても再実行時には続きから取得します。
 
 Python3.5.1の環境下で動作を確認しています。
 """
@@ -19,62 +35,197 @@ __author_email__ = "kensuke_mitsuzawa@fumankaitori.com"
 __license_name__ = "MIT"
 
 
-def get_wikipedia_page(page_title):
-    # type: (str) -> Union[bool, str]
-    try:
-        return wikipedia.page(page_title).content
-    except:
-        logger.error()
-        return False
+class TokenBucket(object):
+    """* What you can do
+    - 複数のスレッドで共有するトークンバケットです。1秒あたりrate回、最大capacity回までの連続したリクエストを許可します。
+    """
+    def __init__(self, rate, capacity=1):
+        # type: (float, int)->None
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
 
+    def acquire(self):
+        # type: ()->None
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait_time = (1 - self.tokens) / self.rate
+            time.sleep(wait_time)
 
-def get_wikipedia_summary(page_title:str, n_summary_sentence:int=3):
-    # type: (str, int)->Union[bool, str]
-    try:
-        return wikipedia.summary(page_title, n_summary_sentence)
-    except:
-        logger.error()
-        return False
+
+def fetch_wikipedia_page(page_title,
+                         token_bucket,
+                         api_url=WIKIPEDIA_API_URL,
+                         max_retries=5,
+                         backoff_base=1.0,
+                         timeout=30):
+    # type: (str, TokenBucket, str, int, float, float)->Union[bool, str]
+    """* What you can do
+    - MediaWiki APIから記事の全文(プレーンテキスト)を取得します。
+    - 通信エラーや429/5xxのときは、指数バックオフで最大max_retries回まで再試行します。
+    - 記事が存在しない場合や、再試行しても取得できない場合はFalseを返します。
+    """
+    query = urlencode({'action': 'query', 'prop': 'extracts', 'explaintext': 1, 'redirects': 1,
+                       'format': 'json', 'titles': page_title})
+    request = Request('{}?{}'.format(api_url, query), headers={'User-Agent': USER_AGENT})
+    for n_retry in range(max_retries + 1):
+        token_bucket.acquire()
+        try:
+            with urlopen(request, timeout=timeout) as response:
+                response_obj = json.loads(response.read().decode('utf-8'))
+            for page_obj in response_obj['query']['pages'].values():
+                if 'missing' in page_obj or 'extract' not in page_obj:
+                    logger.error(msg='Wikipedia page={} does not exist.'.format(page_title))
+                    return False
+                return page_obj['extract']
+            return False
+        except HTTPError as exception:
+            if exception.code not in RETRY_HTTP_STATUS:
+                logger.exception(msg='Failed to get wikipedia page={}'.format(page_title))
+                return False
+            logger.warning(msg='HTTP {} for page={}, retry={}'.format(exception.code, page_title, n_retry))
+        except (URLError, OSError, ValueError, KeyError) as exception:
+            logger.warning(msg='{} for page={}, retry={}'.format(exception, page_title, n_retry))
+        if n_retry < max_retries:
+            time.sleep(backoff_base * (2 ** n_retry) * (1 + random.random()))
+    logger.error(msg='Gave up to get wikipedia page={} after {} retries.'.format(page_title, max_retries))
+
+    return False
+
+
+def derive_summary(content, n_summary_sentence=3):
+    # type: (str, int)->str
+    """* What you can do
+    - 記事の全文から、最初の見出しより前のリード文の先頭n_summary_sentence文を返します。
+    """
+    lead_text = re.split(r'\n\s*==', content, maxsplit=1)[0].strip()
+    seq_sentence = [sentence for sentence in re.split(r'(?<=[。！？])', lead_text) if sentence.strip()]
+
+    return ''.join(seq_sentence[:n_summary_sentence]).strip()
+
+
+def iter_fetch_wikipedia_pages(seq_page_title,
+                               n_workers=4,
+                               requests_per_second=REQUESTS_PER_SECOND,
+                               api_url=WIKIPEDIA_API_URL,
+                               max_retries=5):
+    # type: (List[str], int, float, str, int)->Iterator[Tuple[str, Union[bool, str]]]
+    """* What you can do
+    - 記事をn_workers本のスレッドで並行して取得し、取得できた順に(記事名, 全文)を返します。
+    - リクエストは全体でrequests_per_second回/秒までに制限します。
+    """
+    token_bucket = TokenBucket(rate=requests_per_second, capacity=n_workers)
+    with ThreadPoolExecutor(max_workers=n_workers) as executor:
+        future2page_title = {executor.submit(fetch_wikipedia_page, page_title, token_bucket,
+                                             api_url=api_url, max_retries=max_retries): page_title
+                             for page_title in seq_page_title}
+        for future in as_completed(future2page_title):
+            yield future2page_title[future], future.result()
+
+
+def fetch_wikipedia_pages(seq_page_title,
+                          n_workers=4,
+                          requests_per_second=REQUESTS_PER_SECOND,
+                          api_url=WIKIPEDIA_API_URL,
+                          max_retries=5):
+    # type: (List[str], int, float, str, int)->Dict[str, Union[bool, str]]
+    return dict(iter_fetch_wikipedia_pages(seq_page_title,
+                                           n_workers=n_workers,
+                                           requests_per_second=requests_per_second,
+                                           api_url=api_url,
+                                           max_retries=max_retries))
+
+
+def load_checkpoint(path_checkpoint):
+    # type: (str)->Set[Tuple[str, str]]
+    """* What you can do
+    - 書き出し済みの(記事名, 種類)の組を読み込みます。種類はsummaryかfullです。
+    """
+    completed = set()  # type: Set[Tuple[str, str]]
+    if not os.path.exists(path_checkpoint):
+        return completed
+    with open(path_checkpoint, 'r') as f:
+        for line in f:
+            try:
+                page_title, kind = json.loads(line)
+            except ValueError:
+                # 書き込み途中で中断された行は読み飛ばします。
+                continue
+            completed.add((page_title, kind))
+    return completed
+
+
+def __terminate_last_line(path_file):
+    # type: (str)->None
+    """* What you can do
+    - 書き込み途中で中断されたファイルの末尾に改行を足し、次の行が壊れないようにします。
+    """
+    if not os.path.exists(path_file) or os.path.getsize(path_file) == 0:
+        return
+    with open(path_file, 'rb+') as f:
+        f.seek(-1, os.SEEK_END)
+        if f.read(1) != b'\n':
+            f.write(b'\n')
 
 
 def main(path_extracted_wikipedia_text:str,
-         wikipedia_article_names:List[Tuple[str, str]]):
-    wikipedia.set_lang('ja')
-    wikipedia_text_data = {}
-    extracted_summary_text = []
-    for article_name in wikipedia_article_names:
-        text = get_wikipedia_summary(article_name[0])
-        wikipedia_text_format = {}
-        wikipedia_text_format["page_title"] = article_name[0]
-        wikipedia_text_format["text"] = text
-        wikipedia_text_format["gold_label"] = article_name[1]
-        logger.info(msg='Got wikipedia page={}'.format(article_name))
-        if not text is False:
-            logger.info(msg='It gets text from page-name={}'.format(article_name))
-            extracted_summary_text.append(wikipedia_text_format)
-        time.sleep(SLEEP_TIME)
-
-    extracted_full_text = []
-    for article_name in wikipedia_article_names:
-        text = get_wikipedia_page(article_name[0])
-        wikipedia_text_format = {}
-        wikipedia_text_format["page_title"] = article_name[0]
-        wikipedia_text_format["text"] = text
-        wikipedia_text_format["gold_label"] = article_name[1]
-        logger.info(msg='Got wikipedia page={}'.format(article_name))
-        if not text is False:
-            logger.info(msg='It gets text from page-name={}'.format(article_name))
-            extracted_full_text.append(wikipedia_text_format)
-        time.sleep(SLEEP_TIME)
-
-    wikipedia_text_data['summary'] = extracted_summary_text
-    wikipedia_text_data['full'] = extracted_full_text
-    with open(path_extracted_wikipedia_text, 'w') as f:
-        f.write(json.dumps(wikipedia_text_data, ensure_ascii=False, indent=4))
+         wikipedia_article_names:List[Tuple[str, str]],
+         n_workers:int=4,
+         requests_per_second:float=REQUESTS_PER_SECOND,
+         api_url:str=WIKIPEDIA_API_URL):
+    """* What you can do
+    - 取得した記事を1件ずつJSONLファイルに追記します。1行は1件の評価データです。
+    >>> {"kind": "summary", "page_title": "マジックリン", "text": "...", "gold_label": "暮らし・住まい-バス・トイレ・洗面用品"}
+    - 書き出し済みの(記事名, 種類)を「<出力ファイル>.checkpoint」に記録し、再実行時には取得済みの記事を飛ばします。
+    """
+    path_checkpoint = path_extracted_wikipedia_text + '.checkpoint'
+    completed = load_checkpoint(path_checkpoint)
+    page_title2labels = OrderedDict()  # type: Dict[str, List[str]]
+    for page_title, gold_label in wikipedia_article_names:
+        page_title2labels.setdefault(page_title, []).append(gold_label)
+    seq_pending_title = [page_title for page_title in page_title2labels
+                         if (page_title, 'summary') not in completed or (page_title, 'full') not in completed]
+    logger.info(msg='Skip {} pages already fetched. Fetch {} pages.'.format(
+        len(page_title2labels) - len(seq_pending_title), len(seq_pending_title)))
+
+    __terminate_last_line(path_extracted_wikipedia_text)
+    __terminate_last_line(path_checkpoint)
+    with open(path_extracted_wikipedia_text, 'a') as f, open(path_checkpoint, 'a') as f_checkpoint:
+        for page_title, content in iter_fetch_wikipedia_pages(seq_pending_title,
+                                                              n_workers=n_workers,
+                                                              requests_per_second=requests_per_second,
+                                                              api_url=api_url):
+            logger.info(msg='Got wikipedia page={}'.format(page_title))
+            if content is False:
+                continue
+            logger.info(msg='It gets text from page-name={}'.format(page_title))
+            seq_kind = [kind for kind in ('summary', 'full') if (page_title, kind) not in completed]
+            for kind in seq_kind:
+                for gold_label in page_title2labels[page_title]:
+                    wikipedia_text_format = {}
+                    wikipedia_text_format["kind"] = kind
+                    wikipedia_text_format["page_title"] = page_title
+                    wikipedia_text_format["text"] = derive_summary(content) if kind == 'summary' else content
+                    wikipedia_text_format["gold_label"] = gold_label
+                    f.write(json.dumps(wikipedia_text_format, ensure_ascii=False) + '\n')
+            ### 評価データを書き出してから、チェックポイントを記録します ###
+            f.flush()
+            os.fsync(f.fileno())
+            for kind in seq_kind:
+                f_checkpoint.write(json.dumps([page_title, kind], ensure_ascii=False) + '\n')
+            f_checkpoint.flush()
 
 
 if __name__ == '__main__':
-    path_extracted_wikipedia_text = './wikipedia-text/wikipedia_text.json'
+    path_extracted_wikipedia_text = './wikipedia-text/wikipedia_text.jsonl'
     wikipedia_article_names = [
         ### 住まい・暮らし ###
         ("マジックリン", "暮らし・住まい-バス・トイレ・洗面用品"),
@@ -0,0 +1,264 @@
+from typing import List, Dict, Any, Tuple, Set
+from bisect import bisect_left
+import json
+import logging
+import threading
+import time
+logger = logging.getLogger(__file__)
+logger.setLevel(logging.INFO)
+
+"""スコアリングの処理段階ごとの計測値を集計します。
+計測は明示的に有効にした場合だけ行います。無効の間は、計測箇所でMETRICS.enabledを確認するだけです。
+
+- 処理段階(load, reformat, tokenize, lookup, aggregate, rank)ごとの処理時間のヒストグラム
+- 文書ごとのトークン数、辞書のヒット率のヒストグラム
+- トークン数、未知語数、品詞ごとのヒット数などのカウンター
+
+集計値はsnapshotで辞書として取得でき、PrometheusのテキストかJSONで書き出せます。
+ワーカープロセスの集計値はdrainで取り出し、親プロセスでmergeします。
+
+Python3.5以上で動作します。
+"""
+
+__author__ = "Kensuke Mitsuzawa"
+__author_email__ = "kensuke_mitsuzawa@fumankaitori.com"
+__license_name__ = "MIT"
+
+METRIC_PREFIX = 'fmc_'
+# 処理時間(秒)のヒストグラムの区切り
+LATENCY_BUCKETS = (0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 60.0)
+# 文書あたりのトークン数のヒストグラムの区切り
+TOKEN_COUNT_BUCKETS = (10, 50, 100, 500, 1000, 5000, 10000, 50000)
+# ヒット率のヒストグラムの区切り
+RATIO_BUCKETS = (0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0)
+HISTOGRAM_BUCKETS = {
+    'stage_seconds': LATENCY_BUCKETS,
+    'document_tokens': TOKEN_COUNT_BUCKETS,
+    'dictionary_hit_rate': RATIO_BUCKETS,
+}
+HELP_TEXTS = {
+    'stage_seconds': '処理段階ごとの処理時間(秒)',
+    'document_tokens': '文書あたりのトークン数',
+    'dictionary_hit_rate': '文書ごとの、辞書に存在するトークンの割合',
+    'documents_total': 'スコアリングした文書数',
+    'tokens_total': 'トークン数',
+    'dictionary_hits_total': '辞書に存在したトークン数',
+    'unknown_tokens_total': '辞書に存在しなかったトークン数',
+    'tokens_by_pos_total': '品詞ごとのトークン数',
+}
+
+
+class MetricsRegistry(object):
+    """* What you can do
+    - カウンターとヒストグラムを、名前とラベルの組ごとに集計します。
+
+    * Example
+    >>> METRICS.enable()
+    >>> get_text_score(input_text, word_score_dictionary, function_tokenizer)
+    >>> METRICS.to_prometheus()
+    """
+    def __init__(self):
+        self.enabled = False
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.counters = {}  # type: Dict[Tuple[str, Tuple[Tuple[str,str],...]], float]
+        self.histograms = {}  # type: Dict[Tuple[str, Tuple[Tuple[str,str],...]], List[float]]
+
+    def enable(self):
+        # type: ()->None
+        self.enabled = True
+
+    def disable(self):
+        # type: ()->None
+        self.enabled = False
+
+    def reset(self):
+        # type: ()->None
+        with self.lock:
+            self.counters = {}
+            self.histograms = {}
+
+    def increment(self, name, value=1, **labels):
+        # type: (str, float, str)->None
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        # type: (str, float, str)->None
+        """* What you can do
+        - ヒストグラムに値を1つ加えます。ヒストグラムは[区切りごとの件数..., +Infの件数, 合計値]のリストで保持します。
+        """
+        key = (name, tuple(sorted(labels.items())))
+        buckets = HISTOGRAM_BUCKETS[name]
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = [0] * (len(buckets) + 1) + [0.0]
+                self.histograms[key] = histogram
+            histogram[bisect_left(buckets, value)] += 1
+            histogram[-1] += value
+
+    def observe_stage(self, stage, start):
+        # type: (str, float)->None
+        """* What you can do
+        - time.perf_counter()で取得した開始時刻startから現在までを、stageの処理時間として記録します。
+        """
+        self.observe('stage_seconds', time.perf_counter() - start, stage=stage)
+
+    def set_token_pos(self, token2pos):
+        # type: (Dict[str,str])->None
+        """* What you can do
+        - 直前に形態素解析した文書の、トークンから品詞への対応を保持します。スレッドごとに保持します。
+        """
+        self.local.token2pos = token2pos
+
+    def pop_token_pos(self):
+        # type: ()->Dict[str,str]
+        token2pos = getattr(self.local, 'token2pos', None) or {}
+        self.local.token2pos = None
+        return token2pos
+
+    def snapshot(self):
+        # type: ()->Dict[str,Any]
+        """* What you can do
+        - 集計値を、JSONに変換できる辞書として返します。
+
+        * Output
+        >>> {"counters": [{"name": "tokens_total", "labels": {}, "value": 100}],
+        ...  "histograms": [{"name": "stage_seconds", "labels": {"stage": "lookup"}, "buckets": [0.00001, ...],
+        ...                  "counts": [0, 3, ...], "count": 10, "sum": 0.01}]}
+        """
+        with self.lock:
+            counters = dict(self.counters)
+            histograms = {key: list(histogram) for key, histogram in self.histograms.items()}
+        return build_snapshot(counters, histograms)
+
+    def drain(self):
+        # type: ()->Dict[str,Any]
+        """* What you can do
+        - 集計値を返し、リセットします。ワーカープロセスから親プロセスへ集計値を送るときに使います。
+        """
+        with self.lock:
+            counters, histograms = self.counters, self.histograms
+            self.counters = {}
+            self.histograms = {}
+        return build_snapshot(counters, histograms)
+
+    def merge(self, snapshot):
+        # type: (Dict[str,Any])->None
+        """* What you can do
+        - snapshotやdrainで取得した集計値を加算します。
+        """
+        with self.lock:
+            for counter in snapshot['counters']:
+                key = (counter['name'], tuple(sorted(counter['labels'].items())))
+                self.counters[key] = self.counters.get(key, 0) + counter['value']
+            for histogram_obj in snapshot['histograms']:
+                key = (histogram_obj['name'], tuple(sorted(histogram_obj['labels'].items())))
+                histogram = self.histograms.get(key)
+                if histogram is None:
+                    histogram = [0] * (len(histogram_obj['counts'])) + [0.0]
+                    self.histograms[key] = histogram
+                for index, count in enumerate(histogram_obj['counts']):
+                    histogram[index] += count
+                histogram[-1] += histogram_obj['sum']
+
+    def to_json(self):
+        # type: ()->str
+        return json.dumps(self.snapshot(), ensure_ascii=False, indent=4)
+
+    def to_prometheus(self):
+        # type: ()->str
+        """* What you can do
+        - 集計値をPrometheusのテキスト形式で返します。
+        """
+        snapshot = self.snapshot()
+        lines = []  # type: List[str]
+        seen_names = set()
+        for counter in snapshot['counters']:
+            metric_name = METRIC_PREFIX + counter['name']
+            if metric_name not in seen_names:
+                seen_names.add(metric_name)
+                lines.append('# HELP {} {}'.format(metric_name, HELP_TEXTS.get(counter['name'], counter['name'])))
+                lines.append('# TYPE {} counter'.format(metric_name))
+            lines.append('{}{} {}'.format(metric_name, format_labels(counter['labels']), counter['value']))
+        for histogram in snapshot['histograms']:
+            metric_name = METRIC_PREFIX + histogram['name']
+            if metric_name not in seen_names:
+                seen_names.add(metric_name)
+                lines.append('# HELP {} {}'.format(metric_name, HELP_TEXTS.get(histogram['name'], histogram['name'])))
+                lines.append('# TYPE {} histogram'.format(metric_name))
+            cumulative_count = 0
+            for upper_bound, count in zip(list(histogram['buckets']) + ['+Inf'], histogram['counts']):
+                cumulative_count += count
+                labels = dict(histogram['labels'], le=str(upper_bound))
+                lines.append('{}_bucket{} {}'.format(metric_name, format_labels(labels), cumulative_count))
+            lines.append('{}_sum{} {}'.format(metric_name, format_labels(histogram['labels']), histogram['sum']))
+            lines.append('{}_count{} {}'.format(metric_name, format_labels(histogram['labels']), histogram['count']))
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path_output):
+        # type: (str)->None
+        """* What you can do
+        - 拡張子が.jsonならJSON、それ以外ならPrometheusのテキスト形式で書き出します。
+        """
+        with open(path_output, 'w') as f:
+            f.write(self.to_json() if path_output.endswith('.json') else self.to_prometheus())
+        logger.info(msg='Wrote metrics into {}'.format(path_output))
+
+
+def build_snapshot(counters, histograms):
+    # type: (Dict[Tuple[str, Tuple[Tuple[str,str],...]], float], Dict[Tuple[str, Tuple[Tuple[str,str],...]], List[float]])->Dict[str,Any]
+    return {
+        'counters': [{'name': name, 'labels': dict(labels), 'value': value}
+                     for (name, labels), value in sorted(counters.items())],
+        'histograms': [{'name': name,
+                        'labels': dict(labels),
+                        'buckets': list(HISTOGRAM_BUCKETS[name]),
+                        'counts': histogram[:-1],
+                        'count': sum(histogram[:-1]),
+                        'sum': histogram[-1]}
+                       for (name, labels), histogram in sorted(histograms.items())],
+    }
+
+
+def format_labels(labels):
+    # type: (Dict[str,str])->str
+    """* What you can do
+    - Prometheusのテキスト形式のラベルを返します。ラベルの値のバックスラッシュ、ダブルクォート、改行はエスケープします。
+    """
+    if not labels:
+        return ''
+    return '{' + ','.join('{}="{}"'.format(key,
+                                           str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+                          for key, value in sorted(labels.items())) + '}'
+
+
+def record_document(token_frequency, hit_tokens):
+    # type: (Dict[str,int], Set[str])->None
+    """* What you can do
+    - 1文書のトークン数、辞書のヒット数、未知語数、品詞ごとのヒット数を記録します。
+    - 品詞は、直前にcategory_scoring.tokenizeが記録したものを使います。形態素解析キャッシュから読み込んだ場合など、記録がなければ品詞ごとの集計は行いません。
+    """
+    token2pos = METRICS.pop_token_pos()
+    n_tokens = 0
+    n_hits = 0
+    for token, frequency in token_frequency.items():
+        is_hit = token in hit_tokens
+        n_tokens += frequency
+        if is_hit:
+            n_hits += frequency
+        if token in token2pos:
+            METRICS.increment('tokens_by_pos_total', frequency, pos=token2pos[token], hit='true' if is_hit else 'false')
+    METRICS.increment('documents_total')
+    METRICS.increment('tokens_total', n_tokens)
+    METRICS.increment('dictionary_hits_total', n_hits)
+    METRICS.increment('unknown_tokens_total', n_tokens - n_hits)
+    METRICS.observe('document_tokens', n_tokens)
+    if n_tokens > 0:
+        METRICS.observe('dictionary_hit_rate', n_hits / n_tokens)
+
+
+# プロセス全体で共有する集計器
+METRICS = MetricsRegistry()
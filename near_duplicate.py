@@ -0,0 +1,252 @@
+from typing import List, Dict, Any, Tuple, Iterator, Optional
+from collections import OrderedDict
+import logging
+import time
+import unicodedata
+import zlib
+logger = logging.getLogger(__file__)
+logger.setLevel(logging.INFO)
+
+"""テキストのMinHashとLSHで、ほぼ同じテキスト(転載や定型文の問い合わせなど)をまとめます。
+まとめたテキストは代表の1件だけをスコアリングし、その結果をほかのテキストにも使います。
+
+- テキストはNFKC正規化と空白の除去をしてから、文字のn-gram(shingle)に分けます。形態素解析は行いません。
+- MinHashは1つのハッシュ関数の値をnum_perm個のビンに振り分けて最小値を取る方法(one permutation hashing)で求め、
+  空のビンは右隣のビンの値で埋めます。shingleごとのハッシュ計算は1回で済みます。
+- シグネチャをn_bands個のバンドに分け、いずれかのバンドが一致した代表だけを候補として、推定Jaccard係数がthreshold以上なら同じクラスタとします。
+
+Python3.5以上で動作します。
+"""
+
+__author__ = "Kensuke Mitsuzawa"
+__author_email__ = "kensuke_mitsuzawa@fumankaitori.com"
+__license_name__ = "MIT"
+
+DEFAULT_THRESHOLD = 0.9
+DEFAULT_NUM_PERM = 128
+DEFAULT_SHINGLE_SIZE = 5
+DEFAULT_MAX_REPRESENTATIVES = 100000
+HASH_BITS = 32
+HASH_MULTIPLIER = 0x9E3779B1
+
+
+def normalize_text(input_text):
+    # type: (str)->str
+    return ''.join(unicodedata.normalize('NFKC', input_text).lower().split())
+
+
+def iter_shingles(input_text, shingle_size=DEFAULT_SHINGLE_SIZE):
+    # type: (str, int)->Iterator[str]
+    """* What you can do
+    - 正規化したテキストの文字n-gramを返します。shingle_sizeより短いテキストはテキスト全体を1つ返します。
+    """
+    normalized_text = normalize_text(input_text)
+    if len(normalized_text) <= shingle_size:
+        if normalized_text:
+            yield normalized_text
+        return
+    for position in range(len(normalized_text) - shingle_size + 1):
+        yield normalized_text[position:position + shingle_size]
+
+
+def get_minhash_signature(input_text, num_perm=DEFAULT_NUM_PERM, shingle_size=DEFAULT_SHINGLE_SIZE):
+    # type: (str, int, int)->List[int]
+    """* What you can do
+    - テキストのMinHashのシグネチャ(num_perm個の整数)を返します。num_permは2のべき乗を指定します。
+    - 2つのシグネチャで値が一致する位置の割合は、shingleの集合のJaccard係数の推定値です。
+    """
+    if num_perm <= 0 or num_perm & (num_perm - 1):
+        raise ValueError('num_permには2のべき乗を指定してください。num_perm={}'.format(num_perm))
+    bin_bits = num_perm.bit_length() - 1
+    value_bits = HASH_BITS - bin_bits
+    value_mask = (1 << value_bits) - 1
+    empty_value = 1 << HASH_BITS
+    signature = [empty_value] * num_perm
+    for shingle in set(iter_shingles(input_text, shingle_size)):
+        ### CRC32をそのまま使うと下位ビットの偏りが残るため、乗算で混ぜてから上位ビットをビンにします ###
+        hash_value = (zlib.crc32(shingle.encode('utf-8')) * HASH_MULTIPLIER) & 0xFFFFFFFF
+        bin_id = hash_value >> value_bits
+        value = hash_value & value_mask
+        if value < signature[bin_id]:
+            signature[bin_id] = value
+
+    if all(value == empty_value for value in signature):
+        return [0] * num_perm
+    ### 空のビンは右隣(循環)の最初の空でないビンの値で埋め、距離に応じた値を足して区別します ###
+    densified_signature = list(signature)
+    for bin_id in range(num_perm):
+        if signature[bin_id] != empty_value:
+            continue
+        distance = 1
+        while signature[(bin_id + distance) % num_perm] == empty_value:
+            distance += 1
+        densified_signature[bin_id] = signature[(bin_id + distance) % num_perm] + (distance << value_bits)
+
+    return densified_signature
+
+
+def estimate_jaccard(signature_a, signature_b):
+    # type: (List[int], List[int])->float
+    return sum(1 for value_a, value_b in zip(signature_a, signature_b) if value_a == value_b) / len(signature_a)
+
+
+def choose_bands(num_perm, threshold):
+    # type: (int, float)->Tuple[int,int]
+    """* What you can do
+    - LSHのバンド数と1バンドの行数を返します。
+    - 候補になる確率が1/2程度になる類似度(1/n_bands)^(1/n_rows)がthreshold以下になる組み合わせのうち、最もthresholdに近いものを選びます。
+      候補は推定Jaccard係数で確かめるため、取りこぼしが少なくなる側に寄せています。
+    """
+    seq_band_row = [(num_perm // n_rows, n_rows) for n_rows in range(1, num_perm + 1) if num_perm % n_rows == 0]
+    seq_candidate = [(n_bands, n_rows) for n_bands, n_rows in seq_band_row
+                     if (1.0 / n_bands) ** (1.0 / n_rows) <= threshold]
+    if not seq_candidate:
+        return seq_band_row[0]
+    return max(seq_candidate, key=lambda tuple_obj: (1.0 / tuple_obj[0]) ** (1.0 / tuple_obj[1]))
+
+
+class NearDuplicateIndex(object):
+    """* What you can do
+    - 代表のシグネチャをLSHのバンドごとのハッシュ表で保持し、ほぼ同じ代表を探します。
+    - 代表がmax_representativesを超えると、古い代表から削除します。
+
+    * Example
+    >>> near_duplicate_index = NearDuplicateIndex(threshold=0.9)
+    >>> signature = get_minhash_signature('鈴鹿サーキットは三重県鈴鹿市にあるレジャー施設。')
+    >>> near_duplicate_index.find(signature)
+    None
+    >>> near_duplicate_index.add(0, signature)
+    []
+    """
+    def __init__(self,
+                 threshold=DEFAULT_THRESHOLD,
+                 num_perm=DEFAULT_NUM_PERM,
+                 max_representatives=DEFAULT_MAX_REPRESENTATIVES):
+        # type: (float, int, int)->None
+        if not 0.0 < threshold <= 1.0:
+            raise ValueError('thresholdには0より大きく1以下の値を指定してください。threshold={}'.format(threshold))
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.max_representatives = max_representatives
+        self.n_bands, self.n_rows = choose_bands(num_perm, threshold)
+        self.band_tables = [{} for _ in range(self.n_bands)]  # type: List[Dict[Tuple[int,...], List[Any]]]
+        self.signatures = OrderedDict()  # type: OrderedDict
+
+    def __iter_band_keys(self, signature):
+        # type: (List[int])->Iterator[Tuple[int, Tuple[int,...]]]
+        for band_id in range(self.n_bands):
+            yield band_id, tuple(signature[band_id * self.n_rows:(band_id + 1) * self.n_rows])
+
+    def find(self, signature):
+        # type: (List[int])->Optional[Any]
+        """* What you can do
+        - 推定Jaccard係数がthreshold以上の代表のうち、最も似ているもののキーを返します。なければNoneを返します。
+        """
+        seq_candidate_key = set()
+        for band_id, band_key in self.__iter_band_keys(signature):
+            seq_candidate_key.update(self.band_tables[band_id].get(band_key, ()))
+        best_key = None
+        best_similarity = 0.0
+        ### 同じ類似度なら先に追加した代表を選びます ###
+        for candidate_key in sorted(seq_candidate_key):
+            similarity = estimate_jaccard(signature, self.signatures[candidate_key])
+            if similarity >= self.threshold and similarity > best_similarity:
+                best_key, best_similarity = candidate_key, similarity
+        return best_key
+
+    def add(self, key, signature):
+        # type: (Any, List[int])->List[Any]
+        """* What you can do
+        - 代表を追加します。上限を超えて削除した代表のキーを返します。
+        """
+        self.signatures[key] = signature
+        for band_id, band_key in self.__iter_band_keys(signature):
+            self.band_tables[band_id].setdefault(band_key, []).append(key)
+        seq_evicted_key = []
+        while len(self.signatures) > self.max_representatives:
+            evicted_key, evicted_signature = self.signatures.popitem(last=False)
+            for band_id, band_key in self.__iter_band_keys(evicted_signature):
+                bucket = self.band_tables[band_id][band_key]
+                bucket.remove(evicted_key)
+                if not bucket:
+                    del self.band_tables[band_id][band_key]
+            seq_evicted_key.append(evicted_key)
+        return seq_evicted_key
+
+
+class NearDuplicateStage(object):
+    """* What you can do
+    - スコアリングの前段で、(レコードID, テキスト)のチャンクからほぼ同じテキストをまとめ、代表だけのチャンクを作ります。
+    - 代表のスコアリング結果をfan_outに渡すと、チャンクの全レコードの結果を入力の順序で返します。
+    - split_chunkとfan_outは、チャンクごとに同じ順序で呼び出してください。代表の結果は、後のチャンクで使われなくなるまで保持します。
+
+    * Example
+    >>> near_duplicate_stage = NearDuplicateStage(threshold=0.9)
+    >>> plan, representative_chunk = near_duplicate_stage.split_chunk([('a', 'テキスト'), ('b', 'テキスト')])
+    >>> representative_chunk
+    [(0, 'テキスト')]
+    >>> near_duplicate_stage.fan_out(plan, [(0, [('カテゴリ名', 1.2)])])
+    [('a', [('カテゴリ名', 1.2)]), ('b', [('カテゴリ名', 1.2)])]
+    """
+    def __init__(self,
+                 threshold=DEFAULT_THRESHOLD,
+                 num_perm=DEFAULT_NUM_PERM,
+                 shingle_size=DEFAULT_SHINGLE_SIZE,
+                 max_representatives=DEFAULT_MAX_REPRESENTATIVES):
+        # type: (float, int, int, int)->None
+        self.near_duplicate_index = NearDuplicateIndex(threshold, num_perm, max_representatives)
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.representative_results = {}  # type: Dict[int,Any]
+        self.n_records = 0
+        self.n_representatives = 0
+        self.signature_seconds = 0.0
+
+    def split_chunk(self, chunk):
+        # type: (List[Tuple[Any,str]])->Tuple[Dict[str,Any], List[Tuple[int,str]]]
+        """* What you can do
+        - チャンクのレコードを代表に割り当て、(fan_outに渡す情報, 代表の(キー, テキスト)のリスト)を返します。
+        """
+        start = time.perf_counter()
+        seq_record_key = []  # type: List[Tuple[Any,int]]
+        representative_chunk = []  # type: List[Tuple[int,str]]
+        seq_evicted_key = []  # type: List[int]
+        for record_id, text in chunk:
+            signature = get_minhash_signature(text, self.num_perm, self.shingle_size)
+            representative_key = self.near_duplicate_index.find(signature)
+            if representative_key is None:
+                representative_key = self.n_representatives
+                self.n_representatives += 1
+                representative_chunk.append((representative_key, text))
+                seq_evicted_key += self.near_duplicate_index.add(representative_key, signature)
+            seq_record_key.append((record_id, representative_key))
+        self.n_records += len(chunk)
+        self.signature_seconds += time.perf_counter() - start
+
+        ### 削除した代表は、このチャンクの結果を返した後に結果を捨てます ###
+        return {'records': seq_record_key, 'evicted': seq_evicted_key}, representative_chunk
+
+    def fan_out(self, plan, seq_representative_result):
+        # type: (Dict[str,Any], List[Tuple[int,Any]])->List[Tuple[Any,Any]]
+        self.representative_results.update(seq_representative_result)
+        seq_result = [(record_id, self.representative_results[representative_key])
+                      for record_id, representative_key in plan['records']]
+        for evicted_key in plan['evicted']:
+            self.representative_results.pop(evicted_key, None)
+        return seq_result
+
+    def get_report(self):
+        # type: ()->Dict[str,Any]
+        n_duplicates = self.n_records - self.n_representatives
+        return {
+            'threshold': self.near_duplicate_index.threshold,
+            'num_perm': self.num_perm,
+            'shingle_size': self.shingle_size,
+            'n_bands': self.near_duplicate_index.n_bands,
+            'n_rows': self.near_duplicate_index.n_rows,
+            'n_records': self.n_records,
+            'n_representatives': self.n_representatives,
+            'n_duplicates': n_duplicates,
+            'dedupe_ratio': n_duplicates / self.n_records if self.n_records else 0.0,
+            'signature_sec': self.signature_seconds,
+        }
@@ -0,0 +1,184 @@
+from typing import List, Dict, Any, Tuple, Iterable, Iterator, Optional
+from array import array
+from itertools import combinations
+import json
+import logging
+import os
+import time
+logger = logging.getLogger(__file__)
+logger.setLevel(logging.INFO)
+
+"""品詞条件(POS_CONDITION)の組み合わせを探索します。
+評価データを品詞条件なしで一度だけ形態素解析し、単語と品詞をID配列としてメモリに保持します。
+候補の品詞条件ごとにメモリ上でフィルタをかけてスコアリングし、正解率を比較します。
+
+Python3.5以上で動作します。
+"""
+
+__author__ = "Kensuke Mitsuzawa"
+__author_email__ = "kensuke_mitsuzawa@fumankaitori.com"
+__license_name__ = "MIT"
+
+from evaluate_dictionary import create_mecab_tokenizer, load_evaluation_data, load_word_score_dictionary, get_text_score, \
+    evaluate_section, close_scoring_resources
+
+CANDIDATE_POS = [('名詞', '固有名詞'), ('名詞', '一般'), ('名詞', 'サ変接続'), ('動詞', '自立'),
+                 ('形容詞', '自立'), ('名詞', '形容動詞語幹'), ('名詞', 'ナイ形容詞語幹')]
+
+
+def tokenize_with_pos(input_string, mecab_tokenizer):
+    # type: (str, Any)->List[Tuple[str, Tuple[str,...]]]
+    """* What you can do
+    - 品詞条件なしで形態素解析し、(単語, 品詞のタプル)のリストを返します。
+    - 単語の形はcategory_scoring.tokenizeが返すもの(convert_list_object)と同じです。
+    """
+    tokenized_sentence_obj = mecab_tokenizer.tokenize(sentence=input_string, return_list=False)
+    filtered_obj = mecab_tokenizer.filter(parsed_sentence=tokenized_sentence_obj, pos_condition=None)
+    list_tokens = filtered_obj.convert_list_object()
+    seq_pos = [tuple(token_obj.tuple_pos) for token_obj in filtered_obj.tokenized_objects]
+    if len(list_tokens) != len(seq_pos):
+        raise ValueError('単語と品詞の数が一致しません。')
+
+    return list(zip(list_tokens, seq_pos))
+
+
+class TokenizedCorpus(object):
+    """* What you can do
+    - 形態素解析済みの文書群を、単語IDと品詞IDの配列としてコンパクトに保持します。
+    - 品詞条件ごとのフィルタをメモリ上で適用できます。
+    """
+    __slots__ = ('token_table', 'token2id', 'pos_table', 'pos2id', 'token_ids', 'pos_ids', 'offsets')
+
+    def __init__(self):
+        self.token_table = []  # type: List[str]
+        self.token2id = {}  # type: Dict[str,int]
+        self.pos_table = []  # type: List[Tuple[str,...]]
+        self.pos2id = {}  # type: Dict[Tuple[str,...],int]
+        self.token_ids = array('I')
+        self.pos_ids = array('H')
+        self.offsets = array('I', [0])
+
+    def __len__(self):
+        # type: ()->int
+        return len(self.offsets) - 1
+
+    def add_document(self, seq_token_pos):
+        # type: (List[Tuple[str, Tuple[str,...]]])->None
+        for token, pos in seq_token_pos:
+            if token not in self.token2id:
+                self.token2id[token] = len(self.token_table)
+                self.token_table.append(token)
+            if pos not in self.pos2id:
+                self.pos2id[pos] = len(self.pos_table)
+                self.pos_table.append(pos)
+            self.token_ids.append(self.token2id[token])
+            self.pos_ids.append(self.pos2id[pos])
+        self.offsets.append(len(self.token_ids))
+
+    def get_pos_mask(self, pos_condition):
+        # type: (List[Tuple[str,...]])->bytearray
+        """* What you can do
+        - 品詞IDごとに、品詞条件を満たせば1となるマスクを返します。
+        - JapaneseTokenizerのfilterと同じく、条件のタプルが品詞のタプルの先頭と一致すれば条件を満たします。
+        """
+        return bytearray(1 if any(pos[:len(condition)] == tuple(condition) for condition in pos_condition) else 0
+                         for pos in self.pos_table)
+
+    def get_filtered_tokens(self, document_index, pos_mask):
+        # type: (int, bytearray)->List[str]
+        start, end = self.offsets[document_index], self.offsets[document_index + 1]
+        token_table = self.token_table
+        return [token_table[token_id]
+                for token_id, pos_id in zip(self.token_ids[start:end], self.pos_ids[start:end]) if pos_mask[pos_id]]
+
+
+def iter_pos_condition_grid(seq_candidate_pos, min_size=1, max_size=None):
+    # type: (List[Tuple[str,...]], int, Optional[int])->Iterator[List[Tuple[str,...]]]
+    """* What you can do
+    - 候補の品詞の組み合わせを、品詞条件として順に返します。
+    """
+    max_size = max_size or len(seq_candidate_pos)
+    for size in range(min_size, max_size + 1):
+        for pos_condition in combinations(seq_candidate_pos, size):
+            yield list(pos_condition)
+
+
+def sweep_pos_conditions(path_mecab_bin,
+                         path_evaluation_data,
+                         path_dictionary_data,
+                         seq_pos_condition,
+                         seq_k=(1, 3, 5),
+                         path_output_json=None,
+                         path_dictionary_index=None):
+    # type: (str, str, str, Iterable[List[Tuple[str,...]]], Iterable[int], Optional[str], Optional[str])->List[Dict[str,Any]]
+    """* What you can do
+    - 評価データを一度だけ形態素解析し、品詞条件ごとにsummaryとfullの正解率とMRRを計算します。
+    - 結果はfullセクションのtop-1正解率の高い順に返します。path_output_jsonを指定するとJSONで書き出します。
+    """
+    seq_k = sorted(seq_k)
+    mecab_tokenizer = create_mecab_tokenizer(path_mecab_bin)
+    evaluation_data = load_evaluation_data(path_evaluation_data)
+    word_score_dictionary = load_word_score_dictionary(path_dictionary_data, path_dictionary_index)
+
+    ### 形態素解析は一度だけ行います ###
+    start = time.time()
+    corpus = {}  # type: Dict[str, TokenizedCorpus]
+    for section_name in ('summary', 'full'):
+        corpus[section_name] = TokenizedCorpus()
+        for evaluation_obj in evaluation_data[section_name]:
+            corpus[section_name].add_document(tokenize_with_pos(evaluation_obj['text'], mecab_tokenizer))
+    logger.info(msg='Tokenized evaluation data in {:.1f} sec. N(token type)={}, N(pos)={}'.format(
+        time.time() - start, len(corpus['full'].token_table), len(corpus['full'].pos_table)))
+
+    identity = lambda list_tokens: list_tokens
+    seq_sweep_result = []
+    for pos_condition in seq_pos_condition:
+        sweep_result = {'pos_condition': [list(pos) for pos in pos_condition], 'sections': {}}
+        for section_name in ('summary', 'full'):
+            pos_mask = corpus[section_name].get_pos_mask(pos_condition)
+            seq_section_score_tuple = [
+                get_text_score(input_text=corpus[section_name].get_filtered_tokens(document_index, pos_mask),
+                               word_score_dictionary=word_score_dictionary,
+                               function_tokenizer=identity)
+                for document_index in range(len(corpus[section_name]))]
+            section_report = evaluate_section(evaluation_data[section_name], seq_section_score_tuple, seq_k)
+            sweep_result['sections'][section_name] = {'overall': section_report['overall'],
+                                                      'per_category': section_report['per_category']}
+        logger.info(msg='POS={} -> summary accuracy={}, full accuracy={}'.format(
+            pos_condition,
+            sweep_result['sections']['summary']['overall']['top_k_accuracy'],
+            sweep_result['sections']['full']['overall']['top_k_accuracy']))
+        seq_sweep_result.append(sweep_result)
+
+    close_scoring_resources(word_score_dictionary)
+    first_k = str(seq_k[0])
+    seq_sweep_result.sort(key=lambda sweep_result: (sweep_result['sections']['full']['overall']['top_k_accuracy'][first_k],
+                                                    sweep_result['sections']['full']['overall']['mrr']),
+                          reverse=True)
+    if path_output_json is not None:
+        with open(path_output_json, 'w') as f:
+            f.write(json.dumps(seq_sweep_result, ensure_ascii=False, indent=4))
+
+    return seq_sweep_result
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    PATH_MECAB_BIN = '/usr/local/bin'
+    PATH_EVALUATION_DATA = './wikipedia-text/wikipedia_text.jsonl'
+    PATH_DICTIONARY_DATA = './dictionary-data/word_soa.json'
+    PATH_DICTIONARY_INDEX = './dictionary-data/word_soa.idx'
+    ### 品詞条件ごとの評価結果のJSONの出力先
+    PATH_SWEEP_RESULT = './wikipedia-text/pos_condition_sweep.json'
+    if not os.path.exists(PATH_DICTIONARY_DATA): raise FileExistsError('辞書ファイルが発見できません。')
+
+    seq_sweep_result = sweep_pos_conditions(
+        path_mecab_bin=PATH_MECAB_BIN,
+        path_evaluation_data=PATH_EVALUATION_DATA,
+        path_dictionary_data=PATH_DICTIONARY_DATA,
+        seq_pos_condition=iter_pos_condition_grid(CANDIDATE_POS),
+        path_output_json=PATH_SWEEP_RESULT,
+        path_dictionary_index=PATH_DICTIONARY_INDEX)
+    for sweep_result in seq_sweep_result[:10]:
+        logger.info(msg='{} -> full={}'.format(sweep_result['pos_condition'],
+                                               sweep_result['sections']['full']['overall']['top_k_accuracy']))
@@ -0,0 +1,359 @@
+from typing import List, Dict, Any, Tuple, Callable, Optional, Set
+from collections import OrderedDict
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import unicodedata
+logger = logging.getLogger(__file__)
+logger.setLevel(logging.INFO)
+
+"""カテゴリ分類の結果をキャッシュし、同じテキスト(定型文、フォームの送信、上流からの再送など)を再計算しないようにします。
+キーは(NFKC正規化したテキスト, 辞書のバージョン, 品詞条件, top_k, トークナイザー)のハッシュ値です。
+
+- プロセス内のLRU: 件数の上限とTTL(秒)を超えたものから捨てます。
+- ディスク(SQLite、省略可): 同じホストの複数のプロセスで共有します。合計サイズが上限を超えると、最後に利用された時刻が古いものから削除します。
+
+辞書のバージョンが変わると、古いバージョンの結果は使われなくなり、メモリの層からは捨てます。
+ディスクの層からは、バージョンの変化を検知したプロセスが、直前のバージョンの結果だけを削除します。
+ディスクを共有する別のプロセスが別のバージョンの辞書を使っていても、その結果は削除しません。
+ディスクへの書き込み(結果の追加、最終利用時刻の更新、古いバージョンの削除)はメモリに溜め、flushで1回のトランザクションにまとめます。
+
+Python3.5以上で動作します。
+"""
+
+__author__ = "Kensuke Mitsuzawa"
+__author_email__ = "kensuke_mitsuzawa@fumankaitori.com"
+__license_name__ = "MIT"
+
+DEFAULT_MAX_ENTRIES = 10000
+DEFAULT_TTL = 3600.0
+DEFAULT_DISK_MAX_BYTES = 256 * 1024 * 1024
+# ディスクに書き込んでいない結果がこの件数に達すると、putの中でflushします。
+DEFAULT_DISK_FLUSH_SIZE = 256
+# 上限を超えたときに、この割合まで削除します。
+EVICTION_TARGET_RATIO = 0.9
+
+
+def get_manifest_dictionary_version(path_base_index, version):
+    # type: (str, int)->str
+    """* What you can do
+    - マニフェストの辞書のバージョンを表す文字列を返します。ワーカーが実際に使った辞書のバージョンを求めるときにも使います。
+    """
+    return 'manifest:{}:{}'.format(path_base_index, version)
+
+
+def get_dictionary_version(path_dictionary_data=None,
+                           path_dictionary_index=None,
+                           path_dictionary_sqlite=None,
+                           path_dictionary_manifest=None):
+    # type: (Optional[str], Optional[str], Optional[str], Optional[str])->str
+    """* What you can do
+    - 辞書のバージョンを表す文字列を返します。辞書を読み込まずに求めるため、キャッシュに当たれば辞書の読み込みを省けます。
+    - マニフェストがあれば、元のインデックスとマニフェストのバージョンを使います。
+    - それ以外は、存在する辞書ファイルのパス、大きさ、更新時刻を使います。
+    """
+    if path_dictionary_manifest is not None:
+        from dictionary_delta import load_manifest, resolve_manifest_path
+        manifest = load_manifest(path_dictionary_manifest)
+        return get_manifest_dictionary_version(resolve_manifest_path(path_dictionary_manifest, manifest['base_index']),
+                                               manifest['version'])
+    seq_file_version = []  # type: List[str]
+    for path in (path_dictionary_data, path_dictionary_index, path_dictionary_sqlite):
+        if path is None or not os.path.exists(path):
+            continue
+        stat = os.stat(path)
+        seq_file_version.append('{}:{}:{}'.format(os.path.abspath(path), stat.st_size, stat.st_mtime_ns))
+
+    return '|'.join(seq_file_version)
+
+
+class ResultCache(object):
+    """* What you can do
+    - get_text_scoreの結果をプロセス内のLRUと、(path_disk_cacheを指定した場合は)SQLiteにキャッシュします。
+    - set_dictionary_versionで辞書のバージョンを更新すると、古いバージョンの結果を削除します。
+    - putにスコアリングに使った辞書のバージョンを渡すと、それが現在のバージョンと異なる結果はキャッシュしません。
+    - ディスクへの書き込みはflushでまとめて行います。closeでも書き込みます。
+      flushは別のスレッドから呼び出せます。flush中のgetは、is_wait_disk=Falseならディスクを引かずに待たずに返します。
+
+    * Example
+    >>> result_cache = ResultCache(get_dictionary_version(path_dictionary_data, path_dictionary_index),
+    ...                            path_disk_cache='./result_cache.sqlite3')
+    >>> seq_score_tuple = result_cache.get(input_text, POS_CONDITION, top_k=10)
+    >>> if seq_score_tuple is None:
+    ...     seq_score_tuple = get_text_score(input_text, word_score_dictionary, function_tokenizer, top_k=10)
+    ...     result_cache.put(input_text, POS_CONDITION, 10, seq_score_tuple)
+    >>> result_cache.flush()
+    >>> result_cache.report()
+    """
+    def __init__(self,
+                 dictionary_version,
+                 max_entries=DEFAULT_MAX_ENTRIES,
+                 ttl=DEFAULT_TTL,
+                 path_disk_cache=None,
+                 disk_max_bytes=DEFAULT_DISK_MAX_BYTES,
+                 disk_flush_size=DEFAULT_DISK_FLUSH_SIZE):
+        # type: (str, int, Optional[float], Optional[str], int, int)->None
+        self.dictionary_version = dictionary_version
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.disk_max_bytes = disk_max_bytes
+        self.disk_flush_size = disk_flush_size
+        # キー -> (有効期限, 結果)。有効期限がNoneなら期限はありません。
+        self.entries = OrderedDict()  # type: OrderedDict
+        self.n_memory_hit = 0
+        self.n_disk_hit = 0
+        self.n_miss = 0
+        self.n_evicted_memory = 0
+        self.n_evicted_disk = 0
+        self.n_expired = 0
+        self.n_invalidated_memory = 0
+        self.n_invalidated_disk = 0
+        self.n_disk_skipped = 0
+        self.n_stale_dropped = 0
+
+        # ディスクに書き込んでいない結果(キー -> 行)と最終利用時刻(キー -> 時刻)。flushで書き込みます。
+        self.pending_rows = {}  # type: Dict[bytes, Tuple[bytes, str, bytes, int, Optional[float], float]]
+        self.pending_access = {}  # type: Dict[bytes,float]
+        # ディスクから削除する古いバージョン
+        self.pending_delete_versions = set()  # type: Set[str]
+        # 接続はflushを呼ぶスレッドと共有するため、ロックで保護します。
+        # pending_lockは書き込み待ちの入れ替えだけを保護し、ディスクの読み書き中には持ちません。
+        self.lock = threading.Lock()
+        self.pending_lock = threading.Lock()
+        self.disk_total_bytes = 0
+        self.connection = None  # type: Optional[sqlite3.Connection]
+        if path_disk_cache is not None:
+            import sqlite3
+            self.connection = sqlite3.connect(path_disk_cache, timeout=30, check_same_thread=False)
+            self.connection.execute('PRAGMA journal_mode=WAL')
+            self.connection.execute('PRAGMA synchronous=NORMAL')
+            self.connection.execute('CREATE TABLE IF NOT EXISTS results '
+                                    '(key BLOB PRIMARY KEY, dictionary_version TEXT, value BLOB, size INTEGER, '
+                                    'expires_at REAL, last_access REAL)')
+            self.connection.execute('CREATE INDEX IF NOT EXISTS results_last_access ON results (last_access)')
+            self.connection.commit()
+            self.disk_total_bytes = self.get_disk_total_bytes()
+
+    def make_key(self, input_text, pos_condition, top_k, tokenizer='mecab'):
+        # type: (str, List[Tuple[str,...]], Optional[int], str)->bytes
+        key_prefix = json.dumps([self.dictionary_version, [list(pos) for pos in pos_condition], top_k, tokenizer],
+                                ensure_ascii=False)
+        return hashlib.sha256((key_prefix + unicodedata.normalize('NFKC', input_text)).encode('utf-8')).digest()
+
+    def set_dictionary_version(self, dictionary_version):
+        # type: (str)->bool
+        """* What you can do
+        - 辞書のバージョンが変わっていれば、古いバージョンの結果をすべて削除してTrueを返します。
+        - ディスクからは直前のバージョンの結果だけを、次のflushで削除します。キーに辞書のバージョンを含むため、それまでもgetが返すことはありません。
+        """
+        if dictionary_version == self.dictionary_version:
+            return False
+        logger.info(msg='Dictionary version changed; invalidated {} cached results in memory'.format(len(self.entries)))
+        previous_version = self.dictionary_version
+        self.dictionary_version = dictionary_version
+        self.n_invalidated_memory += len(self.entries)
+        self.entries.clear()
+        if self.connection is not None:
+            ### 書き込んでいない古いバージョンの結果は、メモリの層と重複して数えないように、数えずに捨てます ###
+            with self.pending_lock:
+                self.pending_rows = {}
+                self.pending_access = {}
+                self.pending_delete_versions.add(previous_version)
+                self.pending_delete_versions.discard(dictionary_version)
+        return True
+
+    def get_disk_total_bytes(self):
+        # type: ()->int
+        return self.connection.execute('SELECT COALESCE(SUM(size), 0) FROM results').fetchone()[0]
+
+    def get(self, input_text, pos_condition, top_k, tokenizer='mecab', is_wait_disk=True):
+        # type: (str, List[Tuple[str,...]], Optional[int], str, bool)->Optional[List[Tuple[str,float]]]
+        """* What you can do
+        - is_wait_disk=Falseの場合、別のスレッドがflush中ならディスクを引かずにミスとして返します。イベントループから呼ぶ場合に使います。
+        """
+        key = self.make_key(input_text, pos_condition, top_k, tokenizer)
+        now = time.time()
+        entry = self.entries.get(key)
+        if entry is not None:
+            if entry[0] is None or entry[0] > now:
+                self.entries.move_to_end(key)
+                self.n_memory_hit += 1
+                return entry[1]
+            del self.entries[key]
+            self.n_expired += 1
+
+        if self.connection is not None:
+            row = self.__get_disk_row(key, is_wait_disk)
+            if row is not None and (row[1] is None or row[1] > now):
+                ### 最終利用時刻はメモリに記録し、flushでまとめて書き込みます ###
+                with self.pending_lock:
+                    self.pending_access[key] = now
+                self.n_disk_hit += 1
+                seq_score_tuple = [tuple(score_tuple) for score_tuple in json.loads(row[0].decode('utf-8'))]
+                ### ディスクで当たった結果は、残りの有効期限のままプロセス内のLRUにも載せます ###
+                self.__put_memory(key, row[1], seq_score_tuple)
+                return seq_score_tuple
+            if row is not None:
+                self.n_expired += 1
+
+        self.n_miss += 1
+        return None
+
+    def __get_disk_row(self, key, is_wait_disk):
+        # type: (bytes, bool)->Optional[Tuple[bytes, Optional[float]]]
+        with self.pending_lock:
+            pending_row = self.pending_rows.get(key)
+        if pending_row is not None:
+            return pending_row[2], pending_row[4]
+        if not self.lock.acquire(blocking=is_wait_disk):
+            self.n_disk_skipped += 1
+            return None
+        try:
+            if self.connection is None:
+                return None
+            return self.connection.execute('SELECT value, expires_at FROM results WHERE key = ?', (key,)).fetchone()
+        finally:
+            self.lock.release()
+
+    def put(self, input_text, pos_condition, top_k, seq_score_tuple, tokenizer='mecab', is_auto_flush=True,
+            dictionary_version=None):
+        # type: (str, List[Tuple[str,...]], Optional[int], List[Tuple[str,float]], str, bool, Optional[str])->None
+        """* What you can do
+        - 結果をメモリの層に載せます。ディスクには、書き込んでいない結果がdisk_flush_size件に達したときか、flushで書き込みます。
+        - is_auto_flush=Falseの場合は件数によらずflushしません。イベントループから呼び、flushを別のスレッドで行う場合に使います。
+        - dictionary_versionには、結果を求めた辞書のバージョンを指定します。
+          スコアリング中に現在のバージョンが変わっていれば、古い辞書の結果を新しいバージョンで返さないように捨てます。
+        """
+        if dictionary_version is not None and dictionary_version != self.dictionary_version:
+            self.n_stale_dropped += 1
+            return
+        key = self.make_key(input_text, pos_condition, top_k, tokenizer)
+        now = time.time()
+        expires_at = None if self.ttl is None else now + self.ttl
+        self.__put_memory(key, expires_at, seq_score_tuple)
+        if self.connection is not None:
+            value = json.dumps(seq_score_tuple, ensure_ascii=False).encode('utf-8')
+            with self.pending_lock:
+                self.pending_rows[key] = (key, self.dictionary_version, value, len(value), expires_at, now)
+                self.pending_access.pop(key, None)
+                n_pending_rows = len(self.pending_rows)
+            if is_auto_flush and n_pending_rows >= self.disk_flush_size:
+                self.flush()
+
+    def __put_memory(self, key, expires_at, seq_score_tuple):
+        # type: (bytes, Optional[float], List[Tuple[str,float]])->None
+        self.entries[key] = (expires_at, seq_score_tuple)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.n_evicted_memory += 1
+
+    def flush(self):
+        # type: ()->None
+        """* What you can do
+        - 溜めておいたディスクへの書き込み(直前のバージョンの削除、結果の追加、最終利用時刻の更新)を1回のトランザクションで行います。
+        - 合計サイズが上限を超えていれば、続けてevict_diskで削除します。
+        """
+        if self.connection is None:
+            return
+        ### 書き込む分を先に取り出し、書き込み中に呼ばれたputは次のflushで書き込みます ###
+        with self.pending_lock:
+            seq_row = list(self.pending_rows.values())
+            seq_access = [(last_access, key) for key, last_access in self.pending_access.items()]
+            self.pending_rows = {}
+            self.pending_access = {}
+            seq_delete_version = sorted(self.pending_delete_versions)
+            self.pending_delete_versions = set()
+        if not (seq_row or seq_access or seq_delete_version):
+            return
+        with self.lock:
+            if self.connection is None:
+                return
+            for delete_version in seq_delete_version:
+                cursor = self.connection.execute('DELETE FROM results WHERE dictionary_version = ?', (delete_version,))
+                self.n_invalidated_disk += cursor.rowcount
+            self.connection.executemany('INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?)',
+                                        [row for row in seq_row if row[1] == self.dictionary_version])
+            self.connection.executemany('UPDATE results SET last_access = ? WHERE key = ?', seq_access)
+            self.connection.commit()
+            if seq_delete_version:
+                self.disk_total_bytes = self.get_disk_total_bytes()
+            else:
+                self.disk_total_bytes += sum(row[3] for row in seq_row)
+            if self.disk_total_bytes > self.disk_max_bytes:
+                self.evict_disk()
+
+    def evict_disk(self):
+        # type: ()->None
+        """* What you can do
+        - 有効期限が切れた結果を削除し、それでも合計サイズが上限のEVICTION_TARGET_RATIO倍を超えていれば古いものから削除します。
+        - flushの中から、ロックを取った状態で呼びます。
+        """
+        cursor = self.connection.execute('DELETE FROM results WHERE expires_at IS NOT NULL AND expires_at <= ?',
+                                         (time.time(),))
+        self.n_expired += cursor.rowcount
+        # 他のプロセスも書き込むため、合計サイズはデータベースから取り直します。
+        self.disk_total_bytes = self.get_disk_total_bytes()
+        target_bytes = int(self.disk_max_bytes * EVICTION_TARGET_RATIO)
+        seq_evict_keys = []  # type: List[bytes]
+        for key, size in self.connection.execute('SELECT key, size FROM results ORDER BY last_access'):
+            if self.disk_total_bytes <= target_bytes:
+                break
+            seq_evict_keys.append(key)
+            self.disk_total_bytes -= size
+        self.connection.executemany('DELETE FROM results WHERE key = ?', [(key,) for key in seq_evict_keys])
+        self.connection.commit()
+        self.n_evicted_disk += len(seq_evict_keys)
+
+    def get_or_score(self, input_text, pos_condition, top_k, function_score, tokenizer='mecab'):
+        # type: (str, List[Tuple[str,...]], Optional[int], Callable[[str], List[Tuple[str,float]]], str)->List[Tuple[str,float]]
+        """* What you can do
+        - キャッシュになければfunction_score(input_text)で求めて、キャッシュに載せます。
+        """
+        seq_score_tuple = self.get(input_text, pos_condition, top_k, tokenizer)
+        if seq_score_tuple is None:
+            seq_score_tuple = function_score(input_text)
+            self.put(input_text, pos_condition, top_k, seq_score_tuple, tokenizer)
+        return seq_score_tuple
+
+    def stats(self):
+        # type: ()->Dict[str,Any]
+        n_hit = self.n_memory_hit + self.n_disk_hit
+        n_request = n_hit + self.n_miss
+        return {
+            'memory_hit': self.n_memory_hit,
+            'disk_hit': self.n_disk_hit,
+            'miss': self.n_miss,
+            'hit_rate': n_hit / n_request if n_request else 0.0,
+            'evicted_memory': self.n_evicted_memory,
+            'evicted_disk': self.n_evicted_disk,
+            'expired': self.n_expired,
+            'invalidated_memory': self.n_invalidated_memory,
+            'invalidated_disk': self.n_invalidated_disk,
+            'disk_skipped': self.n_disk_skipped,
+            'stale_dropped': self.n_stale_dropped,
+            'n_memory_entries': len(self.entries),
+            'n_pending_writes': len(self.pending_rows) + len(self.pending_access),
+            'disk_total_bytes': self.disk_total_bytes,
+            'dictionary_version': self.dictionary_version,
+        }
+
+    def report(self):
+        # type: ()->Dict[str,Any]
+        stats = self.stats()
+        logger.info(msg='Result cache; hit-rate={hit_rate:.3f} (memory={memory_hit}, disk={disk_hit}, miss={miss}), '
+                        'N(entry)={n_memory_entries}, evicted={evicted_memory}/{evicted_disk}, expired={expired}, '
+                        'invalidated={invalidated_memory}/{invalidated_disk} (memory/disk)'.format(**stats))
+        return stats
+
+    def close(self):
+        # type: ()->None
+        self.flush()
+        self.entries.clear()
+        with self.lock:
+            if self.connection is not None:
+                self.connection.close()
+                self.connection = None
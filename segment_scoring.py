@@ -0,0 +1,179 @@
+from typing import List, Dict, Any, Tuple, Callable, Iterator, Optional
+from array import array
+from heapq import nlargest
+from itertools import accumulate
+import logging
+logger = logging.getLogger(__file__)
+logger.setLevel(logging.INFO)
+
+"""文書の区間(ウィンドウ)ごとにカテゴリのスコアを求め、文書のどの部分がどのカテゴリに効いているかを調べます。
+文書を1回だけトークン化し、カテゴリごとにトークン位置の累積和(prefix sum)の配列を作成します。
+区間[start, end)のスコアは累積和の差で求まるため、区間の長さによらず、カテゴリ数に比例した時間で順位を返せます。
+
+- get_window_score: 任意の区間の順位
+- iter_window_scores / get_timeline: 幅window_size、間隔strideのすべてのウィンドウのtop-k
+- get_category_peak: カテゴリのスコアが最も高くなるウィンドウ
+
+Python3.5以上で動作します。
+"""
+
+__author__ = "Kensuke Mitsuzawa"
+__author_email__ = "kensuke_mitsuzawa@fumankaitori.com"
+__license_name__ = "MIT"
+
+
+class SegmentScorer(object):
+    """* What you can do
+    - トークン列の任意の区間について、get_text_scoreと同じ順位を返します。
+    - 区間はトークンの位置で指定します。区間のトークンはtokens[start:end]で取り出せます。
+
+    * Example
+    >>> segment_scorer = SegmentScorer.from_text(input_text, word_score_dictionary, function_tokenizer)
+    >>> segment_scorer.get_window_score(0, 100, top_k=3)
+    [('アウトドア・スポーツ-その他', 1.2), ...]
+    >>> segment_scorer.get_timeline(window_size=200, stride=100, top_k=3)
+    """
+    def __init__(self, tokens, word_score_dictionary):
+        # type: (List[str], Any)->None
+        self.tokens = tokens
+        ### get_manyを持つ辞書(SQLiteの辞書ストア)は、異なり語のスコアを1回のクエリでまとめて引きます。
+        ### category_scoring.get_text_scoreと同じく、型ではなくメソッドの有無で判定します ###
+        function_get_many = getattr(word_score_dictionary, 'get_many', None)
+        if function_get_many is not None:
+            word_score_dictionary = function_get_many(set(tokens))
+        n_positions = len(tokens) + 1
+        self.labels = []  # type: List[str]
+        label2id = {}  # type: Dict[str,int]
+        # カテゴリごとの、位置iのトークンのスコアとヒット数。累積和に変換して保持します。
+        seq_score_delta = []  # type: List[array]
+        seq_hit_delta = []  # type: List[array]
+        for position, token in enumerate(tokens, start=1):
+            postings = word_score_dictionary.get(token)
+            if postings is None: continue
+            for label, score in postings:
+                label_id = label2id.get(label)
+                if label_id is None:
+                    label_id = label2id[label] = len(self.labels)
+                    self.labels.append(label)
+                    seq_score_delta.append(array('d', [0.0]) * n_positions)
+                    seq_hit_delta.append(array('i', [0]) * n_positions)
+                seq_score_delta[label_id][position] += score
+                seq_hit_delta[label_id][position] += 1
+        ### prefix_scores[label_id][i]はtokens[:i]のスコアの合計です ###
+        self.prefix_scores = [array('d', accumulate(score_delta)) for score_delta in seq_score_delta]
+        self.prefix_hits = [array('i', accumulate(hit_delta)) for hit_delta in seq_hit_delta]
+        logger.debug(msg='Built prefix sums; N(token)={}, N(label)={}'.format(len(tokens), len(self.labels)))
+
+    @classmethod
+    def from_text(cls, input_text, word_score_dictionary, function_tokenizer):
+        # type: (str, Any, Callable[[str], List[str]])->SegmentScorer
+        return cls(list(function_tokenizer(input_text)), word_score_dictionary)
+
+    @property
+    def n_tokens(self):
+        # type: ()->int
+        return len(self.tokens)
+
+    def __check_window(self, start, end):
+        # type: (int, int)->None
+        if not 0 <= start <= end <= self.n_tokens:
+            raise ValueError('区間が不正です。start={}, end={}, N(token)={}'.format(start, end, self.n_tokens))
+
+    def __rank(self, start, end, top_k):
+        # type: (int, int, Optional[int])->List[Tuple[int,float]]
+        """* What you can do
+        - 区間でヒットしたカテゴリの(カテゴリID, スコア)を、スコアの降順に返します。
+        """
+        seq_score_tuple = [(label_id, prefix_score[end] - prefix_score[start])
+                           for label_id, (prefix_score, prefix_hit) in enumerate(zip(self.prefix_scores, self.prefix_hits))
+                           if prefix_hit[end] != prefix_hit[start]]
+        ### 同点のカテゴリはget_text_scoreと同じくカテゴリ名の降順に並べます ###
+        labels = self.labels
+        key_function = lambda tuple_obj: (tuple_obj[1], labels[tuple_obj[0]])
+        if top_k is None:
+            return sorted(seq_score_tuple, key=key_function, reverse=True)
+        else:
+            return nlargest(top_k, seq_score_tuple, key=key_function)
+
+    def get_window_score(self, start, end, top_k=None):
+        # type: (int, int, Optional[int])->List[Tuple[str,float]]
+        """* What you can do
+        - tokens[start:end]をget_text_scoreでスコアリングした場合と同じ順位を返します。
+        """
+        self.__check_window(start, end)
+        return [(self.labels[label_id], score) for label_id, score in self.__rank(start, end, top_k)]
+
+    def iter_windows(self, window_size, stride=None):
+        # type: (int, Optional[int])->Iterator[Tuple[int,int]]
+        """* What you can do
+        - 幅window_size、間隔strideのウィンドウの(start, end)を返します。strideの既定値はwindow_sizeです。
+        - 最後のウィンドウは文書の末尾で終わるようにします。文書がwindow_sizeより短い場合は文書全体を1つ返します。
+        """
+        if stride is None: stride = window_size
+        if window_size <= 0 or stride <= 0:
+            raise ValueError('window_sizeとstrideは1以上を指定してください。window_size={}, stride={}'.format(
+                window_size, stride))
+        last_start = max(self.n_tokens - window_size, 0)
+        start = 0
+        while start < last_start:
+            yield start, start + window_size
+            start += stride
+        yield last_start, self.n_tokens
+
+    def iter_window_scores(self, window_size, stride=None, top_k=3):
+        # type: (int, Optional[int], Optional[int])->Iterator[Dict[str,Any]]
+        """* What you can do
+        - すべてのウィンドウについて、位置と上位top_k件の順位を返します。
+
+        * Output
+        >>> {"start": 0, "end": 200, "ranking": [("カテゴリ名", 1.2), ...]}
+        """
+        for start, end in self.iter_windows(window_size, stride):
+            yield {'start': start, 'end': end, 'ranking': self.get_window_score(start, end, top_k)}
+
+    def get_timeline(self, window_size, stride=None, top_k=3):
+        # type: (int, Optional[int], int)->Dict[str,Any]
+        """* What you can do
+        - すべてのウィンドウのtop-kを、JSONで書き出せるコンパクトな形で返します。
+        - カテゴリ名はlabelsにまとめ、各ウィンドウでは[start, end, [[カテゴリID, スコア], ...]]で表します。
+
+        * Output
+        >>> {"n_tokens": 1200, "window_size": 200, "stride": 100, "labels": ["カテゴリ名", ...],
+        ...  "windows": [[0, 200, [[3, 1.2], [0, 0.8], [5, 0.5]]], ...]}
+        """
+        seq_window = []  # type: List[List[Any]]
+        used_label_ids = {}  # type: Dict[int,int]
+        for start, end in self.iter_windows(window_size, stride):
+            ranking = [[used_label_ids.setdefault(label_id, len(used_label_ids)), score]
+                       for label_id, score in self.__rank(start, end, top_k)]
+            seq_window.append([start, end, ranking])
+        ### timelineに出現したカテゴリだけをlabelsに含めます ###
+        labels = [self.labels[label_id] for label_id in sorted(used_label_ids, key=used_label_ids.get)]
+        return {
+            'n_tokens': self.n_tokens,
+            'window_size': window_size,
+            'stride': window_size if stride is None else stride,
+            'labels': labels,
+            'windows': seq_window,
+        }
+
+    def get_category_peak(self, label, window_size):
+        # type: (str, int)->Optional[Dict[str,Any]]
+        """* What you can do
+        - 幅window_sizeのウィンドウのうち、カテゴリのスコアが最も高いものを返します。カテゴリがヒットしない場合はNoneを返します。
+        - すべての開始位置を1トークンずつずらして調べます。
+
+        * Output
+        >>> {"start": 120, "end": 320, "score": 2.4}
+        """
+        if label not in self.labels:
+            return None
+        if window_size <= 0:
+            raise ValueError('window_sizeは1以上を指定してください。window_size={}'.format(window_size))
+        prefix_score = self.prefix_scores[self.labels.index(label)]
+        window_size = min(window_size, self.n_tokens)
+        best_start = max(range(self.n_tokens - window_size + 1),
+                         key=lambda start: prefix_score[start + window_size] - prefix_score[start])
+        return {'start': best_start,
+                'end': best_start + window_size,
+                'score': prefix_score[best_start + window_size] - prefix_score[best_start]}
@@ -11,24 +11,55 @@ url=''
 license_name='MIT'
 
 install_requires = [
-    'JapaneseTokenizer',
-    'wikipedia',
-    'sqlitedict'
+    'JapaneseTokenizer'
 ]
 
+extras_require = {
+    'sparse': ['numpy', 'scipy']
+}
+
 dependency_links = []
 
+# スクリプトはリポジトリの直下に置いているため、モジュールとして列挙します。
+py_modules = [
+    'batch_classify',
+    'category_index',
+    'category_score_server',
+    'category_scoring',
+    'compact_dictionary',
+    'dictionary_delta',
+    'dictionary_index',
+    'dictionary_ingest',
+    'dictionary_matcher',
+    'dictionary_pruning',
+    'dictionary_store',
+    'evaluate_dictionary',
+    'get_category_score',
+    'get_wikipedia_text',
+    'metrics',
+    'near_duplicate',
+    'pos_condition_sweep',
+    'result_cache',
+    'segment_scoring',
+    'shared_dictionary',
+    'sparse_scoring',
+    'streaming_scoring',
+    'tokenize_cache',
+]
+
 setup(
     name=name,
     version=version,
     description=description,
     author=author,
     install_requires=install_requires,
+    extras_require=extras_require,
     dependency_links=dependency_links,
     author_email=author_email,
     url=url,
     license=license_name,
-    packages=find_packages(),
+    packages=find_packages(exclude=('tests', 'tests.*', 'benchmarks', 'benchmarks.*')),
+    py_modules=py_modules,
     include_package_data=True,
     zip_safe=False
 )
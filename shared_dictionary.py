@@ -0,0 +1,239 @@
+from typing import List, Dict, Any, Tuple, Iterable, Optional
+from array import array
+import json
+import logging
+import os
+import struct
+import sys
+import zlib
+logger = logging.getLogger(__file__)
+logger.setLevel(logging.INFO)
+
+"""辞書を共有メモリ(multiprocessing.shared_memory)に一度だけ展開し、複数のワーカープロセスから読み取り専用で参照します。
+ワーカーごとにreformat_dictionaryで辞書を作成する代わりに、親プロセスが作成した共有メモリに接続するだけなので、
+ワーカー数によらず辞書のメモリは1つ分で済み、ワーカーの起動も速くなります。
+
+共有メモリの構成は辞書インデックス(dictionary_index.py)と同じで、語彙のハッシュ表のセクションを加えています。
+- 語彙(オフセット配列 + UTF-8のバイト列)、カテゴリ名のテーブル
+- 単語ごとのポスティングのオフセット配列、カテゴリID配列、スコア配列
+- 語彙のハッシュ表(オープンアドレス法。ハッシュ値はプロセスによらず同じになるようCRC32を使います)
+
+共有メモリを作成したプロセスがcloseすると、共有メモリを削除します。
+
+Python3.8以上で動作します。
+"""
+
+__author__ = "Kensuke Mitsuzawa"
+__author_email__ = "kensuke_mitsuzawa@fumankaitori.com"
+__license_name__ = "MIT"
+
+try:
+    from multiprocessing import shared_memory
+    from multiprocessing import resource_tracker
+except ImportError:
+    raise ImportError('共有メモリの辞書はPython3.8以上で利用できます。')
+
+from dictionary_index import DictionaryIndex, INDEX_MAGIC, INDEX_FORMAT_VERSION, SECTION_ALIGNMENT
+
+# ハッシュ表の使用率の上限。これを超えないようにスロット数を2のべき乗で決めます。
+MAX_LOAD_FACTOR = 0.5
+
+
+def __align(position):
+    # type: (int)->int
+    return (position + SECTION_ALIGNMENT - 1) // SECTION_ALIGNMENT * SECTION_ALIGNMENT
+
+
+def build_shared_sections(seq_word_postings):
+    # type: (Iterable[Tuple[str, List[Tuple[str,float]]]])->Tuple[List[Tuple[str, array]], int, int]
+    """* What you can do
+    - (単語, [(カテゴリ名, スコア)])の列から、共有メモリに書き込むセクションを作成します。
+
+    * Output
+    - ([(セクション名, array)], 単語数, カテゴリ数)
+    """
+    word_offsets = array('I', [0])
+    word_blob = array('B')
+    posting_offsets = array('I', [0])
+    posting_label_ids = array('H')
+    posting_scores = array('d')
+    label2id = {}  # type: Dict[str,int]
+    seq_encoded_word = []  # type: List[bytes]
+    for word, postings in seq_word_postings:
+        encoded_word = word.encode('utf-8')
+        seq_encoded_word.append(encoded_word)
+        word_blob.frombytes(encoded_word)
+        word_offsets.append(len(word_blob))
+        for label, score in postings:
+            label_id = label2id.setdefault(label, len(label2id))
+            if label_id >= 65536:
+                raise ValueError('カテゴリ数が多すぎます。N(label)={}'.format(len(label2id)))
+            posting_label_ids.append(label_id)
+            posting_scores.append(score)
+        posting_offsets.append(len(posting_scores))
+
+    ### 語彙のハッシュ表を作成します。空きスロットは-1です ###
+    n_slots = 1
+    while n_slots * MAX_LOAD_FACTOR < max(len(seq_encoded_word), 1):
+        n_slots *= 2
+    hash_slots = array('i', [-1]) * n_slots
+    mask = n_slots - 1
+    for word_id, encoded_word in enumerate(seq_encoded_word):
+        slot = zlib.crc32(encoded_word) & mask
+        while hash_slots[slot] != -1:
+            slot = (slot + 1) & mask
+        hash_slots[slot] = word_id
+
+    label_offsets = array('I', [0])
+    label_blob = array('B')
+    for label in sorted(label2id, key=label2id.get):
+        label_blob.frombytes(label.encode('utf-8'))
+        label_offsets.append(len(label_blob))
+    sections = [
+        ('word_offsets', word_offsets),
+        ('word_blob', word_blob),
+        ('label_offsets', label_offsets),
+        ('label_blob', label_blob),
+        ('posting_offsets', posting_offsets),
+        ('posting_label_ids', posting_label_ids),
+        ('posting_scores', posting_scores),
+        ('hash_slots', hash_slots),
+    ]
+    return sections, len(seq_encoded_word), len(label2id)
+
+
+def __build_header(sections, n_words, n_labels, metadata):
+    # type: (List[Tuple[str, array]], int, int, Dict[str,Any])->Tuple[bytes, int]
+    """* What you can do
+    - ヘッダを作成し、(ヘッダ, 全体のバイト数)を返します。ヘッダの長さでセクションの位置が変わるため、位置が収束するまで計算します。
+    """
+    header = {
+        'format_version': INDEX_FORMAT_VERSION,
+        'byteorder': sys.byteorder,
+        'n_words': n_words,
+        'n_labels': n_labels,
+        'score_encoding': 'float64',
+        'metadata': metadata,
+        'sections': {},
+    }
+    header_size = 0
+    while True:
+        position = __align(len(INDEX_MAGIC) + 4 + header_size)
+        for name, section in sections:
+            header['sections'][name] = [position, len(section), section.typecode]
+            position = __align(position + len(section) * section.itemsize)
+        encoded_header = json.dumps(header, ensure_ascii=False).encode('utf-8')
+        if len(encoded_header) == header_size:
+            return encoded_header, position
+        header_size = len(encoded_header)
+
+
+def create_shared_dictionary(word_score_dictionary, name=None, metadata=None):
+    # type: (Any, Optional[str], Optional[Dict[str,Any]])->SharedDictionary
+    """* What you can do
+    - 辞書(dict、DictionaryIndex、SqliteDictionaryStoreなど、itemsを持つもの)を共有メモリに書き込みます。
+    - 返すSharedDictionaryがcloseされると、共有メモリを削除します。
+    """
+    sections, n_words, n_labels = build_shared_sections(word_score_dictionary.items())
+    encoded_header, total_size = __build_header(sections, n_words, n_labels, metadata or {})
+    shared_memory_object = shared_memory.SharedMemory(name=name, create=True, size=total_size)
+    try:
+        buffer = shared_memory_object.buf
+        buffer[:len(INDEX_MAGIC)] = INDEX_MAGIC
+        struct.pack_into('<I', buffer, len(INDEX_MAGIC), len(encoded_header))
+        header_start = len(INDEX_MAGIC) + 4
+        buffer[header_start:header_start + len(encoded_header)] = encoded_header
+        section_positions = json.loads(encoded_header.decode('utf-8'))['sections']
+        for section_name, section in sections:
+            position = section_positions[section_name][0]
+            section_bytes = memoryview(section).cast('B')
+            buffer[position:position + len(section_bytes)] = section_bytes
+            section_bytes.release()
+        del buffer
+        shared_dictionary = SharedDictionary(shared_memory_object, is_owner=True)
+    except BaseException:
+        shared_memory_object.close()
+        shared_memory_object.unlink()
+        raise
+    logger.info(msg='Created shared dictionary {}; N(word)={}, {} bytes'.format(shared_memory_object.name,
+                                                                                n_words,
+                                                                                total_size))
+    return shared_dictionary
+
+
+def attach_shared_dictionary(name):
+    # type: (str)->SharedDictionary
+    """* What you can do
+    - 他のプロセスが作成した共有メモリの辞書に、読み取り専用で接続します。辞書はコピーしません。
+    """
+    try:
+        shared_memory_object = shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        ### Python3.12以前は接続しただけでresource_trackerに登録され、接続したプロセスの終了時に削除されることがあるため、登録を取り消します ###
+        shared_memory_object = shared_memory.SharedMemory(name=name)
+        if os.name == 'posix':
+            resource_tracker.unregister(shared_memory_object._name, 'shared_memory')
+    return SharedDictionary(shared_memory_object, is_owner=False)
+
+
+class SharedDictionary(DictionaryIndex):
+    """* What you can do
+    - 共有メモリ上の辞書を、DictionaryIndexと同じく辞書(dict)と同じ形で引くことができます。
+    - get_text_scoreのword_score_dictionaryとしてそのまま利用できます。単語はハッシュ表で引きます。
+
+    * Example
+    >>> shared_dictionary = create_shared_dictionary(load_word_score_dictionary(path_dictionary_data))
+    >>> # ワーカープロセスでは
+    >>> word_score_dictionary = attach_shared_dictionary(shared_dictionary.name)
+    >>> word_score_dictionary['お金']
+    [('アウトドア・スポーツ-その他', 0.02942301705479622)]
+    """
+    def __init__(self, shared_memory_object, is_owner=False):
+        # type: (shared_memory.SharedMemory, bool)->None
+        self.shared_memory_object = shared_memory_object
+        self.is_owner = is_owner
+        # 接続したプロセスからは書き込めないよう、読み取り専用のビューを使います。
+        self.readonly_buffer = shared_memory_object.buf if is_owner else shared_memory_object.buf.toreadonly()
+        super(SharedDictionary, self).__init__(self.readonly_buffer)
+        self.hash_slots = self.sections['hash_slots']
+        self.hash_mask = len(self.hash_slots) - 1
+
+    @property
+    def name(self):
+        # type: ()->str
+        return self.shared_memory_object.name
+
+    def find(self, word):
+        # type: (str)->int
+        """* What you can do
+        - ハッシュ表で単語のIDを返します。存在しない場合は-1を返します。
+        """
+        encoded_word = word.encode('utf-8')
+        hash_slots = self.hash_slots
+        mask = self.hash_mask
+        slot = zlib.crc32(encoded_word) & mask
+        while True:
+            word_id = hash_slots[slot]
+            if word_id == -1:
+                return -1
+            if self._get_word(word_id) == encoded_word:
+                return word_id
+            slot = (slot + 1) & mask
+
+    def close(self):
+        # type: ()->None
+        """* What you can do
+        - 共有メモリへの参照を解放します。作成したプロセスの場合は共有メモリを削除します。
+        """
+        if self.shared_memory_object is None:
+            return
+        self.hash_slots = None
+        super(SharedDictionary, self).close()
+        if not self.is_owner:
+            self.readonly_buffer.release()
+        self.readonly_buffer = None
+        self.shared_memory_object.close()
+        if self.is_owner:
+            self.shared_memory_object.unlink()
+            logger.info(msg='Unlinked shared dictionary {}'.format(self.shared_memory_object.name))
+        self.shared_memory_object = None
@@ -0,0 +1,164 @@
+from typing import List, Dict, Any, Tuple, Callable, Iterable, Iterator, Optional
+from collections import Counter
+from heapq import nlargest
+import logging
+import re
+logger = logging.getLogger(__file__)
+logger.setLevel(logging.INFO)
+
+"""長い文書を少しずつスコアリングします。
+get_text_scoreは文書全体をトークン化してから集計するため、メモリ使用量と待ち時間が文書の長さに比例します。
+ここでは文書を文の区切りでまとめたチャンクごとにトークン化し、カテゴリごとのスコアの累計だけを保持します。
+
+- チャンクごとに途中のtop-kを返せます。
+- 残りの文書の長さの上限(文字数)を指定すると、残りをすべて読んでも上位のカテゴリが入れ替わらないと分かった時点で打ち切ります。
+
+Python3.5以上で動作します。
+"""
+
+__author__ = "Kensuke Mitsuzawa"
+__author_email__ = "kensuke_mitsuzawa@fumankaitori.com"
+__license_name__ = "MIT"
+
+# 文の区切り。区切り文字は前の文に含めます。
+SENTENCE_DELIMITER = re.compile('(?<=[。．！？!?\n])')
+DEFAULT_MAX_CHUNK_CHARS = 2000
+
+
+def iter_sentence_chunks(seq_text, max_chunk_chars=DEFAULT_MAX_CHUNK_CHARS):
+    # type: (Iterable[str], int)->Iterator[str]
+    """* What you can do
+    - テキストの断片(ファイルの行など)を受け取り、文の区切りでまとめたチャンクを返します。
+    - チャンクは文の途中で切らず、max_chunk_chars文字を超えない範囲でできるだけ多くの文を含めます。
+      1文がmax_chunk_chars文字を超える場合は、その文だけで1チャンクにします。
+
+    * Example
+    >>> list(iter_sentence_chunks(['鈴鹿サーキットは三重県に', 'ある。F1が開催される。'], max_chunk_chars=10))
+    ['鈴鹿サーキットは三重県にある。', 'F1が開催される。']
+    """
+    chunk = ''
+    remainder = ''
+    for text in seq_text:
+        sentences = SENTENCE_DELIMITER.split(remainder + text)
+        ### 最後の要素は区切り文字で終わっていない、書きかけの文です ###
+        remainder = sentences.pop()
+        for sentence in sentences:
+            if chunk and len(chunk) + len(sentence) > max_chunk_chars:
+                yield chunk
+                chunk = ''
+            chunk += sentence
+    if chunk and len(chunk) + len(remainder) > max_chunk_chars:
+        yield chunk
+        chunk = ''
+    chunk += remainder
+    if chunk:
+        yield chunk
+
+
+def get_score_bound(word_score_dictionary):
+    # type: (Any)->float
+    """* What you can do
+    - 1トークンで2つのカテゴリのスコアの差が変わりうる最大の量を返します。打ち切りの判定に使います。
+    - 辞書全体を1回走査するため、同じ辞書で何度もスコアリングする場合は、結果を保持して使い回してください。
+    """
+    max_score = 0.0
+    min_score = 0.0
+    for _, postings in word_score_dictionary.items():
+        for _, score in postings:
+            if score > max_score: max_score = score
+            elif score < min_score: min_score = score
+    return max_score - min_score
+
+
+def iter_streaming_text_score(seq_text_chunk,
+                              word_score_dictionary,
+                              function_tokenizer,
+                              top_k=None,
+                              total_length=None,
+                              score_bound=None):
+    # type: (Iterable[str], Any, Callable[[str], List[str]], Optional[int], Optional[int], Optional[float])->Iterator[Dict[str,Any]]
+    """* What you can do
+    - チャンクごとにトークン化してカテゴリごとのスコアに加算し、その時点の順位を返します。
+    - 全チャンクを処理した後の順位は、文書全体をget_text_scoreでスコアリングした順位と同じです。
+    - total_length(文書の文字数の上限)とtop_kを指定すると、残りの文字数がすべて辞書の単語だったとしても
+      上位top_k件の顔ぶれが変わらないと分かった時点で、is_stopped=Trueを返して打ち切ります。
+      1トークンは1文字以上なので、残りのトークン数は残りの文字数以下です。
+      score_boundを省略すると、get_score_boundで辞書から求めます。
+
+    * Output
+    >>> {"n_chunks": 1, "n_chars": 120, "n_tokens": 35, "ranking": [("カテゴリ名", 1.2), ...], "is_stopped": False}
+    """
+    if total_length is not None and top_k is not None and score_bound is None:
+        score_bound = get_score_bound(word_score_dictionary)
+    ### get_manyを持つ辞書(SQLiteの辞書ストア)は、category_scoring.get_text_scoreと同じくチャンクの異なり語をまとめて引きます ###
+    function_get_many = getattr(word_score_dictionary, 'get_many', None)
+    ### 同点のカテゴリはget_text_scoreと同じくカテゴリ名の降順に並べます ###
+    key_function = lambda tuple_obj: (tuple_obj[1], tuple_obj[0])
+    score_category = {}  # type: Dict[str,float]
+    n_chunks = 0
+    n_chars = 0
+    n_tokens = 0
+    for text_chunk in seq_text_chunk:
+        n_chunks += 1
+        n_chars += len(text_chunk)
+        token_frequency = Counter(function_tokenizer(text_chunk))
+        n_tokens += sum(token_frequency.values())
+        chunk_dictionary = word_score_dictionary
+        if function_get_many is not None:
+            chunk_dictionary = function_get_many(token_frequency)
+        for token, frequency in token_frequency.items():
+            postings = chunk_dictionary.get(token)
+            if postings is None: continue
+            for label, score in postings:
+                score_category[label] = score_category.get(label, 0.0) + score * frequency
+
+        if top_k is None:
+            seq_score_tuple = sorted(score_category.items(), key=key_function, reverse=True)
+        else:
+            ### top_k件目と次のカテゴリの差を見るため、1件多く取り出します ###
+            seq_score_tuple = nlargest(top_k + 1, score_category.items(), key=key_function)
+        is_stopped = False
+        if total_length is not None and top_k is not None and len(seq_score_tuple) >= top_k:
+            remaining_chars = max(total_length - n_chars, 0)
+            ### まだ出現していないカテゴリのスコアは0です ###
+            next_score = max(seq_score_tuple[top_k][1] if len(seq_score_tuple) > top_k else 0.0, 0.0)
+            is_stopped = seq_score_tuple[top_k - 1][1] - next_score > remaining_chars * score_bound
+        yield {
+            'n_chunks': n_chunks,
+            'n_chars': n_chars,
+            'n_tokens': n_tokens,
+            'ranking': seq_score_tuple if top_k is None else seq_score_tuple[:top_k],
+            'is_stopped': is_stopped,
+        }
+        if is_stopped:
+            logger.debug(msg='Stopped after {} chars of {}'.format(n_chars, total_length))
+            return
+
+
+def get_streaming_text_score(seq_text,
+                             word_score_dictionary,
+                             function_tokenizer,
+                             top_k=None,
+                             total_length=None,
+                             score_bound=None,
+                             max_chunk_chars=DEFAULT_MAX_CHUNK_CHARS):
+    # type: (Iterable[str], Any, Callable[[str], List[str]], Optional[int], Optional[int], Optional[float], int)->List[Tuple[str,float]]
+    """* What you can do
+    - テキストの断片を文の区切りでチャンクにまとめて少しずつスコアリングし、最後の順位を返します。
+    - get_text_scoreと違い、文書全体のトークンを同時に保持しません。
+
+    * Example
+    >>> with open('./long_report.txt', 'r') as f:
+    ...     get_streaming_text_score(f, word_score_dictionary, function_tokenizer, top_k=3,
+    ...                              total_length=os.path.getsize('./long_report.txt'))
+    [('カテゴリ名', 12.3), ...]
+    """
+    scoring_state = {'ranking': []}  # type: Dict[str,Any]
+    for scoring_state in iter_streaming_text_score(iter_sentence_chunks(seq_text, max_chunk_chars),
+                                                   word_score_dictionary,
+                                                   function_tokenizer,
+                                                   top_k=top_k,
+                                                   total_length=total_length,
+                                                   score_bound=score_bound):
+        pass
+    return scoring_state['ranking']
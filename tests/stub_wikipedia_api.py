@@ -0,0 +1,92 @@
+from typing import List, Dict, Any, Tuple, Optional
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from urllib.parse import urlparse, parse_qs
+import json
+import threading
+import time
+
+"""get_wikipedia_text.pyのテストに使う、MediaWiki APIのスタブのHTTPサーバーです。
+127.0.0.1の空いているポートで起動し、記事名ごとに用意した応答(ステータスと本文)を順に返します。
+受け取ったリクエストの時刻と記事名を記録します。
+
+* Example
+>>> with StubWikipediaApi({'鈴鹿サーキット': [429, '鈴鹿サーキットは三重県にある。']}) as stub_api:
+...     fetch_wikipedia_page('鈴鹿サーキット', TokenBucket(rate=10.0), api_url=stub_api.api_url)
+"""
+
+__author__ = "Kensuke Mitsuzawa"
+__author_email__ = "kensuke_mitsuzawa@fumankaitori.com"
+__license_name__ = "MIT"
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class StubWikipediaApi(object):
+    """* What you can do
+    - page_title2responsesの値は、記事名ごとの応答のリストです。intはそのHTTPステータスのエラー、strは記事の全文、
+      Noneは存在しない記事を表します。リストの最後の応答は、以降のリクエストでも繰り返し返します。
+    - 登録されていない記事名には、存在しない記事の応答を返します。
+    """
+    def __init__(self, page_title2responses):
+        # type: (Dict[str, List[Any]])->None
+        self.page_title2responses = page_title2responses
+        self.requests = []  # type: List[Tuple[float,str]]
+        self.lock = threading.Lock()
+        self.server = None  # type: Optional[HTTPServer]
+        self.thread = None  # type: Optional[threading.Thread]
+
+    @property
+    def api_url(self):
+        # type: ()->str
+        return 'http://127.0.0.1:{}/w/api.php'.format(self.server.server_address[1])
+
+    def get_request_times(self, page_title=None):
+        # type: (Optional[str])->List[float]
+        with self.lock:
+            return [requested_at for requested_at, title in self.requests if page_title is None or title == page_title]
+
+    def next_response(self, page_title):
+        # type: (str)->Any
+        with self.lock:
+            n_requested = sum(1 for _, title in self.requests if title == page_title)
+            self.requests.append((time.monotonic(), page_title))
+        responses = self.page_title2responses.get(page_title, [None])
+        return responses[min(n_requested, len(responses) - 1)]
+
+    def __enter__(self):
+        stub_api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                page_title = parse_qs(urlparse(self.path).query).get('titles', [''])[0]
+                response = stub_api.next_response(page_title)
+                if isinstance(response, int):
+                    self.send_error(response)
+                    return
+                if response is None:
+                    page_obj = {'ns': 0, 'title': page_title, 'missing': ''}
+                else:
+                    page_obj = {'pageid': 1, 'ns': 0, 'title': page_title, 'extract': response}
+                body = json.dumps({'batchcomplete': '', 'query': {'pages': {'1': page_obj}}},
+                                  ensure_ascii=False).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = _ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
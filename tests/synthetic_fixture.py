@@ -0,0 +1,44 @@
+from typing import Any, Iterator, Tuple
+import os
+import shutil
+import tempfile
+import unittest
+
+"""合成した辞書でスコアリングを確かめるテストに共通の準備です。
+クラスごとに一度だけ作業ディレクトリと合成した辞書を用意し、辞書(dict)とSQLiteの辞書ストアの形で返します。
+
+* Example
+>>> class TestSegmentScorer(SyntheticDictionaryTestCase):
+...     def test_window_score(self):
+...         for backend_name, word_score_dictionary in self.iter_backends():
+...             ...
+"""
+
+__author__ = "Kensuke Mitsuzawa"
+__author_email__ = "kensuke_mitsuzawa@fumankaitori.com"
+__license_name__ = "MIT"
+
+from benchmarks.synthetic_data import iter_synthetic_dictionary
+from category_scoring import reformat_dictionary
+
+
+class SyntheticDictionaryTestCase(unittest.TestCase):
+    """* What you can do
+    - setUpClassで作業ディレクトリ(path_work_dir)と合成した辞書のレコード(score_dictionary)を作成し、tearDownClassで削除します。
+    - iter_backendsで、(形の名前, 辞書)をdict、sqliteの順に返します。辞書は呼び出し側でcloseします。
+    """
+    @classmethod
+    def setUpClass(cls):
+        cls.path_work_dir = tempfile.mkdtemp(prefix='{}_'.format(cls.__name__))
+        cls.score_dictionary = list(iter_synthetic_dictionary(n_words=300, n_categories=20, mean_postings=4.0))
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.path_work_dir, ignore_errors=True)
+
+    def iter_backends(self):
+        # type: ()->Iterator[Tuple[str,Any]]
+        yield 'dict', reformat_dictionary(self.score_dictionary)
+        yield 'sqlite', reformat_dictionary(self.score_dictionary,
+                                            is_use_sqlite=True,
+                                            path_sqlite=os.path.join(self.path_work_dir, 'word_soa.sqlite3'))
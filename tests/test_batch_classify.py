@@ -0,0 +1,107 @@
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+"""batch_classifyのワーカーの処理を、MeCabを使わずに空白区切りのトークナイザーで確かめます。
+mainの出力が入力と同じ順序で、get_text_scoreと同じ結果になることを、同時に処理中のチャンク数を変えて確かめます。
+"""
+
+__author__ = "Kensuke Mitsuzawa"
+__author_email__ = "kensuke_mitsuzawa@fumankaitori.com"
+__license_name__ = "MIT"
+
+import batch_classify
+from benchmarks.synthetic_data import iter_synthetic_documents, write_synthetic_dictionary
+from category_scoring import get_text_score, load_word_score_dictionary
+from dictionary_delta import DictionaryHandle, create_manifest, publish_delta
+from dictionary_index import compile_dictionary_index
+from result_cache import get_dictionary_version
+
+WORD_SCORE_DICTIONARY = {'お金': [('マネー', 0.3)], '野球': [('スポーツ', 0.4), ('ニュース', 0.2)]}
+
+
+class TestClassifyChunkWithVersion(unittest.TestCase):
+    def setUp(self):
+        self.path_work_dir = tempfile.mkdtemp(prefix='test_batch_classify_')
+        self.path_manifest = os.path.join(self.path_work_dir, 'manifest.json')
+        path_dictionary_index = os.path.join(self.path_work_dir, 'word_soa.idx')
+        compile_dictionary_index(sorted(WORD_SCORE_DICTIONARY.items()), path_dictionary_index)
+        create_manifest(self.path_manifest, path_dictionary_index)
+        batch_classify._WORKER_STATE.clear()
+        batch_classify._WORKER_STATE['function_tokenizer'] = str.split
+
+    def tearDown(self):
+        dictionary_handle = batch_classify._WORKER_STATE.get('dictionary_handle')
+        if dictionary_handle is not None:
+            dictionary_handle.close()
+        batch_classify._WORKER_STATE.clear()
+        shutil.rmtree(self.path_work_dir, ignore_errors=True)
+
+    def test_version_of_dictionary(self):
+        batch_classify._WORKER_STATE['word_score_dictionary'] = WORD_SCORE_DICTIONARY
+        self.assertEqual(batch_classify.classify_chunk_with_version([(0, 'お金')], 10),
+                         ([(0, [('マネー', 0.3)])], None))
+
+    def test_version_of_manifest_dictionary(self):
+        batch_classify._WORKER_STATE['dictionary_handle'] = DictionaryHandle(self.path_manifest, refresh_interval=0.0)
+        _, dictionary_version = batch_classify.classify_chunk_with_version([(0, 'お金')], 10)
+        self.assertEqual(dictionary_version, get_dictionary_version(path_dictionary_manifest=self.path_manifest))
+
+        path_delta = os.path.join(self.path_work_dir, 'delta-2.jsonl')
+        with open(path_delta, 'w') as f:
+            f.write(json.dumps({'op': 'add', 'word': 'お金', 'label': 'ニュース', 'score': 0.5}, ensure_ascii=False) + '\n')
+        publish_delta(self.path_manifest, path_delta)
+        seq_result, dictionary_version = batch_classify.classify_chunk_with_version([(0, 'お金')], 10)
+        self.assertEqual(seq_result, [(0, [('ニュース', 0.5), ('マネー', 0.3)])])
+        self.assertEqual(dictionary_version, get_dictionary_version(path_dictionary_manifest=self.path_manifest))
+
+
+class TestMain(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.path_work_dir = tempfile.mkdtemp(prefix='test_batch_classify_')
+        cls.path_dictionary_data = os.path.join(cls.path_work_dir, 'word_soa.json')
+        write_synthetic_dictionary(cls.path_dictionary_data, n_words=300, n_categories=20)
+        cls.word_score_dictionary = load_word_score_dictionary(cls.path_dictionary_data)
+        seq_score_object = [{'word': word, 'label': label, 'score': score}
+                            for word, postings in cls.word_score_dictionary.items() for label, score in postings]
+        cls.seq_text = [evaluation_obj['text'] for evaluation_obj
+                        in iter_synthetic_documents(seq_score_object, n_documents=53, mean_tokens=30)]
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.path_work_dir, ignore_errors=True)
+
+    def run_main(self, **kwargs):
+        input_file = io.StringIO(''.join(json.dumps({'id': 'doc{}'.format(index), 'text': text}, ensure_ascii=False) + '\n'
+                                         for index, text in enumerate(self.seq_text)))
+        output_file = io.StringIO()
+        n_records = batch_classify.main(input_file, output_file, '', self.path_dictionary_data,
+                                        top_k=5, chunk_size=4, function_tokenizer=str.split, **kwargs)
+        self.assertEqual(n_records, len(self.seq_text))
+        return [json.loads(line) for line in output_file.getvalue().splitlines()]
+
+    def assert_same_as_get_text_score(self, seq_output):
+        self.assertEqual([output_obj['id'] for output_obj in seq_output],
+                         ['doc{}'.format(index) for index in range(len(self.seq_text))])
+        for output_obj, text in zip(seq_output, self.seq_text):
+            seq_expected = get_text_score(text, self.word_score_dictionary, str.split, top_k=5)
+            self.assertEqual([tuple(score_tuple) for score_tuple in output_obj['categories']], seq_expected)
+
+    def test_without_worker_process(self):
+        for max_in_flight in (1, None):
+            self.assert_same_as_get_text_score(self.run_main(n_workers=0, max_in_flight=max_in_flight))
+        batch_classify._WORKER_STATE.clear()
+
+    def test_max_in_flight_one(self):
+        self.assert_same_as_get_text_score(self.run_main(n_workers=2, max_in_flight=1))
+
+    def test_default_max_in_flight(self):
+        self.assert_same_as_get_text_score(self.run_main(n_workers=2))
+
+
+if __name__ == '__main__':
+    unittest.main()
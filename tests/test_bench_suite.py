@@ -0,0 +1,38 @@
+import json
+import os
+import unittest
+
+"""リポジトリのベースラインがマシンによらない項目だけを持ち、処理時間の項目がなくても比較できることを確かめます。
+"""
+
+__author__ = "Kensuke Mitsuzawa"
+__author_email__ = "kensuke_mitsuzawa@fumankaitori.com"
+__license_name__ = "MIT"
+
+from benchmarks.bench_suite import PORTABLE_BASELINE_KEYS, SCALES, compare_with_baseline, get_portable_baseline
+
+PATH_BASELINE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                             'benchmarks', 'bench_suite_baseline.json')
+
+
+class TestBenchSuiteBaseline(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        with open(PATH_BASELINE, 'r') as f:
+            cls.baseline = json.loads(f.read())
+
+    def test_baseline_is_portable(self):
+        for scale_name in ('small', 'medium'):
+            self.assertEqual(sorted(self.baseline[scale_name]), sorted(PORTABLE_BASELINE_KEYS))
+            self.assertEqual(self.baseline[scale_name]['setting'], SCALES[scale_name])
+
+    def test_compare_without_timing(self):
+        scale_result = dict(self.baseline['small'], evaluation_loop_sec=1000.0, peak_rss_mb=1000.0)
+        self.assertEqual(compare_with_baseline({'small': scale_result}, self.baseline), [])
+        self.assertEqual(get_portable_baseline({'small': scale_result}), {'small': self.baseline['small']})
+        changed_result = dict(scale_result, digest='0' * 40)
+        self.assertEqual(len(compare_with_baseline({'small': changed_result}, self.baseline)), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
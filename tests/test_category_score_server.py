@@ -0,0 +1,168 @@
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import json
+import unittest
+
+"""category_score_server.handle_requestが、不正なtop_kに400を、スコアリングの失敗に500を返すことを確かめます。
+ワーカープロセスは起動せず、submitだけを持つサービスで置き換えます。
+handle_connectionは、不正なContent-Lengthに400を返すことを確かめます。
+ScoringService.run_batchは、同じプロセスのスレッドで、空白区切りのトークナイザーと辞書(dict)を使って確かめます。
+"""
+
+__author__ = "Kensuke Mitsuzawa"
+__author_email__ = "kensuke_mitsuzawa@fumankaitori.com"
+__license_name__ = "MIT"
+
+import batch_classify
+from category_score_server import HTTP_REASONS, ScoringService, handle_connection, handle_request
+from category_scoring import POS_CONDITION, get_text_score
+from result_cache import ResultCache
+
+WORD_SCORE_DICTIONARY = {'お金': [('マネー', 0.3)], '野球': [('スポーツ', 0.4), ('ニュース', 0.2)]}
+
+
+class _ScoringServiceStub(object):
+    def __init__(self, exception=None):
+        self.default_top_k = 10
+        self.exception = exception
+        self.seq_submitted = []
+
+    def submit(self, input_text, top_k):
+        self.seq_submitted.append((input_text, top_k))
+        future = asyncio.get_event_loop().create_future()
+        if self.exception is None:
+            future.set_result([('スポーツ', 1.0), ('ニュース', 0.5)][:top_k])
+        else:
+            future.set_exception(self.exception)
+        return future
+
+
+def request_score(service, request):
+    body = json.dumps(request).encode('utf-8')
+    return asyncio.run(handle_request(service, 'POST', '/score', body))
+
+
+def function_failing_tokenizer(input_text):
+    if 'エラー' in input_text:
+        raise RuntimeError('tokenizer failed')
+    return input_text.split()
+
+
+class _StreamWriterStub(object):
+    def __init__(self):
+        self.buffer = b''
+        self.is_closed = False
+
+    def write(self, data):
+        self.buffer += data
+
+    async def drain(self):
+        pass
+
+    def close(self):
+        self.is_closed = True
+
+
+class TestHandleRequest(unittest.TestCase):
+    def test_top_k_below_one_is_rejected(self):
+        service = _ScoringServiceStub()
+        for top_k in (0, -1):
+            status, response_body = request_score(service, {'text': 'テキスト', 'top_k': top_k})
+            self.assertEqual(status, 400)
+            self.assertIn('top_k', response_body['error'])
+        self.assertEqual(service.seq_submitted, [])
+
+    def test_top_k_not_integer_is_rejected(self):
+        service = _ScoringServiceStub()
+        for top_k in (1.5, 2.0, '5', True, None, [3]):
+            status, response_body = request_score(service, {'text': 'テキスト', 'top_k': top_k})
+            self.assertEqual(status, 400, top_k)
+            self.assertIn('top_k', response_body['error'])
+        self.assertEqual(service.seq_submitted, [])
+
+    def test_top_k(self):
+        service = _ScoringServiceStub()
+        self.assertEqual(request_score(service, {'text': 'テキスト', 'top_k': 1}),
+                         (200, {'categories': [('スポーツ', 1.0)]}))
+
+    def test_scoring_failure_is_500(self):
+        service = _ScoringServiceStub(exception=RuntimeError('worker died'))
+        status, response_body = request_score(service, {'text': 'テキスト'})
+        self.assertEqual(status, 500)
+        self.assertIn('worker died', response_body['error'])
+        self.assertEqual(HTTP_REASONS[500], 'Internal Server Error')
+
+
+class TestHandleConnection(unittest.TestCase):
+    def request(self, raw_request):
+        async def run():
+            reader = asyncio.StreamReader()
+            reader.feed_data(raw_request)
+            reader.feed_eof()
+            writer = _StreamWriterStub()
+            await handle_connection(_ScoringServiceStub(), reader, writer)
+            return writer
+        return asyncio.run(run())
+
+    def test_invalid_content_length(self):
+        for content_length in ('abc', '-1', '1.5'):
+            writer = self.request('POST /score HTTP/1.1\r\nContent-Length: {}\r\n\r\n{{}}'.format(
+                content_length).encode('latin-1'))
+            self.assertTrue(writer.buffer.startswith(b'HTTP/1.1 400 Bad Request\r\n'), writer.buffer)
+            self.assertIn(b'content-length', writer.buffer)
+            self.assertTrue(writer.is_closed)
+
+    def test_content_length(self):
+        body = json.dumps({'text': 'テキスト', 'top_k': 1}).encode('utf-8')
+        writer = self.request(b'POST /score HTTP/1.1\r\nContent-Length: ' + str(len(body)).encode('latin-1') +
+                              b'\r\nConnection: close\r\n\r\n' + body)
+        self.assertTrue(writer.buffer.startswith(b'HTTP/1.1 200 OK\r\n'), writer.buffer)
+
+
+class TestRunBatch(unittest.TestCase):
+    def setUp(self):
+        batch_classify._WORKER_STATE.clear()
+        batch_classify._WORKER_STATE.update({'function_tokenizer': str.split,
+                                             'word_score_dictionary': WORD_SCORE_DICTIONARY})
+        self.result_cache = ResultCache('v1')
+        self.scoring_service = ScoringService('', 'word_soa.json', n_workers=0, result_cache=self.result_cache)
+        self.scoring_service.executor = ThreadPoolExecutor(max_workers=1)
+
+    def tearDown(self):
+        self.scoring_service.executor.shutdown(wait=True)
+        batch_classify._WORKER_STATE.clear()
+
+    def run_batch(self, seq_text, dictionary_version):
+        async def run():
+            loop = asyncio.get_event_loop()
+            self.scoring_service.batch_semaphore = asyncio.Semaphore(1)
+            await self.scoring_service.batch_semaphore.acquire()
+            batch = [(input_text, 10, loop.create_future(), dictionary_version) for input_text in seq_text]
+            await self.scoring_service.run_batch(batch)
+            return [future.exception() or future.result() for _, _, future, _ in batch]
+        return asyncio.run(run())
+
+    def test_result_is_cached(self):
+        self.assertEqual(self.run_batch(['お金 野球'], 'v1'),
+                         [get_text_score('お金 野球', WORD_SCORE_DICTIONARY, str.split, top_k=10)])
+        self.assertIsNotNone(self.result_cache.get('お金 野球', POS_CONDITION, 10))
+
+    def test_failure_of_one_request(self):
+        batch_classify._WORKER_STATE['function_tokenizer'] = function_failing_tokenizer
+        seq_result = self.run_batch(['お金 野球', 'エラー', '野球'], 'v1')
+        self.assertEqual(seq_result[0], get_text_score('お金 野球', WORD_SCORE_DICTIONARY, str.split, top_k=10))
+        self.assertIsInstance(seq_result[1], RuntimeError)
+        self.assertEqual(seq_result[2], get_text_score('野球', WORD_SCORE_DICTIONARY, str.split, top_k=10))
+        self.assertIsNone(self.result_cache.get('エラー', POS_CONDITION, 10))
+        self.assertIsNotNone(self.result_cache.get('野球', POS_CONDITION, 10))
+
+    def test_result_of_old_version_is_not_cached(self):
+        ### 受け付けた後で辞書のバージョンが変わった場合、古い辞書の結果を新しいバージョンで登録しません ###
+        self.result_cache.set_dictionary_version('v2')
+        self.assertEqual(len(self.run_batch(['お金 野球'], 'v1')), 1)
+        self.assertIsNone(self.result_cache.get('お金 野球', POS_CONDITION, 10))
+        self.assertEqual(self.result_cache.stats()['stale_dropped'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import unittest
+
+"""CompactDictionaryのget、in、itemsが、reformat_dictionaryの辞書(dict)と同じ結果を返すことを確かめます。
+単精度(score_typecode='f')で保持したスコアの丸め誤差が、単精度の相対誤差の範囲に収まることも確かめます。
+"""
+
+__author__ = "Kensuke Mitsuzawa"
+__author_email__ = "kensuke_mitsuzawa@fumankaitori.com"
+__license_name__ = "MIT"
+
+from benchmarks.synthetic_data import iter_synthetic_dictionary
+from category_scoring import reformat_dictionary
+from compact_dictionary import CompactDictionary
+
+# 単精度の丸めの相対誤差の上限(2^-24)
+FLOAT32_RELATIVE_ERROR = 2.0 ** -24
+
+
+class TestCompactDictionary(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.score_dictionary = list(iter_synthetic_dictionary(n_words=300, n_categories=20, mean_postings=4.0))
+        ### 同じ単語のレコードが離れている場合と、負のスコアや非常に小さいスコアも含めます ###
+        cls.score_dictionary += [{'word': cls.score_dictionary[0]['word'], 'label': '追加', 'score': -0.123456789},
+                                 {'word': '微小', 'label': '追加', 'score': 1e-30}]
+        cls.word_score_dictionary = reformat_dictionary(cls.score_dictionary)
+
+    def assert_same_as_dict(self, compact_dictionary, function_assert_score):
+        self.assertEqual(len(compact_dictionary), len(self.word_score_dictionary))
+        self.assertEqual(sorted(compact_dictionary.keys()), sorted(self.word_score_dictionary))
+        self.assertEqual(sorted(compact_dictionary), sorted(self.word_score_dictionary))
+        self.assertNotIn('辞書にない単語', compact_dictionary)
+        self.assertIsNone(compact_dictionary.get('辞書にない単語'))
+        self.assertEqual(compact_dictionary.get('辞書にない単語', []), [])
+        self.assertRaises(KeyError, compact_dictionary.__getitem__, '辞書にない単語')
+        seq_items = list(compact_dictionary.items())
+        self.assertEqual(sorted(word for word, _ in seq_items), sorted(self.word_score_dictionary))
+        for word, postings in seq_items:
+            self.assertIn(word, compact_dictionary)
+            expected_postings = self.word_score_dictionary[word]
+            for seq_postings in (postings, compact_dictionary.get(word), compact_dictionary[word]):
+                self.assertEqual([label for label, _ in seq_postings], [label for label, _ in expected_postings])
+                for (_, score), (_, expected_score) in zip(seq_postings, expected_postings):
+                    function_assert_score(score, expected_score)
+
+    def test_double(self):
+        for compact_dictionary in (
+                CompactDictionary.from_records(self.score_dictionary, score_typecode='d'),
+                CompactDictionary.from_word_score_dictionary(self.word_score_dictionary, score_typecode='d')):
+            self.assert_same_as_dict(compact_dictionary, self.assertEqual)
+
+    def test_float(self):
+        def assert_float32_error(score, expected_score):
+            self.assertLessEqual(abs(score - expected_score), abs(expected_score) * FLOAT32_RELATIVE_ERROR,
+                                 (score, expected_score))
+        for compact_dictionary in (reformat_dictionary(self.score_dictionary, is_use_compact=True),
+                                   CompactDictionary.from_word_score_dictionary(self.word_score_dictionary)):
+            self.assertEqual(compact_dictionary.posting_scores.typecode, 'f')
+            self.assert_same_as_dict(compact_dictionary, assert_float32_error)
+
+    def test_duplicate_word(self):
+        compact_dictionary = CompactDictionary()
+        compact_dictionary.add_postings('お金', [('マネー', 0.3)])
+        self.assertRaises(ValueError, compact_dictionary.add_postings, 'お金', [('生活', 0.1)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+"""OverlayDictionaryのin、len、keysがgetと一致すること、DictionaryHandle.refreshを同時に呼んでもデルタを一度だけ読み込むことを確かめます。
+"""
+
+__author__ = "Kensuke Mitsuzawa"
+__author_email__ = "kensuke_mitsuzawa@fumankaitori.com"
+__license_name__ = "MIT"
+
+import dictionary_delta
+from dictionary_delta import OverlayDictionary, DictionaryHandle, create_manifest, publish_delta
+from dictionary_index import compile_dictionary_index
+
+WORD_SCORE_DICTIONARY = {
+    'お金': [('マネー', 0.3), ('生活', 0.1)],
+    '鈴鹿': [('スポーツ', 0.5)],
+    '野球': [('スポーツ', 0.4), ('ニュース', 0.2)],
+    '保険': [('マネー', 0.2)],
+}
+
+
+class TestOverlayDictionary(unittest.TestCase):
+    def assert_consistent(self, word_score_dictionary, expected_words):
+        self.assertEqual(sorted(word_score_dictionary.keys()), sorted(expected_words))
+        self.assertEqual(len(word_score_dictionary), len(expected_words))
+        for word in list(WORD_SCORE_DICTIONARY) + ['未知語']:
+            self.assertEqual(word in word_score_dictionary, word in expected_words)
+            self.assertEqual(word_score_dictionary.get(word) is not None, word in expected_words)
+
+    def test_remove_label(self):
+        word_score_dictionary = OverlayDictionary(WORD_SCORE_DICTIONARY, version=1)
+        word_score_dictionary = word_score_dictionary.apply_delta([{'op': 'remove_label', 'label': 'スポーツ'}],
+                                                                  version=2)
+        self.assert_consistent(word_score_dictionary, ['お金', '野球', '保険'])
+        self.assertEqual(word_score_dictionary.get('野球'), [('ニュース', 0.2)])
+        ### 削除したカテゴリを追加し直した単語は、辞書に戻ります ###
+        word_score_dictionary = word_score_dictionary.apply_delta(
+            [{'op': 'add', 'word': '鈴鹿', 'label': 'スポーツ', 'score': 0.6},
+             {'op': 'remove', 'word': '保険', 'label': 'マネー'}], version=3)
+        self.assert_consistent(word_score_dictionary, ['お金', '野球', '鈴鹿'])
+        self.assertEqual(word_score_dictionary['鈴鹿'], [('スポーツ', 0.6)])
+
+    def test_remove_last_label(self):
+        word_score_dictionary = OverlayDictionary(WORD_SCORE_DICTIONARY, version=1)
+        word_score_dictionary = word_score_dictionary.apply_delta(
+            [{'op': 'remove', 'word': '鈴鹿', 'label': 'スポーツ'},
+             {'op': 'remove', 'word': 'お金'},
+             {'op': 'add', 'word': '新語', 'label': 'ニュース', 'score': 0.1}], version=2)
+        self.assertEqual(word_score_dictionary.n_words, 3)
+        self.assert_consistent(word_score_dictionary, ['野球', '保険', '新語'])
+        self.assertRaises(KeyError, word_score_dictionary.__getitem__, '鈴鹿')
+
+
+class TestDictionaryHandle(unittest.TestCase):
+    def setUp(self):
+        self.path_work_dir = tempfile.mkdtemp(prefix='test_dictionary_delta_')
+        self.path_manifest = os.path.join(self.path_work_dir, 'manifest.json')
+        path_dictionary_index = os.path.join(self.path_work_dir, 'word_soa.idx')
+        compile_dictionary_index(sorted(WORD_SCORE_DICTIONARY.items()), path_dictionary_index)
+        create_manifest(self.path_manifest, path_dictionary_index)
+
+    def tearDown(self):
+        shutil.rmtree(self.path_work_dir, ignore_errors=True)
+
+    def test_concurrent_refresh_loads_once(self):
+        dictionary_handle = DictionaryHandle(self.path_manifest, refresh_interval=0.0)
+        path_delta = os.path.join(self.path_work_dir, 'delta-2.jsonl')
+        with open(path_delta, 'w') as f:
+            f.write(json.dumps({'op': 'add', 'word': '新語', 'label': 'ニュース', 'score': 0.1}, ensure_ascii=False) + '\n')
+        publish_delta(self.path_manifest, path_delta)
+
+        function_load = dictionary_delta.load_manifest_dictionary
+
+        def function_slow_load(*args, **kwargs):
+            time.sleep(0.1)
+            return function_load(*args, **kwargs)
+
+        seq_result = []
+        with mock.patch.object(dictionary_delta, 'load_manifest_dictionary', side_effect=function_slow_load) as mock_load:
+            seq_thread = [threading.Thread(target=lambda: seq_result.append(dictionary_handle.refresh()))
+                          for _ in range(8)]
+            for thread in seq_thread:
+                thread.start()
+            for thread in seq_thread:
+                thread.join()
+            self.assertEqual(mock_load.call_count, 1)
+            self.assertEqual(sorted(seq_result), [False] * 7 + [True])
+            self.assertFalse(dictionary_handle.refresh(is_force=True))
+            self.assertEqual(mock_load.call_count, 1)
+        self.assertEqual(dictionary_handle.version, 2)
+        with dictionary_handle.acquire() as word_score_dictionary:
+            self.assertIn('新語', word_score_dictionary)
+        dictionary_handle.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
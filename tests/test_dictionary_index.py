@@ -0,0 +1,100 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+"""辞書インデックスのカテゴリの逆引きが、メモリの上限によらず同じ並び(スコアの降順、同点は単語の昇順)になることを確かめます。
+スコアをint8とfloat16で保持した場合の誤差が、カテゴリごとのスケールで決まる範囲に収まることも確かめます。
+"""
+
+__author__ = "Kensuke Mitsuzawa"
+__author_email__ = "kensuke_mitsuzawa@fumankaitori.com"
+__license_name__ = "MIT"
+
+from benchmarks.synthetic_data import iter_synthetic_dictionary
+from category_scoring import reformat_dictionary
+from dictionary_index import DictionaryIndex, INT8_MAX, compile_dictionary_index
+
+
+class TestCategoryIndex(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.path_work_dir = tempfile.mkdtemp(prefix='test_dictionary_index_')
+        word_score_dictionary = reformat_dictionary(list(iter_synthetic_dictionary(n_words=500, n_categories=12)))
+        ### 同点のポスティングを作るため、スコアを丸めます ###
+        cls.seq_word_postings = [(word, [(label, round(score, 1)) for label, score in postings])
+                                 for word, postings in sorted(word_score_dictionary.items())]
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.path_work_dir, ignore_errors=True)
+
+    def compile(self, memory_budget_bytes):
+        path_dictionary_index = os.path.join(self.path_work_dir, 'word_soa_{}.idx'.format(memory_budget_bytes))
+        compile_dictionary_index(self.seq_word_postings, path_dictionary_index, memory_budget_bytes=memory_budget_bytes)
+        return path_dictionary_index
+
+    def test_category_postings_order(self):
+        label2word_scores = {}
+        for word, postings in self.seq_word_postings:
+            for label, score in postings:
+                label2word_scores.setdefault(label, []).append((word, score))
+        with DictionaryIndex.open(self.compile(None)) as dictionary_index:
+            for label, seq_word_score in label2word_scores.items():
+                self.assertEqual(dictionary_index.get_category_postings(label),
+                                 sorted(seq_word_score, key=lambda tuple_obj: (-tuple_obj[1], tuple_obj[0])))
+
+    def test_memory_budget_does_not_change_index(self):
+        with open(self.compile(None), 'rb') as f:
+            expected = f.read()
+        for memory_budget_bytes in (1, 10000):
+            with open(self.compile(memory_budget_bytes), 'rb') as f:
+                self.assertEqual(f.read(), expected)
+
+
+class TestScoreEncoding(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.path_work_dir = tempfile.mkdtemp(prefix='test_dictionary_index_')
+        word_score_dictionary = reformat_dictionary(list(iter_synthetic_dictionary(n_words=500, n_categories=12)))
+        ### 負のスコアと、スケールより小さいスコアも含めます ###
+        seq_word_postings = sorted(word_score_dictionary.items())
+        seq_word_postings += [('\uffff負', [(label, -score) for label, score in seq_word_postings[0][1]]),
+                              ('\uffff微小', [(label, 1e-9) for label, _ in seq_word_postings[1][1]])]
+        cls.seq_word_postings = sorted(seq_word_postings)
+        cls.label_scales = {}
+        for _, postings in cls.seq_word_postings:
+            for label, score in postings:
+                cls.label_scales[label] = max(cls.label_scales.get(label, 0.0), abs(score) / INT8_MAX)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.path_work_dir, ignore_errors=True)
+
+    def assert_error_bound(self, score_encoding, function_bound):
+        path_dictionary_index = os.path.join(self.path_work_dir, 'word_soa_{}.idx'.format(score_encoding))
+        compile_dictionary_index(self.seq_word_postings, path_dictionary_index, score_encoding=score_encoding)
+        with DictionaryIndex.open(path_dictionary_index) as dictionary_index:
+            self.assertEqual(dictionary_index.score_encoding, score_encoding)
+            for word, postings in self.seq_word_postings:
+                seq_decoded = dictionary_index[word]
+                self.assertEqual([label for label, _ in seq_decoded], [label for label, _ in postings])
+                for (label, score), (_, decoded_score) in zip(postings, seq_decoded):
+                    self.assertLessEqual(abs(decoded_score - score), function_bound(score, self.label_scales[label]),
+                                         (word, label, score, decoded_score))
+
+    def test_int8(self):
+        ### 丸めの誤差は、スケールの半分以下です ###
+        self.assert_error_bound('int8', lambda score, label_scale: label_scale / 2 + 1e-12)
+
+    def test_float16(self):
+        ### 半精度の相対誤差(2^-11)以下で、スケールの半分よりも小さい誤差です ###
+        def function_bound(score, label_scale):
+            bound = max(abs(score) * 2 ** -11, 2 ** -25)
+            self.assertLess(bound, label_scale / 2)
+            return bound
+        self.assert_error_bound('float16', function_bound)
+
+
+if __name__ == '__main__':
+    unittest.main()
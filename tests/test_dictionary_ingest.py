@@ -0,0 +1,71 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+"""辞書jsonファイルを小さい読み込み単位とメモリ上限で読み込んでも、ファイル全体を読み込んでまとめた場合と同じ結果になることを確かめます。
+"""
+
+__author__ = "Kensuke Mitsuzawa"
+__author_email__ = "kensuke_mitsuzawa@fumankaitori.com"
+__license_name__ = "MIT"
+
+from benchmarks.synthetic_data import write_synthetic_dictionary
+from category_scoring import reformat_dictionary
+from dictionary_ingest import iter_grouped_records, iter_score_records
+
+# 読み込み単位の境界でエスケープが分かれるように、エスケープの多いレコードを作ります。
+ESCAPED_SCORE_DICTIONARY = [
+    {'label': 'スポーツ"野球"', 'score': 0.5, 'word': 'お\\金'},
+    {'label': 'ニュース, [速報]', 'score': -1.25e-05, 'word': '改行\nタブ\t'},
+    {'label': 'スポーツ"野球"', 'score': 3, 'word': 'お\\金'},
+    {'label': '}{', 'score': 0.1, 'word': '\U0001F600絵文字'},
+]
+
+
+class TestDictionaryIngest(unittest.TestCase):
+    def setUp(self):
+        self.path_work_dir = tempfile.mkdtemp(prefix='test_dictionary_ingest_')
+
+    def tearDown(self):
+        shutil.rmtree(self.path_work_dir, ignore_errors=True)
+
+    def test_grouped_records_with_spill(self):
+        path_dictionary_data = os.path.join(self.path_work_dir, 'word_soa.json')
+        write_synthetic_dictionary(path_dictionary_data, n_words=200, n_categories=10, mean_postings=3.0)
+        with open(path_dictionary_data, 'r') as f:
+            score_dictionary = json.load(f)
+        self.assertEqual(list(iter_score_records(path_dictionary_data, read_size=7)), score_dictionary)
+
+        path_temporary_dir = os.path.join(self.path_work_dir, 'runs')
+        os.mkdir(path_temporary_dir)
+        seq_word_postings = list(iter_grouped_records(iter_score_records(path_dictionary_data, read_size=7),
+                                                      memory_budget_bytes=2048,
+                                                      path_temporary_dir=path_temporary_dir))
+        self.assertGreater(len(os.listdir(path_temporary_dir)), 1)
+        self.assertEqual(seq_word_postings, sorted(reformat_dictionary(score_dictionary).items()))
+
+    def test_score_records_split_in_escapes(self):
+        for ensure_ascii in (True, False):
+            path_dictionary_data = os.path.join(self.path_work_dir, 'escaped_{}.json'.format(ensure_ascii))
+            with open(path_dictionary_data, 'w') as f:
+                f.write(' [\n' + ',\n'.join(json.dumps(score_object, ensure_ascii=ensure_ascii)
+                                            for score_object in ESCAPED_SCORE_DICTIONARY) + '\n]\n')
+            with open(path_dictionary_data, 'r') as f:
+                n_characters = len(f.read())
+            ### 読み込み単位の境界が、すべての文字の位置に来るようにします ###
+            for read_size in range(1, n_characters + 1):
+                self.assertEqual(list(iter_score_records(path_dictionary_data, read_size=read_size)),
+                                 ESCAPED_SCORE_DICTIONARY, (ensure_ascii, read_size))
+
+    def test_score_records_broken_file(self):
+        path_dictionary_data = os.path.join(self.path_work_dir, 'broken.json')
+        for text in ('[{"label": "a", "score": 0.1, "word": "お金"}', '{"label": "a"}', '[{"label": "a\\'):
+            with open(path_dictionary_data, 'w') as f:
+                f.write(text)
+            self.assertRaises(ValueError, list, iter_score_records(path_dictionary_data, read_size=3))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import os
+import random
+import shutil
+import tempfile
+import unittest
+
+"""AhoCorasickMatcherが、テキストのすべての部分文字列を語彙と照合する素朴な方法と同じ結果を返すことを、
+ランダムな語彙とテキストで確かめます。保存して読み込んだオートマトンでも確かめます。
+"""
+
+__author__ = "Kensuke Mitsuzawa"
+__author_email__ = "kensuke_mitsuzawa@fumankaitori.com"
+__license_name__ = "MIT"
+
+from dictionary_matcher import AhoCorasickMatcher
+
+# 重なりや接頭辞の共有が多くなるように、少ない文字で語彙とテキストを作ります。
+ALPHABET = 'あいうアイ金'
+
+
+def make_random_text(random_object, max_length):
+    return ''.join(random_object.choice(ALPHABET) for _ in range(random_object.randint(1, max_length)))
+
+
+def tokenize_all_brute_force(input_text, vocabulary, min_word_length):
+    seq_match = []
+    for start in range(len(input_text)):
+        for end in range(start + max(min_word_length, 1), len(input_text) + 1):
+            if input_text[start:end] in vocabulary:
+                seq_match.append((start, end, input_text[start:end]))
+    return [word for _, _, word in sorted(seq_match)]
+
+
+def tokenize_longest_brute_force(input_text, vocabulary, min_word_length):
+    list_tokens = []
+    start = 0
+    while start < len(input_text):
+        seq_end = [end for end in range(start + max(min_word_length, 1), len(input_text) + 1)
+                   if input_text[start:end] in vocabulary]
+        if seq_end:
+            list_tokens.append(input_text[start:max(seq_end)])
+            start = max(seq_end)
+        else:
+            start += 1
+    return list_tokens
+
+
+class TestAhoCorasickMatcher(unittest.TestCase):
+    def setUp(self):
+        self.path_work_dir = tempfile.mkdtemp(prefix='test_dictionary_matcher_')
+
+    def tearDown(self):
+        shutil.rmtree(self.path_work_dir, ignore_errors=True)
+
+    def test_random_oracle(self):
+        random_object = random.Random(0)
+        for trial in range(30):
+            min_word_length = random_object.choice([1, 2])
+            seq_word = [make_random_text(random_object, 4) for _ in range(random_object.randint(1, 30))]
+            vocabulary = {word for word in seq_word if len(word) >= min_word_length}
+            seq_text = [make_random_text(random_object, 40) for _ in range(10)] + ['', 'ん']
+
+            path_matcher = os.path.join(self.path_work_dir, 'matcher_{}.bin'.format(trial))
+            AhoCorasickMatcher.build(seq_word, min_word_length=min_word_length).save(path_matcher)
+            for match_policy, function_oracle in (('all', tokenize_all_brute_force),
+                                                  ('longest', tokenize_longest_brute_force)):
+                matcher = AhoCorasickMatcher.build(seq_word, match_policy=match_policy, min_word_length=min_word_length)
+                loaded_matcher = AhoCorasickMatcher.load(path_matcher, match_policy=match_policy)
+                self.assertEqual(loaded_matcher.min_word_length, min_word_length)
+                self.assertEqual(loaded_matcher.n_states, matcher.n_states)
+                for input_text in seq_text:
+                    expected = function_oracle(input_text, vocabulary, min_word_length)
+                    self.assertEqual(matcher.tokenize(input_text), expected, (match_policy, seq_word, input_text))
+                    self.assertEqual(loaded_matcher.tokenize(input_text), expected,
+                                     (match_policy, seq_word, input_text))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import unittest
+
+"""prune_postingsの3つの条件(max_postings、min_score、cumulative_mass)を、同点や負のスコアを含めて確かめます。
+"""
+
+__author__ = "Kensuke Mitsuzawa"
+__author_email__ = "kensuke_mitsuzawa@fumankaitori.com"
+__license_name__ = "MIT"
+
+from dictionary_pruning import prune_postings, iter_pruned_postings
+
+POSTINGS = [('a', 0.1), ('b', 0.5), ('c', 0.3), ('d', 0.1), ('e', -0.2)]
+
+
+class TestPrunePostings(unittest.TestCase):
+    def test_no_condition_sorts_only(self):
+        ### 同点のカテゴリはカテゴリ名の降順に並べます ###
+        self.assertEqual(prune_postings(POSTINGS), [('b', 0.5), ('c', 0.3), ('d', 0.1), ('a', 0.1), ('e', -0.2)])
+
+    def test_max_postings(self):
+        self.assertEqual(prune_postings(POSTINGS, max_postings=2), [('b', 0.5), ('c', 0.3)])
+        ### 同点のカテゴリの途中で切る場合も、並びの順に残します ###
+        self.assertEqual(prune_postings(POSTINGS, max_postings=3), [('b', 0.5), ('c', 0.3), ('d', 0.1)])
+        self.assertEqual(prune_postings(POSTINGS, max_postings=10), prune_postings(POSTINGS))
+        self.assertEqual(prune_postings(POSTINGS, max_postings=0), [])
+
+    def test_min_score(self):
+        ### min_scoreと同じスコアは残します ###
+        self.assertEqual(prune_postings(POSTINGS, min_score=0.1), [('b', 0.5), ('c', 0.3), ('d', 0.1), ('a', 0.1)])
+        self.assertEqual(prune_postings(POSTINGS, min_score=0.0), [('b', 0.5), ('c', 0.3), ('d', 0.1), ('a', 0.1)])
+        self.assertEqual(prune_postings(POSTINGS, min_score=-1.0), prune_postings(POSTINGS))
+        self.assertEqual(prune_postings(POSTINGS, min_score=1.0), [])
+
+    def test_cumulative_mass(self):
+        ### 絶対値の合計は1.2です。0.5 + 0.3 + 0.1で1.2 * 0.7 = 0.84に達します ###
+        self.assertEqual(prune_postings(POSTINGS, cumulative_mass=0.7), [('b', 0.5), ('c', 0.3), ('d', 0.1)])
+        self.assertEqual(prune_postings(POSTINGS, cumulative_mass=0.4), [('b', 0.5)])
+        ### 負のスコアがあっても、割合が1.0ならすべて残します ###
+        self.assertEqual(prune_postings(POSTINGS, cumulative_mass=1.0), prune_postings(POSTINGS))
+        self.assertEqual(prune_postings([('a', -0.1), ('b', -0.3)], cumulative_mass=0.5), [('a', -0.1), ('b', -0.3)])
+        self.assertEqual(prune_postings([('a', 0.0), ('b', 0.0)], cumulative_mass=0.5), [('b', 0.0)])
+
+    def test_combined_conditions(self):
+        ### min_score、max_postings、cumulative_massの順に適用します ###
+        self.assertEqual(prune_postings(POSTINGS, max_postings=3, min_score=0.2), [('b', 0.5), ('c', 0.3)])
+        self.assertEqual(prune_postings(POSTINGS, max_postings=3, cumulative_mass=0.8), [('b', 0.5), ('c', 0.3)])
+        self.assertEqual(prune_postings(POSTINGS, max_postings=1, cumulative_mass=0.1), [('b', 0.5)])
+
+    def test_iter_pruned_postings(self):
+        seq_word_postings = [('お金', POSTINGS), ('鈴鹿', [('a', 0.01)]), ('野球', [('b', 0.2), ('a', 0.2)])]
+        self.assertEqual(list(iter_pruned_postings(seq_word_postings, min_score=0.1)),
+                         [('お金', [('b', 0.5), ('c', 0.3), ('d', 0.1), ('a', 0.1)]),
+                          ('野球', [('b', 0.2), ('a', 0.2)])])
+        self.assertEqual(list(iter_pruned_postings(seq_word_postings)), seq_word_postings)
+
+
+if __name__ == '__main__':
+    unittest.main()
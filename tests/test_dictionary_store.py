@@ -0,0 +1,68 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+"""SqliteDictionaryStoreが、batch_sizeの途中で終わるレコードも含めてすべての単語を保存し、
+900件を超える単語をget_manyで分割して引けること、読み込み専用で開き直せることを確かめます。
+"""
+
+__author__ = "Kensuke Mitsuzawa"
+__author_email__ = "kensuke_mitsuzawa@fumankaitori.com"
+__license_name__ = "MIT"
+
+from benchmarks.synthetic_data import iter_synthetic_dictionary
+from category_scoring import reformat_dictionary
+from dictionary_store import MAX_QUERY_PARAMETERS, SqliteDictionaryStore
+
+
+class TestSqliteDictionaryStore(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.path_work_dir = tempfile.mkdtemp(prefix='test_dictionary_store_')
+        cls.score_dictionary = list(iter_synthetic_dictionary(n_words=1200, n_categories=20, mean_postings=3.0))
+        cls.word_score_dictionary = reformat_dictionary(cls.score_dictionary)
+        cls.path_sqlite = os.path.join(cls.path_work_dir, 'word_soa.sqlite3')
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.path_work_dir, ignore_errors=True)
+
+    def build(self, batch_size=1000):
+        return SqliteDictionaryStore.build(self.path_sqlite, iter(self.score_dictionary), batch_size=batch_size)
+
+    def test_build_with_partial_last_batch(self):
+        self.assertNotEqual(len(self.score_dictionary) % 1000, 0)
+        with self.build(batch_size=1000) as store:
+            self.assertEqual(len(store), len(self.word_score_dictionary))
+            for word, postings in self.word_score_dictionary.items():
+                self.assertIn(word, store)
+                self.assertEqual(store[word], postings)
+            self.assertEqual(dict(store.items()), self.word_score_dictionary)
+        self.assertFalse(os.path.exists(self.path_sqlite + '.tmp'))
+
+    def test_get_many_over_query_parameters(self):
+        seq_words = sorted(self.word_score_dictionary) + ['未知語{}'.format(index) for index in range(100)]
+        self.assertGreater(len(self.word_score_dictionary), MAX_QUERY_PARAMETERS)
+        with self.build() as store:
+            self.assertEqual(store.get_many(seq_words + seq_words[:10]), self.word_score_dictionary)
+            self.assertEqual(store.get_many([]), {})
+
+    def test_reopen_read_only(self):
+        self.build().close()
+        self.assertTrue(SqliteDictionaryStore.is_built(self.path_sqlite))
+        with SqliteDictionaryStore.open(self.path_sqlite) as store:
+            word, postings = next(iter(sorted(self.word_score_dictionary.items())))
+            self.assertEqual(store.get(word), postings)
+            self.assertIsNone(store.get('未知語'))
+            self.assertRaises(KeyError, store.__getitem__, '未知語')
+            self.assertRaises(sqlite3.OperationalError, store.connection.execute,
+                              'DELETE FROM postings WHERE word = ?', (word,))
+        self.assertFalse(SqliteDictionaryStore.is_built(os.path.join(self.path_work_dir, 'not_found.sqlite3')))
+        self.assertRaises(FileExistsError, SqliteDictionaryStore.open,
+                          os.path.join(self.path_work_dir, 'not_found.sqlite3'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+"""get_wikipedia_text.pyの取得処理を、ローカルのスタブのHTTPサーバー(stub_wikipedia_api.py)に対して確かめます。
+ネットワークは使いません。
+"""
+
+__author__ = "Kensuke Mitsuzawa"
+__author_email__ = "kensuke_mitsuzawa@fumankaitori.com"
+__license_name__ = "MIT"
+
+from get_wikipedia_text import TokenBucket, fetch_wikipedia_page, fetch_wikipedia_pages, derive_summary, main
+from tests.stub_wikipedia_api import StubWikipediaApi
+
+CONTENT = '鈴鹿サーキットは三重県鈴鹿市にある。F1日本グランプリが開催される。遊園地もある。ホテルもある。\n\n== 歴史 ==\n1962年に開業した。'
+
+
+class TestFetchWikipediaPage(unittest.TestCase):
+    def test_token_bucket_rate(self):
+        ### 全スレッド合計で、どの区間でも capacity + rate * 区間の長さ 回を超えてリクエストしないことを確かめます。
+        ### 時刻はスタブが受け取った時点のため、送信までの揺らぎを20ミリ秒まで許容します ###
+        rate = 20.0
+        n_workers = 4
+        seq_page_title = ['記事{}'.format(page_id) for page_id in range(16)]
+        with StubWikipediaApi({page_title: [CONTENT] for page_title in seq_page_title}) as stub_api:
+            start = time.monotonic()
+            page_title2content = fetch_wikipedia_pages(seq_page_title,
+                                                       n_workers=n_workers,
+                                                       requests_per_second=rate,
+                                                       api_url=stub_api.api_url)
+            elapsed = time.monotonic() - start
+            request_times = sorted(stub_api.get_request_times())
+        self.assertEqual(page_title2content, {page_title: CONTENT for page_title in seq_page_title})
+        self.assertEqual(len(request_times), len(seq_page_title))
+        self.assertGreaterEqual(elapsed, (len(seq_page_title) - n_workers) / rate * 0.9)
+        for i in range(len(request_times)):
+            for j in range(i, len(request_times)):
+                self.assertLessEqual(j - i + 1, n_workers + rate * (request_times[j] - request_times[i] + 0.02))
+
+    def test_retry_with_backoff(self):
+        backoff_base = 0.05
+        with StubWikipediaApi({'鈴鹿サーキット': [429, 503, 500, CONTENT]}) as stub_api:
+            content = fetch_wikipedia_page('鈴鹿サーキット', TokenBucket(rate=1000.0),
+                                           api_url=stub_api.api_url, max_retries=5, backoff_base=backoff_base)
+            request_times = stub_api.get_request_times('鈴鹿サーキット')
+        self.assertEqual(content, CONTENT)
+        self.assertEqual(len(request_times), 4)
+        ### n回目の再試行の前には backoff_base * 2^n 秒以上待ちます ###
+        for n_retry in range(3):
+            self.assertGreaterEqual(request_times[n_retry + 1] - request_times[n_retry],
+                                    backoff_base * (2 ** n_retry) * 0.9)
+
+    def test_give_up(self):
+        with StubWikipediaApi({'鈴鹿サーキット': [502], '存在しない記事': [None], '禁止': [403]}) as stub_api:
+            self.assertFalse(fetch_wikipedia_page('鈴鹿サーキット', TokenBucket(rate=1000.0),
+                                                  api_url=stub_api.api_url, max_retries=2, backoff_base=0.01))
+            self.assertFalse(fetch_wikipedia_page('存在しない記事', TokenBucket(rate=1000.0),
+                                                  api_url=stub_api.api_url, max_retries=2, backoff_base=0.01))
+            self.assertFalse(fetch_wikipedia_page('禁止', TokenBucket(rate=1000.0),
+                                                  api_url=stub_api.api_url, max_retries=2, backoff_base=0.01))
+            self.assertEqual(len(stub_api.get_request_times('鈴鹿サーキット')), 3)
+            ### 再試行しないステータスと、存在しない記事は1回だけリクエストします ###
+            self.assertEqual(len(stub_api.get_request_times('存在しない記事')), 1)
+            self.assertEqual(len(stub_api.get_request_times('禁止')), 1)
+
+
+class TestMain(unittest.TestCase):
+    def setUp(self):
+        self.path_work_dir = tempfile.mkdtemp(prefix='test_get_wikipedia_text_')
+        self.path_output = os.path.join(self.path_work_dir, 'wikipedia_text.jsonl')
+
+    def tearDown(self):
+        shutil.rmtree(self.path_work_dir, ignore_errors=True)
+
+    def test_summary_from_single_fetch(self):
+        wikipedia_article_names = [('鈴鹿サーキット', '旅行・レジャー-観光'), ('鈴鹿サーキット', 'アウトドア・スポーツ-スポーツ')]
+        with StubWikipediaApi({'鈴鹿サーキット': [CONTENT]}) as stub_api:
+            main(self.path_output, wikipedia_article_names, n_workers=2, requests_per_second=1000.0,
+                 api_url=stub_api.api_url)
+            ### 2回目は取得済みのため、リクエストしません ###
+            main(self.path_output, wikipedia_article_names, n_workers=2, requests_per_second=1000.0,
+                 api_url=stub_api.api_url)
+            self.assertEqual(len(stub_api.get_request_times('鈴鹿サーキット')), 1)
+        with open(self.path_output, 'r') as f:
+            seq_evaluation_obj = [json.loads(line) for line in f]
+        self.assertEqual(len(seq_evaluation_obj), 4)
+        kind2texts = {}
+        for evaluation_obj in seq_evaluation_obj:
+            kind2texts.setdefault(evaluation_obj['kind'], set()).add(evaluation_obj['text'])
+        self.assertEqual(kind2texts['full'], {CONTENT})
+        self.assertEqual(kind2texts['summary'], {'鈴鹿サーキットは三重県鈴鹿市にある。F1日本グランプリが開催される。遊園地もある。'})
+        self.assertEqual(derive_summary(CONTENT, n_summary_sentence=10),
+                         '鈴鹿サーキットは三重県鈴鹿市にある。F1日本グランプリが開催される。遊園地もある。ホテルもある。')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,39 @@
+import os
+import subprocess
+import sys
+import unittest
+
+"""スコアリングのモジュールを読み込んだだけでは、sqlite3を読み込まないことを確かめます。
+sqlite3はSQLiteの辞書ストアや形態素解析キャッシュを使うときに初めて読み込みます。
+"""
+
+__author__ = "Kensuke Mitsuzawa"
+__author_email__ = "kensuke_mitsuzawa@fumankaitori.com"
+__license_name__ = "MIT"
+
+SEQ_MODULE_NAME = ['category_scoring', 'streaming_scoring', 'segment_scoring', 'sparse_scoring', 'shared_dictionary']
+
+
+class TestImportLaziness(unittest.TestCase):
+    def test_no_sqlite_import(self):
+        for module_name in SEQ_MODULE_NAME:
+            with self.subTest(module_name=module_name):
+                ### 読み込み済みのモジュールの影響を受けないよう、モジュールごとに別のプロセスで読み込みます ###
+                code = 'import sys\n' \
+                       'try:\n' \
+                       '    import {}\n' \
+                       'except ImportError:\n' \
+                       '    print("ImportError")\n' \
+                       'else:\n' \
+                       '    print("sqlite3" in sys.modules)'.format(module_name)
+                completed = subprocess.run([sys.executable, '-c', code],
+                                           stdout=subprocess.PIPE, check=True,
+                                           cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+                result = completed.stdout.decode('utf-8').strip()
+                if result == 'ImportError':
+                    continue
+                self.assertEqual(result, 'False')
+
+
+if __name__ == '__main__':
+    unittest.main()
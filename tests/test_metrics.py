@@ -0,0 +1,92 @@
+import unittest
+
+"""MetricsRegistryの集計値のmerge、Prometheusのテキスト形式(ラベルのエスケープを含む)、
+無効の間に何も記録しないことを確かめます。
+"""
+
+__author__ = "Kensuke Mitsuzawa"
+__author_email__ = "kensuke_mitsuzawa@fumankaitori.com"
+__license_name__ = "MIT"
+
+from category_scoring import get_text_score
+from metrics import METRICS, LATENCY_BUCKETS, MetricsRegistry
+
+WORD_SCORE_DICTIONARY = {'お金': [('マネー', 0.3)], '野球': [('スポーツ', 0.4), ('ニュース', 0.2)]}
+
+
+class TestMetricsRegistry(unittest.TestCase):
+    def test_merge(self):
+        registry_a = MetricsRegistry()
+        registry_a.increment('tokens_total', 3)
+        registry_a.increment('tokens_by_pos_total', 2, pos='名詞', hit='true')
+        registry_a.observe('stage_seconds', 0.00002, stage='lookup')
+        registry_a.observe('stage_seconds', 100.0, stage='lookup')
+        registry_b = MetricsRegistry()
+        registry_b.increment('tokens_total', 4)
+        registry_b.increment('documents_total')
+        registry_b.observe('stage_seconds', 0.00005, stage='lookup')
+        registry_b.observe('document_tokens', 10)
+
+        registry = MetricsRegistry()
+        registry.merge(registry_a.drain())
+        registry.merge(registry_b.snapshot())
+        self.assertEqual(registry_a.drain(), {'counters': [], 'histograms': []})
+        snapshot = registry.snapshot()
+        self.assertEqual([(counter['name'], counter['labels'], counter['value']) for counter in snapshot['counters']],
+                         [('documents_total', {}, 1),
+                          ('tokens_by_pos_total', {'hit': 'true', 'pos': '名詞'}, 2),
+                          ('tokens_total', {}, 7)])
+        histogram_tokens, histogram_lookup = snapshot['histograms']
+        self.assertEqual((histogram_tokens['name'], histogram_tokens['counts'][0], histogram_tokens['count']),
+                         ('document_tokens', 1, 1))
+        ### 区切りの値ちょうどは、その区切りのバケツに入ります ###
+        self.assertEqual(histogram_lookup['labels'], {'stage': 'lookup'})
+        self.assertEqual(histogram_lookup['buckets'], list(LATENCY_BUCKETS))
+        self.assertEqual(histogram_lookup['counts'], [0, 2] + [0] * (len(LATENCY_BUCKETS) - 2) + [1])
+        self.assertEqual(histogram_lookup['count'], 3)
+        self.assertAlmostEqual(histogram_lookup['sum'], 100.00007)
+
+    def test_to_prometheus(self):
+        registry = MetricsRegistry()
+        registry.increment('tokens_by_pos_total', 2, pos='名"詞\\固有\n名詞', hit='true')
+        registry.increment('tokens_by_pos_total', 1, pos='動詞', hit='false')
+        registry.observe('dictionary_hit_rate', 0.25)
+        registry.observe('dictionary_hit_rate', 0.95)
+        lines = registry.to_prometheus().splitlines()
+        self.assertEqual(lines[:4], [
+            '# HELP fmc_tokens_by_pos_total 品詞ごとのトークン数',
+            '# TYPE fmc_tokens_by_pos_total counter',
+            'fmc_tokens_by_pos_total{hit="false",pos="動詞"} 1',
+            'fmc_tokens_by_pos_total{hit="true",pos="名\\"詞\\\\固有\\n名詞"} 2',
+        ])
+        self.assertEqual(lines[5], '# TYPE fmc_dictionary_hit_rate histogram')
+        self.assertIn('fmc_dictionary_hit_rate_bucket{le="0.2"} 0', lines)
+        self.assertIn('fmc_dictionary_hit_rate_bucket{le="0.3"} 1', lines)
+        self.assertIn('fmc_dictionary_hit_rate_bucket{le="1.0"} 2', lines)
+        self.assertEqual(lines[-3:], ['fmc_dictionary_hit_rate_bucket{le="+Inf"} 2',
+                                      'fmc_dictionary_hit_rate_sum 1.2',
+                                      'fmc_dictionary_hit_rate_count 2'])
+
+
+class TestDisabledMetrics(unittest.TestCase):
+    def setUp(self):
+        METRICS.reset()
+
+    def tearDown(self):
+        METRICS.disable()
+        METRICS.reset()
+
+    def test_nothing_is_recorded_when_disabled(self):
+        METRICS.disable()
+        get_text_score('お金 野球 未知語', WORD_SCORE_DICTIONARY, str.split)
+        self.assertEqual(METRICS.drain(), {'counters': [], 'histograms': []})
+
+        METRICS.enable()
+        get_text_score('お金 野球 未知語', WORD_SCORE_DICTIONARY, str.split)
+        snapshot = METRICS.drain()
+        self.assertIn({'name': 'unknown_tokens_total', 'labels': {}, 'value': 1}, snapshot['counters'])
+        self.assertEqual(METRICS.drain(), {'counters': [], 'histograms': []})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+import unittest
+
+"""NearDuplicateStageのsplit_chunkとfan_outが、代表の上限を超えて代表を削除しても、
+すべてのレコードに代表の結果を返すことを確かめます。choose_bandsのバンドの選び方も確かめます。
+"""
+
+__author__ = "Kensuke Mitsuzawa"
+__author_email__ = "kensuke_mitsuzawa@fumankaitori.com"
+__license_name__ = "MIT"
+
+from near_duplicate import NearDuplicateStage, choose_bands
+
+SEQ_TEXT = [
+    '鈴鹿サーキットは三重県鈴鹿市にあるレジャー施設。',
+    '株式会社ホンダモビリティランドが運営している。',
+    '国際レーシングコースを中心に遊園地やホテルなどを併設する。',
+    'お金の貯め方と保険の選び方について解説します。',
+    'プロ野球のペナントレースは今週末に最終戦を迎えます。',
+]
+
+
+def score_representative_chunk(representative_chunk):
+    ### 代表のテキストをそのまま結果にして、どの代表の結果が返ったかを確かめます ###
+    return [(representative_key, text) for representative_key, text in representative_chunk]
+
+
+class TestNearDuplicateStage(unittest.TestCase):
+    def test_exact_duplicates_collapse(self):
+        near_duplicate_stage = NearDuplicateStage(threshold=0.9)
+        chunk = [(record_id, SEQ_TEXT[record_id % 2]) for record_id in range(10)]
+        plan, representative_chunk = near_duplicate_stage.split_chunk(chunk)
+        self.assertEqual(representative_chunk, [(0, SEQ_TEXT[0]), (1, SEQ_TEXT[1])])
+        self.assertEqual(near_duplicate_stage.fan_out(plan, score_representative_chunk(representative_chunk)), chunk)
+        report = near_duplicate_stage.get_report()
+        self.assertEqual((report['n_records'], report['n_representatives'], report['n_duplicates']), (10, 2, 8))
+
+    def test_eviction_keeps_results_of_chunk(self):
+        near_duplicate_stage = NearDuplicateStage(threshold=0.9, max_representatives=2)
+        seq_chunk = [
+            [(record_id, text) for record_id, text in enumerate(SEQ_TEXT + SEQ_TEXT)],
+            [('a', SEQ_TEXT[4]), ('b', SEQ_TEXT[0]), ('c', SEQ_TEXT[4])],
+        ]
+        seq_n_representatives = []
+        for chunk in seq_chunk:
+            plan, representative_chunk = near_duplicate_stage.split_chunk(chunk)
+            seq_n_representatives.append(len(representative_chunk))
+            ### 代表を削除しても、このチャンクのすべてのレコードに代表の結果を返します ###
+            self.assertEqual(near_duplicate_stage.fan_out(plan, score_representative_chunk(representative_chunk)),
+                             chunk)
+            self.assertLessEqual(len(near_duplicate_stage.representative_results), 2)
+        ### 削除された代表と同じテキストは、再び代表になります。最後に追加した2つの代表は残ります ###
+        self.assertEqual(seq_n_representatives, [10, 1])
+        self.assertEqual(near_duplicate_stage.get_report()['n_representatives'], 11)
+
+
+class TestChooseBands(unittest.TestCase):
+    def test_choose_bands(self):
+        n_bands, n_rows = choose_bands(128, 0.9)
+        self.assertEqual((n_bands, n_rows), (8, 16))
+        self.assertEqual(n_bands * n_rows, 128)
+        self.assertLessEqual((1.0 / n_bands) ** (1.0 / n_rows), 0.9)
+        self.assertGreater((1.0 / (n_bands // 2)) ** (1.0 / (n_rows * 2)), 0.9)
+
+
+if __name__ == '__main__':
+    unittest.main()
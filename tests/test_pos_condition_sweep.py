@@ -0,0 +1,56 @@
+import unittest
+
+"""TokenizedCorpusの品詞条件のフィルタが、JapaneseTokenizerのfilterと同じく品詞のタプルの先頭で一致することを、MeCabを使わずに確かめます。
+"""
+
+__author__ = "Kensuke Mitsuzawa"
+__author_email__ = "kensuke_mitsuzawa@fumankaitori.com"
+__license_name__ = "MIT"
+
+from pos_condition_sweep import TokenizedCorpus, iter_pos_condition_grid
+
+SEQ_DOCUMENT = [
+    [('鈴鹿', ('名詞', '固有名詞', '地域', '一般')), ('の', ('助詞', '連体化')),
+     ('サーキット', ('名詞', '一般')), ('走る', ('動詞', '自立'))],
+    [('お金', ('名詞', '一般')), ('を', ('助詞', '格助詞', '一般')), ('払う', ('動詞', '自立')),
+     ('鈴鹿', ('名詞', '固有名詞', '地域', '一般')), ('静か', ('名詞', '形容動詞語幹'))],
+    [],
+]
+
+
+class TestTokenizedCorpus(unittest.TestCase):
+    def setUp(self):
+        self.corpus = TokenizedCorpus()
+        for seq_token_pos in SEQ_DOCUMENT:
+            self.corpus.add_document(seq_token_pos)
+
+    def get_filtered_documents(self, pos_condition):
+        pos_mask = self.corpus.get_pos_mask(pos_condition)
+        return [self.corpus.get_filtered_tokens(document_index, pos_mask) for document_index in range(len(self.corpus))]
+
+    def test_prefix_match(self):
+        self.assertEqual(len(self.corpus), 3)
+        ### ('名詞',)は、('名詞', '固有名詞', ...)にも('名詞', '一般')にも一致します ###
+        self.assertEqual(self.get_filtered_documents([('名詞',)]),
+                         [['鈴鹿', 'サーキット'], ['お金', '鈴鹿', '静か'], []])
+        self.assertEqual(self.get_filtered_documents([('名詞', '固有名詞')]), [['鈴鹿'], ['鈴鹿'], []])
+        self.assertEqual(self.get_filtered_documents([('名詞', '固有名詞', '地域', '一般')]), [['鈴鹿'], ['鈴鹿'], []])
+        self.assertEqual(self.get_filtered_documents([('名詞', '一般'), ('動詞', '自立')]),
+                         [['サーキット', '走る'], ['お金', '払う'], []])
+
+    def test_no_match(self):
+        ### 品詞のタプルより長い条件や、途中だけが一致する条件は一致しません ###
+        self.assertEqual(self.get_filtered_documents([('名詞', '一般', '地域')]), [[], [], []])
+        self.assertEqual(self.get_filtered_documents([('一般',)]), [[], [], []])
+        self.assertEqual(self.get_filtered_documents([]), [[], [], []])
+        self.assertEqual(self.corpus.get_pos_mask([['名詞', '一般']]), self.corpus.get_pos_mask([('名詞', '一般')]))
+
+    def test_iter_pos_condition_grid(self):
+        seq_candidate_pos = [('名詞',), ('動詞', '自立'), ('形容詞',)]
+        seq_pos_condition = list(iter_pos_condition_grid(seq_candidate_pos, min_size=2))
+        self.assertEqual(seq_pos_condition, [[('名詞',), ('動詞', '自立')], [('名詞',), ('形容詞',)],
+                                             [('動詞', '自立'), ('形容詞',)], seq_candidate_pos])
+
+
+if __name__ == '__main__':
+    unittest.main()
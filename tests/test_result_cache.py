@@ -0,0 +1,142 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+"""ResultCacheのディスクの層への書き込みがflushにまとめられること、無効化した件数を層ごとに数えることを確かめます。
+"""
+
+__author__ = "Kensuke Mitsuzawa"
+__author_email__ = "kensuke_mitsuzawa@fumankaitori.com"
+__license_name__ = "MIT"
+
+from category_scoring import POS_CONDITION
+from result_cache import ResultCache
+
+SEQ_SCORE_TUPLE = [('スポーツ', 1.5), ('ニュース', 0.5)]
+
+
+class TestResultCache(unittest.TestCase):
+    def setUp(self):
+        self.path_work_dir = tempfile.mkdtemp(prefix='test_result_cache_')
+        self.path_disk_cache = os.path.join(self.path_work_dir, 'result_cache.sqlite3')
+
+    def tearDown(self):
+        shutil.rmtree(self.path_work_dir, ignore_errors=True)
+
+    def count_disk_rows(self):
+        connection = sqlite3.connect(self.path_disk_cache)
+        try:
+            return connection.execute('SELECT COUNT(*) FROM results').fetchone()[0]
+        finally:
+            connection.close()
+
+    def test_put_is_written_on_flush(self):
+        result_cache = ResultCache('v1', path_disk_cache=self.path_disk_cache)
+        for index in range(10):
+            result_cache.put('テキスト{}'.format(index), POS_CONDITION, 10, SEQ_SCORE_TUPLE)
+        self.assertEqual(self.count_disk_rows(), 0)
+        self.assertEqual(result_cache.stats()['n_pending_writes'], 10)
+        result_cache.flush()
+        self.assertEqual(self.count_disk_rows(), 10)
+        self.assertEqual(result_cache.stats()['n_pending_writes'], 0)
+        result_cache.close()
+
+        ### 別のインスタンスからはディスクで当たります ###
+        result_cache = ResultCache('v1', path_disk_cache=self.path_disk_cache)
+        self.assertEqual(result_cache.get('テキスト3', POS_CONDITION, 10), SEQ_SCORE_TUPLE)
+        self.assertEqual(result_cache.stats()['disk_hit'], 1)
+        result_cache.close()
+
+    def test_put_flushes_at_disk_flush_size(self):
+        result_cache = ResultCache('v1', path_disk_cache=self.path_disk_cache, disk_flush_size=4)
+        for index in range(3):
+            result_cache.put('テキスト{}'.format(index), POS_CONDITION, 10, SEQ_SCORE_TUPLE)
+        self.assertEqual(self.count_disk_rows(), 0)
+        result_cache.put('テキスト3', POS_CONDITION, 10, SEQ_SCORE_TUPLE)
+        self.assertEqual(self.count_disk_rows(), 4)
+        result_cache.put('テキスト4', POS_CONDITION, 10, SEQ_SCORE_TUPLE, is_auto_flush=False)
+        result_cache.put('テキスト5', POS_CONDITION, 10, SEQ_SCORE_TUPLE, is_auto_flush=False)
+        result_cache.put('テキスト6', POS_CONDITION, 10, SEQ_SCORE_TUPLE, is_auto_flush=False)
+        result_cache.put('テキスト7', POS_CONDITION, 10, SEQ_SCORE_TUPLE, is_auto_flush=False)
+        self.assertEqual(self.count_disk_rows(), 4)
+        result_cache.close()
+        self.assertEqual(self.count_disk_rows(), 8)
+
+    def test_disk_hit_does_not_write_until_flush(self):
+        result_cache = ResultCache('v1', path_disk_cache=self.path_disk_cache)
+        result_cache.put('テキスト', POS_CONDITION, 10, SEQ_SCORE_TUPLE)
+        result_cache.flush()
+        result_cache.entries.clear()
+        self.assertEqual(result_cache.get('テキスト', POS_CONDITION, 10), SEQ_SCORE_TUPLE)
+        self.assertEqual(result_cache.stats()['disk_hit'], 1)
+        self.assertEqual(result_cache.stats()['n_pending_writes'], 1)
+        self.assertFalse(result_cache.connection.in_transaction)
+        result_cache.flush()
+        self.assertEqual(result_cache.stats()['n_pending_writes'], 0)
+        result_cache.close()
+
+    def test_invalidation_is_counted_per_tier(self):
+        result_cache = ResultCache('v1', path_disk_cache=self.path_disk_cache)
+        for index in range(5):
+            result_cache.put('テキスト{}'.format(index), POS_CONDITION, 10, SEQ_SCORE_TUPLE)
+        result_cache.flush()
+        ### 書き込んでいない結果は、メモリの層だけで数えます ###
+        result_cache.put('テキスト5', POS_CONDITION, 10, SEQ_SCORE_TUPLE)
+        self.assertTrue(result_cache.set_dictionary_version('v2'))
+        self.assertFalse(result_cache.set_dictionary_version('v2'))
+        self.assertIsNone(result_cache.get('テキスト0', POS_CONDITION, 10))
+        result_cache.flush()
+        stats = result_cache.stats()
+        self.assertEqual(stats['invalidated_memory'], 6)
+        self.assertEqual(stats['invalidated_disk'], 5)
+        self.assertEqual(stats['disk_total_bytes'], 0)
+        self.assertEqual(self.count_disk_rows(), 0)
+        result_cache.close()
+
+    def test_stale_put_is_dropped(self):
+        result_cache = ResultCache('v1', path_disk_cache=self.path_disk_cache)
+        result_cache.set_dictionary_version('v2')
+        result_cache.put('テキスト', POS_CONDITION, 10, SEQ_SCORE_TUPLE, dictionary_version='v1')
+        self.assertIsNone(result_cache.get('テキスト', POS_CONDITION, 10))
+        result_cache.put('テキスト', POS_CONDITION, 10, SEQ_SCORE_TUPLE, dictionary_version='v2')
+        self.assertEqual(result_cache.get('テキスト', POS_CONDITION, 10), SEQ_SCORE_TUPLE)
+        self.assertEqual(result_cache.stats()['stale_dropped'], 1)
+        result_cache.close()
+
+    def test_other_versions_on_shared_disk_are_kept(self):
+        result_cache_v1 = ResultCache('v1', path_disk_cache=self.path_disk_cache)
+        result_cache_v1.put('テキスト1', POS_CONDITION, 10, SEQ_SCORE_TUPLE)
+        result_cache_v1.flush()
+        ### 別の辞書を使うプロセスが開いても、v1の結果は削除しません ###
+        result_cache_v2 = ResultCache('v2', path_disk_cache=self.path_disk_cache)
+        result_cache_v2.put('テキスト2', POS_CONDITION, 10, SEQ_SCORE_TUPLE)
+        result_cache_v2.flush()
+        self.assertEqual(self.count_disk_rows(), 2)
+        result_cache_v1.entries.clear()
+        self.assertEqual(result_cache_v1.get('テキスト1', POS_CONDITION, 10), SEQ_SCORE_TUPLE)
+        ### バージョンが変わったプロセスは、直前のバージョン(v2)の結果だけを削除します ###
+        result_cache_v2.set_dictionary_version('v3')
+        result_cache_v2.flush()
+        self.assertEqual(result_cache_v2.stats()['invalidated_disk'], 1)
+        self.assertEqual(self.count_disk_rows(), 1)
+        result_cache_v1.entries.clear()
+        self.assertEqual(result_cache_v1.get('テキスト1', POS_CONDITION, 10), SEQ_SCORE_TUPLE)
+        result_cache_v1.close()
+        result_cache_v2.close()
+
+    def test_evict_disk(self):
+        result_cache = ResultCache('v1', path_disk_cache=self.path_disk_cache, disk_max_bytes=1000)
+        for index in range(40):
+            result_cache.put('テキスト{}'.format(index), POS_CONDITION, 10, SEQ_SCORE_TUPLE)
+            result_cache.flush()
+        stats = result_cache.stats()
+        self.assertGreater(stats['evicted_disk'], 0)
+        self.assertLessEqual(stats['disk_total_bytes'], 1000)
+        self.assertEqual(stats['evicted_memory'], 0)
+        result_cache.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,42 @@
+import unittest
+
+"""SegmentScorerの区間の順位が、区間のトークンをget_text_scoreでスコアリングした順位と同じになることを確かめます。
+"""
+
+__author__ = "Kensuke Mitsuzawa"
+__author_email__ = "kensuke_mitsuzawa@fumankaitori.com"
+__license_name__ = "MIT"
+
+from benchmarks.synthetic_data import iter_synthetic_documents
+from category_scoring import close_word_score_dictionary, get_text_score
+from segment_scoring import SegmentScorer
+from tests.synthetic_fixture import SyntheticDictionaryTestCase
+
+
+class TestSegmentScorer(SyntheticDictionaryTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super(TestSegmentScorer, cls).setUpClass()
+        cls.seq_tokens = [evaluation_obj['text'].split() for evaluation_obj
+                          in iter_synthetic_documents(cls.score_dictionary, n_documents=5, mean_tokens=200)
+                          if evaluation_obj['kind'] == 'full']
+
+    def test_window_score(self):
+        for backend_name, word_score_dictionary in self.iter_backends():
+            try:
+                for list_tokens in self.seq_tokens:
+                    segment_scorer = SegmentScorer(list_tokens, word_score_dictionary)
+                    for start, end in segment_scorer.iter_windows(50, 25):
+                        seq_score_tuple = segment_scorer.get_window_score(start, end, top_k=3)
+                        seq_expected_score_tuple = get_text_score(list_tokens[start:end], word_score_dictionary,
+                                                                  lambda tokens: tokens, top_k=3)
+                        self.assertEqual([label for label, _ in seq_score_tuple],
+                                         [label for label, _ in seq_expected_score_tuple], backend_name)
+                        for (_, score), (_, expected_score) in zip(seq_score_tuple, seq_expected_score_tuple):
+                            self.assertAlmostEqual(score, expected_score, places=9, msg=backend_name)
+            finally:
+                close_word_score_dictionary(word_score_dictionary)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import os
+import subprocess
+import sys
+import unittest
+
+"""create_shared_dictionaryで、辞書のそれぞれの形から共有メモリの辞書を作成できることを確かめます。
+接続したプロセスが終了しても、共有メモリが削除されないことも確かめます。
+"""
+
+__author__ = "Kensuke Mitsuzawa"
+__author_email__ = "kensuke_mitsuzawa@fumankaitori.com"
+__license_name__ = "MIT"
+
+from category_scoring import reformat_dictionary, close_word_score_dictionary
+from tests.synthetic_fixture import SyntheticDictionaryTestCase
+
+
+class TestCreateSharedDictionary(SyntheticDictionaryTestCase):
+    @classmethod
+    def setUpClass(cls):
+        try:
+            from shared_dictionary import create_shared_dictionary, attach_shared_dictionary
+        except ImportError:
+            raise unittest.SkipTest('multiprocessing.shared_memory requires Python3.8 or later')
+        cls.create_shared_dictionary = staticmethod(create_shared_dictionary)
+        cls.attach_shared_dictionary = staticmethod(attach_shared_dictionary)
+        super(TestCreateSharedDictionary, cls).setUpClass()
+        cls.word_score_dictionary = reformat_dictionary(cls.score_dictionary)
+
+    def assert_shared_copy(self, source_dictionary):
+        shared_dictionary = self.create_shared_dictionary(source_dictionary)
+        try:
+            attached_dictionary = self.attach_shared_dictionary(shared_dictionary.name)
+            try:
+                self.assertEqual(len(attached_dictionary), len(self.word_score_dictionary))
+                for word, postings in self.word_score_dictionary.items():
+                    self.assertEqual(attached_dictionary[word], postings)
+                self.assertIsNone(attached_dictionary.get('辞書にない単語'))
+            finally:
+                attached_dictionary.close()
+        finally:
+            shared_dictionary.close()
+
+    def test_every_backend(self):
+        for backend_name, word_score_dictionary in self.iter_backends():
+            try:
+                self.assert_shared_copy(word_score_dictionary)
+            finally:
+                close_word_score_dictionary(word_score_dictionary)
+
+    def test_attached_process_exit_keeps_shared_memory(self):
+        shared_dictionary = self.create_shared_dictionary(self.word_score_dictionary)
+        try:
+            code = 'from shared_dictionary import attach_shared_dictionary; ' \
+                   'attach_shared_dictionary({!r}).close()'.format(shared_dictionary.name)
+            completed_process = subprocess.run([sys.executable, '-c', code],
+                                               cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                               stderr=subprocess.PIPE, universal_newlines=True)
+            self.assertEqual(completed_process.returncode, 0, completed_process.stderr)
+            self.assertNotIn('leaked', completed_process.stderr)
+            attached_dictionary = self.attach_shared_dictionary(shared_dictionary.name)
+            self.assertEqual(len(attached_dictionary), len(self.word_score_dictionary))
+            attached_dictionary.close()
+        finally:
+            shared_dictionary.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
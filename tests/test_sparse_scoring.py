@@ -0,0 +1,73 @@
+from typing import List, Tuple
+import json
+import os
+import unittest
+
+"""SparseScoringEngineを、辞書のすべての形(dict、CompactDictionary、DictionaryIndex、SqliteDictionaryStore、SharedDictionary)から作成し、
+get_text_scoreと同じ順位になることを確かめます。
+"""
+
+__author__ = "Kensuke Mitsuzawa"
+__author_email__ = "kensuke_mitsuzawa@fumankaitori.com"
+__license_name__ = "MIT"
+
+from benchmarks.synthetic_data import iter_synthetic_documents
+from category_scoring import reformat_dictionary, load_word_score_dictionary, close_word_score_dictionary, \
+    get_text_score
+from tests.synthetic_fixture import SyntheticDictionaryTestCase
+
+
+class TestSparseScoringBackends(SyntheticDictionaryTestCase):
+    @classmethod
+    def setUpClass(cls):
+        try:
+            from sparse_scoring import SparseScoringEngine
+        except ImportError:
+            raise unittest.SkipTest('numpy and scipy are not installed')
+        super(TestSparseScoringBackends, cls).setUpClass()
+        cls.engine_class = SparseScoringEngine
+        cls.seq_tokens = [evaluation_obj['text'].split() for evaluation_obj
+                          in iter_synthetic_documents(cls.score_dictionary, n_documents=20, mean_tokens=50)]
+
+    def iter_backends(self):
+        path_dictionary_data = os.path.join(self.path_work_dir, 'word_soa.json')
+        if not os.path.exists(path_dictionary_data):
+            with open(path_dictionary_data, 'w') as f:
+                f.write(json.dumps(self.score_dictionary, ensure_ascii=False))
+        for backend_name, word_score_dictionary in super(TestSparseScoringBackends, self).iter_backends():
+            yield backend_name, word_score_dictionary
+        yield 'compact', reformat_dictionary(self.score_dictionary, is_use_compact=True)
+        path_dictionary_index = os.path.join(self.path_work_dir, 'word_soa.idx')
+        load_word_score_dictionary(path_dictionary_data, path_dictionary_index)
+        yield 'index', load_word_score_dictionary(path_dictionary_data, path_dictionary_index)
+        try:
+            from shared_dictionary import create_shared_dictionary
+        except ImportError:
+            return
+        yield 'shared', create_shared_dictionary(reformat_dictionary(self.score_dictionary))
+
+    def assert_same_ranking(self, seq_score_tuple, seq_expected_score_tuple, backend_name):
+        # type: (List[Tuple[str,float]], List[Tuple[str,float]], str)->None
+        self.assertEqual([label for label, _ in seq_score_tuple],
+                         [label for label, _ in seq_expected_score_tuple], backend_name)
+        for (_, score), (_, expected_score) in zip(seq_score_tuple, seq_expected_score_tuple):
+            self.assertAlmostEqual(score, expected_score, places=6, msg=backend_name)
+
+    def test_every_backend(self):
+        seq_backend_name = []
+        for backend_name, word_score_dictionary in self.iter_backends():
+            try:
+                engine = self.engine_class.from_word_score_dictionary(word_score_dictionary)
+                seq_seq_score_tuple = engine.score_batch(self.seq_tokens, top_k=5)
+                for list_tokens, seq_score_tuple in zip(self.seq_tokens, seq_seq_score_tuple):
+                    seq_expected_score_tuple = get_text_score(list_tokens, word_score_dictionary, lambda tokens: tokens,
+                                                              top_k=5)
+                    self.assert_same_ranking(seq_score_tuple, seq_expected_score_tuple, backend_name)
+            finally:
+                close_word_score_dictionary(word_score_dictionary)
+            seq_backend_name.append(backend_name)
+        self.assertTrue({'dict', 'compact', 'sqlite', 'index'}.issubset(seq_backend_name))
+
+
+if __name__ == '__main__':
+    unittest.main()
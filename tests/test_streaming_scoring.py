@@ -0,0 +1,63 @@
+import unittest
+
+"""get_streaming_text_scoreが、辞書の形によらずget_text_scoreと同じ順位を返すことを確かめます。
+"""
+
+__author__ = "Kensuke Mitsuzawa"
+__author_email__ = "kensuke_mitsuzawa@fumankaitori.com"
+__license_name__ = "MIT"
+
+from benchmarks.synthetic_data import iter_synthetic_documents
+from category_scoring import close_word_score_dictionary, get_text_score
+from streaming_scoring import get_score_bound, iter_sentence_chunks, iter_streaming_text_score, \
+    get_streaming_text_score
+from tests.synthetic_fixture import SyntheticDictionaryTestCase
+
+
+class TestStreamingScoring(SyntheticDictionaryTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super(TestStreamingScoring, cls).setUpClass()
+        cls.seq_text = []
+        for evaluation_obj in iter_synthetic_documents(cls.score_dictionary, n_documents=10, mean_tokens=200):
+            list_tokens = evaluation_obj['text'].split()
+            ### 20トークンごとに文を区切ります。句点は辞書にない1トークンになります ###
+            cls.seq_text.append(''.join(' '.join(list_tokens[start:start + 20]) + ' 。\n'
+                                        for start in range(0, len(list_tokens), 20)))
+
+    def test_same_ranking_as_get_text_score(self):
+        for backend_name, word_score_dictionary in self.iter_backends():
+            try:
+                for input_text in self.seq_text:
+                    seq_score_tuple = get_streaming_text_score([input_text], word_score_dictionary, str.split,
+                                                               max_chunk_chars=100)
+                    seq_expected_score_tuple = get_text_score(input_text, word_score_dictionary, str.split)
+                    ### チャンクごとに加算するため、スコアは加算の順序による丸め誤差の範囲で一致します ###
+                    self.assertEqual([label for label, _ in seq_score_tuple],
+                                     [label for label, _ in seq_expected_score_tuple], backend_name)
+                    for (_, score), (_, expected_score) in zip(seq_score_tuple, seq_expected_score_tuple):
+                        self.assertAlmostEqual(score, expected_score, places=9, msg=backend_name)
+            finally:
+                close_word_score_dictionary(word_score_dictionary)
+
+    def test_early_stop(self):
+        for backend_name, word_score_dictionary in self.iter_backends():
+            try:
+                self.assertGreater(get_score_bound(word_score_dictionary), 0.0)
+                for input_text in self.seq_text:
+                    expected_labels = [label for label, _ in get_text_score(input_text, word_score_dictionary,
+                                                                            str.split, top_k=1)]
+                    for scoring_state in iter_streaming_text_score(iter_sentence_chunks([input_text], 100),
+                                                                   word_score_dictionary,
+                                                                   str.split,
+                                                                   top_k=1,
+                                                                   total_length=len(input_text)):
+                        pass
+                    self.assertEqual([label for label, _ in scoring_state['ranking'][:1]], expected_labels,
+                                     backend_name)
+            finally:
+                close_word_score_dictionary(word_score_dictionary)
+
+
+if __name__ == '__main__':
+    unittest.main()
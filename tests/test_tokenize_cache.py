@@ -0,0 +1,101 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+"""TokenizeCacheが、キャッシュに当たるたびやputのたびにはコミットせず、最終利用時刻とputの結果をまとめて書き込むことを確かめます。
+"""
+
+__author__ = "Kensuke Mitsuzawa"
+__author_email__ = "kensuke_mitsuzawa@fumankaitori.com"
+__license_name__ = "MIT"
+
+from category_scoring import POS_CONDITION
+from tokenize_cache import TokenizeCache
+
+
+def function_split_tokenizer(input_text):
+    return input_text.split()
+
+
+class TestTokenizeCache(unittest.TestCase):
+    def setUp(self):
+        self.path_work_dir = tempfile.mkdtemp(prefix='test_tokenize_cache_')
+        self.path_cache = os.path.join(self.path_work_dir, 'tokenize_cache.sqlite3')
+
+    def tearDown(self):
+        shutil.rmtree(self.path_work_dir, ignore_errors=True)
+
+    def count_rows(self):
+        connection = sqlite3.connect(self.path_cache)
+        try:
+            return connection.execute('SELECT COUNT(*) FROM tokens').fetchone()[0]
+        finally:
+            connection.close()
+
+    def get_last_access(self, tokenize_cache, input_text):
+        connection = sqlite3.connect(self.path_cache)
+        try:
+            return connection.execute('SELECT last_access FROM tokens WHERE key = ?',
+                                      (tokenize_cache.make_key(input_text),)).fetchone()[0]
+        finally:
+            connection.close()
+
+    def test_hit_is_flushed_in_batches(self):
+        tokenize_cache = TokenizeCache(self.path_cache, 'neologd', POS_CONDITION,
+                                       access_flush_size=3, put_flush_size=1)
+        function_tokenizer = tokenize_cache.wrap(function_split_tokenizer)
+        self.assertEqual(function_tokenizer('お金 鈴鹿'), ['お金', '鈴鹿'])
+        last_access = self.get_last_access(tokenize_cache, 'お金 鈴鹿')
+        self.assertEqual(function_tokenizer('お金 鈴鹿'), ['お金', '鈴鹿'])
+        self.assertEqual(function_tokenizer('お金 鈴鹿'), ['お金', '鈴鹿'])
+        self.assertEqual(len(tokenize_cache.pending_access), 1)
+        self.assertFalse(tokenize_cache.connection.in_transaction)
+        self.assertEqual(self.get_last_access(tokenize_cache, 'お金 鈴鹿'), last_access)
+        tokenize_cache.close()
+        self.assertGreater(self.get_last_access(tokenize_cache, 'お金 鈴鹿'), last_access)
+
+    def test_evict_uses_pending_access(self):
+        tokenize_cache = TokenizeCache(self.path_cache, 'neologd', POS_CONDITION, max_bytes=10 ** 9)
+        for index in range(20):
+            tokenize_cache.put('テキスト{}'.format(index), ['テキスト', str(index)])
+        tokenize_cache.flush()
+        ### 最初に書き込んだものに当たった後で削除し、当たったものが残ることを確かめます ###
+        self.assertEqual(tokenize_cache.get('テキスト0'), ['テキスト', '0'])
+        self.assertEqual(len(tokenize_cache.pending_access), 1)
+        tokenize_cache.max_bytes = tokenize_cache.get_total_bytes() // 2
+        tokenize_cache.evict()
+        self.assertEqual(tokenize_cache.pending_access, {})
+        self.assertGreater(tokenize_cache.n_evicted, 0)
+        self.assertEqual(tokenize_cache.get('テキスト0'), ['テキスト', '0'])
+        self.assertIsNone(tokenize_cache.get('テキスト1'))
+        tokenize_cache.close()
+
+    def test_put_is_written_in_batches(self):
+        tokenize_cache = TokenizeCache(self.path_cache, 'neologd', POS_CONDITION, put_flush_size=4)
+        function_tokenizer = tokenize_cache.wrap(function_split_tokenizer)
+        for index in range(3):
+            self.assertEqual(function_tokenizer('テキスト {}'.format(index)), ['テキスト', str(index)])
+        self.assertEqual(self.count_rows(), 0)
+        self.assertFalse(tokenize_cache.connection.in_transaction)
+        self.assertEqual(tokenize_cache.stats()['n_pending_writes'], 3)
+        ### 書き込む前の結果にも当たります ###
+        self.assertEqual(tokenize_cache.get('テキスト 0'), ['テキスト', '0'])
+        self.assertEqual((tokenize_cache.n_hit, tokenize_cache.n_miss), (1, 3))
+        self.assertEqual(tokenize_cache.get('空のテキスト'), None)
+        tokenize_cache.put('空のテキスト', [])
+        self.assertEqual(self.count_rows(), 4)
+        self.assertEqual(tokenize_cache.stats()['n_pending_writes'], 0)
+        tokenize_cache.put('テキスト 4', ['テキスト', '4'])
+        tokenize_cache.close()
+        self.assertEqual(self.count_rows(), 5)
+
+        tokenize_cache = TokenizeCache(self.path_cache, 'neologd', POS_CONDITION)
+        self.assertEqual(tokenize_cache.get('空のテキスト'), [])
+        self.assertEqual(tokenize_cache.get('テキスト 4'), ['テキスト', '4'])
+        tokenize_cache.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,217 @@
+from typing import List, Dict, Any, Tuple, Callable, Optional
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import subprocess
+import time
+import zlib
+logger = logging.getLogger(__file__)
+logger.setLevel(logging.INFO)
+
+"""形態素解析の結果をディスクにキャッシュします。
+キーは(テキスト, 辞書の種類, 品詞条件, MeCab辞書のバージョン)のハッシュ値で、トークン列は圧縮して保存します。
+SQLiteのファイルに保存するため、実行をまたいで、また複数のプロセスから同じキャッシュを利用できます。
+キャッシュの合計サイズが上限を超えると、最後に利用された時刻が古いものから削除します。
+キャッシュに当たったときの最終利用時刻と、putした結果はメモリに溜め、削除、flush、closeのときにまとめて1回のトランザクションで書き込みます。
+putした結果は、put_flush_size件溜まるまで他のプロセスからは見えません。
+
+Python3.5以上で動作します。
+"""
+
+__author__ = "Kensuke Mitsuzawa"
+__author_email__ = "kensuke_mitsuzawa@fumankaitori.com"
+__license_name__ = "MIT"
+
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024
+# 上限を超えたときに、この割合まで削除します。
+EVICTION_TARGET_RATIO = 0.9
+# 書き込んでいない最終利用時刻がこの件数に達すると、getの中でflushします。
+DEFAULT_ACCESS_FLUSH_SIZE = 1000
+# 書き込んでいないputの結果がこの件数に達すると、putの中でflushします。
+DEFAULT_PUT_FLUSH_SIZE = 100
+TOKEN_SEPARATOR = '\n'
+
+
+def get_mecab_dictionary_version(path_mecab_bin, dict_type='neologd'):
+    # type: (str, str)->str
+    """* What you can do
+    - mecab -Dの出力(辞書のファイル名、バージョン、サイズ)から、MeCab辞書のバージョンを表す文字列を返します。
+    - 取得できない場合はunknownを返します。
+    """
+    try:
+        path_dicdir = subprocess.check_output([os.path.join(path_mecab_bin, 'mecab-config'), '--dicdir'])
+        path_dicdir = path_dicdir.decode('utf-8').strip()
+        dictionary_name = 'mecab-ipadic-neologd' if dict_type == 'neologd' else 'ipadic'
+        dictionary_info = subprocess.check_output([os.path.join(path_mecab_bin, 'mecab'),
+                                                   '-D', '-d', os.path.join(path_dicdir, dictionary_name)])
+    except (OSError, subprocess.CalledProcessError):
+        logger.warning(msg='Failed to get MeCab dictionary version from {}'.format(path_mecab_bin))
+        return 'unknown'
+
+    return hashlib.sha1(dictionary_info).hexdigest()
+
+
+class TokenizeCache(object):
+    """* What you can do
+    - 形態素解析の結果をキャッシュします。wrapでトークナイザー関数をキャッシュ付きの関数に変換できます。
+
+    * Example
+    >>> cache = TokenizeCache('./wikipedia-text/tokenize_cache.sqlite3', dict_type='neologd', pos_condition=POS_CONDITION)
+    >>> function_tokenizer = cache.wrap(function_mecab_tokenizer)
+    >>> cache.report()
+    >>> cache.close()
+    """
+    def __init__(self,
+                 path_cache,
+                 dict_type,
+                 pos_condition,
+                 mecab_dictionary_version='unknown',
+                 max_bytes=DEFAULT_MAX_BYTES,
+                 access_flush_size=DEFAULT_ACCESS_FLUSH_SIZE,
+                 put_flush_size=DEFAULT_PUT_FLUSH_SIZE):
+        # type: (str, str, List[Tuple[str,...]], str, int, int, int)->None
+        self.path_cache = path_cache
+        self.max_bytes = max_bytes
+        self.access_flush_size = access_flush_size
+        self.put_flush_size = put_flush_size
+        self.key_prefix = json.dumps([dict_type, [list(pos) for pos in pos_condition], mecab_dictionary_version],
+                                     ensure_ascii=False)
+        self.n_hit = 0
+        self.n_miss = 0
+        self.n_evicted = 0
+        # キー -> 書き込んでいない最終利用時刻
+        self.pending_access = {}  # type: Dict[bytes,float]
+        # キー -> 書き込んでいない圧縮済みのトークン列
+        self.pending_rows = {}  # type: Dict[bytes,bytes]
+
+        self.connection = sqlite3.connect(path_cache, timeout=30, check_same_thread=False)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.execute('CREATE TABLE IF NOT EXISTS tokens '
+                                '(key BLOB PRIMARY KEY, value BLOB, size INTEGER, last_access REAL)')
+        self.connection.execute('CREATE INDEX IF NOT EXISTS tokens_last_access ON tokens (last_access)')
+        self.connection.commit()
+        self.total_bytes = self.get_total_bytes()
+
+    def make_key(self, input_text):
+        # type: (str)->bytes
+        return hashlib.sha256((self.key_prefix + input_text).encode('utf-8')).digest()
+
+    def get_total_bytes(self):
+        # type: ()->int
+        return self.connection.execute('SELECT COALESCE(SUM(size), 0) FROM tokens').fetchone()[0]
+
+    def get(self, input_text):
+        # type: (str)->Optional[List[str]]
+        key = self.make_key(input_text)
+        compressed_value = self.pending_rows.get(key)
+        if compressed_value is None:
+            row = self.connection.execute('SELECT value FROM tokens WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                self.n_miss += 1
+                return None
+            compressed_value = row[0]
+            self.pending_access[key] = time.time()
+            if len(self.pending_access) >= self.access_flush_size:
+                self.flush()
+        self.n_hit += 1
+        value = zlib.decompress(compressed_value).decode('utf-8')
+
+        return value.split(TOKEN_SEPARATOR) if value else []
+
+    def put(self, input_text, list_tokens):
+        # type: (str, List[str])->None
+        key = self.make_key(input_text)
+        value = zlib.compress(TOKEN_SEPARATOR.join(list_tokens).encode('utf-8'))
+        self.pending_access.pop(key, None)
+        self.pending_rows[key] = value
+        self.total_bytes += len(value)
+        if self.total_bytes > self.max_bytes:
+            self.evict()
+        elif len(self.pending_rows) >= self.put_flush_size:
+            self.flush()
+
+    def __write_pending(self):
+        # type: ()->None
+        """* What you can do
+        - 溜めておいたputの結果と最終利用時刻を書き込みます。コミットは呼び出し側で行います。
+        """
+        if self.pending_rows:
+            now = time.time()
+            self.connection.executemany('INSERT OR REPLACE INTO tokens VALUES (?, ?, ?, ?)',
+                                        [(key, value, len(value), now)
+                                         for key, value in self.pending_rows.items()])
+            self.pending_rows = {}
+        if self.pending_access:
+            self.connection.executemany('UPDATE tokens SET last_access = ? WHERE key = ?',
+                                        [(last_access, key) for key, last_access in self.pending_access.items()])
+            self.pending_access = {}
+
+    def flush(self):
+        # type: ()->None
+        """* What you can do
+        - 溜めておいたputの結果と最終利用時刻を1回のトランザクションで書き込みます。
+        """
+        if not self.pending_rows and not self.pending_access:
+            return
+        self.__write_pending()
+        self.connection.commit()
+
+    def evict(self):
+        # type: ()->None
+        """* What you can do
+        - キャッシュの合計サイズが上限のEVICTION_TARGET_RATIO倍以下になるまで、古いものから削除します。
+        - 最近当たったものを削除しないように、溜めておいたputの結果と最終利用時刻を先に書き込みます。
+        """
+        self.__write_pending()
+        # 他のプロセスも書き込むため、合計サイズはデータベースから取り直します。
+        self.total_bytes = self.get_total_bytes()
+        target_bytes = int(self.max_bytes * EVICTION_TARGET_RATIO)
+        seq_evict_keys = []  # type: List[bytes]
+        for key, size in self.connection.execute('SELECT key, size FROM tokens ORDER BY last_access'):
+            if self.total_bytes <= target_bytes:
+                break
+            seq_evict_keys.append(key)
+            self.total_bytes -= size
+        self.connection.executemany('DELETE FROM tokens WHERE key = ?', [(key,) for key in seq_evict_keys])
+        self.connection.commit()
+        self.n_evicted += len(seq_evict_keys)
+
+    def wrap(self, function_tokenizer):
+        # type: (Callable[[str], List[str]])->Callable[[str], List[str]]
+        def function_cached_tokenizer(input_text):
+            # type: (str)->List[str]
+            list_tokens = self.get(input_text)
+            if list_tokens is None:
+                list_tokens = function_tokenizer(input_text)
+                self.put(input_text, list_tokens)
+            return list_tokens
+
+        return function_cached_tokenizer
+
+    def stats(self):
+        # type: ()->Dict[str,Any]
+        n_request = self.n_hit + self.n_miss
+        return {
+            'hit': self.n_hit,
+            'miss': self.n_miss,
+            'hit_rate': self.n_hit / n_request if n_request else 0.0,
+            'evicted': self.n_evicted,
+            'n_entries': self.connection.execute('SELECT COUNT(*) FROM tokens').fetchone()[0],
+            'n_pending_writes': len(self.pending_rows),
+            'total_bytes': self.get_total_bytes(),
+        }
+
+    def report(self):
+        # type: ()->Dict[str,Any]
+        stats = self.stats()
+        logger.info(msg='Tokenize cache; hit-rate={hit_rate:.3f} = {hit} / ({hit} + {miss}), '
+                        'N(entry)={n_entries}, size={total_bytes} bytes, evicted={evicted}'.format(**stats))
+        return stats
+
+    def close(self):
+        # type: ()->None
+        self.flush()
+        self.connection.close()